@@ -0,0 +1,215 @@
+# === answers.py - Caché de respuestas del chat ===
+"""
+La mayoría de las consultas se repiten con otras palabras o signos
+("¿Hacen envíos?", "hacen envios", "HACEN ENVÍOS!!"). Las respuestas de
+Gemini se guardan por el mensaje normalizado::
+
+    from chat.answers import answer_cache
+
+    answer, meta = answer_cache.get_or_compute(message, lambda: ask(message))
+    meta  # {'cache': 'hit' | 'miss' | 'coalesced', 'saved_ms': ..., 'hit_rate': ...}
+
+- Dos niveles: un LRU con TTL en memoria del proceso (sin ida y vuelta al
+  backend) y la caché de Django, compartida entre workers si el backend lo
+  es (Redis, Memcached).
+- Single-flight: si llegan varias preguntas iguales a la vez se hace una
+  sola llamada a Gemini. En el proceso esperan al primer hilo; entre
+  workers, el que consigue el lock (``cache.add``) pregunta y los demás
+  esperan a encontrar la respuesta en la caché.
+
+Solo se guardan respuestas de Gemini (las predefinidas no cuestan nada) y
+mensajes cortos: una consulta larga casi nunca se repite igual. Las
+respuestas en streaming (``views.chat_stream``) se guardan al terminar con
+``remember`` y no se agrupan: cada stream tiene su propia llamada.
+"""
+
+import hashlib
+import re
+import threading
+import time
+import unicodedata
+from collections import Counter, OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+
+KEY_PREFIX = 'chat:answer:'
+# Cambiarla invalida las respuestas guardadas (p. ej. al cambiar el prompt)
+PROMPT_VERSION = 1
+POLL_INTERVAL = 0.05
+
+NON_WORD_RE = re.compile(r'[^\w\s]+')
+SPACES_RE = re.compile(r'\s+')
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def normalize_message(text):
+    """Minúsculas, sin acentos ni signos y con los espacios colapsados"""
+    text = unicodedata.normalize('NFKD', str(text or '').lower())
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    return SPACES_RE.sub(' ', NON_WORD_RE.sub(' ', text).replace('_', ' ')).strip()
+
+
+class _Flight:
+    """Una llamada en curso que otros hilos esperan"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.entry = None
+
+
+class AnswerCache:
+    """LRU + TTL local sobre la caché de Django, con single-flight"""
+
+    def __init__(self, ttl=None, local_size=None, max_chars=None, wait_timeout=None):
+        self.ttl = ttl or _setting('CHAT_CACHE_TTL', 3600)
+        self.local_size = local_size or _setting('CHAT_CACHE_LOCAL_SIZE', 512)
+        self.max_chars = max_chars or _setting('CHAT_CACHE_MAX_CHARS', 200)
+        self.wait_timeout = wait_timeout or _setting('CHAT_CACHE_WAIT_TIMEOUT', 20)
+        self._local = OrderedDict()
+        self._flights = {}
+        self._lock = threading.Lock()
+        self.stats = Counter()
+
+    def key(self, message):
+        """Clave de caché del mensaje, o None si no conviene guardarlo"""
+        normalized = normalize_message(message)
+        if not normalized or len(normalized) > self.max_chars:
+            return None
+        digest = hashlib.sha256(f'{PROMPT_VERSION}:{normalized}'.encode()).hexdigest()[:32]
+        return KEY_PREFIX + digest
+
+    def hit_rate(self):
+        served = self.stats['hit'] + self.stats['coalesced']
+        total = served + self.stats['miss']
+        return round(served / total, 3) if total else 0.0
+
+    # -------------------------------------------------------------------------
+
+    def _get_local(self, key):
+        with self._lock:
+            entry = self._local.get(key)
+            if entry is None:
+                return None
+            if entry['expires'] <= time.time():
+                del self._local[key]
+                return None
+            self._local.move_to_end(key)
+            return entry
+
+    def _put_local(self, key, entry):
+        with self._lock:
+            self._local[key] = entry
+            self._local.move_to_end(key)
+            while len(self._local) > self.local_size:
+                self._local.popitem(last=False)
+
+    def get(self, key):
+        entry = self._get_local(key)
+        if entry is None:
+            entry = cache.get(key)
+            if entry is not None and entry['expires'] > time.time():
+                self._put_local(key, entry)
+            else:
+                entry = None
+        return entry
+
+    def _store(self, key, answer, upstream_ms):
+        entry = {'answer': answer, 'upstream_ms': upstream_ms, 'expires': time.time() + self.ttl}
+        cache.set(key, entry, self.ttl)
+        self._put_local(key, entry)
+        return entry
+
+    def _result(self, entry, status):
+        self.stats[status] += 1
+        return entry['answer'], {
+            'cache': status,
+            'upstream_ms': round(entry['upstream_ms'], 1),
+            'saved_ms': round(entry['upstream_ms'], 1) if status != 'miss' else 0.0,
+            'hit_rate': self.hit_rate(),
+        }
+
+    def remember(self, message, answer, upstream_ms):
+        """Guarda una respuesta obtenida por fuera (streaming). Devuelve los metadatos"""
+        key = self.key(message)
+        if key is None:
+            return {'cache': 'skip', 'upstream_ms': round(upstream_ms, 1), 'saved_ms': 0.0,
+                    'hit_rate': self.hit_rate()}
+        return self._result(self._store(key, answer, upstream_ms), 'miss')[1]
+
+    # -------------------------------------------------------------------------
+
+    def get_or_compute(self, message, compute=None):
+        """
+        ``(respuesta, metadatos)`` del mensaje. ``compute()`` hace la
+        llamada real y devuelve el texto; sin ``compute`` solo se busca en la
+        caché y devuelve None si no está.
+        """
+        key = self.key(message)
+        if key is None:
+            if compute is None:
+                return None
+            start = time.perf_counter()
+            answer = compute()
+            self.stats['uncacheable'] += 1
+            return answer, {'cache': 'skip', 'upstream_ms': round((time.perf_counter() - start) * 1000, 1),
+                            'saved_ms': 0.0, 'hit_rate': self.hit_rate()}
+
+        entry = self.get(key)
+        if entry is not None:
+            return self._result(entry, 'hit')
+        if compute is None:
+            return None
+
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+        if not leader:
+            flight.done.wait(self.wait_timeout)
+            if flight.entry is not None:
+                return self._result(flight.entry, 'coalesced')
+            # El primero falló o tardó demasiado: se pregunta de nuevo
+            return self._compute(key, compute, None)
+        return self._compute(key, compute, flight)
+
+    def _compute(self, key, compute, flight):
+        lock_key = key + ':lock'
+        try:
+            acquired = cache.add(lock_key, 1, self.wait_timeout)
+            if not acquired:
+                # Otro worker está preguntando lo mismo
+                deadline = time.monotonic() + self.wait_timeout
+                while time.monotonic() < deadline:
+                    time.sleep(POLL_INTERVAL)
+                    entry = self.get(key)
+                    if entry is not None:
+                        if flight:
+                            flight.entry = entry
+                        return self._result(entry, 'coalesced')
+                    if cache.add(lock_key, 1, self.wait_timeout):
+                        acquired = True
+                        break
+            try:
+                start = time.perf_counter()
+                answer = compute()
+                entry = self._store(key, answer, (time.perf_counter() - start) * 1000)
+            finally:
+                if acquired:
+                    cache.delete(lock_key)
+            if flight:
+                flight.entry = entry
+            return self._result(entry, 'miss')
+        finally:
+            if flight:
+                with self._lock:
+                    self._flights.pop(key, None)
+                flight.done.set()
+
+
+# Instancia por proceso
+answer_cache = AnswerCache()
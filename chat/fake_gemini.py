@@ -0,0 +1,81 @@
+# === fake_gemini.py - Modelo falso de Gemini para tests y benchmarks ===
+"""
+Imita la parte de ``GenerativeModel`` que usa el chat, sin red::
+
+    model = FakeGeminiModel(latency=0.8)
+    resolver = GeminiResolver(factory=lambda name: model)
+    model.stats['calls']
+
+``latency`` es lo que tarda en llegar el primer token y ``token_delay`` lo
+que tarda cada uno de los siguientes; sin ``stream=True`` se devuelve todo
+junto al final, como la API real. Cuenta las llamadas (y cuántas corren a
+la vez) para ver cuántas llegan realmente a la "API".
+"""
+
+import threading
+import time
+from collections import Counter
+
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeGeminiModel:
+    def __init__(self, latency=0.5, token_delay=0.0, fail=False, name='models/fake'):
+        self.latency = latency
+        self.token_delay = token_delay
+        self.fail = fail
+        self.model_name = name
+        self.stats = Counter()
+        self._lock = threading.Lock()
+        self._running = 0
+
+    def _enter(self):
+        with self._lock:
+            self.stats['calls'] += 1
+            self._running += 1
+            self.stats['max_concurrent'] = max(self.stats['max_concurrent'], self._running)
+
+    def _exit(self):
+        with self._lock:
+            self._running -= 1
+
+    def answer(self, prompt):
+        consulta = prompt.rsplit('Consulta:', 1)[-1].split('Respuesta:', 1)[0].strip()
+        return (
+            f'¡Buena pregunta! 🎮 Sobre "{consulta}": tenemos teclados, mouses, auriculares y monitores '
+            'de Logitech, Razer, Redragon y HyperX. Enviamos a todo el país y podés pagar hasta en '
+            '12 cuotas o con 10% de descuento por transferencia. ¿Querés que te recomiende algo? 😊'
+        )
+
+    def tokens(self, prompt):
+        words = self.answer(prompt).split(' ')
+        return [word + ' ' for word in words[:-1]] + words[-1:]
+
+    def generate_content(self, prompt, stream=False, **kwargs):
+        if stream:
+            return self._stream(prompt)
+        self._enter()
+        try:
+            tokens = self.tokens(prompt)
+            time.sleep(self.latency + self.token_delay * (len(tokens) - 1))
+            if self.fail:
+                raise RuntimeError('503 Service Unavailable')
+            return FakeResponse(''.join(tokens))
+        finally:
+            self._exit()
+
+    def _stream(self, prompt):
+        self._enter()
+        try:
+            time.sleep(self.latency)
+            if self.fail:
+                raise RuntimeError('503 Service Unavailable')
+            for i, token in enumerate(self.tokens(prompt)):
+                if i:
+                    time.sleep(self.token_delay)
+                yield FakeResponse(token)
+        finally:
+            self._exit()
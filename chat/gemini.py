@@ -0,0 +1,155 @@
+# === gemini.py - Modelo de Gemini del chat, resuelto sin bloquear ===
+"""
+Antes ``chat/views.py`` configuraba Gemini al importarse: importaba el SDK
+(~1 s), mandaba un ``generate_content("Hola")`` y, si fallaba, probaba hasta
+tres modelos más. Cada worker pagaba eso al arrancar, y con la API lenta o
+caída el arranque se colgaba.
+
+Ahora no se hace nada al importar::
+
+    from chat.gemini import resolver
+
+    model = resolver.get_model()      # nunca espera a la red
+    ...
+    resolver.report_failure(model)    # si la llamada falló
+
+En el primer uso de cada proceso se lanza un chequeo en segundo plano que
+prueba los modelos de ``GEMINI_MODELS`` en orden y recuerda el primero que
+responde durante ``GEMINI_HEALTH_TTL`` segundos (``GEMINI_RETRY_TTL`` si
+ninguno anduvo). Mientras tanto se usa el modelo principal sin probarlo:
+la consulta real sirve de prueba, y si falla se busca otro modelo.
+"""
+
+import logging
+import threading
+import time
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODELS = [
+    'models/gemini-2.0-flash-001',
+    'models/gemini-2.5-flash',
+    'models/gemini-flash-latest',
+    'models/gemini-pro-latest',
+]
+PROBE_PROMPT = 'Hola'
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+class GeminiResolver:
+    """Modelo de Gemini que anda en este proceso, con chequeo en segundo plano"""
+
+    def __init__(self, models=None, factory=None, ttl=None, retry_ttl=None, probe_timeout=None):
+        """``factory(nombre) -> modelo`` reemplaza al SDK (tests y benchmarks)"""
+        self.models = list(models or _setting('GEMINI_MODELS', DEFAULT_MODELS))
+        self.factory = factory
+        self.ttl = ttl or _setting('GEMINI_HEALTH_TTL', 600)
+        self.retry_ttl = retry_ttl or _setting('GEMINI_RETRY_TTL', 60)
+        self.probe_timeout = probe_timeout or _setting('GEMINI_PROBE_TIMEOUT', 10)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._configured = False
+        self._model = None
+        self._healthy = None        # None: todavía no se probó
+        self._checked_at = None
+        self.model_name = None
+        self.check_ms = None
+
+    @property
+    def enabled(self):
+        return self.factory is not None or bool(_setting('GEMINI_API_KEY', None))
+
+    def available(self):
+        """Si vale la pena ofrecer el chat con IA (sin esperar al chequeo)"""
+        return self.enabled and self._healthy is not False
+
+    # -------------------------------------------------------------------------
+
+    def build(self, name):
+        """``GenerativeModel`` sin llamar a la API (el SDK se importa acá)"""
+        if self.factory is not None:
+            return self.factory(name)
+        import google.generativeai as genai
+
+        if not self._configured:
+            genai.configure(api_key=settings.GEMINI_API_KEY)
+            self._configured = True
+        return genai.GenerativeModel(name)
+
+    def get_model(self):
+        """Modelo a usar, o None si no hay clave o ninguno anduvo"""
+        if not self.enabled:
+            return None
+        if self._expired():
+            self.check_async()
+        if self._healthy is None and self._model is None:
+            # Primer uso: el principal, sin probar, mientras corre el chequeo
+            with self._lock:
+                if self._model is None:
+                    self._model = self.build(self.models[0])
+                    self.model_name = self.models[0]
+        return self._model
+
+    def report_failure(self, model):
+        """La llamada con ``model`` falló: se busca otro en segundo plano"""
+        with self._lock:
+            if model is not None and model is self._model:
+                logger.warning('Gemini: falló %s, se buscan alternativas', self.model_name)
+                self._model = None
+                self._healthy = False
+                self._checked_at = None
+        self.check_async()
+
+    # -------------------------------------------------------------------------
+
+    def _expired(self):
+        if self._checked_at is None:
+            return True
+        ttl = self.ttl if self._healthy else self.retry_ttl
+        return time.monotonic() - self._checked_at >= ttl
+
+    def check_async(self):
+        """Lanza el chequeo si no hay otro en curso. Devuelve el hilo"""
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self.check_now, name='gemini-health', daemon=True)
+                self._thread.start()
+            return self._thread
+
+    def check_now(self):
+        """Prueba los modelos en orden y se queda con el primero que responde"""
+        start = time.perf_counter()
+        found = name = None
+        for candidate in self.models:
+            try:
+                model = self.build(candidate)
+                model.generate_content(
+                    PROBE_PROMPT,
+                    generation_config={'max_output_tokens': 8},
+                    request_options={'timeout': self.probe_timeout},
+                )
+            except Exception as exc:
+                logger.warning('Gemini: %s no responde (%s)', candidate, exc)
+                continue
+            found, name = model, candidate
+            break
+
+        with self._lock:
+            self._model, self.model_name = found, name
+            self._healthy = found is not None
+            self._checked_at = time.monotonic()
+            self.check_ms = (time.perf_counter() - start) * 1000
+        if found is None:
+            logger.error('Gemini: ningún modelo respondió, se reintenta en %s s', self.retry_ttl)
+        else:
+            logger.info('Gemini: usando %s (chequeo en %.0f ms)', name, self.check_ms)
+        return found
+
+
+# Instancia por proceso (el hilo de chequeo no sobrevive a un fork)
+resolver = GeminiResolver()
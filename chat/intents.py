@@ -0,0 +1,137 @@
+# === intents.py - Respuestas predefinidas del chat por intención ===
+"""
+Las intenciones (palabras clave → respuesta) están en un archivo de datos,
+``CHAT_INTENTS_FILE`` (por defecto ``chat/data/intents.json``)::
+
+    from chat.intents import get_matcher
+
+    match = get_matcher().match('¿Hacen envios al interior??')
+    match.intent.name, match.intent.response, match.score
+
+- El mensaje y las palabras clave se normalizan igual que en la caché de
+  respuestas (sin mayúsculas, acentos ni signos) y se comparan por palabras
+  enteras: "envio" encuentra "envíos" pero no "desenvolver".
+- Cada palabra clave acepta su plural ("monitor" → "monitores") y los
+  sinónimos de ``synonyms`` en cualquiera de sus palabras.
+- Gana la intención de mayor ``priority``; a igual prioridad, la de más
+  puntaje: ``weight`` de la intención por la suma de los pesos de las
+  palabras clave distintas que aparecen. Si empatan, la que aparece antes.
+
+Al cargar se arma un diccionario de frases → intenciones. Cada mensaje
+busca sus grupos de 1 a N palabras seguidas (N = la frase más larga):
+el costo depende del largo del mensaje, no de cuántas intenciones haya.
+"""
+
+import json
+import threading
+from collections import namedtuple
+from itertools import product
+
+from django.conf import settings
+
+from .answers import normalize_message
+
+Intent = namedtuple('Intent', ['name', 'response', 'priority', 'weight', 'keywords'])
+IntentMatch = namedtuple('IntentMatch', ['intent', 'score', 'keywords'])
+
+
+def plurals(word):
+    """El singular y sus plurales posibles ("luz" → "luces")"""
+    if word[-1:].isdigit():
+        return [word]
+    if word.endswith('z'):
+        return [word, word[:-1] + 'ces']
+    return [word, word + 's', word + 'es']
+
+
+class IntentMatcher:
+    """Frases normalizadas → ``(intención, palabra clave, peso)``"""
+
+    def __init__(self, intents, synonyms=None):
+        self.intents = []
+        self.phrases = {}
+        self.max_words = 1
+        synonyms = {
+            normalize_message(word): [normalize_message(variant) for variant in variants]
+            for word, variants in (synonyms or {}).items()
+        }
+        names = set()
+        for data in intents:
+            if data['name'] in names:
+                raise ValueError(f"Intención repetida: {data['name']}")
+            names.add(data['name'])
+            keywords = [
+                (entry, 1.0) if isinstance(entry, str) else (entry['text'], float(entry.get('weight', 1)))
+                for entry in data['keywords']
+            ]
+            intent = Intent(
+                name=data['name'],
+                response=data['response'],
+                priority=int(data.get('priority', 0)),
+                weight=float(data.get('weight', 1)),
+                keywords=[normalize_message(text) for text, _ in keywords],
+            )
+            index = len(self.intents)
+            self.intents.append(intent)
+            for keyword, (_, weight) in zip(intent.keywords, keywords):
+                for phrase in self.variants(keyword, synonyms):
+                    self.phrases.setdefault(phrase, {})[index, keyword] = weight
+                    self.max_words = max(self.max_words, phrase.count(' ') + 1)
+        # Más rápido de recorrer que el dict interno
+        self.phrases = {phrase: tuple(hits.items()) for phrase, hits in self.phrases.items()}
+
+    @staticmethod
+    def variants(keyword, synonyms):
+        """La frase con sinónimos en cada palabra y plural en la última"""
+        words = keyword.split(' ')
+        options = [[word] + synonyms.get(word, []) for word in words]
+        for combination in product(*options):
+            *head, last = ' '.join(combination).split(' ')
+            for word in plurals(last):
+                yield ' '.join(head + [word])
+
+    @classmethod
+    def from_file(cls, path):
+        with open(path, encoding='utf-8') as fh:
+            data = json.load(fh)
+        return cls(data['intents'], data.get('synonyms'))
+
+    def ranked(self, message):
+        """Intenciones encontradas en el mensaje, de la mejor a la peor"""
+        words = normalize_message(message).split()
+        found = {}
+        for start in range(len(words)):
+            for end in range(start + 1, min(start + self.max_words, len(words)) + 1):
+                hits = self.phrases.get(' '.join(words[start:end]))
+                if hits:
+                    for (index, keyword), weight in hits:
+                        found.setdefault(index, (start, {}))[1][keyword] = weight
+
+        matches = []
+        for index, (first, keywords) in found.items():
+            intent = self.intents[index]
+            score = intent.weight * sum(keywords.values())
+            matches.append(((intent.priority, score, -first), IntentMatch(intent, score, list(keywords))))
+        matches.sort(key=lambda item: item[0], reverse=True)
+        return [match for _, match in matches]
+
+    def match(self, message):
+        """La mejor intención del mensaje, o None"""
+        matches = self.ranked(message)
+        return matches[0] if matches else None
+
+
+_matcher = None
+_lock = threading.Lock()
+
+
+def get_matcher():
+    """El matcher del proceso, cargado de ``CHAT_INTENTS_FILE`` la primera vez"""
+    global _matcher
+    if _matcher is None:
+        with _lock:
+            if _matcher is None:
+                _matcher = IntentMatcher.from_file(
+                    getattr(settings, 'CHAT_INTENTS_FILE', settings.BASE_DIR / 'chat' / 'data' / 'intents.json')
+                )
+    return _matcher
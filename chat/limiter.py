@@ -0,0 +1,144 @@
+# === limiter.py - Límite de llamadas concurrentes a Gemini ===
+"""
+Con ASGI (``masivo_tech/asgi.py``) una consulta lenta a Gemini ya no ocupa
+un worker entero, pero sin límite cada mensaje abriría otra llamada y otro
+hilo. ``UpstreamLimiter`` es el cupo del proceso::
+
+    from chat.limiter import Busy, upstream
+
+    try:
+        text = await upstream.run(ask, message)
+    except Busy:           # cola llena o demasiada espera: responder sin Gemini
+        ...
+    except TimeoutError:   # la llamada pasó el plazo
+        ...
+
+- Como mucho ``CHAT_UPSTREAM_CONCURRENCY`` llamadas a la vez, en un pool de
+  hilos propio (el SDK es bloqueante).
+- Hasta ``CHAT_UPSTREAM_QUEUE`` mensajes esperan turno, cada uno como mucho
+  ``CHAT_UPSTREAM_QUEUE_TIMEOUT`` segundos; el resto se descarta enseguida.
+- Cada llamada tiene ``CHAT_UPSTREAM_DEADLINE`` segundos. El hilo no se
+  puede cortar: el lugar se libera cuando la llamada termina de verdad, así
+  el cupo nunca se pasa.
+
+No usa ``asyncio.Semaphore`` porque queda atado al primer event loop que lo
+usa; este sirve para cualquier loop y para hilos del mismo proceso.
+"""
+
+import asyncio
+import threading
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+
+def _setting(value, name, default):
+    return getattr(settings, name, default) if value is None else value
+
+
+class Busy(Exception):
+    """No hay lugar para otra llamada a Gemini"""
+
+
+class _Waiter:
+    __slots__ = ('loop', 'future', 'granted')
+
+    def __init__(self, loop):
+        self.loop = loop
+        self.future = loop.create_future()
+        self.granted = False
+
+
+def _wake(future):
+    if not future.done():
+        future.set_result(None)
+
+
+class UpstreamLimiter:
+    """Semáforo con cola acotada y plazo por llamada"""
+
+    def __init__(self, limit=None, queue_size=None, queue_timeout=None, deadline=None):
+        self.limit = _setting(limit, 'CHAT_UPSTREAM_CONCURRENCY', 8)
+        self.queue_size = _setting(queue_size, 'CHAT_UPSTREAM_QUEUE', 32)
+        self.queue_timeout = _setting(queue_timeout, 'CHAT_UPSTREAM_QUEUE_TIMEOUT', 5)
+        self.deadline = _setting(deadline, 'CHAT_UPSTREAM_DEADLINE', 15)
+        self.active = 0
+        self._waiters = deque()
+        self._lock = threading.Lock()
+        self._executor = None
+        self.stats = Counter()
+
+    @property
+    def waiting(self):
+        return len(self._waiters)
+
+    async def acquire(self):
+        """Espera un lugar; ``Busy`` si la cola está llena o se esperó demasiado"""
+        with self._lock:
+            if self.active < self.limit and not self._waiters:
+                self.active += 1
+                return
+            if len(self._waiters) >= self.queue_size:
+                self.stats['shed_full'] += 1
+                raise Busy('cola llena')
+            waiter = _Waiter(asyncio.get_running_loop())
+            self._waiters.append(waiter)
+            self.stats['queued'] += 1
+
+        try:
+            await asyncio.wait([waiter.future], timeout=self.queue_timeout)
+        except asyncio.CancelledError:
+            # El cliente se fue: devolver el lugar si ya se lo habían dado
+            if self._leave(waiter):
+                self.release()
+            raise
+        if not self._leave(waiter):
+            self.stats['shed_wait'] += 1
+            raise Busy('demasiada espera')
+
+    def _leave(self, waiter):
+        """Saca al que espera de la cola. True si ya tenía el lugar"""
+        with self._lock:
+            if not waiter.granted:
+                self._waiters.remove(waiter)
+            return waiter.granted
+
+    def release(self):
+        """Pasa el lugar al primero de la cola (o lo libera)"""
+        with self._lock:
+            while self._waiters:
+                waiter = self._waiters.popleft()
+                try:
+                    waiter.loop.call_soon_threadsafe(_wake, waiter.future)
+                except RuntimeError:
+                    continue  # su event loop ya cerró
+                waiter.granted = True
+                return
+            self.active -= 1
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(self.limit, thread_name_prefix='chat-upstream')
+            return self._executor
+
+    async def run(self, func, *args):
+        """``func(*args)`` en el pool cuando haya lugar, con el plazo por llamada"""
+        await self.acquire()
+        try:
+            future = self._get_executor().submit(func, *args)
+        except BaseException:
+            self.release()
+            raise
+        future.add_done_callback(lambda _: self.release())
+        self.stats['calls'] += 1
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), self.deadline)
+        except TimeoutError:
+            self.stats['timeout'] += 1
+            raise
+
+
+# Instancia por proceso
+upstream = UpstreamLimiter()
@@ -0,0 +1,94 @@
+import json
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from chat import views
+from chat.answers import AnswerCache
+from chat.fake_gemini import FakeGeminiModel
+from chat.gemini import GeminiResolver
+from marketplace.benchmarks import format_stats, summarize
+
+QUESTIONS = [
+    'hacen envíos', 'cuotas sin interés', 'garantía', 'tienen stock', 'formas de pago',
+    'envían al interior', 'cuánto tarda el envío', 'tienen local', 'aceptan mercadopago',
+    'tienen teclados mecánicos', 'qué mouse me recomiendan', 'horario de atención',
+    'descuento por transferencia', 'auriculares inalámbricos', 'monitores 144hz',
+    'sillas gamer', 'cómo hago el seguimiento', 'hacen factura a', 'puedo retirar', 'whatsapp',
+]
+
+
+def variant(question, rng):
+    """La misma pregunta como la escribiría otra persona"""
+    text = question
+    if rng.random() < 0.5:
+        text = text.replace('á', 'a').replace('é', 'e').replace('í', 'i').replace('ó', 'o').replace('ú', 'u')
+    if rng.random() < 0.3:
+        text = text.upper()
+    return rng.choice(['', '¿', '']) + text + rng.choice(['?', '??', '', '!', ' ?'])
+
+
+class NoCache:
+    """Sin caché: cada mensaje llega a Gemini"""
+
+    def get_or_compute(self, message, compute=None):
+        if compute is None:
+            return None
+        return compute(), {'cache': 'off', 'saved_ms': 0.0}
+
+
+class Command(BaseCommand):
+    help = 'Mide la caché de respuestas del chat con preguntas repetidas y un Gemini falso'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=400)
+        parser.add_argument('--concurrency', type=int, default=16)
+        parser.add_argument('--latency', type=float, default=0.8, help='Segundos que tarda el Gemini falso')
+        parser.add_argument('--questions', type=int, default=len(QUESTIONS),
+                            help='Preguntas distintas (más = menos aciertos)')
+
+    def handle(self, *args, **options):
+        rng = random.Random(42)
+        # Las preguntas frecuentes se repiten más (Zipf)
+        pool = QUESTIONS[:options['questions']]
+        weights = [1 / (rank + 1) for rank in range(len(pool))]
+        messages = [variant(rng.choices(pool, weights)[0], rng) for _ in range(options['requests'])]
+
+        for label, answers in (('Sin caché', NoCache()), ('Con caché', AnswerCache())):
+            cache.clear()
+            model = FakeGeminiModel(latency=options['latency'])
+            resolver = GeminiResolver(factory=lambda name: model)
+            resolver.check_now()
+            model.stats.clear()
+            with mock.patch.object(views, 'resolver', resolver), mock.patch.object(views, 'answer_cache', answers):
+                latencies, metas, elapsed = self.replay(messages, options['concurrency'])
+
+            saved = sum(meta.get('saved_ms', 0) for meta in metas)
+            served = sum(1 for meta in metas if meta.get('cache') in ('hit', 'coalesced'))
+            self.stdout.write(format_stats(label, summarize(latencies)))
+            self.stdout.write(
+                f"  {model.stats['calls']:,} llamadas a Gemini para {len(messages):,} mensajes"
+                f" | aciertos {served / len(messages):.0%} | ahorro {saved / 1000:,.1f} s"
+                f" ({saved / len(messages):,.0f} ms por mensaje) | total {elapsed:.1f} s"
+            )
+
+    def replay(self, messages, concurrency):
+        url = reverse('chat_api')
+
+        def send(message):
+            client = Client()
+            start = time.perf_counter()
+            response = client.post(url, json.dumps({'message': message}), content_type='application/json')
+            return (time.perf_counter() - start) * 1000, response.json().get('cache', {})
+
+        start = time.perf_counter()
+        with override_settings(ALLOWED_HOSTS=['testserver']), ThreadPoolExecutor(concurrency) as pool:
+            results = list(pool.map(send, messages))
+        return [ms for ms, _ in results], [meta for _, meta in results], time.perf_counter() - start
@@ -0,0 +1,85 @@
+import random
+import re
+
+from django.core.management.base import BaseCommand
+
+from chat.answers import normalize_message
+from chat.intents import IntentMatcher
+from marketplace.benchmarks import WORDS, measure
+
+SYLLABLES = ['ka', 'ro', 'mi', 'te', 'lu', 'sa', 'po', 'ne', 'di', 'ga', 've', 'tor', 'bal', 'sin', 'mer']
+FILLER = ['hola', 'quiero', 'saber', 'si', 'tienen', 'el', 'la', 'para', 'mi', 'hijo', 'cuanto', 'sale',
+          'me', 'interesa', 'algo', 'bueno', 'y', 'barato', 'gracias', 'de', 'antemano'] + WORDS
+
+
+def fake_word(rng):
+    return ''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4)))
+
+
+def fake_intents(count, rng):
+    """``count`` intenciones de 5 palabras clave inventadas (algunas de 2 palabras)"""
+    return [
+        {
+            'name': f'intent{i}',
+            'priority': rng.randint(0, 20),
+            'keywords': [fake_word(rng) if rng.random() < 0.8 else f'{fake_word(rng)} {fake_word(rng)}'
+                         for _ in range(5)],
+            'response': f'respuesta {i}',
+        }
+        for i in range(count)
+    ]
+
+
+class LoopMatcher:
+    """Como antes: ``keyword in mensaje`` para cada palabra clave, en orden"""
+
+    def __init__(self, intents):
+        self.responses = {keyword: intent['response'] for intent in intents for keyword in intent['keywords']}
+
+    def match(self, message):
+        lower = message.lower()
+        for keyword, answer in self.responses.items():
+            if keyword in lower:
+                return answer
+        return None
+
+
+class RegexMatcher:
+    """Una sola regex con todas las palabras clave (el motor prueba las alternativas de a una)"""
+
+    def __init__(self, intents):
+        keywords = sorted({keyword for intent in intents for keyword in intent['keywords']}, key=len, reverse=True)
+        self.pattern = re.compile(r'\b(?:' + '|'.join(map(re.escape, keywords)) + r')(?:s|es)?\b')
+
+    def match(self, message):
+        return self.pattern.findall(normalize_message(message))
+
+
+class Command(BaseCommand):
+    help = 'Mide el costo por mensaje de las respuestas predefinidas del chat según cuántas intenciones haya'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--intents', type=int, nargs='+', default=[20, 500, 2000, 5000])
+        parser.add_argument('--messages', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        for count in options['intents']:
+            rng = random.Random(42)
+            intents = fake_intents(count, rng)
+            keywords = [keyword for intent in intents for keyword in intent['keywords']]
+            # Mensajes de 8-20 palabras; la mitad menciona una palabra clave
+            messages = []
+            for _ in range(options['messages']):
+                words = [rng.choice(FILLER) for _ in range(rng.randint(8, 20))]
+                if rng.random() < 0.5:
+                    words.insert(rng.randrange(len(words)), rng.choice(keywords))
+                messages.append(' '.join(words).capitalize() + '?')
+
+            self.stdout.write(f'{count:,} intenciones ({len(keywords):,} palabras clave), '
+                              f'{len(messages):,} mensajes:')
+            for label, matcher in (('Antes: bucle "in"', LoopMatcher(intents)),
+                                   ('Regex única', RegexMatcher(intents)),
+                                   ('IntentMatcher', IntentMatcher(intents))):
+                stats = measure(lambda: [matcher.match(message) for message in messages], repeat=5, warmup=1)
+                per_message = stats['p50'] * 1000 / len(messages)
+                self.stdout.write(f'  {label:<32} {per_message:10.2f} µs por mensaje')
@@ -0,0 +1,183 @@
+import asyncio
+import json
+import queue
+import random
+import threading
+import time
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from chat import views
+from chat.answers import AnswerCache
+from chat.fake_gemini import FakeGeminiModel
+from chat.gemini import GeminiResolver
+from chat.limiter import UpstreamLimiter
+from marketplace.benchmarks import benchmark_database, format_stats, make_products, summarize
+from marketplace.models import Product
+
+
+class Command(BaseCommand):
+    help = ('Tráfico mixto de catálogo y chat con un Gemini lento: workers sync (gunicorn) '
+            'contra chat_api_async bajo ASGI')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rate', type=float, default=20, help='Pedidos por segundo')
+        parser.add_argument('--duration', type=float, default=10, help='Segundos de tráfico')
+        parser.add_argument('--chat-share', type=float, default=0.1, help='Fracción de pedidos al chat')
+        parser.add_argument('--latency', type=float, default=3.0, help='Segundos que tarda el Gemini falso')
+        parser.add_argument('--workers', type=int, default=4, help='Workers sync de gunicorn')
+        parser.add_argument('--concurrency', type=int, default=8, help='CHAT_UPSTREAM_CONCURRENCY')
+        parser.add_argument('--products', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        with benchmark_database(threaded=True), override_settings(ALLOWED_HOSTS=['*']):
+            make_products(options['products'])
+            ids = list(Product.objects.values_list('id', flat=True))
+            catalog = [reverse('product_list'), reverse('product_list') + '?category=mouses',
+                       reverse('product_list') + '?sort=price_low'] + [
+                reverse('product_detail', args=[product_id]) for product_id in ids[:50]]
+
+            # Llegadas a ritmo fijo (como usuarios reales: no esperan a que el server se libere)
+            rng = random.Random(42)
+            total = int(options['rate'] * options['duration'])
+            arrivals = [
+                (i / options['rate'], 'chat' if rng.random() < options['chat_share'] else rng.choice(catalog))
+                for i in range(total)
+            ]
+            workers = options['workers']
+            self.stdout.write(
+                f"{total} pedidos en {options['duration']:.0f} s, {options['chat_share']:.0%} al chat; "
+                f"Gemini falso de {options['latency']:.1f} s"
+            )
+            scenarios = [
+                (f'Sync ({workers} workers), sin chat', self.run_sync, [a for a in arrivals if a[1] != 'chat']),
+                (f'Sync ({workers} workers), con chat', self.run_sync, arrivals),
+                ('ASGI (1 proceso), sin chat', self.run_asgi, [a for a in arrivals if a[1] != 'chat']),
+                ('ASGI (1 proceso), con chat', self.run_asgi, arrivals),
+            ]
+            for label, run, schedule in scenarios:
+                # Sin respuestas del escenario anterior y con el catálogo caliente
+                cache.clear()
+                for url in catalog:
+                    Client().get(url)
+                model = FakeGeminiModel(latency=0)
+                resolver = GeminiResolver(factory=lambda name: model)
+                resolver.check_now()
+                model.latency = options['latency']
+                model.stats.clear()
+                limiter = UpstreamLimiter(limit=options['concurrency'])
+                with mock.patch.object(views, 'resolver', resolver), \
+                        mock.patch.object(views, 'answer_cache', AnswerCache()), \
+                        mock.patch.object(views, 'upstream', limiter):
+                    results = run(schedule, workers)
+                self.report(label, results, model, limiter)
+
+    def report(self, label, results, model, limiter):
+        catalog = [ms for kind, ms, _ in results if kind != 'chat']
+        chat = [(ms, body) for kind, ms, body in results if kind == 'chat']
+        stats = summarize(catalog)
+        self.stdout.write(format_stats(f'{label}: catálogo', stats) + f" | p99 {stats['p99']:9.3f} ms")
+        if chat:
+            answered = sum(1 for _, body in chat if body.get('source') == 'gemini')
+            chat_stats = summarize([ms for ms, _ in chat])
+            self.stdout.write(
+                f"  chat: p50 {chat_stats['p50']:,.0f} ms | p99 {chat_stats['p99']:,.0f} ms | "
+                f"{answered}/{len(chat)} de Gemini, {len(chat) - answered} predefinidas"
+                f" | máx. {model.stats['max_concurrent']} llamadas a la vez"
+                + (f" | descartadas {limiter.stats['shed_full'] + limiter.stats['shed_wait']}"
+                   if limiter.stats['calls'] else '')
+            )
+
+    def chat_body(self, index):
+        # Mensajes distintos: siempre llega a Gemini
+        return json.dumps({'message': f'consulta {index} sobre teclados'})
+
+    def run_sync(self, schedule, workers):
+        """Cada worker atiende un pedido por vez; el resto espera en la cola (backlog)"""
+        pending = queue.Queue()
+        for index, item in enumerate(schedule):
+            pending.put((index, item))
+        results = []
+        chat_url = reverse('chat_api')
+        start = time.perf_counter()
+
+        def worker():
+            client = Client()
+            while True:
+                try:
+                    index, (at, url) = pending.get_nowait()
+                except queue.Empty:
+                    return
+                wait = start + at - time.perf_counter()
+                if wait > 0:
+                    time.sleep(wait)
+                if url == 'chat':
+                    response = client.post(chat_url, self.chat_body(index), content_type='application/json')
+                    body = response.json()
+                else:
+                    response = client.get(url)
+                    body = None
+                results.append(('chat' if url == 'chat' else 'catalog',
+                                (time.perf_counter() - start - at) * 1000, body))
+
+        threads = [threading.Thread(target=worker) for _ in range(workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def run_asgi(self, schedule, workers):
+        """Un event loop con la aplicación de masivo_tech/asgi.py; el chat va a chat_api_async"""
+        from masivo_tech.asgi import application
+
+        chat_url = reverse('chat_api_async')
+
+        async def call(index, at, url, start):
+            method, path, query, body = 'GET', url, '', b''
+            if url == 'chat':
+                method, path, body = 'POST', chat_url, self.chat_body(index).encode()
+            elif '?' in url:
+                path, query = url.split('?', 1)
+            scope = {
+                'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+                'method': method, 'scheme': 'http', 'path': path, 'raw_path': path.encode(),
+                'query_string': query.encode(), 'root_path': '',
+                'headers': [(b'host', b'localhost'), (b'content-type', b'application/json'),
+                            (b'content-length', str(len(body)).encode())],
+                'client': ('127.0.0.1', 50000), 'server': ('127.0.0.1', 80),
+            }
+            received = False
+            chunks = []
+
+            async def receive():
+                nonlocal received
+                if not received:
+                    received = True
+                    return {'type': 'http.request', 'body': body, 'more_body': False}
+                await asyncio.Event().wait()  # el cliente nunca se desconecta
+
+            async def send(message):
+                if message['type'] == 'http.response.body':
+                    chunks.append(message.get('body', b''))
+
+            await application(scope, receive, send)
+            elapsed = (time.perf_counter() - start - at) * 1000
+            return ('chat', elapsed, json.loads(b''.join(chunks))) if url == 'chat' else ('catalog', elapsed, None)
+
+        async def main():
+            start = time.perf_counter()
+            tasks = []
+            for index, (at, url) in enumerate(schedule):
+                wait = start + at - time.perf_counter()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                tasks.append(asyncio.ensure_future(call(index, at, url, start)))
+            return await asyncio.gather(*tasks)
+
+        return asyncio.run(main())
@@ -0,0 +1,92 @@
+import json
+import os
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from marketplace.benchmarks import format_stats, summarize
+
+# Corre en un proceso nuevo: arranque de un worker (django.setup() + URLs).
+# "eager" repite lo que hacía chat/views.py al importarse: importar el SDK y
+# probar los modelos en orden; la API se simula con un modelo falso lento.
+SCRIPT = '''
+import json, sys, time
+start = time.perf_counter()
+import django
+django.setup()
+setup = time.perf_counter()
+from django.urls import get_resolver
+get_resolver().url_patterns
+urls = time.perf_counter()
+
+mode, latency, failing = sys.argv[1], float(sys.argv[2]), int(sys.argv[3])
+
+class FakeModel:
+    def __init__(self, name, index):
+        self.name, self.index = name, index
+
+    def generate_content(self, prompt, **kwargs):
+        time.sleep(latency)
+        if self.index < failing:
+            raise RuntimeError('503 Service Unavailable')
+
+from chat.gemini import GeminiResolver
+models = GeminiResolver().models
+fake = GeminiResolver(factory=lambda name: FakeModel(name, models.index(name)))
+
+first_use = None
+if mode == 'eager':
+    import google.generativeai
+    fake.check_now()
+else:
+    # Primer mensaje del chat: importa el SDK y arranca el chequeo sin esperarlo
+    before = time.perf_counter()
+    import google.generativeai
+    fake.get_model()
+    first_use = (time.perf_counter() - before) * 1000
+ready = time.perf_counter()
+print(json.dumps({
+    'setup': (setup - start) * 1000,
+    'urls': (urls - setup) * 1000,
+    'ready': (ready - start) * 1000 if mode == 'eager' else (urls - start) * 1000,
+    'first_use': first_use,
+}))
+'''
+
+
+class Command(BaseCommand):
+    help = 'Mide el arranque de un worker (django.setup() + URLs) con y sin el chequeo de Gemini al importar'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=5)
+        parser.add_argument('--latency', type=float, default=0.6,
+                            help='Segundos que tarda cada prueba de modelo en la API simulada')
+
+    def run_worker(self, mode, latency, failing):
+        env = {**os.environ, 'DJANGO_SETTINGS_MODULE': os.environ.get('DJANGO_SETTINGS_MODULE', 'masivo_tech.settings')}
+        result = subprocess.run(
+            [sys.executable, '-c', SCRIPT, mode, str(latency), str(failing)],
+            cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+        )
+        if result.returncode:
+            raise CommandError(result.stderr.strip().splitlines()[-1])
+        return json.loads(result.stdout.strip().splitlines()[-1])
+
+    def handle(self, *args, **options):
+        latency = options['latency']
+        models = len(settings.GEMINI_MODELS)
+        scenarios = [
+            ('API sana', 0),
+            ('modelo principal caído', 1),
+            (f'API caída ({models} modelos)', models),
+        ]
+        lazy = [self.run_worker('lazy', latency, 0) for _ in range(options['runs'])]
+        self.stdout.write(format_stats('Ahora: arranque', summarize([run['ready'] for run in lazy])))
+        self.stdout.write(format_stats('  django.setup()', summarize([run['setup'] for run in lazy])))
+        self.stdout.write(format_stats('  carga de URLs', summarize([run['urls'] for run in lazy])))
+        self.stdout.write(format_stats('  primer uso del chat', summarize([run['first_use'] for run in lazy])))
+        for label, failing in scenarios:
+            eager = [self.run_worker('eager', latency, failing) for _ in range(options['runs'])]
+            self.stdout.write(format_stats(f'Antes: {label}', summarize([run['ready'] for run in eager])))
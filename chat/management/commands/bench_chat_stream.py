@@ -0,0 +1,75 @@
+import http.client
+import json
+import threading
+import time
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand
+from django.core.servers.basehttp import ThreadedWSGIServer, WSGIRequestHandler
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from chat import views
+from chat.answers import AnswerCache
+from chat.fake_gemini import FakeGeminiModel
+from chat.gemini import GeminiResolver
+from marketplace.benchmarks import format_stats, summarize
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+class Command(BaseCommand):
+    help = 'Compara el tiempo al primer byte de chat_api (JSON) y chat_stream (SSE) con un Gemini falso'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=20)
+        parser.add_argument('--latency', type=float, default=0.4,
+                            help='Segundos hasta el primer token del Gemini falso')
+        parser.add_argument('--token-delay', type=float, default=0.05,
+                            help='Segundos entre tokens del Gemini falso')
+
+    def handle(self, *args, **options):
+        model = FakeGeminiModel(latency=options['latency'], token_delay=options['token_delay'])
+        resolver = GeminiResolver(factory=lambda name: model)
+        resolver.check_now()
+        tokens = len(model.tokens(''))
+
+        # Servidor HTTP real: el cliente de tests junta todo el cuerpo antes de devolverlo
+        server = ThreadedWSGIServer(('127.0.0.1', 0), QuietHandler)
+        server.set_app(WSGIHandler())
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.port = server.server_address[1]
+
+        self.stdout.write(f'Gemini falso: {options["latency"]:.2f} s al primer token, {tokens} tokens '
+                          f'cada {options["token_delay"] * 1000:.0f} ms')
+        try:
+            with override_settings(ALLOWED_HOSTS=['*']), mock.patch.object(views, 'resolver', resolver):
+                for label, url in (('chat_api (JSON)', reverse('chat_api')),
+                                   ('chat_stream (SSE)', reverse('chat_stream'))):
+                    cache.clear()
+                    with mock.patch.object(views, 'answer_cache', AnswerCache()):
+                        # Mensajes distintos: siempre llega a Gemini
+                        runs = [self.request(url, f'consulta {label} {i}') for i in range(options['requests'])]
+                    self.stdout.write(format_stats(f'{label}: primer byte', summarize([ttfb for ttfb, _ in runs])))
+                    self.stdout.write(format_stats(f'{label}: completa', summarize([total for _, total in runs])))
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    def request(self, url, message):
+        connection = http.client.HTTPConnection('127.0.0.1', self.port, timeout=60)
+        body = json.dumps({'message': message})
+        start = time.perf_counter()
+        connection.request('POST', url, body, {'Content-Type': 'application/json'})
+        response = connection.getresponse()
+        response.read1()
+        first_byte = time.perf_counter()
+        response.read()
+        end = time.perf_counter()
+        connection.close()
+        return (first_byte - start) * 1000, (end - start) * 1000
@@ -1,3 +1,298 @@
-from django.test import TestCase
+import asyncio
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from . import views
+from .answers import AnswerCache, normalize_message
+from .fake_gemini import FakeGeminiModel
+from .gemini import GeminiResolver
+from .intents import IntentMatcher, get_matcher
+from .limiter import Busy, UpstreamLimiter
+
+
+class FakeModel:
+    def __init__(self, name, fail=False, gate=None):
+        self.name, self.fail, self.gate = name, fail, gate
+
+    def generate_content(self, prompt, **kwargs):
+        if self.gate:
+            self.gate.wait(5)
+        if self.fail:
+            raise RuntimeError('503')
+        return mock.Mock(text=f'respuesta de {self.name}')
+
+
+MODELS = ['principal', 'alternativo']
+
+
+class GeminiResolverTests(TestCase):
+    """Resolución del modelo de Gemini sin bloquear"""
+
+    def resolver(self, failing=(), gate=None):
+        return GeminiResolver(MODELS, factory=lambda name: FakeModel(name, name in failing, gate))
+
+    @override_settings(GEMINI_API_KEY=None)
+    def test_without_key(self):
+        resolver = GeminiResolver(MODELS)
+        self.assertIsNone(resolver.get_model())
+        self.assertFalse(resolver.available())
+
+    def test_first_use_does_not_wait_for_check(self):
+        gate = threading.Event()
+        resolver = self.resolver(gate=gate)
+        model = resolver.get_model()
+        # El chequeo sigue trabado en la "API": se usa el principal sin probar
+        self.assertEqual(model.name, 'principal')
+        gate.set()
+        resolver.check_async().join(5)
+        self.assertEqual(resolver.model_name, 'principal')
+        self.assertIs(resolver.get_model(), resolver.get_model())
+
+    def test_falls_back_and_remembers(self):
+        resolver = self.resolver(failing={'principal'})
+        self.assertEqual(resolver.check_now().name, 'alternativo')
+        with mock.patch.object(resolver, 'check_async') as check:
+            self.assertEqual(resolver.get_model().name, 'alternativo')
+        check.assert_not_called()
+
+    def test_failure_triggers_recheck(self):
+        resolver = self.resolver()
+        model = resolver.check_now()
+        with mock.patch.object(resolver, 'check_async') as check:
+            resolver.report_failure(model)
+            self.assertIsNone(resolver.get_model())
+            self.assertFalse(resolver.available())
+        self.assertTrue(check.called)
+
+    def test_chat_api_uses_resolved_model(self):
+        resolver = self.resolver()
+        resolver.check_now()
+        with mock.patch.object(views, 'resolver', resolver), mock.patch.object(views, 'answer_cache', AnswerCache()):
+            response = self.client.post(
+                reverse('chat_api'), json.dumps({'message': '¿Tienen mouses?'}), content_type='application/json',
+            )
+        self.assertEqual(response.json()['response'], 'respuesta de principal')
+
+
+class AnswerCacheTests(TestCase):
+    """Caché de respuestas del chat"""
+
+    def setUp(self):
+        cache.clear()
+
+    def test_normalize(self):
+        self.assertEqual(normalize_message('  ¿Hacen   ENVÍOS?? '), 'hacen envios')
+        self.assertEqual(normalize_message('garantía!'), normalize_message('GARANTIA'))
+
+    def test_hit_after_miss(self):
+        answers = AnswerCache()
+        calls = []
+        answer, meta = answers.get_or_compute('¿Cuotas?', lambda: calls.append(1) or 'Hasta 12')
+        self.assertEqual((answer, meta['cache']), ('Hasta 12', 'miss'))
+        answer, meta = answers.get_or_compute('cuotas', lambda: calls.append(1) or 'otra')
+        self.assertEqual((answer, meta['cache'], meta['hit_rate']), ('Hasta 12', 'hit', 0.5))
+        self.assertEqual(len(calls), 1)
+        # Otro worker: sin LRU local, desde la caché compartida
+        self.assertEqual(AnswerCache().get_or_compute('CUOTAS!')[0], 'Hasta 12')
+
+    def test_lru_and_ttl(self):
+        answers = AnswerCache(local_size=2)
+        for message in ('uno', 'dos', 'tres'):
+            answers.get_or_compute(message, lambda: message)
+        self.assertEqual(list(answers._local), [answers.key('dos'), answers.key('tres')])
+
+        with mock.patch('chat.answers.time.time', return_value=answers._local[answers.key('tres')]['expires']):
+            self.assertIsNone(answers.get_or_compute('tres'))
+
+    def test_concurrent_questions_share_one_call(self):
+        model = FakeGeminiModel(latency=0.2)
+        answers = AnswerCache()
+        ask = lambda message: answers.get_or_compute(message, lambda: model.generate_content(message).text)
+        with ThreadPoolExecutor(8) as pool:
+            results = list(pool.map(ask, ['¿garantía?'] * 4 + ['GARANTIA'] * 4))
+        self.assertEqual(model.stats['calls'], 1)
+        self.assertEqual(len({answer for answer, _ in results}), 1)
+        self.assertEqual(sorted(meta['cache'] for _, meta in results).count('miss'), 1)
+
+    def test_chat_api_reports_cache(self):
+        model = FakeGeminiModel(latency=0)
+        resolver = GeminiResolver(factory=lambda name: model)
+        resolver.check_now()
+        url = reverse('chat_api')
+        with mock.patch.object(views, 'resolver', resolver), mock.patch.object(views, 'answer_cache', AnswerCache()):
+            first = self.client.post(url, json.dumps({'message': 'Hacen envíos?'}), content_type='application/json')
+            second = self.client.post(url, json.dumps({'message': 'hacen envios'}), content_type='application/json')
+        self.assertEqual(first.json()['cache']['cache'], 'miss')
+        self.assertEqual(second.json()['cache']['cache'], 'hit')
+        self.assertEqual(second.json()['response'], first.json()['response'])
+        self.assertEqual(model.stats['calls'], 2)  # el chequeo de salud + una consulta
+
+
+def parse_events(response):
+    """Lista de ``(evento, datos)`` de una respuesta text/event-stream"""
+    events = []
+    for block in b''.join(response.streaming_content).decode().split('\n\n'):
+        if block:
+            event, data = block.split('\n')
+            events.append((event.removeprefix('event: '), json.loads(data.removeprefix('data: '))))
+    return events
+
+
+class ChatStreamTests(TestCase):
+    """Respuestas del chat por Server-Sent Events"""
+
+    def setUp(self):
+        cache.clear()
+        self.url = reverse('chat_stream')
+
+    def post(self, message):
+        return self.client.post(self.url, json.dumps({'message': message}), content_type='application/json')
+
+    def test_streams_chunks_then_caches(self):
+        model = FakeGeminiModel(latency=0)
+        resolver = GeminiResolver(factory=lambda name: model)
+        resolver.check_now()
+        with mock.patch.object(views, 'resolver', resolver), mock.patch.object(views, 'answer_cache', AnswerCache()):
+            response = self.post('¿Tienen teclados?')
+            self.assertEqual(response['Content-Type'], 'text/event-stream; charset=utf-8')
+            events = parse_events(response)
+            again = parse_events(self.post('tienen teclados'))
+
+        chunks = [data['text'] for event, data in events if event == 'chunk']
+        self.assertGreater(len(chunks), 10)
+        self.assertEqual(events[-1][0], 'done')
+        self.assertEqual(events[-1][1]['cache']['cache'], 'miss')
+        # La segunda vez sale de la caché, en un solo evento
+        self.assertEqual(len(again), 1)
+        self.assertEqual(again[0][0], 'answer')
+        self.assertEqual(again[0][1]['response'], ''.join(chunks).strip())
+        self.assertEqual(again[0][1]['cache']['cache'], 'hit')
+        self.assertEqual(model.stats['calls'], 2)  # el chequeo de salud + una consulta
+
+    def test_fallback_is_single_event(self):
+        with override_settings(GEMINI_API_KEY=None), mock.patch.object(views, 'resolver', GeminiResolver()):
+            events = parse_events(self.post('¿Hacen envíos?'))
+        self.assertEqual(len(events), 1)
+        self.assertEqual(events[0][0], 'answer')
+        self.assertEqual(events[0][1]['source'], 'fallback')
+
+    def test_failure_before_first_chunk_falls_back(self):
+        resolver = GeminiResolver(factory=lambda name: FakeGeminiModel(latency=0, fail=True))
+        with mock.patch.object(views, 'resolver', resolver), \
+                mock.patch.object(resolver, 'check_async'), mock.patch.object(views, 'answer_cache', AnswerCache()):
+            events = parse_events(self.post('¿Tienen garantía?'))
+        self.assertEqual([event for event, _ in events], ['answer'])
+        self.assertTrue(events[0][1]['source'].startswith('fallback'))
+
+
+class UpstreamLimiterTests(TestCase):
+    """Cupo de llamadas a Gemini de chat_api_async"""
+
+    async def test_limit_and_queue(self):
+        limiter = UpstreamLimiter(limit=1, queue_size=1, queue_timeout=5, deadline=5)
+        gate = threading.Event()
+        first = asyncio.ensure_future(limiter.run(lambda: gate.wait(5) and 'primera'))
+        await asyncio.sleep(0.01)
+        second = asyncio.ensure_future(limiter.run(lambda: 'segunda'))
+        await asyncio.sleep(0.01)
+        self.assertEqual((limiter.active, limiter.waiting), (1, 1))
+        # Cola llena: se descarta sin esperar
+        with self.assertRaises(Busy):
+            await limiter.run(lambda: 'tercera')
+        gate.set()
+        self.assertEqual(await asyncio.gather(first, second), ['primera', 'segunda'])
+        self.assertEqual((limiter.active, limiter.waiting), (0, 0))
+        self.assertEqual((limiter.stats['calls'], limiter.stats['shed_full']), (2, 1))
+
+    async def test_queue_timeout(self):
+        limiter = UpstreamLimiter(limit=1, queue_size=4, queue_timeout=0.05, deadline=5)
+        gate = threading.Event()
+        first = asyncio.ensure_future(limiter.run(gate.wait, 5))
+        await asyncio.sleep(0.01)
+        with self.assertRaises(Busy):
+            await limiter.run(lambda: 'tarde')
+        self.assertEqual(limiter.waiting, 0)
+        gate.set()
+        await first
+
+    async def test_deadline_keeps_slot_until_call_ends(self):
+        limiter = UpstreamLimiter(limit=1, queue_size=0, queue_timeout=1, deadline=0.05)
+        with self.assertRaises(TimeoutError):
+            await limiter.run(time.sleep, 0.3)
+        # El hilo sigue en la "API": el lugar no se libera todavía
+        self.assertEqual(limiter.active, 1)
+        with self.assertRaises(Busy):
+            await limiter.run(lambda: 'otra')
+        await asyncio.sleep(0.4)
+        self.assertEqual(limiter.active, 0)
+
+    def post(self, message):
+        return self.client.post(reverse('chat_api_async'), json.dumps({'message': message}),
+                                content_type='application/json')
+
+    def test_async_view(self):
+        cache.clear()
+        model = FakeGeminiModel(latency=0)
+        resolver = GeminiResolver(factory=lambda name: model)
+        resolver.check_now()
+        limiter = UpstreamLimiter(limit=1, queue_size=0)
+        with mock.patch.object(views, 'resolver', resolver), mock.patch.object(views, 'answer_cache', AnswerCache()), \
+                mock.patch.object(views, 'upstream', limiter):
+            answer = self.post('¿Tienen monitores?').json()
+            self.assertEqual((answer['source'], answer['cache']['cache']), ('gemini', 'miss'))
+            # Sin lugar: respuesta predefinida sin llamar a Gemini
+            limiter.active = 1
+            busy = self.post('¿Tienen mouses?').json()
+        self.assertEqual((busy['source'], busy['reason']), ('fallback', 'busy'))
+        self.assertEqual(model.stats['calls'], 2)  # el chequeo de salud + una consulta
+
+
+class IntentMatcherTests(TestCase):
+    """Respuestas predefinidas por intención"""
+
+    def matcher(self):
+        return IntentMatcher([
+            {'name': 'envios', 'priority': 20, 'keywords': ['envio', {'text': 'cuanto tarda', 'weight': 2}],
+             'response': 'envíos'},
+            {'name': 'pagos', 'priority': 20, 'keywords': ['pago', 'tarjeta'], 'response': 'pagos'},
+            {'name': 'cuotas', 'priority': 20, 'weight': 2, 'keywords': ['cuota'], 'response': 'cuotas'},
+            {'name': 'saludo', 'keywords': ['hola'], 'response': 'hola'},
+        ], synonyms={'envío': ['despacho']})
+
+    def names(self, message):
+        return [match.intent.name for match in self.matcher().ranked(message)]
+
+    def test_normalized_whole_words(self):
+        self.assertEqual(self.names('¿Hacen ENVÍOS?'), ['envios'])
+        self.assertEqual(self.names('hacen envio'), ['envios'])
+        self.assertEqual(self.names('DESPACHOS al interior'), ['envios'])  # sinónimo en plural
+        self.assertEqual(self.names('desenvolver el paquete'), [])
+
+    def test_priority_then_score(self):
+        # El saludo tiene menos prioridad aunque aparezca primero
+        self.assertEqual(self.names('Hola! cuánto tarda el envío?'), ['envios', 'saludo'])
+        self.assertEqual(self.matcher().match('cuánto tarda el envío').score, 3)
+        # Misma prioridad: gana el mayor puntaje (cuotas pesa doble)
+        self.assertEqual(self.names('pago con tarjeta en cuotas')[:1], ['pagos'])
+        self.assertEqual(self.names('pago en cuotas'), ['cuotas', 'pagos'])
+        # Empate: la que aparece antes
+        self.assertEqual(self.names('tarjeta o envio')[0], 'pagos')
+
+    def test_data_file(self):
+        matcher = get_matcher()
+        for intent in matcher.intents:
+            self.assertEqual(matcher.match(intent.keywords[0]).intent, intent)
+        with self.assertRaises(ValueError):
+            IntentMatcher([{'name': 'a', 'keywords': ['x'], 'response': ''}] * 2)
+
+    def test_fallback_answer(self):
+        answer = views.fallback_answer('Hola, ¿tienen auriculares inalámbricos?')
+        self.assertEqual((answer['intent'], answer['source']), ('auricular', 'fallback'))
+        self.assertEqual(views.fallback_answer('xyz')['source'], 'fallback_contextual')
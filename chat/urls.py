@@ -4,4 +4,6 @@ from . import views
 urlpatterns = [
     path('', views.chat_view, name='chat'),
     path('api/', views.chat_api, name='chat_api'),
+    path('api/async/', views.chat_api_async, name='chat_api_async'),
+    path('api/stream/', views.chat_stream, name='chat_stream'),
 ]
\ No newline at end of file
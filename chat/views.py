@@ -1,64 +1,56 @@
-import google.generativeai as genai
 import json
+import time
 import uuid
 import logging
+from asgiref.sync import sync_to_async
 from django.shortcuts import render
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
-from django.conf import settings
+
+from .answers import answer_cache
+from .gemini import resolver
+from .intents import get_matcher
+from .limiter import Busy, upstream
 
 # Configurar logging
 logger = logging.getLogger(__name__)
 
-# Configurar Gemini con el modelo CORRECTO
-def setup_gemini():
-    try:
-        if hasattr(settings, 'GEMINI_API_KEY') and settings.GEMINI_API_KEY:
-            genai.configure(api_key=settings.GEMINI_API_KEY)
-            
-            # USAR EL MODELO CORRECTO de tu lista
-            model_name = 'models/gemini-2.0-flash-001'  # ← MODELO ESTABLE Y RÁPIDO
-            
-            try:
-                model = genai.GenerativeModel(model_name)
-                # Probar el modelo
-                test_response = model.generate_content("Hola")
-                if test_response.text:
-                    logger.info(f"✅ Gemini configurado con: {model_name}")
-                    return model
-            except Exception as e:
-                logger.error(f"❌ Error con {model_name}: {e}")
-                
-                # Fallback a otros modelos
-                fallback_models = [
-                    'models/gemini-2.5-flash',
-                    'models/gemini-flash-latest', 
-                    'models/gemini-pro-latest'
-                ]
-                
-                for fallback_model in fallback_models:
-                    try:
-                        model = genai.GenerativeModel(fallback_model)
-                        test_response = model.generate_content("Hola")
-                        if test_response.text:
-                            logger.info(f"✅ Gemini configurado con fallback: {fallback_model}")
-                            return model
-                    except:
-                        continue
-            
-            logger.error("❌ Ningún modelo de Gemini funcionó")
-            return None
-            
-        else:
-            logger.warning("⚠️  GEMINI_API_KEY no configurada")
-            return None
-            
-    except Exception as e:
-        logger.error(f"❌ Error configurando Gemini: {e}")
-        return None
+# Prompt optimizado para Masivo Tech (si cambia, subir answers.PROMPT_VERSION)
+PROMPT = """Eres Masibot, el asistente virtual oficial de Masivo Tech.
+
+INFORMACIÓN REAL:
+- Tienda: Masivo Tech - Periféricos gaming
+- Productos: teclados mecánicos, mouses gaming, auriculares, monitores, sillas gamer
+- Marcas: Logitech, Razer, Redragon, HyperX, SteelSeries
+- Envíos: CABA 24-48hs, Interior 3-5 días hábiles
+- Pagos: tarjetas (hasta 12 cuotas), transferencia (10% descuento), efectivo
+- Garantía: 6-12 meses oficial
+- Contacto: WhatsApp +54 11 1234-5678, info@masivotech.com
+- Horario: Lunes a Viernes 9-18hs
+
+RESPONDE:
+- En español argentino coloquial y amigable
+- Usa emojis relevantes 🎮🖱️⌨️🎧🚚💳
+- Sé entusiasta sobre gaming
+- Responde específicamente a la consulta
+- NO inventes precios exactos
+- NO inventes stocks exactos
+- Mantén respuestas breves (máximo 2 párrafos)
+
+Consulta: {message}
+
+Respuesta:"""
+
+
+def build_prompt(message):
+    return PROMPT.format(message=message)
+
+
+def ask_gemini(model, message, timeout=None):
+    """Texto de la respuesta de Gemini"""
+    kwargs = {'request_options': {'timeout': timeout}} if timeout else {}
+    return model.generate_content(build_prompt(message), **kwargs).text.strip()
 
-# Configurar al iniciar
-gemini_model = setup_gemini()
 
 def chat_view(request):
     session_id = request.session.get('chat_session_id')
@@ -68,7 +60,7 @@ def chat_view(request):
     
     return render(request, 'chat/chat.html', {
         'session_id': session_id,
-        'gemini_available': gemini_model is not None
+        'gemini_available': resolver.available()
     })
 
 @csrf_exempt
@@ -84,49 +76,27 @@ def chat_api(request):
             if not user_message:
                 return JsonResponse({'response': '¡Hola! ¿En qué puedo ayudarte? 😊'})
             
-            # USAR GEMINI CON EL MODELO CORRECTO
-            if gemini_model:
-                try:
-                    # Prompt optimizado para Masivo Tech
-                    prompt = f"""Eres Masibot, el asistente virtual oficial de Masivo Tech.
-
-INFORMACIÓN REAL:
-- Tienda: Masivo Tech - Periféricos gaming
-- Productos: teclados mecánicos, mouses gaming, auriculares, monitores, sillas gamer
-- Marcas: Logitech, Razer, Redragon, HyperX, SteelSeries
-- Envíos: CABA 24-48hs, Interior 3-5 días hábiles
-- Pagos: tarjetas (hasta 12 cuotas), transferencia (10% descuento), efectivo
-- Garantía: 6-12 meses oficial
-- Contacto: WhatsApp +54 11 1234-5678, info@masivotech.com
-- Horario: Lunes a Viernes 9-18hs
-
-RESPONDE:
-- En español argentino coloquial y amigable
-- Usa emojis relevantes 🎮🖱️⌨️🎧🚚💳
-- Sé entusiasta sobre gaming
-- Responde específicamente a la consulta
-- NO inventes precios exactos
-- NO inventes stocks exactos
-- Mantén respuestas breves (máximo 2 párrafos)
-
-Consulta: {user_message}
+            # Modelo resuelto en segundo plano (no espera a la red). Las
+            # respuestas ya guardadas se sirven aunque Gemini esté caído
+            gemini_model = resolver.get_model()
+            compute = (lambda: ask_gemini(gemini_model, user_message)) if gemini_model else None
+            try:
+                cached = answer_cache.get_or_compute(user_message, compute)
+            except Exception as e:
+                logger.error(f"❌ Error con Gemini: {e}")
+                resolver.report_failure(gemini_model)
+                cached = None
+                # Continuar con fallback
 
-Respuesta:"""
-                    
-                    response = gemini_model.generate_content(prompt)
-                    bot_response = response.text.strip()
-                    
-                    logger.info(f"🤖 Gemini 2.0 Flash respondió: {bot_response}")
-                    
-                    return JsonResponse({
-                        'response': bot_response,
-                        'session_id': session_id,
-                        'source': 'gemini_2.0_flash'
-                    })
-                    
-                except Exception as e:
-                    logger.error(f"❌ Error con Gemini: {e}")
-                    # Continuar con fallback
+            if cached:
+                bot_response, meta = cached
+                logger.info(f"🤖 Gemini ({resolver.model_name}, {meta['cache']}) respondió: {bot_response}")
+                return JsonResponse({
+                    'response': bot_response,
+                    'session_id': session_id,
+                    'source': 'gemini',
+                    'cache': meta,
+                })
             
             # FALLBACK INTELIGENTE
             return handle_fallback_response(user_message)
@@ -139,35 +109,69 @@ Respuesta:"""
     
     return JsonResponse({'error': 'Método no permitido'}, status=405)
 
+@csrf_exempt
+async def chat_api_async(request):
+    """
+    ``chat_api`` para ASGI: mientras espera a Gemini no ocupa un worker. Las
+    llamadas pasan por ``upstream`` (cupo, cola y plazo); si no hay lugar o
+    se pasa el plazo responde con las respuestas predefinidas.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Método no permitido'}, status=405)
+    try:
+        data = json.loads(request.body)
+        user_message = str(data.get('message', '')).strip()
+        session_id = data.get('session_id')
+    except (ValueError, AttributeError):
+        return JsonResponse({'error': 'JSON inválido'}, status=400)
+
+    logger.info(f"📨 Mensaje del usuario (async): {user_message}")
+    if not user_message:
+        return JsonResponse({'response': '¡Hola! ¿En qué puedo ayudarte? 😊'})
+
+    # La caché (puede ser Redis) y el primer get_model() (importa el SDK) bloquean
+    cached = await sync_to_async(answer_cache.get_or_compute, thread_sensitive=False)(user_message)
+    gemini_model = None if cached else await sync_to_async(resolver.get_model, thread_sensitive=False)()
+    reason = None
+    if gemini_model:
+        compute = lambda: ask_gemini(gemini_model, user_message, timeout=upstream.deadline)
+        try:
+            cached = await upstream.run(answer_cache.get_or_compute, user_message, compute)
+        except Busy as e:
+            logger.warning(f"⏳ Gemini ocupado ({e}): respuesta predefinida")
+            reason = 'busy'
+        except TimeoutError:
+            logger.warning(f"⌛ Gemini tardó más de {upstream.deadline} s: respuesta predefinida")
+            reason = 'timeout'
+        except Exception as e:
+            logger.error(f"❌ Error con Gemini: {e}")
+            resolver.report_failure(gemini_model)
+            reason = 'error'
+
+    if cached:
+        bot_response, meta = cached
+        logger.info(f"🤖 Gemini ({resolver.model_name}, {meta['cache']}) respondió: {bot_response}")
+        return JsonResponse({
+            'response': bot_response,
+            'session_id': session_id,
+            'source': 'gemini',
+            'cache': meta,
+        })
+
+    answer = fallback_answer(user_message)
+    if reason:
+        answer['reason'] = reason
+    return JsonResponse(answer)
+
 def handle_fallback_response(user_message):
     """Sistema de respuestas predefinidas"""
-    user_lower = user_message.lower()
-    
-    responses = {
-        'hola': "¡Hola! 😊 Soy Masibot de Masivo Tech. ¿Buscás algún periférico gaming? 🎮",
-        'mouse': "🖱️ Tenemos mouses gaming Logitech, Razer, Redragon. ¿Inalámbricos o con cable?",
-        'teclado': "🎹 Teclados mecánicos con switches azul, rojo o marrón. Marcas: Redragon, Logitech, Razer",
-        'auricular': "🎧 Auriculares gaming con sonido surround 7.1. HyperX, Logitech, Razer",
-        'monitor': "🖥️ Monitores gaming 144Hz, 240Hz. Samsung, LG, ASUS. ¿Qué tamaño?",
-        'silla': "💺 Sillas gamer ergonómicas con soporte lumbar ajustable",
-        'logitech': "🎮 Logitech G! Pro X Superlight, G502 Hero, G203 Lightsync. ¿Cuál modelo?",
-        'razer': "🐍 Razer! DeathAdder, Viper, BlackWidow. Calidad premium",
-        'redragon': "🐲 Redragon! Kumara, Griffin, Lamia. Excelente calidad-precio",
-        'envío': "🚚 ¡Envíos a todo el país! CABA: 24-48hs | Interior: 3-5 días | Gratis +$50.000",
-        'envios': "🚚 ¡Envíos a todo el país! CABA: 24-48hs | Interior: 3-5 días | Gratis +$50.000",
-        'pago': "💳 Tarjetas (12 cuotas SIN interés), transferencia (10% OFF), efectivo",
-        'cuota': "💰 ¡12 cuotas SIN interés! Transferencia con 10% de descuento",
-        'garantía': "✅ Garantía oficial 6-12 meses. Distribuidores autorizados",
-        'garantia': "✅ Garantía oficial 6-12 meses. Distribuidores autorizados",
-        'stock': "📦 Todos los productos publicados están disponibles. Stock en tiempo real!",
-        'contacto': "📞 WhatsApp: +54 11 1234-5678 | Email: info@masivotech.com | Lun-Vie 9-18hs",
-        'whatsapp': "💬 WhatsApp: +54 11 1234-5678 - Respondemos al instante!",
-        'gracias': "¡De nada! 😊 ¿Necesitás algo más?",
-    }
-    
-    for keyword, answer in responses.items():
-        if keyword in user_lower:
-            return JsonResponse({'response': answer, 'source': 'fallback'})
+    return JsonResponse(fallback_answer(user_message))
+
+def fallback_answer(user_message):
+    """Respuesta predefinida: ``{'response', 'source'}``"""
+    match = get_matcher().match(user_message)
+    if match:
+        return {'response': match.intent.response, 'source': 'fallback', 'intent': match.intent.name}
     
     import random
     contextual = [
@@ -176,7 +180,79 @@ def handle_fallback_response(user_message):
         f"🖥️ ¿Necesitás info sobre '{user_message}'? Soy experto en periféricos!",
     ]
     
-    return JsonResponse({
+    return {
         'response': random.choice(contextual),
         'source': 'fallback_contextual'
-    })
\ No newline at end of file
+    }
+
+
+# =============================================================================
+# STREAMING (Server-Sent Events)
+# =============================================================================
+
+def sse_event(event, data):
+    """Un evento SSE con ``data`` en JSON"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+def stream_answer(user_message, session_id):
+    """
+    Eventos de la respuesta: ``chunk`` por cada parte que manda Gemini y
+    ``done`` al final; las respuestas cacheadas y las predefinidas van en un
+    solo evento ``answer``; ``error`` si Gemini se corta a la mitad.
+    """
+    cached = answer_cache.get_or_compute(user_message)
+    if cached:
+        bot_response, meta = cached
+        yield sse_event('answer', {'response': bot_response, 'source': 'gemini', 'cache': meta,
+                                   'session_id': session_id})
+        return
+
+    gemini_model = resolver.get_model()
+    if gemini_model:
+        parts = []
+        start = time.perf_counter()
+        try:
+            for chunk in gemini_model.generate_content(build_prompt(user_message), stream=True):
+                if chunk.text:
+                    parts.append(chunk.text)
+                    yield sse_event('chunk', {'text': chunk.text})
+        except Exception as e:
+            logger.error(f"❌ Error con Gemini (streaming): {e}")
+            resolver.report_failure(gemini_model)
+            if parts:
+                yield sse_event('error', {'response': 'Se cortó la respuesta. ¿Probás de nuevo? 🙏'})
+                return
+            # Sin nada enviado todavía: sigue con la respuesta predefinida
+        else:
+            bot_response = ''.join(parts).strip()
+            if bot_response:
+                meta = answer_cache.remember(user_message, bot_response, (time.perf_counter() - start) * 1000)
+                logger.info(f"🤖 Gemini ({resolver.model_name}, streaming) respondió: {bot_response}")
+                yield sse_event('done', {'source': 'gemini', 'cache': meta, 'session_id': session_id})
+                return
+
+    yield sse_event('answer', fallback_answer(user_message))
+
+@csrf_exempt
+def chat_stream(request):
+    """Igual que ``chat_api`` pero la respuesta llega por partes (text/event-stream)"""
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Método no permitido'}, status=405)
+    try:
+        data = json.loads(request.body)
+        user_message = str(data.get('message', '')).strip()
+        session_id = data.get('session_id')
+    except (ValueError, AttributeError):
+        return JsonResponse({'error': 'JSON inválido'}, status=400)
+
+    logger.info(f"📨 Mensaje del usuario (streaming): {user_message}")
+    if user_message:
+        events = stream_answer(user_message, session_id)
+    else:
+        events = iter([sse_event('answer', {'response': '¡Hola! ¿En qué puedo ayudarte? 😊'})])
+
+    response = StreamingHttpResponse(events, content_type='text/event-stream; charset=utf-8')
+    response['Cache-Control'] = 'no-cache'
+    # Que nginx no junte los eventos en su buffer
+    response['X-Accel-Buffering'] = 'no'
+    return response
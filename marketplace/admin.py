@@ -1,10 +1,14 @@
 from django.contrib import admin
 from django.utils.html import format_html
-from .models import Product, Order, OrderItem, ShippingOption, ShippingZone
+from .models import (
+    Product, Order, OrderItem, ShippingOption, ShippingZone, StockReservation,
+    PaymentNotification,
+)
 from django.urls import path
 from django.shortcuts import redirect
 from django.utils import timezone
 from datetime import timedelta
+from . import exports
 
 class ProductAdmin(admin.ModelAdmin):
     list_display = ['image_preview', 'name', 'category_display', 'price', 'stock', 'available', 'created_at']
@@ -20,10 +24,11 @@ class ProductAdmin(admin.ModelAdmin):
     
     readonly_fields = ['created_at', 'updated_at']
     ordering = ['-created_at']
+    actions = ['export_csv']
     
     def image_preview(self, obj):
-        if obj.image and obj.image.url:
-            return format_html('<img src="{}" style="width: 50px; height: 50px; object-fit: cover;" />', obj.image.url)
+        if obj.image:
+            return format_html('<img src="{}" style="width: 50px; height: 50px; object-fit: cover;" />', obj.get_image_url('thumb'))
         return "📷 Sin imagen"
     image_preview.short_description = 'Imagen'
     
@@ -43,6 +48,10 @@ class ProductAdmin(admin.ModelAdmin):
             return format_html('<span style="color: green;">🟢 EN STOCK ({})</span>', obj.stock)
     stock_status.short_description = 'Estado Stock'
 
+    @admin.action(description='Exportar productos seleccionados (CSV)')
+    def export_csv(self, request, queryset):
+        return exports.export_response('products', 'csv', queryset)
+
 class OrderItemInline(admin.TabularInline):
     model = OrderItem
     readonly_fields = ['product', 'quantity', 'price']
@@ -55,6 +64,7 @@ class OrderAdmin(admin.ModelAdmin):
     search_fields = ['first_name', 'last_name', 'email', 'mercadopago_id']
     readonly_fields = ['created_at', 'updated_at', 'mercadopago_id']
     inlines = [OrderItemInline]
+    actions = ['export_orders_csv', 'export_orders_jsonl', 'export_items_csv']
     
     fieldsets = [
         ('Información del Cliente', {
@@ -86,6 +96,20 @@ class OrderAdmin(admin.ModelAdmin):
         ''', obj.id)
     order_actions.short_description = 'Acciones'
 
+    # Exportaciones en streaming: sirven también con "seleccionar todas"
+    @admin.action(description='Exportar órdenes seleccionadas (CSV)')
+    def export_orders_csv(self, request, queryset):
+        return exports.export_response('orders', 'csv', queryset)
+
+    @admin.action(description='Exportar órdenes seleccionadas (JSONL)')
+    def export_orders_jsonl(self, request, queryset):
+        return exports.export_response('orders', 'jsonl', queryset)
+
+    @admin.action(description='Exportar ítems de las órdenes seleccionadas (CSV)')
+    def export_items_csv(self, request, queryset):
+        items = OrderItem.objects.filter(order__in=queryset.order_by().values('pk'))
+        return exports.export_response('items', 'csv', items)
+
 @admin.register(ShippingOption)
 class ShippingOptionAdmin(admin.ModelAdmin):
     list_display = ['name', 'price', 'estimated_days', 'is_active']
@@ -97,6 +121,26 @@ class ShippingZoneAdmin(admin.ModelAdmin):
     list_display = ['name', 'postal_code_start', 'postal_code_end', 'shipping_option']
     list_filter = ['shipping_option']
 
+@admin.register(StockReservation)
+class StockReservationAdmin(admin.ModelAdmin):
+    list_display = ['reference', 'product', 'quantity', 'status', 'expires_at']
+    list_filter = ['status']
+    search_fields = ['reference']
+    raw_id_fields = ['product']
+    # El stock ya se descontó: cambiar una reserva a mano lo desbalancearía
+    readonly_fields = ['reference', 'product', 'quantity', 'status', 'expires_at']
+
+@admin.register(PaymentNotification)
+class PaymentNotificationAdmin(admin.ModelAdmin):
+    list_display = ['notification_id', 'topic', 'resource_id', 'status', 'attempts', 'received_at']
+    list_filter = ['status', 'topic']
+    search_fields = ['notification_id', 'resource_id']
+    # Registro de lo que mandó MercadoPago: solo lectura
+    readonly_fields = [
+        'notification_id', 'topic', 'resource_id', 'payload',
+        'status', 'attempts', 'error', 'received_at', 'processed_at',
+    ]
+
 # Registrar modelos
 admin.site.register(Product, ProductAdmin)
 admin.site.register(Order, OrderAdmin)
@@ -1,77 +1,91 @@
+# === admin_dashboard.py - Dashboard de ventas para el admin ===
+"""
+``/admin/dashboard/?since=AAAA-MM-DD&until=AAAA-MM-DD`` (últimos 30 días por
+defecto). Ventas y órdenes salen de ``DailySalesSummary`` con una consulta
+por rango (ver ``sales.py``); el inventario, de un solo ``aggregate``; los
+productos más vendidos, canastas, categorías y cohortes, de ``analytics.py``
+(cacheados por período).
+"""
+
+import json
+from datetime import date, timedelta
+
 from django.contrib import admin
-from django.urls import path
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Count, Q
 from django.shortcuts import render
-from django.db.models import Sum, Count, Avg
 from django.utils import timezone
-from datetime import timedelta
-import json
-from .models import Order, OrderItem, Product
+
+from . import analytics
+from .models import Product
+from .sales import sales_summary
+
+DEFAULT_DAYS = 30
+MAX_DAYS = 366
+LOW_STOCK = 10
+
+
+def parse_range(request):
+    """``(desde, hasta)`` de la query string, acotado a ``MAX_DAYS``"""
+    today = timezone.localdate()
+    try:
+        end = date.fromisoformat(request.GET['until'])
+    except (KeyError, ValueError):
+        end = today
+    try:
+        start = date.fromisoformat(request.GET['since'])
+    except (KeyError, ValueError):
+        start = end - timedelta(days=DEFAULT_DAYS - 1)
+    if start > end:
+        start, end = end, start
+    return max(start, end - timedelta(days=MAX_DAYS - 1)), end
+
 
 def admin_dashboard(request):
     """Dashboard personalizado para el admin"""
-    
-    # Estadísticas principales
-    total_orders = Order.objects.count()
-    total_revenue = Order.objects.aggregate(Sum('total_amount'))['total_amount__sum'] or 0
-    total_products = Product.objects.count()
-    low_stock_products = Product.objects.filter(stock__lt=10, stock__gt=0).count()
-    out_of_stock_products = Product.objects.filter(stock=0).count()
-    
-    # Ventas últimos 30 días
-    thirty_days_ago = timezone.now() - timedelta(days=30)
-    recent_orders = Order.objects.filter(created_at__gte=thirty_days_ago)
-    recent_revenue = recent_orders.aggregate(Sum('total_amount'))['total_amount__sum'] or 0
-    
-    # Órdenes por estado
-    orders_by_status = Order.objects.values('status').annotate(
-        count=Count('id'),
-        revenue=Sum('total_amount')
+    start, end = parse_range(request)
+    sales = sales_summary(start, end)
+
+    # Inventario: un solo recorrido de la tabla
+    stock = Product.objects.aggregate(
+        total=Count('id'),
+        low=Count('id', filter=Q(stock__lt=LOW_STOCK, stock__gt=0)),
+        out=Count('id', filter=Q(stock=0)),
     )
-    
-    # Productos más vendidos
-    top_products = OrderItem.objects.values(
-        'product__name', 
-        'product__category'
-    ).annotate(
-        total_sold=Sum('quantity'),
-        revenue=Sum('price')
-    ).order_by('-total_sold')[:10]
-    
-    # Ventas por día (últimos 7 días)
-    sales_data = []
-    for i in range(7):
-        day = timezone.now() - timedelta(days=i)
-        day_start = day.replace(hour=0, minute=0, second=0, microsecond=0)
-        day_end = day.replace(hour=23, minute=59, second=59, microsecond=999999)
-        
-        day_sales = Order.objects.filter(
-            created_at__range=(day_start, day_end)
-        ).aggregate(
-            total=Sum('total_amount'),
-            count=Count('id')
-        )
-        
-        sales_data.append({
-            'date': day.strftime('%Y-%m-%d'),
-            'day_name': day.strftime('%a'),
-            'total': day_sales['total'] or 0,
-            'count': day_sales['count'] or 0
-        })
-    
-    sales_data.reverse()
-    
+    low_stock_products_list = Product.objects.filter(stock__lt=LOW_STOCK).only('name', 'stock').order_by('stock')[:10]
+
+    metrics = analytics.window_metrics(start, end)
+
+    sales_data = [
+        {
+            'date': day['date'].isoformat(),
+            'day_name': day['date'].strftime('%d/%m'),
+            'total': float(day['total']),
+            'count': day['count'],
+        }
+        for day in sales['days']
+    ]
+
     context = {
+        **admin.site.each_context(request),
         'title': 'Dashboard MasivoTech',
-        'total_orders': total_orders,
-        'total_revenue': total_revenue,
-        'total_products': total_products,
-        'low_stock_products': low_stock_products,
-        'out_of_stock_products': out_of_stock_products,
-        'recent_revenue': recent_revenue,
-        'orders_by_status': list(orders_by_status),
-        'top_products': list(top_products),
+        'since': start,
+        'until': end,
+        'total_orders': sales['order_count'],
+        'total_revenue': sales['revenue'],
+        'total_products': stock['total'],
+        'low_stock_products': stock['low'],
+        'out_of_stock_products': stock['out'],
+        'orders_by_status': sales['by_status'],
+        'status_json': json.dumps(sales['by_status'], cls=DjangoJSONEncoder),
+        'top_products': metrics['top_products'],
+        'basket': metrics['basket'],
+        'cohorts': metrics['cohorts'],
+        'basket_json': json.dumps(metrics['basket']['bins']),
+        'category_json': json.dumps(metrics['category_mix'], cls=DjangoJSONEncoder),
+        'low_stock_products_list': low_stock_products_list,
         'sales_data': sales_data,
         'sales_json': json.dumps(sales_data),
     }
-    
-    return render(request, 'admin/marketplace/dashboard.html', context)
\ No newline at end of file
+
+    return render(request, 'admin/marketplace/dashboard.html', context)
@@ -0,0 +1,289 @@
+# === analytics.py - Métricas de ventas con NumPy / pandas ===
+"""
+Métricas del dashboard que con el ORM serían decenas de consultas::
+
+    from marketplace import analytics
+
+    metrics = analytics.window_metrics(since, until)
+    metrics['top_products']   # unidades e ingresos (cantidad x precio)
+    metrics['basket']         # distribución de unidades por orden y ticket
+    metrics['category_mix']   # ingresos por categoría y semana
+    metrics['cohorts']        # clientes recurrentes y retención por mes
+
+Los ítems vendidos del período se leen con un solo ``values_list`` (más una
+consulta para la primera compra de cada cliente y otra para los nombres de
+los productos) y todo lo demás son operaciones vectorizadas sobre columnas.
+
+El resultado se guarda en la caché por ventana ``(desde, hasta)`` junto con
+la huella de ``DailySalesSummary`` de esos días: cuando entra o cambia una
+orden del período se recalcula; si no, se sirve de la caché.
+"""
+
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import FloatField, Max, Min, Sum
+from django.db.models.functions import Cast, Lower
+from django.utils import timezone
+
+from .models import DailySalesSummary, Order, OrderItem, Product
+from .sales import REVENUE_STATUSES
+
+CACHE_PREFIX = 'analytics:'
+CACHE_TIMEOUT = getattr(settings, 'ANALYTICS_CACHE_TIMEOUT', 3600)
+TOP_PRODUCTS = 10
+MAX_COHORT_MONTHS = 12
+
+# Unidades por orden: 1, 2, 3, 4, 5, 6-10, más de 10
+BASKET_BINS = [1, 2, 3, 4, 5, 6, 11]
+BASKET_LABELS = ['1', '2', '3', '4', '5', '6-10', '11+']
+
+CATEGORY_LABELS = dict(Product.CATEGORY_CHOICES)
+
+
+def window_bounds(start, end):
+    """Datetimes locales ``[start 00:00, end + 1 día 00:00)``"""
+    return (
+        timezone.make_aware(datetime.combine(start, time.min)),
+        timezone.make_aware(datetime.combine(end + timedelta(days=1), time.min)),
+    )
+
+
+def _money(value):
+    """float -> Decimal con centavos (las sumas se hacen en float64)"""
+    return Decimal(f'{value:.2f}')
+
+
+# =============================================================================
+# CARGA
+# =============================================================================
+
+def load_items(start, end, using='default'):
+    """
+    Ítems vendidos entre ``start`` y ``end`` (fechas, inclusive) como
+    DataFrame: ``order_id, created_at (hora local), customer, product_id,
+    quantity, price``. El precio llega de la base como REAL.
+    """
+    since, until = window_bounds(start, end)
+    rows = OrderItem.objects.using(using).filter(
+        order__created_at__gte=since, order__created_at__lt=until,
+        order__status__in=REVENUE_STATUSES,
+    ).values_list(
+        'order_id', 'order__created_at', 'order__user_id', Lower('order__email'),
+        'product_id', 'quantity', Cast('price', FloatField()),
+    ).order_by()
+
+    items = pd.DataFrame.from_records(
+        list(rows), columns=['order_id', 'created_at', 'user_id', 'email', 'product_id', 'quantity', 'price'],
+    )
+    items['created_at'] = pd.to_datetime(items['created_at'], utc=True).dt.tz_convert(
+        timezone.get_current_timezone_name()
+    )
+    items['customer'] = customer_keys(items['user_id'], items['email'])
+    items['quantity'] = items['quantity'].astype('int64')
+    items['price'] = items['price'].astype('float64')
+    items['line_total'] = items['quantity'].to_numpy() * items['price'].to_numpy()
+    return items.drop(columns=['user_id', 'email'])
+
+
+def customer_keys(user_ids, emails):
+    """Cliente: el usuario si compró logueado, si no el email (sin mayúsculas)"""
+    # Int64 (con nulos): con invitados un int64 pasaría a float y daría 'u:12.0'
+    users = pd.Series(pd.array(user_ids, dtype='Int64'))
+    return np.where(users.notna(), 'u:' + users.astype(str), 'e:' + pd.Series(emails, dtype='object').astype(str))
+
+
+def first_purchases(using='default'):
+    """``{cliente: primera compra (hora local)}`` con un solo GROUP BY"""
+    rows = Order.objects.using(using).filter(status__in=REVENUE_STATUSES).values_list(
+        'user_id', Lower('email'),
+    ).annotate(first=Min('created_at')).order_by()
+    frame = pd.DataFrame.from_records(list(rows), columns=['user_id', 'email', 'first'])
+    frame['customer'] = customer_keys(frame['user_id'], frame['email'])
+    first = pd.to_datetime(frame['first'], utc=True).dt.tz_convert(timezone.get_current_timezone_name())
+    # Un usuario con varios emails queda con la compra más vieja
+    return first.groupby(frame['customer'].to_numpy()).min()
+
+
+# =============================================================================
+# MÉTRICAS
+# =============================================================================
+
+def orders_frame(items):
+    """Una fila por orden: fecha, cliente, unidades y total"""
+    return items.groupby('order_id', sort=False).agg(
+        created_at=('created_at', 'first'),
+        customer=('customer', 'first'),
+        units=('quantity', 'sum'),
+        total=('line_total', 'sum'),
+    )
+
+
+def top_products(items, categories, limit=TOP_PRODUCTS, using='default'):
+    """Productos con más unidades vendidas; ingresos = cantidad x precio"""
+    if items.empty:
+        return []
+    grouped = items.groupby('product_id', sort=False).agg(
+        total_sold=('quantity', 'sum'), revenue=('line_total', 'sum'), orders=('order_id', 'nunique'),
+    )
+    top = grouped.sort_values(['total_sold', 'revenue'], ascending=False).head(limit)
+    names = dict(Product.objects.using(using).filter(pk__in=top.index.tolist()).values_list('pk', 'name'))
+    return [
+        {
+            'product_id': product_id,
+            'name': names.get(product_id, ''),
+            'category': CATEGORY_LABELS.get(categories.get(product_id), ''),
+            'total_sold': int(row.total_sold),
+            'orders': int(row.orders),
+            'revenue': _money(row.revenue),
+        }
+        for product_id, row in zip(top.index, top.itertuples())
+    ]
+
+
+def product_categories(using='default'):
+    """``{product_id: categoría}`` (el catálogo entra entero en memoria)"""
+    return dict(Product.objects.using(using).values_list('pk', 'category'))
+
+
+def basket_stats(orders):
+    """Distribución de unidades por orden y ticket promedio / mediano / p90"""
+    if orders.empty:
+        return {'orders': 0, 'bins': [{'label': label, 'count': 0} for label in BASKET_LABELS],
+                'avg_units': 0.0, 'avg_ticket': Decimal('0'), 'median_ticket': Decimal('0'),
+                'p90_ticket': Decimal('0')}
+    units = orders['units'].to_numpy()
+    totals = orders['total'].to_numpy()
+    # Índice del tramo de cada orden: 0 = 1 unidad ... 6 = más de 10
+    counts = np.bincount(np.searchsorted(BASKET_BINS, units, side='right') - 1, minlength=len(BASKET_BINS))
+    median, p90 = np.percentile(totals, [50, 90])
+    return {
+        'orders': int(len(units)),
+        'bins': [{'label': label, 'count': int(count)} for label, count in zip(BASKET_LABELS, counts)],
+        'avg_units': round(float(units.mean()), 2),
+        'avg_ticket': _money(totals.mean()),
+        'median_ticket': _money(median),
+        'p90_ticket': _money(p90),
+    }
+
+
+def category_mix(items, categories):
+    """Ingresos por categoría y semana (lunes a domingo)"""
+    if items.empty:
+        return {'categories': [], 'weeks': []}
+    week = items['created_at'].dt.tz_localize(None).dt.to_period('W-SUN').dt.start_time.dt.date
+    table = pd.pivot_table(
+        pd.DataFrame({
+            'week': week.to_numpy(),
+            'category': items['product_id'].map(categories).fillna('').to_numpy(),
+            'revenue': items['line_total'].to_numpy(),
+        }),
+        index='week', columns='category', values='revenue', aggfunc='sum', fill_value=0.0,
+    ).sort_index()
+    columns = list(table.columns)
+    return {
+        'categories': [{'key': key, 'label': CATEGORY_LABELS.get(key, key)} for key in columns],
+        'weeks': [
+            {'week': week, 'revenue': {key: round(float(value), 2) for key, value in zip(columns, values)}}
+            for week, values in zip(table.index, table.to_numpy())
+        ],
+    }
+
+
+def cohorts(orders, since, first=None, using='default'):
+    """
+    Clientes nuevos (primera compra de siempre desde ``since``) agrupados por
+    mes: qué porcentaje vuelve a comprar en cada mes siguiente del período.
+    """
+    if orders.empty:
+        return {'customers': 0, 'repeat_customers': 0, 'repeat_rate': 0.0, 'months': [], 'table': []}
+    if first is None:
+        first = first_purchases(using)
+
+    month = orders['created_at'].dt.tz_localize(None).dt.to_period('M')
+    first = first.reindex(orders['customer'].to_numpy())
+    frame = pd.DataFrame({
+        'customer': orders['customer'].to_numpy(),
+        'month': month.to_numpy(),
+        'cohort': first.dt.tz_localize(None).dt.to_period('M').to_numpy(),
+        'new': (first >= since).to_numpy(),
+    })
+    orders_per_customer = frame['customer'].value_counts()
+
+    # Mes de la compra y su distancia al mes de la primera compra
+    frame['offset'] = (frame['month'].dt.year - frame['cohort'].dt.year) * 12 + (
+        frame['month'].dt.month - frame['cohort'].dt.month
+    )
+    last_month = frame['month'].max()
+    frame = frame[frame['new']]
+    customers = int(len(orders_per_customer))
+    repeat = int((orders_per_customer.to_numpy() >= 2).sum())
+    summary = {
+        'customers': customers,
+        'repeat_customers': repeat,
+        'repeat_rate': round(repeat / customers * 100, 1) if customers else 0.0,
+        'months': [],
+        'table': [],
+    }
+    if frame.empty:
+        return summary
+
+    active = frame.drop_duplicates(['customer', 'offset']).pivot_table(
+        index='cohort', columns='offset', values='customer', aggfunc='count', fill_value=0,
+    )
+    active = active.reindex(columns=range(min(MAX_COHORT_MONTHS, int(frame['offset'].max()) + 1)), fill_value=0)
+
+    summary['months'] = list(active.columns)
+    for cohort_month, counts in zip(active.index, active.to_numpy()):
+        size = int(counts[0])
+        # Meses que todavía no pasaron (o quedan fuera del período): None
+        observed = (last_month.year - cohort_month.year) * 12 + last_month.month - cohort_month.month
+        summary['table'].append({
+            'cohort': cohort_month.start_time.date(),
+            'customers': size,
+            'retention': [
+                round(float(count) / size * 100, 1) if size and offset <= observed else None
+                for offset, count in enumerate(counts)
+            ],
+        })
+    return summary
+
+
+def compute(start, end, using='default'):
+    """Todas las métricas del período, sin caché"""
+    items = load_items(start, end, using)
+    orders = orders_frame(items)
+    categories = product_categories(using)
+    return {
+        'top_products': top_products(items, categories, using=using),
+        'basket': basket_stats(orders),
+        'category_mix': category_mix(items, categories),
+        'cohorts': cohorts(orders, window_bounds(start, end)[0], using=using),
+    }
+
+
+# =============================================================================
+# CACHÉ
+# =============================================================================
+
+def window_version(start, end, using='default'):
+    """Huella de las órdenes del período (sale del resumen diario)"""
+    summary = DailySalesSummary.objects.using(using).filter(date__range=(start, end)).aggregate(
+        count=Sum('order_count'), updated=Max('updated_at'),
+    )
+    updated = summary['updated'].timestamp() if summary['updated'] else 0
+    return f"{summary['count'] or 0}:{updated:.6f}"
+
+
+def window_metrics(start, end, using='default'):
+    """Métricas del período, de la caché si las órdenes no cambiaron"""
+    key = f'{CACHE_PREFIX}{start.isoformat()}:{end.isoformat()}:{window_version(start, end, using)}'
+    metrics = cache.get(key)
+    if metrics is None:
+        metrics = compute(start, end, using)
+        cache.set(key, metrics, CACHE_TIMEOUT)
+    return metrics
@@ -0,0 +1,231 @@
+# === autocomplete.py - Índice de prefijos en memoria para el autocompletado ===
+"""
+Índice de prefijos por proceso para ``search_autocomplete``.
+
+Cada producto disponible aporta los tokens de su nombre (incluye la marca),
+de la categoría y de su etiqueta. Los tokens se guardan en una lista ordenada
+y cada consulta resuelve los prefijos con ``bisect``, sin tocar la base de
+datos. Los resultados son registros ya armados (nombre, categoría, precio,
+URL, miniatura), así la vista solo tiene que serializarlos.
+
+El índice se construye en el primer uso y se actualiza con las señales de
+``Product``. Recuerda la versión del catálogo (``CatalogVersion``) con la
+que se armó: la vista le pasa la de la base, la misma del ETag, y si es
+otra (un cambio en otro worker) se reconstruye antes de responder. Además
+se reconstruye cada ``AUTOCOMPLETE_MAX_AGE`` segundos.
+"""
+
+import threading
+import time
+from bisect import bisect_left
+from itertools import islice
+from decimal import Decimal
+
+from django.conf import settings
+from django.urls import reverse
+
+from . import images
+from .search import tokenize
+
+# Campos de cada resultado, en el orden en que se guardan en el registro
+RESULT_FIELDS = ('name', 'category', 'price', 'url', 'image')
+
+MAX_PRODUCTS = getattr(settings, 'AUTOCOMPLETE_MAX_PRODUCTS', 50_000)
+MAX_TOKENS_PER_PRODUCT = getattr(settings, 'AUTOCOMPLETE_MAX_TOKENS', 16)
+MAX_AGE = getattr(settings, 'AUTOCOMPLETE_MAX_AGE', 300)
+
+CENTS = Decimal('0.01')
+
+
+class AutocompleteIndex:
+    """Índice de prefijos ordenado con registros precalculados"""
+
+    def __init__(self, max_products=MAX_PRODUCTS, max_age=MAX_AGE):
+        self.max_products = max_products
+        self.max_age = max_age
+        self._lock = threading.RLock()
+        self._build_lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._keys = []        # tokens ordenados
+        self._ids = []         # product_id de cada token (lista paralela)
+        self._records = {}     # product_id -> registro (tupla RESULT_FIELDS)
+        self._tokens = {}      # product_id -> tupla de tokens indexados
+        self._url_pattern = None
+        self.built_at = None
+        self.version = None
+        self.truncated = False
+
+    # -------------------------------------------------------------------------
+    # Construcción
+    # -------------------------------------------------------------------------
+
+    @property
+    def is_built(self):
+        return self.built_at is not None
+
+    def _is_stale(self, version=None):
+        if not self.is_built or (version is not None and version != self.version):
+            return True
+        return self.max_age and time.monotonic() - self.built_at > self.max_age
+
+    def build(self, version=None):
+        """Carga todos los productos disponibles (snapshot o una sola consulta)"""
+        from .catalog import get_db_catalog_version
+        from .models import Product
+        from .snapshot import catalog_snapshot
+
+        # La versión se lee antes que las filas, como en el snapshot
+        if version is None:
+            version = get_db_catalog_version()
+        snapshot = catalog_snapshot.get()
+        if snapshot is not None and snapshot.version == version:
+            rows = [
+                (record.id, record.name, record.category, record.price, record.image_name, record.image_derivatives)
+                for record in islice(snapshot.ordered('newest'), self.max_products + 1)
+            ]
+        else:
+            rows = (
+                Product.objects.filter(available=True)
+                .order_by('-created_at', '-id')
+                .values_list('id', 'name', 'category', 'price', 'image', 'image_derivatives')[:self.max_products + 1]
+            )
+
+        pairs, records, tokens = [], {}, {}
+        for row in rows:
+            if len(records) >= self.max_products:
+                break
+            product_id, record, product_tokens = self._make_entry(*row)
+            records[product_id] = record
+            tokens[product_id] = product_tokens
+            pairs.extend((token, product_id) for token in product_tokens)
+
+        pairs.sort()
+        with self._lock:
+            self._keys = [token for token, _ in pairs]
+            self._ids = [product_id for _, product_id in pairs]
+            self._records = records
+            self._tokens = tokens
+            self.truncated = len(rows) > self.max_products
+            self.built_at = time.monotonic()
+            self.version = version
+
+    def _product_url(self, product_id):
+        # reverse() una sola vez; el resto es formateo de string
+        if self._url_pattern is None:
+            self._url_pattern = reverse('product_detail', args=[987654321]).replace('987654321', '{}')
+        return self._url_pattern.format(product_id)
+
+    def _make_entry(self, product_id, name, category, price, image, image_derivatives):
+        from .models import Product
+
+        category_label = dict(Product.CATEGORY_CHOICES).get(category, category)
+        storage = Product._meta.get_field('image').storage
+        image_url = images.image_url(image, image_derivatives, 'thumb', 'webp', storage=storage)
+        record = (
+            name,
+            category_label,
+            str(Decimal(price).quantize(CENTS)),
+            self._product_url(product_id),
+            image_url,
+        )
+        product_tokens = tuple(dict.fromkeys(
+            tokenize(name) + tokenize(category_label) + tokenize(category)
+        ))[:MAX_TOKENS_PER_PRODUCT]
+        return product_id, record, product_tokens
+
+    def ensure_built(self, version=None):
+        """Reconstruye si está vencido o si ``version`` (la de la base) es otra"""
+        # La reconstrucción arma las listas nuevas sin bloquear las consultas
+        if self._is_stale(version):
+            with self._build_lock:
+                if self._is_stale(version):
+                    self.build(version)
+
+    # -------------------------------------------------------------------------
+    # Actualización incremental
+    # -------------------------------------------------------------------------
+
+    def update(self, product):
+        """Reindexa un producto (lo quita si ya no está disponible)"""
+        with self._lock:
+            if not self.is_built:
+                return
+            self._remove(product.pk)
+            if not product.available:
+                return
+            if len(self._records) >= self.max_products:
+                self.truncated = True
+                return
+            product_id, record, product_tokens = self._make_entry(
+                product.pk, product.name, product.category, product.price, product.image.name,
+                product.image_derivatives,
+            )
+            self._records[product_id] = record
+            self._tokens[product_id] = product_tokens
+            for token in product_tokens:
+                position = bisect_left(self._keys, token)
+                # Mantener las listas paralelas ordenadas por (token, id)
+                while position < len(self._keys) and self._keys[position] == token and self._ids[position] < product_id:
+                    position += 1
+                self._keys.insert(position, token)
+                self._ids.insert(position, product_id)
+
+    def remove(self, product_id):
+        with self._lock:
+            if self.is_built:
+                self._remove(product_id)
+
+    def _remove(self, product_id):
+        self._records.pop(product_id, None)
+        for token in self._tokens.pop(product_id, ()):
+            position = bisect_left(self._keys, token)
+            while position < len(self._keys) and self._keys[position] == token:
+                if self._ids[position] == product_id:
+                    del self._keys[position]
+                    del self._ids[position]
+                    break
+                position += 1
+
+    # -------------------------------------------------------------------------
+    # Consultas
+    # -------------------------------------------------------------------------
+
+    def _prefix_range(self, prefix):
+        start = bisect_left(self._keys, prefix)
+        end = bisect_left(self._keys, prefix + '\uffff', start)
+        return start, end
+
+    def search(self, query, limit=5):
+        """Devuelve hasta ``limit`` registros cuyos tokens empiezan con la consulta"""
+        terms = tokenize(query)
+        if not terms:
+            return []
+
+        self.ensure_built()
+        with self._lock:
+            ranges = sorted((self._prefix_range(term) for term in terms), key=lambda r: r[1] - r[0])
+            start, end = ranges[0]
+            others = terms if len(terms) > 1 else ()
+
+            results, seen = [], set()
+            for position in range(start, end):
+                product_id = self._ids[position]
+                if product_id in seen:
+                    continue
+                seen.add(product_id)
+                if others and not self._matches_all(product_id, others):
+                    continue
+                results.append(self._records[product_id])
+                if len(results) >= limit:
+                    break
+            return results
+
+    def _matches_all(self, product_id, terms):
+        product_tokens = self._tokens[product_id]
+        return all(any(token.startswith(term) for token in product_tokens) for term in terms)
+
+
+# Instancia por proceso
+autocomplete_index = AutocompleteIndex()
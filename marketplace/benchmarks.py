@@ -0,0 +1,191 @@
+# === benchmarks.py - Utilidades para los comandos bench_* ===
+"""
+Helpers compartidos por los comandos ``manage.py bench_*``.
+
+Los benchmarks corren siempre sobre una base de datos de prueba descartable
+(la misma que usa ``manage.py test``), nunca sobre los datos reales.
+"""
+
+import copy
+import os
+import random
+import shutil
+import statistics
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import connection
+from django.db.backends.base.base import BaseDatabaseWrapper
+
+BRANDS = ['Logitech', 'Razer', 'Redragon', 'HyperX', 'SteelSeries', 'Corsair', 'Samsung', 'ASUS', 'LG']
+
+PRODUCT_TYPES = {
+    'teclados': ['Teclado mecánico', 'Teclado inalámbrico', 'Teclado compacto TKL'],
+    'mouses': ['Mouse gaming', 'Mouse inalámbrico', 'Mouse ultraliviano'],
+    'auriculares': ['Auriculares gaming', 'Auriculares inalámbricos', 'Headset 7.1'],
+    'monitores': ['Monitor gaming 144Hz', 'Monitor curvo 240Hz', 'Monitor IPS 27"'],
+}
+
+WORDS = [
+    'switches', 'rojos', 'azules', 'marrones', 'iluminación', 'RGB', 'sensor', 'óptico',
+    'batería', 'micrófono', 'desmontable', 'sonido', 'envolvente', 'panel', 'resolución',
+    'ergonómico', 'aluminio', 'cable', 'trenzado', 'garantía', 'oficial', 'respuesta',
+    'latencia', 'baja', 'diseño', 'compacto', 'profesional', 'torneos', 'gamers',
+]
+
+
+@contextmanager
+def benchmark_database(verbosity=0, threaded=False):
+    """
+    Crea una base de datos de prueba y la destruye al terminar.
+
+    Con ``threaded`` y SQLite la base va a un archivo temporal (WAL) con
+    transacciones IMMEDIATE: en memoria (caché compartida) y con transacciones
+    diferidas los hilos que escriben a la vez fallan en lugar de esperar.
+    """
+    settings_dict = connection.settings_dict
+    saved = copy.deepcopy({key: settings_dict[key] for key in ('TEST', 'OPTIONS')})
+    tmp = None
+    if threaded and connection.vendor == 'sqlite':
+        tmp = tempfile.mkdtemp(prefix='bench-')
+        settings_dict['TEST']['NAME'] = os.path.join(tmp, 'bench.sqlite3')
+        settings_dict['OPTIONS'].update({
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 30,
+            'init_command': 'PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL;',
+        })
+
+    old_name = connection.creation.create_test_db(verbosity=verbosity, autoclobber=True)
+    try:
+        yield connection
+    finally:
+        # En SQLite en memoria close() no cierra la conexión y la próxima base
+        # de prueba arrancaría con los datos de esta
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            BaseDatabaseWrapper.close(connection)
+        connection.creation.destroy_test_db(old_name, verbosity=verbosity)
+        settings_dict.update(saved)
+        if tmp:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+
+def make_products(count, seed=42, batch_size=5000):
+    """Crea ``count`` productos sintéticos con bulk_create (sin señales)"""
+    from .models import Product
+
+    rng = random.Random(seed)
+    categories = list(PRODUCT_TYPES)
+    batch = []
+    for i in range(count):
+        category = rng.choice(categories)
+        name = f"{rng.choice(PRODUCT_TYPES[category])} {rng.choice(BRANDS)} {i}"
+        description = ' '.join(rng.choice(WORDS) for _ in range(rng.randint(20, 60)))
+        batch.append(Product(
+            name=name,
+            description=description,
+            price=Decimal(rng.randint(5000, 500000)),
+            category=category,
+            image='products/default_product.jpg',
+            stock=rng.choice([0, 2, 4, 10, 25, 100]),
+            available=rng.random() > 0.05,
+        ))
+        if len(batch) >= batch_size:
+            Product.objects.bulk_create(batch)
+            batch = []
+    if batch:
+        Product.objects.bulk_create(batch)
+
+    # bulk_create no dispara señales: invalidar las cachés del catálogo a mano
+    from .catalog import bump_catalog_version
+    bump_catalog_version()
+
+
+ORDER_STATUSES = ['paid'] * 6 + ['pending'] * 2 + ['cancelled', 'shipped', 'delivered', 'processing']
+
+
+@contextmanager
+def backdated_orders():
+    """Permite fijar ``created_at`` en ``bulk_create`` (auto_now_add lo pisaría)"""
+    from .models import Order
+
+    field = Order._meta.get_field('created_at')
+    field.auto_now_add = False
+    try:
+        yield
+    finally:
+        field.auto_now_add = True
+
+
+def make_orders(count, days=365, items_per_order=1, customers=5000, seed=42, batch_size=10_000):
+    """
+    ``count`` órdenes repartidas en los últimos ``days`` días, con
+    ``items_per_order`` ítems cada una, de ``customers`` clientes distintos
+    (sin señales: el resumen de ventas se arma después con ``sales.rebuild``)
+    """
+    from django.utils import timezone
+
+    from .models import Order, OrderItem, Product
+
+    rng = random.Random(seed)
+    if Product.objects.count() < items_per_order:
+        make_products(max(200, items_per_order))
+    products = list(Product.objects.values_list('id', 'price'))
+    now = timezone.now()
+    with backdated_orders():
+        for offset in range(0, count, batch_size):
+            size = min(batch_size, count - offset)
+            lines = [
+                [(product_id, price, rng.randint(1, 3)) for product_id, price in rng.sample(products, items_per_order)]
+                for _ in range(size)
+            ]
+            orders = Order.objects.bulk_create([
+                Order(
+                    first_name='Ana', last_name='Gómez', email=f'cliente{i % customers}@example.com',
+                    address='Av. Siempre Viva 742', city='CABA', phone='1122334455',
+                    total=sum(price * quantity for _, price, quantity in order_lines),
+                    status=rng.choice(ORDER_STATUSES),
+                    created_at=now - timedelta(seconds=rng.randint(0, days * 86400)),
+                )
+                for i, order_lines in enumerate(lines, offset)
+            ])
+            OrderItem.objects.bulk_create([
+                OrderItem(order=order, product_id=product_id, quantity=quantity, price=price)
+                for order, order_lines in zip(orders, lines)
+                for product_id, price, quantity in order_lines
+            ])
+
+
+def measure(func, repeat=20, warmup=2):
+    """Ejecuta ``func`` varias veces y devuelve estadísticas en milisegundos"""
+    for _ in range(warmup):
+        func()
+
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return summarize(samples)
+
+
+def summarize(samples):
+    """Estadísticas de una lista de tiempos en milisegundos"""
+    samples = sorted(samples)
+    return {
+        'mean': statistics.fmean(samples),
+        'p50': samples[len(samples) // 2],
+        'p95': samples[min(len(samples) - 1, int(len(samples) * 0.95))],
+        'p99': samples[min(len(samples) - 1, int(len(samples) * 0.99))],
+        'min': samples[0],
+    }
+
+
+def format_stats(label, stats):
+    """Formatea una fila de resultados"""
+    return (
+        f"{label:<34} media {stats['mean']:9.3f} ms | p50 {stats['p50']:9.3f} ms | "
+        f"p95 {stats['p95']:9.3f} ms"
+    )
@@ -1,14 +1,25 @@
 from decimal import Decimal
-from django.conf import settings
+from .cart_storage import get_cart_storage
 from .models import Product
 
+# Campos que usan las vistas y templates del carrito (nombre, stock, imagen)
+CART_PRODUCT_FIELDS = ('id', 'name', 'price', 'stock', 'available', 'image', 'image_derivatives')
+
+
 class Cart:
     def __init__(self, request):
         self.session = request.session
-        cart = self.session.get(settings.CART_SESSION_ID)
-        if not cart:
-            cart = self.session[settings.CART_SESSION_ID] = {}
-        self.cart = cart
+        # Productos ya cargados en este request, compartidos por todos los Cart
+        products = getattr(request, '_cart_products', None)
+        if products is None:
+            products = request._cart_products = {}
+        self.products = products
+        # Sesión, caché o tabla CartLine según CART_STORAGE (ver cart_storage.py)
+        self.storage = get_cart_storage(request)
+
+    @property
+    def cart(self):
+        return self.storage.lines
 
     def add(self, product, quantity=1, update_quantity=False):
         product_id = str(product.id)
@@ -33,30 +44,84 @@ class Cart:
             else:
                 self.cart[product_id]['quantity'] = product.stock
         
-        self.save()
+        self.storage.write(changed=[product_id])
 
     def save(self):
-        self.session[settings.CART_SESSION_ID] = self.cart
-        self.session.modified = True
+        """Persiste todas las líneas"""
+        self.storage.write(changed=list(self.cart))
 
     def remove(self, product):
         product_id = str(product.id)
         if product_id in self.cart:
             del self.cart[product_id]
-            self.save()
+            self.storage.write(removed=[product_id])
 
-    def __iter__(self):
-        product_ids = self.cart.keys()
-        products = Product.objects.filter(id__in=product_ids)
-        cart = self.cart.copy()
-        
-        for product in products:
-            cart[str(product.id)]['product'] = product
+    def apply(self, operations):
+        """
+        Aplica varias operaciones ``(op, product_id, quantity)`` con ``op`` en
+        ``set``, ``add`` o ``remove`` y guarda todo con una sola escritura.
+
+        Los productos se validan con una sola consulta; las cantidades se
+        ajustan al stock como en ``add``. Devuelve ``(changed, removed, errors)``.
+        """
+        products = self.load_products(str(product_id) for _, product_id, _ in operations)
+        before = set(self.cart)
+        touched, errors = set(), []
 
-        for item in cart.values():
-            item['price'] = Decimal(item['price'])
-            item['total_price'] = item['price'] * item['quantity']
-            yield item
+        for op, product_id, quantity in operations:
+            product_id = str(product_id)
+            product = products.get(product_id)
+            if op == 'remove':
+                self.cart.pop(product_id, None)
+                touched.add(product_id)
+                continue
+            if product is None or (product_id not in self.cart and not product.is_in_stock()):
+                errors.append({'product_id': product_id, 'message': 'Producto no disponible'})
+                continue
+
+            line = self.cart.setdefault(product_id, {'quantity': 0, 'price': str(product.price)})
+            wanted = quantity if op == 'set' else line['quantity'] + quantity
+            if wanted > product.stock:
+                errors.append({
+                    'product_id': product_id,
+                    'message': f'Stock máximo: {product.stock} unidades',
+                })
+            line['quantity'] = min(wanted, product.stock)
+            if line['quantity'] <= 0:
+                del self.cart[product_id]
+            touched.add(product_id)
+
+        changed = sorted(touched & set(self.cart))
+        removed = sorted(touched & before - set(self.cart))
+        if changed or removed:
+            self.storage.write(changed=changed, removed=removed)
+        return changed, removed, errors
+
+    def load_products(self, product_ids=None):
+        """Carga en una sola consulta los productos que faltan en el request"""
+        if product_ids is None:
+            product_ids = self.cart
+        missing = {product_id for product_id in product_ids if product_id not in self.products}
+        if missing:
+            self.products.update(dict.fromkeys(missing))
+            for product in Product.objects.filter(id__in=missing).only(*CART_PRODUCT_FIELDS):
+                self.products[str(product.id)] = product
+        return self.products
+
+    def __iter__(self):
+        products = self.load_products()
+        # Copias por línea: la sesión guarda solo cantidad y precio
+        for product_id, item in list(self.cart.items()):
+            product = products[product_id]
+            if product is None:  # el producto se borró después de agregarlo
+                continue
+            price = Decimal(item['price'])
+            yield {
+                **item,
+                'product': product,
+                'price': price,
+                'total_price': price * item['quantity'],
+            }
 
     def __len__(self):
         return sum(item['quantity'] for item in self.cart.values())
@@ -65,8 +130,7 @@ class Cart:
         return sum(Decimal(item['price']) * item['quantity'] for item in self.cart.values())
 
     def clear(self):
-        del self.session[settings.CART_SESSION_ID]
-        self.session.modified = True
+        self.storage.clear()
 
     def get_available_quantity(self, product):
         """Obtener la cantidad máxima que se puede agregar considerando el stock"""
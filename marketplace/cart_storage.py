@@ -0,0 +1,172 @@
+# === cart_storage.py - Dónde se guardan las líneas del carrito ===
+"""
+Backends de almacenamiento para ``Cart``. Se elige con ``CART_STORAGE``::
+
+    CART_STORAGE = 'marketplace.cart_storage.SessionCartStorage'   # por defecto
+    CART_STORAGE = 'marketplace.cart_storage.CacheCartStorage'
+    CART_STORAGE = 'marketplace.cart_storage.DatabaseCartStorage'
+
+Todos exponen las líneas como ``{product_id: {'quantity': int, 'price': str}}``
+(el mismo formato que se guardaba en la sesión) y reciben solo las líneas que
+cambiaron en cada operación:
+
+- ``SessionCartStorage``: el carrito vive en la sesión; cada cambio marca la
+  sesión como modificada y el middleware reescribe la fila completa.
+- ``CacheCartStorage``: el carrito es una clave propia en la caché; la sesión
+  no se toca después de crear el token.
+- ``DatabaseCartStorage``: una fila de ``CartLine`` por producto; cada cambio
+  es un upsert o un delete de esa fila.
+
+Los dos últimos identifican el carrito con un token guardado en la sesión,
+que se crea en la primera escritura (leer un carrito vacío no escribe nada).
+"""
+
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+OWNER_SESSION_KEY = 'cart_owner'
+
+
+def get_cart_storage(request):
+    """Backend configurado, uno por request (lo comparten todos los ``Cart``)"""
+    storage = getattr(request, '_cart_storage', None)
+    if storage is None:
+        backend = import_string(getattr(
+            settings, 'CART_STORAGE', 'marketplace.cart_storage.SessionCartStorage'
+        ))
+        storage = request._cart_storage = backend(request)
+    return storage
+
+
+class BaseCartStorage:
+    """Interfaz común: ``load``, ``write`` y ``clear``"""
+
+    def __init__(self, request):
+        self.request = request
+        self.session = request.session
+        self._lines = None
+
+    @property
+    def lines(self):
+        if self._lines is None:
+            self._lines = self.load()
+        return self._lines
+
+    def load(self):
+        """Lee las líneas del carrito"""
+        raise NotImplementedError
+
+    def write(self, changed=(), removed=()):
+        """Persiste las líneas ``changed`` (ids) y borra las ``removed``"""
+        raise NotImplementedError
+
+    def clear(self):
+        """Vacía el carrito"""
+        raise NotImplementedError
+
+
+class SessionCartStorage(BaseCartStorage):
+    """El carrito dentro de la sesión de Django (comportamiento original)"""
+
+    def load(self):
+        return self.session.get(settings.CART_SESSION_ID) or {}
+
+    def write(self, changed=(), removed=()):
+        self.session[settings.CART_SESSION_ID] = self.lines
+        self.session.modified = True
+
+    def clear(self):
+        self.session.pop(settings.CART_SESSION_ID, None)
+        self.session.modified = True
+        self._lines = {}
+
+
+class OwnerCartStorage(BaseCartStorage):
+    """Base de los backends que guardan el carrito fuera de la sesión"""
+
+    def get_owner(self, create=False):
+        owner = self.session.get(OWNER_SESSION_KEY)
+        if owner is None and create:
+            # Única escritura en la sesión: después solo se lee el token
+            owner = self.session[OWNER_SESSION_KEY] = uuid.uuid4().hex
+        return owner
+
+
+class CacheCartStorage(OwnerCartStorage):
+    """
+    El carrito como una clave de la caché (Redis/Memcached en producción).
+    Se reescribe el dict del carrito, no la sesión completa.
+    """
+
+    def key(self, owner):
+        return f'cart:{owner}'
+
+    @property
+    def timeout(self):
+        return getattr(settings, 'CART_CACHE_TIMEOUT', settings.SESSION_COOKIE_AGE)
+
+    def load(self):
+        owner = self.get_owner()
+        return (cache.get(self.key(owner)) or {}) if owner else {}
+
+    def write(self, changed=(), removed=()):
+        cache.set(self.key(self.get_owner(create=True)), self.lines, self.timeout)
+
+    def clear(self):
+        owner = self.get_owner()
+        if owner:
+            cache.delete(self.key(owner))
+        self._lines = {}
+
+
+class DatabaseCartStorage(OwnerCartStorage):
+    """Una fila de ``CartLine`` por producto, con upsert por línea"""
+
+    def load(self):
+        from .models import CartLine
+
+        owner = self.get_owner()
+        if not owner:
+            return {}
+        return {
+            str(product_id): {'quantity': quantity, 'price': str(price)}
+            for product_id, quantity, price in CartLine.objects.filter(owner=owner).order_by('id')
+            .values_list('product_id', 'quantity', 'price')
+        }
+
+    def write(self, changed=(), removed=()):
+        from .models import CartLine
+
+        owner = self.get_owner(create=True)
+        lines = self.lines
+        with transaction.atomic():
+            if removed:
+                CartLine.objects.filter(owner=owner, product_id__in=[int(pid) for pid in removed]).delete()
+            if changed:
+                # bulk_create con update_conflicts: un INSERT ... ON CONFLICT DO UPDATE
+                CartLine.objects.bulk_create(
+                    [
+                        CartLine(
+                            owner=owner,
+                            product_id=int(pid),
+                            quantity=lines[pid]['quantity'],
+                            price=lines[pid]['price'],
+                        )
+                        for pid in changed
+                    ],
+                    update_conflicts=True,
+                    unique_fields=['owner', 'product'],
+                    update_fields=['quantity', 'price', 'updated_at'],
+                )
+
+    def clear(self):
+        from .models import CartLine
+
+        owner = self.get_owner()
+        if owner:
+            CartLine.objects.filter(owner=owner).delete()
+        self._lines = {}
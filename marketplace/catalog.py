@@ -0,0 +1,50 @@
+# === catalog.py - Versión global del catálogo ===
+"""
+La versión del catálogo es la fila ``CatalogVersion`` de la base: se
+incrementa cada vez que un ``Product`` se guarda o se elimina (ver
+``signals.py``) y con cada cambio de stock de las reservas. Con una caché
+local por worker es la única versión que ven todos los workers.
+
+Todo lo que se cachea a partir del catálogo incluye la versión en la clave
+(conteos de facetas, grillas de ``fragment_cache.py``, validadores de
+``conditional.py``), así un cambio invalida todo de una sola vez sin tener
+que borrar claves. El snapshot en memoria (``snapshot.py``) la consulta
+para saber cuándo recargarse.
+"""
+
+import hashlib
+
+from django.db.models import F
+from django.utils import timezone
+
+COUNT_TIMEOUT = 300
+
+
+def bump_catalog_version(using='default'):
+    """Invalida todo lo cacheado a partir del catálogo"""
+    bump_db_catalog_version(using)
+
+
+def get_db_catalog_version(using='default'):
+    """Versión guardada en la base (una consulta por clave primaria)"""
+    from .models import CatalogVersion
+
+    version = CatalogVersion.objects.using(using).filter(pk=1).values_list('version', flat=True).first()
+    return version or 0
+
+
+def bump_db_catalog_version(using='default'):
+    from .models import CatalogVersion
+
+    updated = CatalogVersion.objects.using(using).filter(pk=1).update(
+        version=F('version') + 1, updated_at=timezone.now()
+    )
+    if not updated:
+        CatalogVersion.objects.using(using).get_or_create(pk=1, defaults={'version': 2})
+
+
+def catalog_cache_key(prefix, *parts):
+    """Clave de caché versionada con el catálogo actual (la de la base)"""
+    digest = hashlib.md5('|'.join(str(part) for part in parts).encode()).hexdigest()
+    return f'catalog:{prefix}:v{get_db_catalog_version()}:{digest}'
+
@@ -0,0 +1,151 @@
+# === conditional.py - GET condicional (ETag / Last-Modified) ===
+"""
+Validadores para las páginas del catálogo y los endpoints JSON.
+
+- Detalle: ``updated_at`` del producto.
+- Listados y autocompletado: la fila de ``CatalogVersion`` (una consulta
+  por clave primaria), que suben las señales de ``Product`` y cada cambio
+  de stock de las reservas. El índice de autocompletado se reconstruye
+  antes si se armó con otra versión.
+
+Las páginas también muestran partes personales (usuario, panel del carrito,
+token CSRF), así que el ETag incluye ese estado. ``Last-Modified`` solo se
+envía a visitantes anónimos con el carrito vacío, porque una fecha no
+refleja cambios en el carrito. Con mensajes pendientes o sin cookie CSRF no
+se envían validadores y la respuesta siempre se renderiza.
+"""
+
+import functools
+import hashlib
+import json
+
+from django.contrib import messages
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+
+from .autocomplete import autocomplete_index
+from .cart_storage import get_cart_storage
+from .models import CatalogVersion, Product
+
+_UNSET = object()
+
+
+# =============================================================================
+# SELLOS DEL CATÁLOGO
+# =============================================================================
+
+def catalog_stamp(request, *args, **kwargs):
+    """(última modificación, versión) del catálogo"""
+    return CatalogVersion.objects.filter(pk=1).values_list('updated_at', 'version').first() or (None, 0)
+
+
+def autocomplete_stamp(request, *args, **kwargs):
+    """
+    Sello del catálogo; antes el índice de este worker se pone al día con
+    esa versión, así el cuerpo nunca es más viejo que el ETag.
+    """
+    stamp = catalog_stamp(request)
+    autocomplete_index.ensure_built(stamp[1])
+    return stamp
+
+
+def product_stamp(request, product_id, *args, **kwargs):
+    """(última modificación,) de un producto disponible, o None si no existe"""
+    updated_at = (
+        Product.objects.filter(id=product_id, available=True)
+        .values_list('updated_at', flat=True)
+        .first()
+    )
+    return None if updated_at is None else (updated_at,)
+
+
+# =============================================================================
+# ESTADO PERSONAL
+# =============================================================================
+
+def personal_state(request):
+    """
+    Lo que cambia la página para este visitante, o None si no se puede
+    validar (mensajes pendientes o primera visita sin cookie CSRF).
+    """
+    if len(messages.get_messages(request)):
+        return None
+
+    state = []
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        state.append(('user', user.pk, user.get_username()))
+
+    # Del backend configurado (sesión, caché o base): el mismo que usa el Cart
+    cart = get_cart_storage(request).lines
+    if cart:
+        state.append(('cart', json.dumps(cart, sort_keys=True)))
+        # El panel muestra nombre e imagen de productos que no son los de la página
+        state.append(('catalog', catalog_stamp(request)))
+
+    # Sin cookie CSRF la página crea un token nuevo: no se puede reutilizar
+    csrf_cookie = request.META.get('CSRF_COOKIE')
+    if not csrf_cookie:
+        return None
+    state.append(('csrf', csrf_cookie))
+    return tuple(state)
+
+
+def _is_personalized(state):
+    return any(part[0] in ('user', 'cart') for part in state)
+
+
+# =============================================================================
+# DECORADOR
+# =============================================================================
+
+def _validators(request, stamp_func, args, kwargs, personalized):
+    # etag_func y last_modified_func comparten el resultado en el request
+    cached = getattr(request, '_catalog_validators', _UNSET)
+    if cached is not _UNSET:
+        return cached
+
+    result = None
+    state = personal_state(request) if personalized else ()
+    if state is not None:
+        stamp = stamp_func(request, *args, **kwargs)
+        if stamp is not None:
+            digest = hashlib.md5(repr((stamp, state)).encode()).hexdigest()
+            last_modified = None if _is_personalized(state) else stamp[0]
+            result = (digest, last_modified)
+
+    request._catalog_validators = result
+    return result
+
+
+def catalog_condition(stamp_func=catalog_stamp, personalized=True):
+    """
+    Como ``@condition`` de Django: responde 304 sin ejecutar la vista si el
+    catálogo (y el estado personal) no cambió desde la última visita.
+
+    ``personalized=False`` para endpoints que no dependen del visitante.
+    """
+    def etag_func(request, *args, **kwargs):
+        validators = _validators(request, stamp_func, args, kwargs, personalized)
+        return validators[0] if validators else None
+
+    def last_modified_func(request, *args, **kwargs):
+        validators = _validators(request, stamp_func, args, kwargs, personalized)
+        return validators[1] if validators else None
+
+    def decorator(view):
+        conditional_view = condition(etag_func=etag_func, last_modified_func=last_modified_func)(view)
+
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            response = conditional_view(request, *args, **kwargs)
+            # El navegador guarda la copia pero revalida en cada visita
+            if response.has_header('ETag'):
+                patch_cache_control(response, private=True, no_cache=True)
+            return response
+
+        return wrapper
+
+    return decorator
@@ -1,9 +1,22 @@
+from django.utils.functional import SimpleLazyObject
+
 from .cart import Cart
 
+
 def cart_context(request):
-    cart = Cart(request)
-    return {
-        'cart': cart,
-        'cart_total_items': len(cart),
-        'cart_total_price': cart.get_total_price(),
-    }
\ No newline at end of file
+    """
+    Carrito para los templates.
+
+    Los valores son perezosos: el ``Cart``, la cantidad y el total se calculan
+    solo si el template los lee (el admin o los fragmentos JSON no los usan),
+    y una sola vez por request aunque se rendericen varios templates.
+    """
+    context = getattr(request, '_cart_context', None)
+    if context is None:
+        cart = SimpleLazyObject(lambda: Cart(request))
+        context = request._cart_context = {
+            'cart': cart,
+            'cart_total_items': SimpleLazyObject(lambda: len(cart)),
+            'cart_total_price': SimpleLazyObject(lambda: cart.get_total_price()),
+        }
+    return context
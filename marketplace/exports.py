@@ -0,0 +1,279 @@
+# === exports.py - Exportación de órdenes, ítems y productos ===
+"""
+Exporta tablas completas sin cargarlas en memoria::
+
+    python manage.py export_data items --format csv --since 2025-01-01 -o items.csv
+    python manage.py export_data orders --format parquet -o orders.parquet
+
+o desde el admin (acciones "Exportar ... CSV/JSONL" de Órdenes y Productos).
+
+Las filas salen de ``values_list().iterator(chunk_size=...)``: en PostgreSQL
+es un cursor del lado del servidor, en SQLite se leen de a ``chunk_size``.
+CSV y JSONL se generan de a bloques de ~64 KiB para ``StreamingHttpResponse``
+o un archivo, con memoria constante. Parquet se escribe por grupos de filas
+con ``ParquetWriter``; es opcional porque ``pyarrow`` no está en
+``requirements.txt``, y sin él el formato queda deshabilitado.
+"""
+
+import csv
+import importlib.util
+import json
+
+from django.conf import settings
+from django.db import models
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+from .models import Order, OrderItem, Product
+
+CHUNK_SIZE = 2000
+BUFFER_BYTES = 64 * 1024
+PARQUET_ROW_GROUP = 100_000
+
+FORMATS = {
+    'csv': ('text/csv; charset=utf-8', 'csv'),
+    'jsonl': ('application/x-ndjson', 'jsonl'),
+}
+
+PARQUET_AVAILABLE = importlib.util.find_spec('pyarrow') is not None
+PARQUET_MISSING = 'Para exportar a Parquet hace falta instalar pyarrow (pip install pyarrow)'
+
+# Columnas de cada exportación: (encabezado, lookup del ORM)
+DATASETS = {
+    'orders': (Order, [
+        ('id', 'id'),
+        ('created_at', 'created_at'),
+        ('status', 'status'),
+        ('total', 'total'),
+        ('first_name', 'first_name'),
+        ('last_name', 'last_name'),
+        ('email', 'email'),
+        ('phone', 'phone'),
+        ('address', 'address'),
+        ('city', 'city'),
+        ('user_id', 'user_id'),
+        ('mercadopago_id', 'mercadopago_id'),
+        ('external_reference', 'external_reference'),
+    ]),
+    'items': (OrderItem, [
+        ('id', 'id'),
+        ('order_id', 'order_id'),
+        ('order_created_at', 'order__created_at'),
+        ('order_status', 'order__status'),
+        ('product_id', 'product_id'),
+        ('product_name', 'product__name'),
+        ('category', 'product__category'),
+        ('quantity', 'quantity'),
+        ('price', 'price'),
+    ]),
+    'products': (Product, [
+        ('id', 'id'),
+        ('name', 'name'),
+        ('category', 'category'),
+        ('price', 'price'),
+        ('stock', 'stock'),
+        ('available', 'available'),
+        ('created_at', 'created_at'),
+        ('updated_at', 'updated_at'),
+    ]),
+}
+
+
+def file_formats():
+    """Formatos que se pueden escribir a archivo en esta instalación"""
+    return list(FORMATS) + (['parquet'] if PARQUET_AVAILABLE else [])
+
+
+def export_queryset(dataset, queryset=None):
+    """Queryset base de ``dataset`` (o ``queryset`` filtrado) en orden estable"""
+    model, _ = DATASETS[dataset]
+    if queryset is None:
+        queryset = model.objects.all()
+    return queryset.order_by('pk')
+
+
+def iter_rows(dataset, queryset=None, chunk_size=CHUNK_SIZE):
+    """Tuplas de ``dataset`` leídas de a ``chunk_size``"""
+    _, columns = DATASETS[dataset]
+    lookups = [lookup for _, lookup in columns]
+    return export_queryset(dataset, queryset).values_list(*lookups).iterator(chunk_size=chunk_size)
+
+
+def _field(model, lookup):
+    """Campo del modelo al que apunta ``lookup`` (sigue las relaciones)"""
+    *relations, name = lookup.split('__')
+    for relation in relations:
+        model = model._meta.get_field(relation).related_model
+    return model._meta.get_field(name)
+
+
+def converters(dataset, decimals=True):
+    """
+    Conversión de cada columna, resuelta una vez por exportación y no por
+    valor: fechas en ISO 8601 con la hora local, Decimal como texto exacto.
+    ``None`` donde el valor sale tal cual.
+    """
+    model, columns = DATASETS[dataset]
+    tz = timezone.get_current_timezone()
+
+    def local_iso(value):
+        return value.astimezone(tz).isoformat() if value is not None else None
+
+    def plain(field):
+        if isinstance(field, models.DateTimeField):
+            return local_iso
+        if isinstance(field, models.DateField):
+            return lambda value: value.isoformat() if value is not None else None
+        if decimals and isinstance(field, models.DecimalField):
+            return lambda value: str(value) if value is not None else None
+        return None
+
+    return [plain(_field(model, lookup)) for _, lookup in columns]
+
+
+def _convert(rows, convert):
+    """Aplica ``convert`` solo a las columnas que lo necesitan"""
+    pending = [(i, func) for i, func in enumerate(convert) if func]
+    for row in rows:
+        row = list(row)
+        for i, func in pending:
+            row[i] = func(row[i])
+        yield row
+
+
+# =============================================================================
+# CSV / JSONL
+# =============================================================================
+
+class _Buffer(list):
+    """Destino de ``csv.writer`` que junta las líneas en memoria"""
+
+    def write(self, value):
+        self.append(value)
+
+
+def _buffered(lines):
+    """Junta líneas en bloques de ~``BUFFER_BYTES`` (menos writes y chunks HTTP)"""
+    block, size = [], 0
+    for line in lines:
+        block.append(line)
+        size += len(line)
+        if size >= BUFFER_BYTES:
+            yield ''.join(block).encode('utf-8')
+            block, size = [], 0
+    if block:
+        yield ''.join(block).encode('utf-8')
+
+
+def csv_lines(dataset, rows):
+    _, columns = DATASETS[dataset]
+    buffer = _Buffer()
+    writer = csv.writer(buffer)
+    # BOM: Excel abre el CSV como UTF-8
+    buffer.append('\ufeff')
+    writer.writerow([header for header, _ in columns])
+    # csv escribe Decimal con str(): solo hace falta convertir las fechas
+    for row in _convert(rows, converters(dataset, decimals=False)):
+        writer.writerow(row)
+        yield from buffer
+        buffer.clear()
+    yield from buffer
+
+
+def jsonl_lines(dataset, rows):
+    _, columns = DATASETS[dataset]
+    headers = [header for header, _ in columns]
+    dumps = json.JSONEncoder(ensure_ascii=False, separators=(',', ':')).encode
+    for row in _convert(rows, converters(dataset)):
+        yield dumps(dict(zip(headers, row))) + '\n'
+
+
+def stream_export(dataset, fmt, queryset=None, chunk_size=CHUNK_SIZE):
+    """Bloques de bytes del archivo exportado (``fmt``: csv o jsonl)"""
+    rows = iter_rows(dataset, queryset, chunk_size)
+    lines = csv_lines(dataset, rows) if fmt == 'csv' else jsonl_lines(dataset, rows)
+    yield from _buffered(lines)
+
+
+def export_filename(dataset, extension):
+    return f'masivotech-{dataset}-{timezone.localtime():%Y%m%d-%H%M}.{extension}'
+
+
+def export_response(dataset, fmt, queryset=None):
+    """``StreamingHttpResponse`` con la descarga"""
+    content_type, extension = FORMATS[fmt]
+    response = StreamingHttpResponse(stream_export(dataset, fmt, queryset), content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{export_filename(dataset, extension)}"'
+    return response
+
+
+# =============================================================================
+# PARQUET
+# =============================================================================
+
+def _parquet_type(pa, field):
+    """Tipo de pyarrow de la columna (las FK con el tipo de la clave apuntada)"""
+    if isinstance(field, models.ForeignKey):
+        field = field.target_field
+    if isinstance(field, models.BooleanField):
+        return pa.bool_()
+    if isinstance(field, (models.AutoField, models.BigAutoField, models.IntegerField)):
+        return pa.int64()
+    if isinstance(field, models.FloatField):
+        return pa.float64()
+    if isinstance(field, models.DecimalField):
+        return pa.decimal128(field.max_digits, field.decimal_places)
+    if isinstance(field, models.DateTimeField):
+        return pa.timestamp('us', tz='UTC' if settings.USE_TZ else None)
+    if isinstance(field, models.DateField):
+        return pa.date32()
+    return pa.string()
+
+
+def parquet_schema(dataset, pa):
+    """
+    Esquema fijo a partir de los campos del modelo: si se infiriera del
+    primer grupo, una columna toda ``None`` (``user_id`` de invitados)
+    quedaría de tipo ``null`` y los grupos siguientes fallarían.
+    """
+    model, columns = DATASETS[dataset]
+    return pa.schema([(header, _parquet_type(pa, _field(model, lookup))) for header, lookup in columns])
+
+
+def write_parquet(dataset, path, queryset=None, chunk_size=CHUNK_SIZE, row_group=PARQUET_ROW_GROUP):
+    """
+    Escribe ``dataset`` en Parquet por grupos de ``row_group`` filas.
+    Devuelve cuántas filas escribió. Requiere ``pyarrow``.
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError(PARQUET_MISSING)
+
+    schema = parquet_schema(dataset, pa)
+    written = 0
+    writer = None
+    batch = []
+
+    def flush():
+        nonlocal writer
+        table = pa.Table.from_pylist([dict(zip(schema.names, row)) for row in batch], schema=schema)
+        if writer is None:
+            writer = pq.ParquetWriter(path, schema, compression='snappy')
+        writer.write_table(table)
+        batch.clear()
+
+    try:
+        for row in iter_rows(dataset, queryset, chunk_size):
+            batch.append(row)
+            if len(batch) >= row_group:
+                written += len(batch)
+                flush()
+        if batch or writer is None:
+            written += len(batch)
+            flush()
+    finally:
+        if writer is not None:
+            writer.close()
+    return written
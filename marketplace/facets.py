@@ -0,0 +1,154 @@
+# === facets.py - Conteos por categoría, rango de precio y stock ===
+"""
+Motor de facetas para ``product_list``.
+
+Todos los conteos salen de un único ``aggregate()`` con ``Count(filter=...)``
+sobre la búsqueda actual. Cada faceta cuenta aplicando las selecciones de las
+*otras* facetas (no la propia), así el usuario ve cuántos productos tendría
+al cambiar de opción. El resultado se cachea con la versión del catálogo.
+"""
+
+from django.core.cache import cache
+from django.db.models import Count, Q
+
+from .catalog import COUNT_TIMEOUT, catalog_cache_key
+from .models import Product
+from .search import normalize
+
+# (clave, etiqueta, mínimo, máximo) - mínimo incluido, máximo excluido
+PRICE_BANDS = [
+    ('hasta-25000', 'Hasta $25.000', None, 25000),
+    ('25000-50000', '$25.000 a $50.000', 25000, 50000),
+    ('50000-100000', '$50.000 a $100.000', 50000, 100000),
+    ('100000-200000', '$100.000 a $200.000', 100000, 200000),
+    ('desde-200000', 'Más de $200.000', 200000, None),
+]
+
+# Mismos umbrales que Product.get_stock_status
+STOCK_STATUSES = [
+    ('en_stock', 'En stock', Q(stock__gte=5)),
+    ('poco_stock', 'Poco stock', Q(stock__gt=0, stock__lt=5)),
+    ('agotado', 'Agotado', Q(stock=0)),
+]
+
+FACET_PARAMS = ('category', 'price', 'stock')
+
+
+def _price_q(band):
+    _, _, low, high = band
+    q = Q()
+    if low is not None:
+        q &= Q(price__gte=low)
+    if high is not None:
+        q &= Q(price__lt=high)
+    return q
+
+
+FACET_OPTIONS = {
+    'category': [(value, label, Q(category=value)) for value, label in Product.CATEGORY_CHOICES],
+    'price': [(band[0], band[1], _price_q(band)) for band in PRICE_BANDS],
+    'stock': STOCK_STATUSES,
+}
+
+
+def price_band(price):
+    """Rango de precio de un valor (equivalente en Python de los filtros)"""
+    for value, _, low, high in PRICE_BANDS:
+        if (low is None or price >= low) and (high is None or price < high):
+            return value
+    return None
+
+
+def parse_selection(params):
+    """Facetas seleccionadas válidas a partir de request.GET"""
+    selection = {}
+    for facet in FACET_PARAMS:
+        value = params.get(facet, '')
+        if any(value == option[0] for option in FACET_OPTIONS[facet]):
+            selection[facet] = value
+    return selection
+
+
+def facet_q(facet, value):
+    for option_value, _, q in FACET_OPTIONS[facet]:
+        if option_value == value:
+            return q
+    return Q()
+
+
+def apply_facets(queryset, selection):
+    """Filtra por las facetas seleccionadas"""
+    condition = Q()
+    for facet, value in selection.items():
+        condition &= facet_q(facet, value)
+    return queryset.filter(condition)
+
+
+def compute_facets(queryset, selection, search_query=''):
+    """
+    Conteos de todas las facetas en una sola consulta.
+
+    ``queryset`` es la búsqueda actual *sin* filtros de facetas: los
+    productos disponibles filtrados por ``search_query``, que junto con
+    ``selection`` forma la clave de caché.
+    Devuelve ``{faceta: {valor: conteo}}``.
+    """
+    # Búsqueda sin términos (``queryset.none()``): no hay nada que contar
+    if queryset.query.is_empty():
+        return {facet: {value: 0 for value, _, _ in options} for facet, options in FACET_OPTIONS.items()}
+
+    key = catalog_cache_key('facets', ' '.join(normalize(search_query).split()), sorted(selection.items()))
+    counts = cache.get(key)
+    if counts is not None:
+        return counts
+
+    aggregates = {}
+    for facet, options in FACET_OPTIONS.items():
+        others = Q()
+        for other, value in selection.items():
+            if other != facet:
+                others &= facet_q(other, value)
+        for value, _, q in options:
+            aggregates[f'{facet}__{value}'] = Count('id', filter=q & others)
+
+    row = queryset.order_by().aggregate(**aggregates)
+    counts = {facet: {} for facet in FACET_OPTIONS}
+    for alias, count in row.items():
+        facet, value = alias.split('__', 1)
+        counts[facet][value] = count
+
+    cache.set(key, counts, COUNT_TIMEOUT)
+    return counts
+
+
+def result_count(counts, selection):
+    """Total de resultados con todas las facetas aplicadas (sin otro COUNT)"""
+    # Los estados de stock cubren todo el catálogo sin superponerse
+    stock_counts = counts['stock']
+    if 'stock' in selection:
+        return stock_counts.get(selection['stock'], 0)
+    return sum(stock_counts.values())
+
+
+def build_facets(counts, selection, params):
+    """Estructura para el template: etiqueta, conteo, selección y URL"""
+    facets = {}
+    for facet, options in FACET_OPTIONS.items():
+        entries = []
+        for value, label, _ in options:
+            query = params.copy()
+            query.pop('cursor', None)
+            query.pop('fragment', None)
+            if selection.get(facet) == value:
+                query.pop(facet, None)
+            else:
+                query[facet] = value
+            entries.append({
+                'value': value,
+                'label': label,
+                'count': counts[facet].get(value, 0),
+                'selected': selection.get(facet) == value,
+                'url': '?' + query.urlencode(),
+            })
+        facets[facet] = entries
+    return facets
@@ -0,0 +1,140 @@
+# === fake_mercadopago.py - Servidor falso de la API de MercadoPago ===
+"""
+Imita los endpoints que usa la tienda para medir y probar sin red::
+
+    python manage.py fake_mercadopago --port 8765 --latency 0.15
+    MERCADOPAGO_API_BASE_URL=http://127.0.0.1:8765 python manage.py runserver
+
+o desde código (tests, benchmarks)::
+
+    with FakeMercadoPago(latency=0.05) as fake:
+        with override_settings(MERCADOPAGO_API_BASE_URL=fake.url): ...
+        fake.stats['preferences']
+
+Endpoints: ``POST /checkout/preferences``, ``GET /checkout/preferences/<id>``
+y ``GET /v1/payments/<id>``. Respeta ``x-idempotency-key`` como la API real.
+Habla HTTP/1.1 con keep-alive y cuenta las conexiones nuevas, así se ve la
+diferencia entre abrir una sesión por pago o reutilizarla.
+"""
+
+import json
+import socket
+import threading
+import time
+import uuid
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeMercadoPagoHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        super().setup()
+        # Sin Nagle: con keep-alive los segmentos chicos esperarían el ACK retrasado
+        self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.server.count('connections')
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status, data):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def read_json(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        return json.loads(self.rfile.read(length) or b'{}')
+
+    def do_POST(self):
+        data = self.read_json()
+        time.sleep(self.server.latency)
+        if self.path.split('?')[0] != '/checkout/preferences':
+            return self.send_json(404, {'message': 'not found'})
+        if not self.headers.get('Authorization', '').startswith('Bearer '):
+            return self.send_json(401, {'message': 'unauthorized'})
+        if not data.get('items'):
+            return self.send_json(400, {'message': 'items required'})
+
+        key = self.headers.get('x-idempotency-key')
+        with self.server.lock:
+            preference = self.server.idempotency.get(key) if key else None
+            if preference is None:
+                preference_id = f'fake-{uuid.uuid4().hex[:12]}'
+                preference = {
+                    **data,
+                    'id': preference_id,
+                    'init_point': f'{self.server.url}/checkout/v1/redirect?pref_id={preference_id}',
+                    'sandbox_init_point': f'{self.server.url}/checkout/v1/redirect?pref_id={preference_id}',
+                }
+                self.server.preferences[preference_id] = preference
+                self.server.stats['preferences'] += 1
+                if key:
+                    self.server.idempotency[key] = preference
+        self.send_json(201, preference)
+
+    def do_GET(self):
+        time.sleep(self.server.latency)
+        path = self.path.split('?')[0]
+        if path.startswith('/checkout/preferences/'):
+            preference = self.server.preferences.get(path.rsplit('/', 1)[-1])
+            if preference:
+                return self.send_json(200, preference)
+        elif path.startswith('/v1/payments/'):
+            payment_id = path.rsplit('/', 1)[-1]
+            self.server.count('payment_lookups')
+            return self.send_json(200, self.server.payment(payment_id))
+        self.send_json(404, {'message': 'not found'})
+
+
+class FakeMercadoPago(ThreadingHTTPServer):
+    """Servidor en un hilo propio; ``port=0`` elige uno libre"""
+
+    daemon_threads = True
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0):
+        super().__init__((host, port), FakeMercadoPagoHandler)
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.stats = Counter()
+        self.preferences = {}
+        self.idempotency = {}
+        # Pagos conocidos: id -> dict (los demás se inventan como aprobados)
+        self.payments = {}
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def count(self, name):
+        with self.lock:
+            self.stats[name] += 1
+
+    def payment(self, payment_id):
+        return self.payments.get(payment_id) or {
+            'id': payment_id,
+            'status': 'approved',
+            'external_reference': None,
+            'transaction_amount': 0,
+        }
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -0,0 +1,125 @@
+# === fragment_cache.py - Caché de fragmentos para tarjetas y grillas ===
+"""
+Caché de HTML renderizado para las tarjetas de producto y las grillas de
+``index``, ``ofertas`` y ``product_list``.
+
+- Tarjetas: la clave lleva el ``id`` y el ``updated_at`` del producto, así
+  una edición en el admin invalida solo la tarjeta de ese producto.
+- Grillas: la clave lleva la versión del catálogo en la base
+  (``CatalogVersion``, una consulta por clave primaria), que se incrementa
+  con las señales de ``Product`` y los cambios de stock. La de la caché no
+  sirve: con LocMem cada worker tiene la suya.
+
+Los contadores de aciertos, fallos e invalidaciones se acumulan por proceso
+y se vuelcan a la caché compartida cada ``FLUSH_EVERY`` eventos, para no
+sumar una escritura a la caché por cada tarjeta renderizada.
+"""
+
+import hashlib
+import threading
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .catalog import get_db_catalog_version
+
+FRAGMENT_TIMEOUT = getattr(settings, 'FRAGMENT_CACHE_TIMEOUT', 3600)
+
+STATS = ('hits', 'misses', 'invalidations')
+STATS_KEY = 'fragments:stats:{}'
+FLUSH_EVERY = 50
+
+
+# =============================================================================
+# CONTADORES
+# =============================================================================
+
+class FragmentStats:
+    """Contadores por proceso que se vuelcan a la caché compartida"""
+
+    def __init__(self, flush_every=FLUSH_EVERY):
+        self.flush_every = flush_every
+        self._pending = Counter()
+        self._lock = threading.Lock()
+
+    def record(self, name, count=1):
+        with self._lock:
+            self._pending[name] += count
+            if sum(self._pending.values()) < self.flush_every:
+                return
+            pending, self._pending = self._pending, Counter()
+        self._flush(pending)
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, Counter()
+        self._flush(pending)
+
+    def _flush(self, pending):
+        for name, count in pending.items():
+            key = STATS_KEY.format(name)
+            # add() crea el contador si no existe; incr() es atómico en memcached/redis
+            if not cache.add(key, count, timeout=None):
+                try:
+                    cache.incr(key, count)
+                except ValueError:
+                    cache.set(key, count, timeout=None)
+
+    def snapshot(self):
+        """Totales de todos los procesos (incluye lo pendiente de este)"""
+        self.flush()
+        values = cache.get_many([STATS_KEY.format(name) for name in STATS])
+        totals = {name: values.get(STATS_KEY.format(name), 0) for name in STATS}
+        lookups = totals['hits'] + totals['misses']
+        totals['hit_rate'] = round(totals['hits'] / lookups, 4) if lookups else None
+        return totals
+
+    def reset(self):
+        with self._lock:
+            self._pending = Counter()
+        cache.delete_many([STATS_KEY.format(name) for name in STATS])
+
+
+fragment_stats = FragmentStats()
+
+
+def fragment_cache_stats():
+    """Aciertos, fallos, invalidaciones y tasa de aciertos"""
+    return fragment_stats.snapshot()
+
+
+def record_invalidation():
+    """Se llama desde las señales cuando cambia un producto"""
+    fragment_stats.record('invalidations')
+
+
+# =============================================================================
+# CLAVES Y RENDER
+# =============================================================================
+
+def _digest(parts):
+    return hashlib.md5('|'.join(str(part) for part in parts).encode()).hexdigest()
+
+
+def product_fragment_key(name, product, *vary_on):
+    """Clave de una tarjeta: cambia con cada edición del producto"""
+    updated_at = product.updated_at.timestamp() if product.updated_at else ''
+    return f'fragments:{name}:{product.pk}:{updated_at}:{_digest(vary_on)}'
+
+
+def catalog_fragment_key(name, *vary_on):
+    """Clave de una grilla: cambia con la versión del catálogo"""
+    return f'fragments:{name}:v{get_db_catalog_version()}:{_digest(vary_on)}'
+
+
+def get_or_render(key, render, timeout=FRAGMENT_TIMEOUT):
+    """HTML cacheado en ``key`` o el resultado de ``render()``"""
+    html = cache.get(key)
+    if html is not None:
+        fragment_stats.record('hits')
+        return html
+    fragment_stats.record('misses')
+    html = render()
+    cache.set(key, html, timeout)
+    return html
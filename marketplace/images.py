@@ -0,0 +1,238 @@
+# === images.py - Derivados de las imágenes de productos ===
+"""
+Pipeline de imágenes de ``Product``.
+
+Por cada imagen original se generan tres tamaños (thumb, card, detail) en
+WebP y JPEG, guardados junto al original::
+
+    products/mouse_razer.png
+    products/mouse_razer_png.card.webp
+    products/mouse_razer_png.card.jpg
+    ...
+
+El nombre lleva la extensión del original: ``foo.png`` y ``foo.jpg`` en la
+misma carpeta no se pisan los derivados.
+
+Los derivados conservan la proporción del original (caben en una caja
+cuadrada), así los tres tamaños sirven como candidatos de un mismo
+``srcset``. ``Product.image_derivatives`` guarda la versión del pipeline
+con la que se generaron; con 0 los helpers devuelven la imagen original.
+
+Al guardar un producto los derivados se generan en un hilo en segundo plano
+después del commit; ``build_image_derivatives`` completa los pendientes.
+"""
+
+import logging
+import posixpath
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connections, transaction
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+logger = logging.getLogger(__name__)
+
+# Subir la versión cuando cambian tamaños o calidad (backfill regenera todo)
+DERIVATIVES_VERSION = 2
+
+# Tamaño -> lado máximo en píxeles
+DERIVATIVE_SIZES = {
+    'thumb': 160,
+    'card': 480,
+    'detail': 1200,
+}
+
+# Formato -> (extensión, formato Pillow, opciones de guardado)
+DERIVATIVE_FORMATS = {
+    'webp': ('webp', 'WEBP', {'quality': 80, 'method': 4}),
+    'jpeg': ('jpg', 'JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+# Formato detectado por Pillow -> extensión del archivo original
+SOURCE_EXTENSIONS = {
+    'JPEG': 'jpg',
+    'PNG': 'png',
+    'WEBP': 'webp',
+    'GIF': 'gif',
+    'BMP': 'bmp',
+    'TIFF': 'tiff',
+    'AVIF': 'avif',
+}
+
+
+# =============================================================================
+# NOMBRES Y URLS
+# =============================================================================
+
+def derivative_name(name, size, fmt):
+    """``products/foo.png`` -> ``products/foo_png.card.webp``"""
+    root, ext = posixpath.splitext(name)
+    if ext:
+        root = f'{root}_{ext[1:].lower()}'
+    return f'{root}.{size}.{DERIVATIVE_FORMATS[fmt][0]}'
+
+
+def image_url(name, derivatives, size, fmt='jpeg', storage=default_storage):
+    """URL del derivado, o del original si todavía no se generaron"""
+    if not name:
+        return None
+    if derivatives < DERIVATIVES_VERSION:
+        return storage.url(name)
+    return storage.url(derivative_name(name, size, fmt))
+
+
+def image_srcset(name, derivatives, fmt='jpeg', storage=default_storage):
+    """``srcset`` con los tres tamaños (vacío si no hay derivados)"""
+    if not name or derivatives < DERIVATIVES_VERSION:
+        return ''
+    return ', '.join(
+        f'{storage.url(derivative_name(name, size, fmt))} {width}w'
+        for size, width in DERIVATIVE_SIZES.items()
+    )
+
+
+# =============================================================================
+# PROCESAMIENTO
+# =============================================================================
+
+def detect_image_extension(content):
+    """Extensión real de una imagen en bytes, o None si Pillow no la reconoce"""
+    try:
+        with Image.open(BytesIO(content)) as image:
+            return SOURCE_EXTENSIONS.get(image.format)
+    except (UnidentifiedImageError, OSError):
+        return None
+
+
+def _prepare(image, pil_format):
+    # JPEG no tiene transparencia: se aplana sobre fondo blanco
+    has_alpha = image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info)
+    if has_alpha:
+        image = image.convert('RGBA')
+        if pil_format == 'JPEG':
+            background = Image.new('RGB', image.size, (255, 255, 255))
+            background.paste(image, mask=image.getchannel('A'))
+            return background
+        return image
+    return image.convert('RGB') if image.mode != 'RGB' else image
+
+
+def generate_derivatives(name, storage=default_storage, overwrite=False):
+    """
+    Genera todos los derivados de ``name``. Devuelve los nombres guardados.
+
+    Sin ``overwrite`` los derivados que ya existen no se regeneran (varias
+    filas pueden compartir la misma imagen, p. ej. la imagen por defecto).
+    """
+    targets = [
+        (size, fmt, derivative_name(name, size, fmt))
+        for size in DERIVATIVE_SIZES
+        for fmt in DERIVATIVE_FORMATS
+    ]
+    if not overwrite:
+        targets = [target for target in targets if not storage.exists(target[2])]
+    if not targets:
+        return []
+
+    with storage.open(name, 'rb') as source:
+        original = Image.open(source)
+        original.load()
+    original = ImageOps.exif_transpose(original)
+
+    saved = []
+    # De mayor a menor: cada tamaño se reduce desde el anterior, más rápido
+    image = original
+    for size, max_side in sorted(DERIVATIVE_SIZES.items(), key=lambda item: -item[1]):
+        image = image.copy()
+        image.thumbnail((max_side, max_side), Image.Resampling.LANCZOS)
+        for fmt, (_, pil_format, options) in DERIVATIVE_FORMATS.items():
+            target = derivative_name(name, size, fmt)
+            if (size, fmt, target) not in targets:
+                continue
+            buffer = BytesIO()
+            _prepare(image, pil_format).save(buffer, pil_format, **options)
+            if storage.exists(target):
+                storage.delete(target)
+            saved.append(storage.save(target, ContentFile(buffer.getvalue())))
+    return saved
+
+
+def process_product_image(product, using='default'):
+    """
+    Se llama desde la señal ``post_save``: si la imagen cambió o sus derivados
+    están desactualizados, agenda la generación en segundo plano para después
+    del commit, así el guardado en el admin no espera a Pillow. Mientras
+    tanto se sirve el original; lo que no llegue a generarse (error, reinicio
+    del proceso) lo completa ``build_image_derivatives``.
+    """
+    from .models import Product
+
+    name = product.image.name if product.image else ''
+    if not name:
+        return False
+    # None: la instancia se cargó sin el campo imagen (no se sabe si cambió)
+    loaded_name = getattr(product, '_loaded_image_name', None)
+    image_changed = loaded_name is not None and loaded_name != name
+    if product.image_derivatives >= DERIVATIVES_VERSION and not image_changed:
+        return False
+
+    # Los derivados guardados son de la imagen anterior: hasta regenerarlos, el original
+    if image_changed and product.image_derivatives:
+        Product.objects.using(using).filter(pk=product.pk).update(image_derivatives=0)
+        product.image_derivatives = 0
+    product._loaded_image_name = name
+
+    storage = product.image.storage
+    transaction.on_commit(
+        lambda: run_in_background(build_product_image, product.pk, name, image_changed, storage, using),
+        using=using,
+    )
+    return True
+
+
+def build_product_image(product_id, name, overwrite=False, storage=default_storage, using='default'):
+    """Genera los derivados de un producto y lo marca con la versión del pipeline"""
+    from django.utils import timezone
+
+    from .catalog import bump_catalog_version
+    from .models import Product
+
+    try:
+        generate_derivatives(name, storage=storage, overwrite=overwrite)
+    except (OSError, UnidentifiedImageError, Image.DecompressionBombError):
+        logger.exception('No se pudieron generar los derivados de %s', name)
+        return False
+
+    # update() para no volver a disparar las señales; updated_at cambia para
+    # invalidar la tarjeta cacheada (ahora con srcset). Si la imagen volvió a
+    # cambiar en el medio, la fila no se toca: ya hay otra generación agendada
+    updated = Product.objects.using(using).filter(pk=product_id, image=name).update(
+        image_derivatives=DERIVATIVES_VERSION, updated_at=timezone.now()
+    )
+    if updated:
+        bump_catalog_version(using)
+    return bool(updated)
+
+
+# =============================================================================
+# SEGUNDO PLANO
+# =============================================================================
+
+# Un solo hilo por proceso: los derivados no compiten por CPU con las requests
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='image-derivatives')
+
+
+def run_in_background(func, *args):
+    """Ejecuta ``func`` en el hilo de derivados, con sus propias conexiones"""
+    def task():
+        try:
+            return func(*args)
+        except Exception:
+            logger.exception('Falló una tarea de derivados de imagen')
+        finally:
+            # Solo cierra las conexiones de este hilo
+            connections.close_all()
+
+    return _executor.submit(task)
@@ -0,0 +1,154 @@
+import statistics
+import time
+from collections import Counter, defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import F, Min, Sum
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from marketplace import analytics, sales
+from marketplace.benchmarks import benchmark_database, format_stats, make_orders, measure
+from marketplace.models import Order, OrderItem, Product
+from marketplace.sales import REVENUE_STATUSES
+
+
+# =============================================================================
+# MISMAS MÉTRICAS CON EL ORM (instancias, bucles y una consulta por semana)
+# =============================================================================
+
+def orm_metrics(start, end):
+    since, until = analytics.window_bounds(start, end)
+    window = Order.objects.filter(created_at__gte=since, created_at__lt=until, status__in=REVENUE_STATUSES)
+
+    top = list(OrderItem.objects.filter(order__in=window).values('product_id').annotate(
+        total_sold=Sum('quantity'), revenue=Sum(F('quantity') * F('price')),
+    ).order_by('-total_sold', '-revenue')[:analytics.TOP_PRODUCTS])
+
+    # Canastas: recorrer cada orden con sus ítems
+    units, totals = [], []
+    for order in window.prefetch_related('items'):
+        items = list(order.items.all())
+        units.append(sum(item.quantity for item in items))
+        totals.append(sum(item.quantity * item.price for item in items))
+    bins = Counter()
+    for count in units:
+        bins['11+' if count > 10 else '6-10' if count > 5 else str(count)] += 1
+
+    # Categorías: una consulta por semana y categoría
+    mix = {}
+    week = timezone.localtime(since).date()
+    week -= timedelta(days=week.weekday())
+    while week <= end:
+        for category, _ in Product.CATEGORY_CHOICES:
+            lower, upper = analytics.window_bounds(max(week, start), min(week + timedelta(days=6), end))
+            revenue = OrderItem.objects.filter(
+                order__in=window, order__created_at__gte=lower, order__created_at__lt=upper,
+                product__category=category,
+            ).aggregate(total=Sum(F('quantity') * F('price')))['total']
+            if revenue:
+                mix[(week, category)] = revenue
+        week += timedelta(days=7)
+
+    # Cohortes: primera compra de cada cliente (un GROUP BY) y recorrido en Python
+    first_purchase = {}
+    rows = Order.objects.filter(status__in=REVENUE_STATUSES).values('user_id', 'email').annotate(
+        first=Min('created_at')
+    ).order_by()
+    for row in rows:
+        key = f"u:{row['user_id']}" if row['user_id'] else f"e:{row['email'].lower()}"
+        first_purchase[key] = min(first_purchase.get(key, row['first']), row['first'])
+    orders_by_customer = defaultdict(list)
+    for user_id, email, created_at in window.values_list('user_id', 'email', 'created_at'):
+        key = f'u:{user_id}' if user_id else f'e:{email.lower()}'
+        orders_by_customer[key].append(timezone.localtime(created_at))
+    cohorts = defaultdict(lambda: defaultdict(set))
+    for key, dates in orders_by_customer.items():
+        first = timezone.localtime(first_purchase[key])
+        if first < since:
+            continue
+        for day in dates:
+            cohorts[(first.year, first.month)][(day.year - first.year) * 12 + day.month - first.month].add(key)
+
+    return {
+        'top': [(row['total_sold'], row['revenue']) for row in top],
+        'bins': [bins[label] for label in analytics.BASKET_LABELS],
+        'median_ticket': statistics.median(totals) if totals else 0,
+        'mix': mix,
+        'repeat': sum(1 for dates in orders_by_customer.values() if len(dates) > 1),
+        'cohorts': {cohort: len(months[0]) for cohort, months in cohorts.items()},
+    }
+
+
+def compare(vectorized, orm):
+    """Diferencias entre las dos implementaciones (lista vacía si coinciden)"""
+    cents = Decimal('0.01')
+    errors = []
+    top = [(row['total_sold'], row['revenue']) for row in vectorized['top_products']]
+    if top != [(sold, Decimal(revenue).quantize(cents)) for sold, revenue in orm['top']]:
+        errors.append('productos más vendidos')
+    if [b['count'] for b in vectorized['basket']['bins']] != orm['bins'] or (
+        vectorized['basket']['median_ticket'] != Decimal(orm['median_ticket']).quantize(cents)
+    ):
+        errors.append('unidades por orden')
+    mix = {
+        (week['week'], key): Decimal(str(value)).quantize(cents)
+        for week in vectorized['category_mix']['weeks'] for key, value in week['revenue'].items() if value
+    }
+    if mix != {key: Decimal(value).quantize(cents) for key, value in orm['mix'].items()}:
+        errors.append('mezcla de categorías')
+    cohorts = vectorized['cohorts']
+    sizes = {(row['cohort'].year, row['cohort'].month): row['customers'] for row in cohorts['table']}
+    if cohorts['repeat_customers'] != orm['repeat'] or sizes != orm['cohorts']:
+        errors.append('cohortes')
+    return errors
+
+
+class Command(BaseCommand):
+    help = 'Compara las métricas del dashboard con pandas contra los mismos cálculos con el ORM'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=200_000)
+        parser.add_argument('--items-per-order', type=int, default=3)
+        parser.add_argument('--days', type=int, default=365, help='Antigüedad de las órdenes generadas')
+        parser.add_argument('--window', type=int, default=90, help='Días del período medido')
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        with benchmark_database():
+            start = time.perf_counter()
+            make_orders(options['orders'], options['days'], options['items_per_order'],
+                        customers=max(1, options['orders'] // 4))
+            sales.rebuild()
+            if connection.vendor == 'sqlite':
+                connection.cursor().execute('ANALYZE')
+            self.stdout.write(f"{options['orders']:,} órdenes creadas en {time.perf_counter() - start:.1f} s")
+
+            end = timezone.localdate()
+            start = end - timedelta(days=options['window'] - 1)
+            repeat = options['repeat']
+
+            with CaptureQueriesContext(connection) as queries:
+                vectorized = analytics.compute(start, end)
+            stats = measure(lambda: analytics.compute(start, end), repeat, warmup=0)
+            self.stdout.write(format_stats('pandas (sin caché)', stats) + f' | {len(queries)} consultas')
+
+            cache.clear()
+            analytics.window_metrics(start, end)
+            stats = measure(lambda: analytics.window_metrics(start, end), repeat * 20)
+            self.stdout.write(format_stats('pandas (caché)', stats))
+
+            with CaptureQueriesContext(connection) as queries:
+                orm = orm_metrics(start, end)
+            stats = measure(lambda: orm_metrics(start, end), max(1, repeat // 2), warmup=0)
+            self.stdout.write(format_stats('ORM', stats) + f' | {len(queries):,} consultas')
+
+            errors = compare(vectorized, orm)
+            if errors:
+                raise CommandError('Las métricas no coinciden: ' + ', '.join(errors))
+            self.stdout.write(f"Métricas verificadas: {vectorized['basket']['orders']:,} órdenes, "
+                              f"{vectorized['cohorts']['customers']:,} clientes en {options['window']} días")
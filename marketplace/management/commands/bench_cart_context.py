@@ -0,0 +1,85 @@
+import copy
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client, RequestFactory
+from django.test.utils import CaptureQueriesContext, override_settings
+
+from marketplace.benchmarks import benchmark_database, format_stats, make_products, measure
+from marketplace.cart import Cart
+from marketplace.context_processors import cart_context
+from marketplace.models import Product
+
+LAZY = 'marketplace.context_processors.cart_context'
+EAGER = 'marketplace.management.commands.bench_cart_context.eager_cart_context'
+
+
+def eager_cart_context(request):
+    """Versión anterior: arma el carrito en cada render"""
+    cart = Cart(request)
+    return {
+        'cart': cart,
+        'cart_total_items': len(cart),
+        'cart_total_price': cart.get_total_price(),
+    }
+
+
+class FakeSession(dict):
+    modified = False
+
+
+class Command(BaseCommand):
+    help = 'Mide el costo del context processor del carrito en páginas que no lo muestran'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lines', type=int, default=10, help='Productos distintos en el carrito')
+        parser.add_argument('--repeat', type=int, default=200)
+
+    def handle(self, *args, **options):
+        with benchmark_database():
+            make_products(max(options['lines'], 50))
+            self.processor_only(options)
+            self.full_requests(options)
+
+    def processor_only(self, options):
+        products = list(Product.objects.order_by('id')[:options['lines']])
+        session = FakeSession({settings.CART_SESSION_ID: {
+            str(p.id): {'quantity': 2, 'price': str(p.price)} for p in products
+        }})
+        factory = RequestFactory()
+
+        def run(processor):
+            def call():
+                request = factory.get('/admin/')
+                request.session = session
+                processor(request)
+            return call
+
+        self.stdout.write(f"\nSolo el context processor ({options['lines']} líneas en el carrito):")
+        self.stdout.write(format_stats('  eager', measure(run(eager_cart_context), options['repeat'])))
+        self.stdout.write(format_stats('  lazy (sin leer)', measure(run(cart_context), options['repeat'])))
+
+    def full_requests(self, options):
+        product = Product.objects.filter(available=True, stock__gt=0).first()
+        pages = [('admin login', '/admin/login/'), ('scroll infinito', '/productos/?fragment=1')]
+
+        for label, processor in (('eager', EAGER), ('lazy', LAZY)):
+            templates = copy.deepcopy(settings.TEMPLATES)
+            processors = templates[0]['OPTIONS']['context_processors']
+            processors[processors.index(LAZY)] = processor
+
+            with override_settings(TEMPLATES=templates, ALLOWED_HOSTS=['*']):
+                client = Client()
+                client.post(f'/carrito/agregar/{product.id}/', {'quantity': 1})
+                self.stdout.write(f'\nRequests completos con carrito ({label}):')
+                for page_label, url in pages:
+                    client.get(url)
+                    with CaptureQueriesContext(connection) as queries:
+                        client.get(url)
+                    # Cada request vacía connection.queries: se cuenta antes de medir
+                    query_count = len(queries)
+                    stats = measure(lambda: client.get(url), options['repeat'] // 4)
+                    self.stdout.write(
+                        format_stats(f'  {page_label}', stats) + f' | {query_count} consultas'
+                    )
@@ -0,0 +1,89 @@
+import pickle
+
+from django.contrib.sessions.backends.db import SessionStore
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext, override_settings
+
+from marketplace.benchmarks import benchmark_database, format_stats, make_products, measure
+from marketplace.cart import Cart
+from marketplace.cart_storage import CacheCartStorage
+from marketplace.models import Product
+
+BACKENDS = [
+    ('sesión', 'marketplace.cart_storage.SessionCartStorage'),
+    ('caché', 'marketplace.cart_storage.CacheCartStorage'),
+    ('tabla CartLine', 'marketplace.cart_storage.DatabaseCartStorage'),
+]
+
+
+class Command(BaseCommand):
+    help = 'Compara latencia y volumen escrito por operación de carrito en cada backend'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lines', type=int, default=10, help='Líneas en el carrito')
+        parser.add_argument('--ops', type=int, default=300, help='Operaciones a medir')
+
+    def handle(self, *args, **options):
+        with benchmark_database():
+            make_products(max(options['lines'] * 2, 50))
+            products = list(Product.objects.filter(stock__gte=2).order_by('id')[:options['lines']])
+            self.stdout.write(
+                f"Cambiar la cantidad de una línea, carrito de {len(products)} líneas, "
+                f"{options['ops']} operaciones (sesiones en la base de datos):\n"
+            )
+            for label, backend in BACKENDS:
+                with override_settings(CART_STORAGE=backend):
+                    self.run_backend(label, products, options['ops'])
+
+    def request_for(self, factory, session_key):
+        request = factory.post('/carrito/api/')
+        request.session = SessionStore(session_key=session_key)
+        return request
+
+    def finish(self, request):
+        # Lo mismo que hace SessionMiddleware al terminar el request
+        if request.session.modified:
+            request.session.save()
+
+    def run_backend(self, label, products, ops):
+        factory = RequestFactory()
+        session = SessionStore()
+        # Datos típicos de una sesión además del carrito
+        session.update({'shipping_price': 2000.0, 'postal_code': '1425', '_auth_user_hash': 'x' * 64})
+        session.create()
+
+        request = self.request_for(factory, session.session_key)
+        cart = Cart(request)
+        for product in products:
+            cart.add(product, 1)
+        self.finish(request)
+
+        state = {'i': 0, 'writes': 0, 'sql_bytes': 0, 'cache_bytes': 0}
+
+        def operation():
+            state['i'] += 1
+            product = products[state['i'] % len(products)]
+            request = self.request_for(factory, session.session_key)
+            with CaptureQueriesContext(connection) as queries:
+                cart = Cart(request)
+                cart.add(product, 1 + state['i'] % 2, update_quantity=True)
+                self.finish(request)
+            writes = [
+                q['sql'] for q in queries
+                if q['sql'].lstrip().upper().startswith(('INSERT', 'UPDATE', 'DELETE'))
+            ]
+            state['writes'] += len(writes)
+            state['sql_bytes'] += sum(len(sql) for sql in writes)
+            if isinstance(cart.storage, CacheCartStorage):
+                state['cache_bytes'] += len(pickle.dumps(cart.storage.lines))
+
+        stats = measure(operation, ops)
+        count = state['i']
+        self.stdout.write(format_stats(f'  {label}', stats))
+        self.stdout.write(
+            f"      {state['writes'] / count:.1f} escrituras SQL/op, "
+            f"{state['sql_bytes'] / count:,.0f} B de SQL/op"
+            + (f", {state['cache_bytes'] / count:,.0f} B en caché/op" if state['cache_bytes'] else '')
+        )
@@ -0,0 +1,81 @@
+import time
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count, Sum
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from marketplace.benchmarks import benchmark_database, format_stats, make_orders, measure
+from marketplace.models import Order
+from marketplace.sales import REVENUE_STATUSES, rebuild, sales_summary
+
+def legacy_dashboard():
+    """Consultas del dashboard anterior (con ``total`` en lugar de ``total_amount``)"""
+    Order.objects.count()
+    Order.objects.aggregate(Sum('total'))
+    Order.objects.filter(created_at__gte=timezone.now() - timedelta(days=30)).aggregate(Sum('total'))
+    list(Order.objects.values('status').annotate(count=Count('id'), revenue=Sum('total')))
+    for i in range(7):
+        day = timezone.now() - timedelta(days=i)
+        Order.objects.filter(created_at__range=(
+            day.replace(hour=0, minute=0, second=0, microsecond=0),
+            day.replace(hour=23, minute=59, second=59, microsecond=999999),
+        )).aggregate(total=Sum('total'), count=Count('id'))
+
+
+class Command(BaseCommand):
+    help = 'Mide el dashboard del admin con el resumen diario de ventas y millones de órdenes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=1_000_000)
+        parser.add_argument('--days', type=int, default=730, help='Antigüedad de las órdenes generadas')
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        with benchmark_database():
+            start = time.perf_counter()
+            make_orders(options['orders'], options['days'])
+            self.stdout.write(f"{options['orders']:,} órdenes creadas en {time.perf_counter() - start:.1f} s")
+            if connection.vendor == 'sqlite':
+                # Sin estadísticas SQLite elige el índice de status en lugar del de created_at
+                connection.cursor().execute('ANALYZE')
+
+            start = time.perf_counter()
+            rows = rebuild()
+            self.stdout.write(f'rebuild_sales_summary: {rows:,} filas en {time.perf_counter() - start:.2f} s')
+
+            today = timezone.localdate()
+            for days in (30, 365):
+                stats = measure(lambda: sales_summary(today - timedelta(days=days - 1), today), options['repeat'])
+                self.stdout.write(format_stats(f'Resumen {days} días (1 consulta)', stats))
+            stats = measure(legacy_dashboard, max(3, options['repeat'] // 5), warmup=1)
+            self.stdout.write(format_stats('Consultas del dashboard anterior', stats))
+
+            user = get_user_model().objects.create_superuser('bench', 'bench@example.com', 'x')
+            client = Client()
+            client.force_login(user)
+            url = reverse('admin_dashboard')
+            with override_settings(ALLOWED_HOSTS=['testserver']):
+                with CaptureQueriesContext(connection) as queries:
+                    client.get(url)
+                query_count = len(queries)
+                stats = measure(lambda: client.get(url), options['repeat'])
+            self.stdout.write(format_stats('Vista /admin/dashboard/', stats) + f' | {query_count} consultas')
+
+            self.verify(today, options['days'])
+
+    def verify(self, today, days):
+        summary = sales_summary(today - timedelta(days=days + 1), today)
+        expected = Order.objects.aggregate(count=Count('id'))['count']
+        revenue = Order.objects.filter(status__in=REVENUE_STATUSES).aggregate(total=Sum('total'))['total']
+        if (summary['order_count'], summary['revenue']) != (expected, revenue):
+            raise CommandError(
+                f"El resumen no coincide: {summary['order_count']} / {summary['revenue']} "
+                f"vs {expected} / {revenue}"
+            )
+        self.stdout.write(f'Resumen verificado: {expected:,} órdenes, ${revenue:,.2f} en ventas')
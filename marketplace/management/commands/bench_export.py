@@ -0,0 +1,102 @@
+import os
+import tempfile
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from marketplace import exports
+from marketplace.benchmarks import benchmark_database, make_orders
+from marketplace.models import OrderItem
+
+
+def naive_csv(dataset, path):
+    """Exportación anterior: todas las filas en una lista y después el archivo"""
+    rows = list(exports.export_queryset(dataset).values_list(
+        *[lookup for _, lookup in exports.DATASETS[dataset][1]]
+    ))
+    with open(path, 'wb') as stream:
+        for block in exports._buffered(exports.csv_lines(dataset, rows)):
+            stream.write(block)
+
+
+def streamed(dataset, fmt, path, chunk_size):
+    if fmt == 'parquet':
+        exports.write_parquet(dataset, path, chunk_size=chunk_size)
+        return
+    with open(path, 'wb') as stream:
+        for block in exports.stream_export(dataset, fmt, chunk_size=chunk_size):
+            stream.write(block)
+
+
+def first_block_ms(dataset, fmt):
+    """Lo que tarda la descarga del admin en mandar el primer bloque"""
+    start = time.perf_counter()
+    response = exports.export_response(dataset, fmt)
+    next(iter(response.streaming_content))
+    elapsed = (time.perf_counter() - start) * 1000
+    response.close()
+    return elapsed
+
+
+def peak_mb(func):
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1] / 2**20
+    finally:
+        tracemalloc.stop()
+
+
+class Command(BaseCommand):
+    help = 'Mide la exportación en streaming (CSV / JSONL / Parquet) con un millón de ítems'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=250_000)
+        parser.add_argument('--items-per-order', type=int, default=4)
+        parser.add_argument('--chunk-size', type=int, default=exports.CHUNK_SIZE)
+        parser.add_argument('--no-memory', action='store_true',
+                            help='No medir memoria (tracemalloc hace todo más lento)')
+
+    def handle(self, *args, **options):
+        formats = exports.file_formats()
+        if 'parquet' not in formats:
+            self.stdout.write('pyarrow no está instalado: se omite Parquet')
+
+        with benchmark_database(), tempfile.TemporaryDirectory(prefix='bench-export-') as tmp:
+            start = time.perf_counter()
+            make_orders(options['orders'], items_per_order=options['items_per_order'])
+            if connection.vendor == 'sqlite':
+                connection.cursor().execute('ANALYZE')
+            items = OrderItem.objects.count()
+            self.stdout.write(f"{options['orders']:,} órdenes y {items:,} ítems creados "
+                              f"en {time.perf_counter() - start:.1f} s")
+
+            for fmt in formats:
+                path = os.path.join(tmp, f'items.{fmt}')
+                start = time.perf_counter()
+                streamed('items', fmt, path, options['chunk_size'])
+                elapsed = time.perf_counter() - start
+                size = os.path.getsize(path) / 2**20
+                line = (f'items.{fmt:<8} {items / elapsed:>10,.0f} filas/s | {size / elapsed:6.1f} MB/s'
+                        f' | {size:7.1f} MB en {elapsed:5.1f} s')
+                if fmt != 'parquet':
+                    line += f' | primer bloque {first_block_ms("items", fmt):.1f} ms'
+                    self.verify(path, fmt, items)
+                self.stdout.write(line)
+
+            if options['no_memory']:
+                return
+            path = os.path.join(tmp, 'memory.csv')
+            for fmt in formats:
+                mb = peak_mb(lambda: streamed('items', fmt, path, options['chunk_size']))
+                self.stdout.write(f'Memoria pico, streaming {fmt:<8} {mb:8.1f} MB')
+            mb = peak_mb(lambda: naive_csv('items', path))
+            self.stdout.write(f'Memoria pico, list() + CSV      {mb:8.1f} MB')
+
+    def verify(self, path, fmt, expected):
+        with open(path, 'rb') as stream:
+            lines = sum(1 for _ in stream) - (1 if fmt == 'csv' else 0)
+        if lines != expected:
+            raise CommandError(f'{path}: {lines:,} filas, se esperaban {expected:,}')
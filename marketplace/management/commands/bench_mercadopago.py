@@ -0,0 +1,110 @@
+import json
+import threading
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+from mercadopago import SDK
+from mercadopago.http import HttpClient
+
+from marketplace import payments
+from marketplace.benchmarks import benchmark_database, format_stats, make_products, measure
+from marketplace.fake_mercadopago import FakeMercadoPago
+from marketplace.models import Order, Product
+
+PREFERENCE = {
+    'items': [{'title': 'Teclado', 'quantity': 1, 'unit_price': 15000, 'currency_id': 'ARS'}],
+    'external_reference': 'bench',
+}
+
+
+class RedirectedHttpClient(HttpClient):
+    """Cliente por defecto del SDK (una sesión por llamada) apuntado al servidor falso"""
+
+    def __init__(self, base_url):
+        self.base_url = base_url
+
+    def request(self, method, url, maxretries=None, **kwargs):
+        url = url.replace(payments.MERCADOPAGO_API_URL, self.base_url)
+        return super().request(method, url, maxretries=maxretries, **kwargs)
+
+
+class Command(BaseCommand):
+    help = (
+        'Compara el SDK de MercadoPago por defecto con el cliente compartido '
+        'contra un servidor falso y verifica la deduplicación de doble envío'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=50)
+        parser.add_argument('--latency', type=float, default=0.02,
+                            help='Demora del servidor falso por request (s)')
+        parser.add_argument('--submits', type=int, default=8,
+                            help='Envíos simultáneos del mismo carrito')
+
+    def handle(self, *args, **options):
+        with FakeMercadoPago(latency=options['latency']) as fake, override_settings(
+            MERCADOPAGO_ACCESS_TOKEN='TEST-bench', MERCADOPAGO_API_BASE_URL=fake.url,
+            ALLOWED_HOSTS=['testserver'],
+        ):
+            self.bench_clients(fake, options['repeat'])
+            self.bench_double_submit(fake, options['submits'])
+
+    def bench_clients(self, fake, repeat):
+        def default_sdk():
+            # Lo que hacía la vista: SDK nuevo y sesión HTTP nueva en cada pago
+            sdk = SDK('TEST-bench', http_client=RedirectedHttpClient(fake.url))
+            return sdk.preference().create(PREFERENCE)
+
+        def pooled():
+            return payments.create_preference(PREFERENCE)
+
+        for label, func in (('SDK por defecto', default_sdk), ('Cliente compartido', pooled)):
+            before = fake.stats['connections']
+            stats = measure(func, repeat)
+            opened = fake.stats['connections'] - before
+            self.stdout.write(format_stats(f'{label:<18}', stats) + f' | {opened} conexiones')
+
+    def bench_double_submit(self, fake, submits):
+        with benchmark_database(threaded=True):
+            cache.clear()
+            make_products(1)
+            product = Product.objects.get()
+            client = Client()
+            session = client.session
+            session[settings.CART_SESSION_ID] = {str(product.id): {'quantity': 1, 'price': str(product.price)}}
+            session.save()
+            cookie = client.cookies[settings.SESSION_COOKIE_NAME].value
+
+            before = fake.stats['preferences']
+            barrier = threading.Barrier(submits)
+            results = []
+
+            def submit():
+                worker = Client()
+                worker.cookies[settings.SESSION_COOKIE_NAME] = cookie
+                barrier.wait()
+                try:
+                    response = worker.post(reverse('create_payment'), '{}', content_type='application/json')
+                    results.append(response.json().get('id') if response.status_code == 200 else response.status_code)
+                finally:
+                    connection.close()
+
+            threads = [threading.Thread(target=submit) for _ in range(submits)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+            created = fake.stats['preferences'] - before
+            product.refresh_from_db(fields=['stock'])
+            self.stdout.write(
+                f'{submits} envíos simultáneos -> {created} preferencia(s), '
+                f'{Order.objects.count()} orden(es), ids {sorted(set(map(str, results)))}'
+            )
+            if created != 1 or len(set(results)) != 1 or Order.objects.count() != 1:
+                raise CommandError('El doble envío creó más de una preferencia u orden')
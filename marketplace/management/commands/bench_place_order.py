@@ -0,0 +1,62 @@
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+
+from marketplace.benchmarks import benchmark_database, format_stats, make_products, measure
+from marketplace.cart import Cart
+from marketplace.models import Order, OrderItem, Product
+from marketplace.orders import place_order, price_cart
+
+CUSTOMER = {
+    'first_name': 'Ana', 'last_name': 'Gómez', 'email': 'ana@example.com',
+    'address': 'Av. Siempre Viva 742', 'city': 'CABA', 'phone': '1122334455',
+}
+
+
+class FakeSession(dict):
+    modified = False
+
+
+class Command(BaseCommand):
+    help = 'Mide la creación de órdenes desde el carrito con 1, 10 y 100 líneas'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[1, 10, 100])
+        parser.add_argument('--repeat', type=int, default=50)
+
+    def handle(self, *args, **options):
+        with benchmark_database():
+            make_products(max(options['sizes']))
+            products = list(Product.objects.order_by('id').values_list('id', 'price'))
+            factory = RequestFactory()
+
+            for size in options['sizes']:
+                lines = {
+                    str(product_id): {'quantity': 2, 'price': str(price)}
+                    for product_id, price in products[:size]
+                }
+
+                def place():
+                    # Request nuevo: incluye la consulta de productos del carrito
+                    request = factory.post('/payment/create/')
+                    request.session = FakeSession({settings.CART_SESSION_ID: dict(lines)})
+                    request.user = AnonymousUser()
+                    order_lines, _ = price_cart(Cart(request))
+                    return place_order(order_lines, CUSTOMER, user=request.user, shipping_price=2000)
+
+                with CaptureQueriesContext(connection) as queries:
+                    order = place()
+                query_count = len(queries)
+                stats = measure(place, options['repeat'])
+                self.stdout.write(
+                    format_stats(f'{size:>4} líneas', stats) + f' | {query_count} consultas'
+                )
+                if order.items.count() != size:
+                    raise CommandError(f'La orden tiene {order.items.count()} ítems, se esperaban {size}')
+
+            self.stdout.write(
+                f'{Order.objects.count():,} órdenes y {OrderItem.objects.count():,} ítems creados.'
+            )
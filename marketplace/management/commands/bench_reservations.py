@@ -0,0 +1,126 @@
+import random
+import threading
+import time
+from collections import Counter
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.db.models import Sum
+from django.utils import timezone
+
+from marketplace.benchmarks import benchmark_database, make_products
+from marketplace.models import Product, StockReservation
+from marketplace import reservations
+
+
+class Command(BaseCommand):
+    help = 'Prueba de estrés de las reservas de stock con varios hilos (verifica que no haya sobreventa)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--attempts', type=int, default=300, help='Checkouts por hilo')
+        parser.add_argument('--products', type=int, default=5, help='Productos en disputa')
+        parser.add_argument('--stock', type=int, default=1000, help='Stock inicial de cada producto')
+        parser.add_argument('--ttl', type=float, default=0.05, help='Vencimiento de las reservas (s)')
+
+    def handle(self, *args, **options):
+        with benchmark_database(threaded=True):
+            make_products(options['products'])
+            Product.objects.update(stock=options['stock'])
+            product_ids = list(Product.objects.values_list('id', flat=True))
+            self.stdout.write(
+                f"{options['threads']} hilos x {options['attempts']} checkouts sobre "
+                f"{len(product_ids)} productos con stock {options['stock']} ({connection.vendor})"
+            )
+            results = self.run(product_ids, options)
+            self.verify(product_ids, options['stock'], results)
+
+    def run(self, product_ids, options):
+        results = Counter()
+        lock = threading.Lock()
+        done = threading.Event()
+        ttl = timedelta(seconds=options['ttl'])
+
+        def buyer(seed):
+            rng = random.Random(seed)
+            local = Counter()
+            try:
+                for i in range(options['attempts']):
+                    lines = [(pid, rng.randint(1, 3)) for pid in rng.sample(product_ids, rng.randint(1, 3))]
+                    reference = f'bench_{seed}_{i}'
+                    try:
+                        reservations.reserve(reference, lines, ttl=ttl)
+                    except reservations.InsufficientStock:
+                        local['sin stock'] += 1
+                        continue
+                    local['reservas'] += 1
+                    # Pago aprobado, rechazado o abandonado (vence y lo libera el barrido)
+                    outcome = rng.random()
+                    if outcome < 0.5:
+                        reservations.commit(reference)
+                        local['confirmadas'] += 1
+                    elif outcome < 0.8:
+                        reservations.release(reference)
+                        local['liberadas'] += 1
+            finally:
+                connections.close_all()
+                with lock:
+                    results.update(local)
+
+        def sweeper():
+            try:
+                while not done.is_set():
+                    released = reservations.release_expired()
+                    with lock:
+                        results['barridas'] += released
+                    time.sleep(options['ttl'] / 2)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=buyer, args=(n,)) for n in range(options['threads'])]
+        sweep_thread = threading.Thread(target=sweeper)
+        start = time.perf_counter()
+        sweep_thread.start()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        done.set()
+        sweep_thread.join()
+
+        # Último barrido con todo vencido: las reservas abandonadas al final
+        # todavía no llegaron al TTL, se barre como si ya hubiera pasado
+        results['barridas'] += reservations.release_expired(now=timezone.now() + ttl)
+        results['segundos'] = elapsed
+        return results
+
+    def verify(self, product_ids, initial_stock, results):
+        elapsed = results.pop('segundos')
+        attempts = results['reservas'] + results['sin stock']
+        self.stdout.write(
+            f"{attempts:,} intentos en {elapsed:.2f} s: {attempts / elapsed:,.0f} intentos/s, "
+            f"{results['reservas'] / elapsed:,.0f} reservas/s"
+        )
+        self.stdout.write('  ' + ', '.join(f'{key}: {value:,}' for key, value in sorted(results.items())))
+
+        sold = dict(
+            StockReservation.objects.filter(status='committed')
+            .values_list('product_id').annotate(total=Sum('quantity'))
+        )
+        held = StockReservation.objects.filter(status='held').count()
+        errors = []
+        for product in Product.objects.filter(id__in=product_ids):
+            committed = sold.get(product.id, 0)
+            if product.stock < 0 or committed > initial_stock:
+                errors.append(f'producto {product.id}: stock {product.stock}, vendidas {committed}')
+            elif product.stock + committed != initial_stock:
+                errors.append(
+                    f'producto {product.id}: stock {product.stock} + vendidas {committed} != {initial_stock}'
+                )
+            self.stdout.write(f'  producto {product.id}: vendidas {committed}, stock final {product.stock}')
+
+        if held or errors:
+            raise CommandError(f'Inconsistencias ({held} reservas sin liberar): ' + '; '.join(errors))
+        self.stdout.write(self.style.SUCCESS('Sin sobreventa: stock final + vendido = stock inicial'))
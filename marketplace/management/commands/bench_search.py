@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from marketplace import search
+from marketplace.benchmarks import benchmark_database, format_stats, make_products, measure
+from marketplace.models import Product
+
+QUERIES = ['teclado mecánico', 'mouses inalámbricos', 'Razer', 'micrófono desmontable', 'monitor curvo']
+
+
+class Command(BaseCommand):
+    help = 'Compara la búsqueda full-text contra el filtro icontains en un catálogo sintético'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=100_000)
+        parser.add_argument('--repeat', type=int, default=10)
+
+    def handle(self, *args, **options):
+        with benchmark_database():
+            self.stdout.write(f"Generando {options['products']:,} productos...")
+            make_products(options['products'])
+            search.rebuild_search_index()
+
+            base = Product.objects.filter(available=True)
+
+            for query in QUERIES:
+                def icontains():
+                    qs = base.filter(Q(name__icontains=query) | Q(description__icontains=query))
+                    return qs.count(), list(qs.order_by('name')[:24])
+
+                def full_text():
+                    qs = search.search_products(base, query)
+                    return qs.count(), list(qs.order_by('-search_rank')[:24])
+
+                self.stdout.write(f"\n'{query}' -> icontains: {icontains()[0]:,} | full-text: {full_text()[0]:,}")
+                self.stdout.write(format_stats('  icontains', measure(icontains, options['repeat'])))
+                self.stdout.write(format_stats('  full-text', measure(full_text, options['repeat'])))
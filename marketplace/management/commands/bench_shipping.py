@@ -0,0 +1,89 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from marketplace.benchmarks import benchmark_database, format_stats, measure
+from marketplace.models import ShippingOption, ShippingZone
+from marketplace.shipping import ShippingIndex, load_zones, normalize_postal_code, shipping_index
+
+
+def make_zones(count, seed=42):
+    """``count`` zonas con rangos superpuestos de anchos muy distintos"""
+    rng = random.Random(seed)
+    options = ShippingOption.objects.bulk_create([
+        ShippingOption(name=f'Opción {i}', price=1000 + 100 * i, estimated_days=f'{i % 7 + 1} días')
+        for i in range(20)
+    ])
+    zones = []
+    for i in range(count):
+        width = rng.choice([0, 5, 20, 100, 500, 2000])
+        start = rng.randint(1000, 9999 - width)
+        zones.append(ShippingZone(
+            name=f'Zona {i}', postal_code_start=f'{start:04d}', postal_code_end=f'{start + width:04d}',
+            shipping_option=rng.choice(options),
+        ))
+    ShippingZone.objects.bulk_create(zones, batch_size=1000)
+
+
+def linear_lookup(zones, code):
+    """Referencia: recorre todas las zonas con la misma regla de prioridad"""
+    best = None
+    for zone in zones:
+        if zone[2] <= code <= zone[3]:
+            key = (zone[3] - zone[2], zone[6], zone[0])
+            if best is None or key < best[0]:
+                best = (key, zone)
+    return best and best[1]
+
+
+class Command(BaseCommand):
+    help = 'Mide la cotización de envíos con miles de zonas (índice ordenado vs. recorrido lineal)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--zones', type=int, default=5000)
+        parser.add_argument('--codes', type=int, default=10_000, help='Códigos por cotización masiva')
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        rng = random.Random(7)
+        codes = [str(rng.randint(1000, 9999)) for _ in range(options['codes'])]
+
+        with benchmark_database():
+            make_zones(options['zones'])
+            zones = load_zones()
+
+            start = time.perf_counter()
+            index = ShippingIndex(None, zones)
+            build_ms = (time.perf_counter() - start) * 1000
+            self.stdout.write(
+                f'{len(zones):,} zonas -> {len(index.starts):,} tramos disjuntos, armado en {build_ms:.1f} ms'
+            )
+
+            mismatches = sum(
+                index.lookup(int(code)) is not linear_lookup(zones, int(code)) for code in codes[:2000]
+            )
+            if mismatches:
+                raise CommandError(f'{mismatches} códigos con distinta zona que el recorrido lineal')
+
+            sample = codes[:200]
+            stats = measure(lambda: [index.quote(code) for code in sample], options['repeat'])
+            self.stdout.write(format_stats('Índice (200 códigos)', stats))
+            stats = measure(lambda: [linear_lookup(zones, normalize_postal_code(c)) for c in sample], 3, warmup=0)
+            self.stdout.write(format_stats('Recorrido lineal (200 códigos)', stats))
+
+            shipping_index.mark_stale()
+            stats = measure(lambda: shipping_index.quote_many(codes), options['repeat'])
+            self.stdout.write(format_stats(f'quote_many ({len(codes):,} códigos)', stats))
+
+            client = Client()
+            url = reverse('shipping_quote_api')
+            with override_settings(ALLOWED_HOSTS=['testserver']):
+                stats = measure(
+                    lambda: client.post(url, {'postal_codes': codes[:500]}, content_type='application/json'),
+                    options['repeat'],
+                )
+            self.stdout.write(format_stats('API (500 códigos por POST)', stats))
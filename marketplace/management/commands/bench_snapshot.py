@@ -0,0 +1,64 @@
+import tracemalloc
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+
+from marketplace.benchmarks import benchmark_database, format_stats, make_products, measure
+from marketplace.catalog import get_db_catalog_version
+from marketplace.facets import apply_facets, compute_facets
+from marketplace.models import Product
+from marketplace.pagination import paginate
+from marketplace.snapshot import load_snapshot
+
+SELECTION = {'category': 'mouses', 'stock': 'en_stock'}
+
+
+class Command(BaseCommand):
+    help = 'Mide memoria y latencia del snapshot del catálogo frente al ORM'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, nargs='+', default=[1_000, 10_000, 50_000])
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        for count in options['products']:
+            with benchmark_database():
+                make_products(count)
+                self.run(count, options['repeat'])
+
+    def run(self, count, repeat):
+        tracemalloc.start()
+        snapshot = load_snapshot(get_db_catalog_version(), max_products=count)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        self.stdout.write(
+            f"\n{count:,} productos ({len(snapshot):,} disponibles): "
+            f"snapshot {snapshot.memory_bytes / 1024 / 1024:.1f} MiB "
+            f"({snapshot.memory_bytes / max(len(snapshot), 1):.0f} B/producto), "
+            f"pico durante la carga {peak / 1024 / 1024:.1f} MiB"
+        )
+        self.stdout.write(format_stats('  carga del snapshot', measure(
+            lambda: load_snapshot(0, max_products=count), repeat=3, warmup=0
+        )))
+
+        base = Product.objects.filter(available=True)
+
+        def orm_page():
+            return list(paginate(apply_facets(base, SELECTION), 'price_low'))
+
+        def snapshot_page():
+            return list(snapshot.paginate(SELECTION, 'price_low'))
+
+        def orm_facets():
+            cache.clear()
+            return compute_facets(base, SELECTION)
+
+        def snapshot_facets():
+            snapshot._facet_counts.clear()
+            return snapshot.facet_counts(SELECTION)
+
+        self.stdout.write(format_stats('  página (ORM)', measure(orm_page, repeat)))
+        self.stdout.write(format_stats('  página (snapshot)', measure(snapshot_page, repeat)))
+        self.stdout.write(format_stats('  facetas (ORM, sin caché)', measure(orm_facets, repeat)))
+        self.stdout.write(format_stats('  facetas (snapshot, sin memo)', measure(snapshot_facets, repeat)))
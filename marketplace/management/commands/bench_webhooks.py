@@ -0,0 +1,135 @@
+import json
+import random
+import time
+from collections import Counter
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from marketplace.benchmarks import benchmark_database, format_stats, make_products, summarize
+from marketplace.fake_mercadopago import FakeMercadoPago
+from marketplace.models import Order, PaymentNotification, Product, StockReservation
+from marketplace.reservations import reservation_ttl
+from marketplace.webhooks import BATCH_SIZE, TRANSITIONS, process_inbox
+
+PAYMENT_STATUSES = ['approved'] * 7 + ['rejected'] * 2 + ['in_process']
+
+
+def build_fixture(count, seed=42):
+    """
+    Ráfaga de ``count`` notificaciones como las manda MercadoPago: dos por
+    pago (created/updated) y ~15 % de reintentos con el mismo id.
+    Devuelve ``(notificaciones, pagos)``.
+    """
+    rng = random.Random(seed)
+    notifications, payments = [], {}
+    notification_id = 10_000_000
+    while len(notifications) < count:
+        payment_id = str(50_000_000 + len(payments))
+        payments[payment_id] = {
+            'id': payment_id,
+            'status': rng.choice(PAYMENT_STATUSES),
+            'external_reference': f'bench_{payment_id}',
+        }
+        for action in ('payment.created', 'payment.updated'):
+            notification_id += 1
+            body = {
+                'id': notification_id, 'type': 'payment', 'action': action,
+                'api_version': 'v1', 'live_mode': False, 'data': {'id': payment_id},
+            }
+            notifications.append({'query': {'data.id': payment_id, 'type': 'payment'}, 'body': body})
+            if rng.random() < 0.15:
+                notifications.append(notifications[-1])
+    return notifications[:count], payments
+
+
+class Command(BaseCommand):
+    help = 'Mide la recepción y el procesamiento de una ráfaga de notificaciones de pago'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=10_000)
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+        parser.add_argument('--latency', type=float, default=0.005,
+                            help='Demora del servidor falso por consulta de pago (s)')
+        parser.add_argument('--fixture', help='JSONL con {"query", "body"} por línea (en lugar de generarla)')
+        parser.add_argument('--save-fixture', help='Guardar la ráfaga generada en este JSONL')
+
+    def handle(self, *args, **options):
+        notifications, payment_data = build_fixture(options['count'])
+        if options['fixture']:
+            with open(options['fixture']) as fh:
+                notifications = [json.loads(line) for line in fh if line.strip()]
+        if options['save_fixture']:
+            with open(options['save_fixture'], 'w') as fh:
+                fh.writelines(json.dumps(n) + '\n' for n in notifications)
+
+        with benchmark_database(), FakeMercadoPago(latency=options['latency']) as fake, override_settings(
+            MERCADOPAGO_ACCESS_TOKEN='TEST-bench', MERCADOPAGO_API_BASE_URL=fake.url,
+            ALLOWED_HOSTS=['testserver'],
+        ):
+            fake.payments.update(payment_data)
+            self.create_orders(payment_data)
+            self.replay(notifications)
+            self.drain(fake, options['batch_size'])
+            self.verify(payment_data)
+
+    def create_orders(self, payment_data):
+        make_products(1)
+        product = Product.objects.get()
+        expires_at = timezone.now() + reservation_ttl()
+        references = [payment['external_reference'] for payment in payment_data.values()]
+        Order.objects.bulk_create([
+            Order(first_name='Ana', last_name='Gómez', email='ana@example.com', address='-',
+                  city='CABA', phone='-', total=1000, external_reference=reference)
+            for reference in references
+        ], batch_size=1000)
+        StockReservation.objects.bulk_create([
+            StockReservation(reference=reference, product=product, quantity=1, expires_at=expires_at)
+            for reference in references
+        ], batch_size=1000)
+
+    def replay(self, notifications):
+        client = Client()
+        url = reverse('payment_webhook')
+        samples = []
+        start = time.perf_counter()
+        for notification in notifications:
+            query = '&'.join(f'{key}={value}' for key, value in notification['query'].items())
+            begin = time.perf_counter()
+            response = client.post(f'{url}?{query}', notification['body'], content_type='application/json')
+            samples.append((time.perf_counter() - begin) * 1000)
+            if response.status_code != 200:
+                raise CommandError(f'El webhook respondió {response.status_code}: {response.content!r}')
+        elapsed = time.perf_counter() - start
+
+        stored = PaymentNotification.objects.count()
+        self.stdout.write(format_stats(f'Webhook ({len(notifications):,} POST)', summarize(samples)))
+        self.stdout.write(
+            f'  {len(notifications) / elapsed:,.0f} notificaciones/s; '
+            f'{stored:,} guardadas, {len(notifications) - stored:,} duplicadas descartadas'
+        )
+
+    def drain(self, fake, batch_size):
+        start = time.perf_counter()
+        stats = process_inbox(batch_size=batch_size)
+        elapsed = time.perf_counter() - start
+        self.stdout.write(
+            f'Worker: {stats["processed"]:,} notificaciones en {elapsed:.2f} s '
+            f'({stats["processed"] / elapsed:,.0f}/s, {stats["batches"]} lotes de {batch_size}); '
+            f'{fake.stats["payment_lookups"]:,} consultas de pago, {stats["orders"]:,} órdenes actualizadas'
+        )
+        if stats['retry'] or stats['failed']:
+            raise CommandError(f'Quedaron notificaciones sin procesar: {dict(stats)}')
+
+    def verify(self, payment_data):
+        expected = Counter(
+            TRANSITIONS.get(payment['status'], ('pending',))[0] for payment in payment_data.values()
+        )
+        actual = Counter(dict(Order.objects.values_list('status').annotate(count=Count('id'))))
+        self.stdout.write(f'Órdenes por estado: {dict(actual)}')
+        if actual != expected:
+            raise CommandError(f'Se esperaba {dict(expected)}')
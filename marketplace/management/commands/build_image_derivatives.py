@@ -0,0 +1,81 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.utils import timezone
+
+from marketplace.catalog import bump_catalog_version
+from marketplace.images import DERIVATIVES_VERSION, generate_derivatives
+from marketplace.models import Product
+
+UPDATE_BATCH = 500
+
+
+def _init_worker():
+    # Con "spawn" (macOS/Windows) cada proceso arranca sin Django configurado
+    django.setup()
+
+
+def _process(name, overwrite):
+    try:
+        return name, len(generate_derivatives(name, overwrite=overwrite)), None
+    except Exception as exc:  # el error se informa en el proceso principal
+        return name, 0, f'{type(exc).__name__}: {exc}'
+
+
+class Command(BaseCommand):
+    help = 'Genera los derivados (thumb, card, detail en WebP y JPEG) de las imágenes existentes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+        parser.add_argument(
+            '--overwrite', action='store_true',
+            help='Regenera también los productos que ya tienen derivados',
+        )
+
+    def handle(self, *args, **options):
+        products = Product.objects.exclude(image='')
+        if not options['overwrite']:
+            products = products.filter(image_derivatives__lt=DERIVATIVES_VERSION)
+
+        # Varias filas pueden compartir la imagen (p. ej. la imagen por defecto)
+        names = sorted(set(products.values_list('image', flat=True)))
+        if not names:
+            self.stdout.write('No hay imágenes pendientes.')
+            return
+
+        self.stdout.write(f"Procesando {len(names):,} imágenes con {options['workers']} procesos...")
+        # Los procesos hijos no deben heredar conexiones abiertas
+        connections.close_all()
+
+        start = time.perf_counter()
+        done, failed, files = [], 0, 0
+        with ProcessPoolExecutor(max_workers=options['workers'], initializer=_init_worker) as pool:
+            futures = [pool.submit(_process, name, options['overwrite']) for name in names]
+            for future in as_completed(futures):
+                name, count, error = future.result()
+                if error:
+                    failed += 1
+                    self.stderr.write(f'  {name}: {error}')
+                else:
+                    done.append(name)
+                    files += count
+        elapsed = time.perf_counter() - start
+
+        # update() no dispara señales: se marca en lote y se invalida el catálogo a mano
+        now = timezone.now()
+        updated = 0
+        for i in range(0, len(done), UPDATE_BATCH):
+            updated += Product.objects.filter(image__in=done[i:i + UPDATE_BATCH]).update(
+                image_derivatives=DERIVATIVES_VERSION, updated_at=now
+            )
+        if updated:
+            bump_catalog_version()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(done):,} imágenes ({files:,} archivos nuevos) en {elapsed:.1f} s, '
+            f'{updated:,} productos actualizados, {failed:,} con error.'
+        ))
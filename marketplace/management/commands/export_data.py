@@ -0,0 +1,68 @@
+import sys
+import time
+from datetime import date, datetime, time as dt_time, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from marketplace import exports
+from marketplace.models import Order, OrderItem, Product
+
+
+class Command(BaseCommand):
+    help = 'Exporta órdenes, ítems o productos a CSV, JSONL o Parquet sin cargarlos en memoria'
+
+    def add_arguments(self, parser):
+        parser.add_argument('dataset', choices=sorted(exports.DATASETS))
+        parser.add_argument('--format', choices=['csv', 'jsonl', 'parquet'], default='csv',
+                            help='parquet requiere pyarrow (no viene en requirements.txt)')
+        parser.add_argument('-o', '--output', default='-', help='Archivo de salida ("-": salida estándar)')
+        parser.add_argument('--since', type=date.fromisoformat, help='Órdenes desde este día (AAAA-MM-DD)')
+        parser.add_argument('--until', type=date.fromisoformat, help='Órdenes hasta este día inclusive')
+        parser.add_argument('--status', action='append', help='Solo órdenes en este estado (se puede repetir)')
+        parser.add_argument('--chunk-size', type=int, default=exports.CHUNK_SIZE)
+
+    def queryset(self, dataset, options):
+        if dataset == 'products':
+            return Product.objects.all()
+        # Los filtros de fecha y estado son de la orden
+        prefix = '' if dataset == 'orders' else 'order__'
+        queryset = (Order if dataset == 'orders' else OrderItem).objects.all()
+        if options['since']:
+            start = timezone.make_aware(datetime.combine(options['since'], dt_time.min))
+            queryset = queryset.filter(**{f'{prefix}created_at__gte': start})
+        if options['until']:
+            end = timezone.make_aware(datetime.combine(options['until'] + timedelta(days=1), dt_time.min))
+            queryset = queryset.filter(**{f'{prefix}created_at__lt': end})
+        if options['status']:
+            queryset = queryset.filter(**{f'{prefix}status__in': options['status']})
+        return queryset
+
+    def handle(self, *args, **options):
+        dataset, fmt, output = options['dataset'], options['format'], options['output']
+        if fmt not in exports.file_formats():
+            raise CommandError(exports.PARQUET_MISSING)
+        queryset = self.queryset(dataset, options)
+        start = time.perf_counter()
+
+        if fmt == 'parquet':
+            if output == '-':
+                raise CommandError('Parquet necesita un archivo de salida (--output)')
+            rows = exports.write_parquet(dataset, output, queryset, options['chunk_size'])
+            written = None
+        else:
+            stream = sys.stdout.buffer if output == '-' else open(output, 'wb')
+            written = 0
+            try:
+                for block in exports.stream_export(dataset, fmt, queryset, options['chunk_size']):
+                    stream.write(block)
+                    written += len(block)
+            finally:
+                if stream is not sys.stdout.buffer:
+                    stream.close()
+            rows = None
+
+        if output != '-':
+            elapsed = time.perf_counter() - start
+            detail = f'{rows:,} filas' if rows is not None else f'{written / 1e6:,.1f} MB'
+            self.stdout.write(self.style.SUCCESS(f'{dataset} -> {output} ({detail}, {elapsed:.1f} s)'))
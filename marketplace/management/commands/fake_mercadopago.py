@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from marketplace.fake_mercadopago import FakeMercadoPago
+
+
+class Command(BaseCommand):
+    help = 'Levanta un servidor falso de la API de MercadoPago para pruebas sin red'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument('--latency', type=float, default=0.15, help='Demora por respuesta (s)')
+
+    def handle(self, *args, **options):
+        server = FakeMercadoPago(options['host'], options['port'], options['latency'])
+        self.stdout.write(
+            f'MercadoPago falso en {server.url} (latencia {options["latency"]} s)\n'
+            f'Usar con MERCADOPAGO_API_BASE_URL={server.url}'
+        )
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            self.stdout.write(f'Estadísticas: {dict(server.stats)}')
@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from marketplace.webhooks import BATCH_SIZE, process_inbox
+
+
+class Command(BaseCommand):
+    help = 'Procesa las notificaciones de pago pendientes (correr periódicamente o con --every)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+        parser.add_argument(
+            '--every', type=float, default=0,
+            help='Repetir cada N segundos en lugar de correr una sola vez',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            stats = process_inbox(batch_size=options['batch_size'])
+            if stats or not options['every']:
+                self.stdout.write(
+                    f"{stats['processed']:,} procesadas, {stats['ignored']:,} ignoradas, "
+                    f"{stats['retry']:,} a reintentar ({stats['failed']:,} fallidas), "
+                    f"{stats['orders']:,} órdenes actualizadas."
+                )
+            if not options['every']:
+                return
+            time.sleep(options['every'])
@@ -0,0 +1,17 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from marketplace.sales import rebuild
+
+
+class Command(BaseCommand):
+    help = 'Recalcula el resumen diario de ventas del dashboard desde las órdenes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', type=date.fromisoformat, help='Primer día (AAAA-MM-DD)')
+        parser.add_argument('--until', type=date.fromisoformat, help='Último día (AAAA-MM-DD)')
+
+    def handle(self, *args, **options):
+        rows = rebuild(options['since'], options['until'])
+        self.stdout.write(f'{rows:,} filas de resumen (día y estado) recalculadas.')
@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from marketplace.reservations import release_expired
+
+
+class Command(BaseCommand):
+    help = 'Devuelve al stock las reservas vencidas (correr periódicamente, p. ej. con cron)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--every', type=float, default=0,
+            help='Repetir cada N segundos en lugar de correr una sola vez',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            released = release_expired()
+            if released or not options['every']:
+                self.stdout.write(f'{released:,} reservas vencidas liberadas.')
+            if not options['every']:
+                return
+            time.sleep(options['every'])
@@ -0,0 +1,120 @@
+# Generated by Django 5.2.8 on 2026-10-18 20:04
+
+import re
+import unicodedata
+
+import django.contrib.postgres.search
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Copia congelada de ``marketplace.search`` al momento de esta migración: si
+# el analizador cambia después, el historial de migraciones no cambia con él
+PG_SEARCH_CONFIG = 'spanish_unaccent'
+FTS_TABLE = 'marketplace_product_fts'
+
+_TOKEN_RE = re.compile(r'[a-z0-9]+')
+_SUFFIXES = (
+    'amientos', 'imientos', 'amiento', 'imiento', 'aciones', 'uciones',
+    'adoras', 'adores', 'ancias', 'acion', 'ucion', 'adora', 'mente',
+    'ancia', 'ables', 'ibles', 'istas', 'ador', 'able', 'ible', 'ista',
+)
+
+
+def _stem(word):
+    if len(word) <= 3 or word.isdigit():
+        return word
+    for suffix in _SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            return word[:-len(suffix)]
+    if word.endswith('ces') and len(word) > 4:
+        word = word[:-3] + 'z'
+    elif word.endswith('es') and len(word) > 4:
+        word = word[:-2]
+    elif word.endswith('s') and len(word) > 3:
+        word = word[:-1]
+    if word[-1] in 'aeo' and len(word) > 4:
+        word = word[:-1]
+    return word
+
+
+def _analyze(text):
+    text = unicodedata.normalize('NFKD', text or '')
+    text = ''.join(c for c in text if not unicodedata.combining(c)).lower()
+    return ' '.join(_stem(token) for token in _TOKEN_RE.findall(text))
+
+
+def create_search_backend(apps, schema_editor):
+    """Crea el índice full-text según el motor de base de datos"""
+    connection = schema_editor.connection
+    Product = apps.get_model('marketplace', 'Product')
+    products = Product.objects.using(connection.alias)
+
+    if connection.vendor == 'postgresql':
+        schema_editor.execute('CREATE EXTENSION IF NOT EXISTS unaccent')
+        schema_editor.execute(
+            f"DO $$ BEGIN "
+            f"IF NOT EXISTS (SELECT 1 FROM pg_ts_config WHERE cfgname = '{PG_SEARCH_CONFIG}') THEN "
+            f"CREATE TEXT SEARCH CONFIGURATION {PG_SEARCH_CONFIG} (COPY = spanish); "
+            f"ALTER TEXT SEARCH CONFIGURATION {PG_SEARCH_CONFIG} "
+            f"ALTER MAPPING FOR hword, hword_part, word WITH unaccent, spanish_stem; "
+            f"END IF; END $$"
+        )
+        schema_editor.execute(
+            'CREATE INDEX IF NOT EXISTS marketplace_product_search_gin '
+            'ON marketplace_product USING gin (search_vector)'
+        )
+        schema_editor.execute(
+            f"UPDATE marketplace_product SET search_vector = "
+            f"setweight(to_tsvector('{PG_SEARCH_CONFIG}', coalesce(name, '')), 'A') || "
+            f"setweight(to_tsvector('{PG_SEARCH_CONFIG}', coalesce(description, '')), 'B')"
+        )
+    elif connection.vendor == 'sqlite':
+        schema_editor.execute(
+            f'CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} '
+            f'USING fts5(name, description, tokenize="unicode61 remove_diacritics 2")'
+        )
+        rows = [
+            (product_id, _analyze(name), _analyze(description))
+            for product_id, name, description in products.values_list('id', 'name', 'description')
+        ]
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'INSERT OR REPLACE INTO {FTS_TABLE} (rowid, name, description) VALUES (%s, %s, %s)',
+                rows,
+            )
+
+
+def drop_search_backend(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS marketplace_product_search_gin')
+    elif connection.vendor == 'sqlite':
+        schema_editor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('marketplace', '0005_alter_order_options_alter_orderitem_options_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True, verbose_name='Vector de búsqueda'),
+        ),
+        migrations.RunPython(create_search_backend, drop_search_backend),
+        migrations.CreateModel(
+            name='ProductSearchEntry',
+            fields=[
+                ('product', models.OneToOneField(db_column='rowid', db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search_entry', serialize=False, to='marketplace.product')),
+                ('name', models.TextField()),
+                ('description', models.TextField()),
+            ],
+            options={
+                'db_table': 'marketplace_product_fts',
+                'managed': False,
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.8 on 2026-10-18 20:20
+
+from django.db import migrations, models
+
+
+def create_version_row(apps, schema_editor):
+    CatalogVersion = apps.get_model('marketplace', 'CatalogVersion')
+    CatalogVersion.objects.using(schema_editor.connection.alias).get_or_create(pk=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('marketplace', '0008_product_updated_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveBigIntegerField(default=1, verbose_name='Versión')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Versión del catálogo',
+                'verbose_name_plural': 'Versión del catálogo',
+            },
+        ),
+        migrations.RunPython(create_version_row, migrations.RunPython.noop),
+    ]
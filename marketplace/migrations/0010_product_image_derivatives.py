@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 20:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('marketplace', '0009_catalog_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='image_derivatives',
+            field=models.PositiveSmallIntegerField(default=0, editable=False, verbose_name='Derivados de imagen'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.8 on 2026-10-18 20:32
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('marketplace', '0010_product_image_derivatives'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CartLine',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('owner', models.CharField(max_length=32, verbose_name='Dueño')),
+                ('quantity', models.PositiveIntegerField(verbose_name='Cantidad')),
+                ('price', models.DecimalField(decimal_places=2, help_text='Precio al momento de agregarlo', max_digits=10, verbose_name='Precio')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='marketplace.product', verbose_name='Producto')),
+            ],
+            options={
+                'verbose_name': 'Línea de carrito',
+                'verbose_name_plural': 'Líneas de carrito',
+                'constraints': [models.UniqueConstraint(fields=('owner', 'product'), name='cart_line_owner_product')],
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.8 on 2026-10-18 20:36
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('marketplace', '0011_cart_line'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockReservation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('reference', models.CharField(db_index=True, max_length=64, verbose_name='Referencia')),
+                ('quantity', models.PositiveIntegerField(verbose_name='Cantidad')),
+                ('status', models.CharField(choices=[('held', 'Retenida'), ('committed', 'Confirmada'), ('released', 'Liberada')], default='held', max_length=10, verbose_name='Estado')),
+                ('expires_at', models.DateTimeField(verbose_name='Vence')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservations', to='marketplace.product', verbose_name='Producto')),
+            ],
+            options={
+                'verbose_name': 'Reserva de stock',
+                'verbose_name_plural': 'Reservas de stock',
+                'indexes': [models.Index(fields=['status', 'expires_at'], name='reservation_sweep_idx')],
+            },
+        ),
+    ]
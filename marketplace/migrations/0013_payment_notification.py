@@ -0,0 +1,38 @@
+# Generated by Django 5.2.8 on 2026-10-18 20:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('marketplace', '0012_stock_reservation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='external_reference',
+            field=models.CharField(blank=True, db_index=True, max_length=64, null=True, verbose_name='Referencia externa'),
+        ),
+        migrations.CreateModel(
+            name='PaymentNotification',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('notification_id', models.CharField(max_length=64, unique=True, verbose_name='ID de notificación')),
+                ('topic', models.CharField(max_length=32, verbose_name='Tipo')),
+                ('resource_id', models.CharField(blank=True, max_length=64, verbose_name='ID del recurso')),
+                ('payload', models.JSONField(default=dict, verbose_name='Contenido')),
+                ('status', models.CharField(choices=[('pending', 'Pendiente'), ('processed', 'Procesada'), ('ignored', 'Ignorada'), ('failed', 'Fallida')], default='pending', max_length=10, verbose_name='Estado')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='Intentos')),
+                ('error', models.CharField(blank=True, max_length=255, verbose_name='Error')),
+                ('received_at', models.DateTimeField(auto_now_add=True, verbose_name='Recibida')),
+                ('processed_at', models.DateTimeField(blank=True, null=True, verbose_name='Procesada')),
+            ],
+            options={
+                'verbose_name': 'Notificación de pago',
+                'verbose_name_plural': 'Notificaciones de pago',
+                'indexes': [models.Index(fields=['status', 'id'], name='notification_inbox_idx')],
+            },
+        ),
+    ]
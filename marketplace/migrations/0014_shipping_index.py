@@ -0,0 +1,45 @@
+# Generated by Django 5.2.8 on 2026-10-18 20:48
+
+from decimal import Decimal
+
+from django.db import migrations, models
+
+# Las mismas tarifas que antes estaban fijas en calculate_shipping
+DEFAULT_ZONES = [
+    ('CABA', Decimal('1500'), '24-48 horas', '1000', '1499'),
+    ('GBA', Decimal('2000'), '48-72 horas', '1500', '1999'),
+    ('Interior', Decimal('3500'), '5-7 días', '2000', '9999'),
+]
+
+
+def create_default_zones(apps, schema_editor):
+    ShippingOption = apps.get_model('marketplace', 'ShippingOption')
+    ShippingZone = apps.get_model('marketplace', 'ShippingZone')
+    if ShippingZone.objects.exists():
+        return
+    for name, price, days, start, end in DEFAULT_ZONES:
+        option = ShippingOption.objects.create(name=name, price=price, estimated_days=days)
+        ShippingZone.objects.create(
+            name=name, postal_code_start=start, postal_code_end=end, shipping_option=option
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('marketplace', '0013_payment_notification'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='shippingoption',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='shippingzone',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.RunPython(create_default_zones, migrations.RunPython.noop),
+    ]
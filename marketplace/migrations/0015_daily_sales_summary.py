@@ -0,0 +1,51 @@
+# Generated by Django 5.2.8 on 2026-10-18 20:50
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+
+
+def build_summary(apps, schema_editor):
+    """Primera carga desde las órdenes existentes (como rebuild_sales_summary)"""
+    Order = apps.get_model('marketplace', 'Order')
+    DailySalesSummary = apps.get_model('marketplace', 'DailySalesSummary')
+    rows = (
+        Order.objects.annotate(day=TruncDate('created_at'))
+        .values('day', 'status')
+        .annotate(order_count=Count('id'), revenue=Sum('total'))
+        .order_by()
+    )
+    DailySalesSummary.objects.bulk_create([
+        DailySalesSummary(
+            date=row['day'], status=row['status'],
+            order_count=row['order_count'], revenue=row['revenue'] or 0,
+        )
+        for row in rows
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('marketplace', '0014_shipping_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailySalesSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Fecha')),
+                ('status', models.CharField(choices=[('pending', 'Pendiente'), ('paid', 'Pagado'), ('processing', 'Procesando'), ('shipped', 'Enviado'), ('delivered', 'Entregado'), ('cancelled', 'Cancelado')], max_length=20, verbose_name='Estado')),
+                ('order_count', models.IntegerField(default=0, verbose_name='Órdenes')),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Monto')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Resumen diario de ventas',
+                'verbose_name_plural': 'Resúmenes diarios de ventas',
+                'constraints': [models.UniqueConstraint(fields=('date', 'status'), name='daily_sales_date_status')],
+            },
+        ),
+        migrations.RunPython(build_summary, migrations.RunPython.noop),
+    ]
@@ -1,9 +1,13 @@
 # === models.py - Modelos Django Optimizados ===
 
 from django.db import models
+from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator
 from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.search import SearchVectorField
+
+from . import images
 
 # Obtener el modelo de usuario de forma compatible
 User = get_user_model()
@@ -56,6 +60,13 @@ class Product(models.Model):
         help_text="Imagen principal del producto"
     )
     
+    # Versión del pipeline de imágenes con la que se generaron los derivados (0 = ninguno)
+    image_derivatives = models.PositiveSmallIntegerField(
+        default=0,
+        editable=False,
+        verbose_name="Derivados de imagen"
+    )
+    
     # Gestión de inventario
     stock = models.PositiveIntegerField(
         default=0,
@@ -69,6 +80,13 @@ class Product(models.Model):
         help_text="¿El producto está disponible para la venta?"
     )
     
+    # Búsqueda full-text (PostgreSQL); en SQLite se usa la tabla FTS5
+    search_vector = SearchVectorField(
+        null=True,
+        editable=False,
+        verbose_name="Vector de búsqueda"
+    )
+    
     # Metadata
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -81,6 +99,12 @@ class Product(models.Model):
             models.Index(fields=['category', 'available']),
             models.Index(fields=['created_at']),
             models.Index(fields=['price']),
+            # Paginación keyset: un índice por cada orden de product_list
+            models.Index(fields=['available', 'name', 'id'], name='product_keyset_name_idx'),
+            models.Index(fields=['available', 'price', 'id'], name='product_keyset_price_idx'),
+            models.Index(fields=['available', 'created_at', 'id'], name='product_keyset_newest_idx'),
+            # GET condicional: MAX(updated_at) sin recorrer la tabla
+            models.Index(fields=['updated_at'], name='product_updated_idx'),
         ]
     
     def __str__(self):
@@ -91,6 +115,14 @@ class Product(models.Model):
         """Formatea el precio en formato pesos argentinos"""
         return f"${self.price:,.2f}".replace(',', '.')
     
+    def get_image_url(self, size='card', fmt='jpeg'):
+        """URL de la imagen en un tamaño derivado (o la original si no hay derivados)"""
+        return images.image_url(self.image.name, self.image_derivatives, size, fmt)
+    
+    def get_image_srcset(self, fmt='jpeg'):
+        """srcset con los tamaños thumb, card y detail"""
+        return images.image_srcset(self.image.name, self.image_derivatives, fmt)
+    
     def is_in_stock(self):
         """Verifica si el producto está en stock"""
         return self.stock > 0 and self.available
@@ -105,6 +137,131 @@ class Product(models.Model):
             return "en_stock"
 
 
+class ProductSearchEntry(models.Model):
+    """
+    Fila de la tabla FTS5 de ``search.py`` (solo SQLite), con el texto ya
+    analizado. La tabla la crea la migración 0006 y no la maneja Django:
+    el modelo solo sirve para unirla a ``Product`` en las búsquedas.
+    """
+
+    product = models.OneToOneField(
+        Product,
+        on_delete=models.DO_NOTHING,
+        primary_key=True,
+        db_column='rowid',
+        db_constraint=False,
+        related_name='search_entry',
+    )
+    name = models.TextField()
+    description = models.TextField()
+
+    class Meta:
+        managed = False
+        db_table = 'marketplace_product_fts'
+
+
+class CatalogVersion(models.Model):
+    """
+    Versión del catálogo compartida entre workers (una sola fila).
+    Se incrementa con cada alta, edición o baja de un producto.
+    """
+    
+    version = models.PositiveBigIntegerField(default=1, verbose_name="Versión")
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = "Versión del catálogo"
+        verbose_name_plural = "Versión del catálogo"
+    
+    def __str__(self):
+        return f"Catálogo v{self.version}"
+
+
+class CartLine(models.Model):
+    """
+    Línea de carrito para ``cart_storage.DatabaseCartStorage``.
+    Una fila por producto: cada cambio escribe solo esa fila.
+    """
+
+    # Token guardado en la sesión (sobrevive al login, que rota la sesión)
+    owner = models.CharField(max_length=32, verbose_name="Dueño")
+
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        related_name="+",
+        verbose_name="Producto"
+    )
+
+    quantity = models.PositiveIntegerField(verbose_name="Cantidad")
+
+    price = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        verbose_name="Precio",
+        help_text="Precio al momento de agregarlo"
+    )
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Línea de carrito"
+        verbose_name_plural = "Líneas de carrito"
+        constraints = [
+            models.UniqueConstraint(fields=['owner', 'product'], name='cart_line_owner_product'),
+        ]
+
+    def __str__(self):
+        return f"{self.owner}: {self.quantity} x {self.product_id}"
+
+
+class StockReservation(models.Model):
+    """
+    Stock retenido durante el pago (ver ``reservations.py``).
+    Al crearla ya se descontó de ``Product.stock``; si vence sin
+    confirmarse, el barrido lo devuelve.
+    """
+
+    STATUS_CHOICES = [
+        ('held', 'Retenida'),
+        ('committed', 'Confirmada'),
+        ('released', 'Liberada'),
+    ]
+
+    # external_reference de la preferencia de MercadoPago
+    reference = models.CharField(max_length=64, db_index=True, verbose_name="Referencia")
+
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        related_name="reservations",
+        verbose_name="Producto"
+    )
+
+    quantity = models.PositiveIntegerField(verbose_name="Cantidad")
+
+    status = models.CharField(
+        max_length=10,
+        choices=STATUS_CHOICES,
+        default='held',
+        verbose_name="Estado"
+    )
+
+    expires_at = models.DateTimeField(verbose_name="Vence")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Reserva de stock"
+        verbose_name_plural = "Reservas de stock"
+        indexes = [
+            # Barrido de reservas vencidas
+            models.Index(fields=['status', 'expires_at'], name='reservation_sweep_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.reference}: {self.quantity} x {self.product_id} ({self.status})"
+
+
 class Order(models.Model):
     """
     Modelo para órdenes de compra
@@ -163,6 +320,16 @@ class Order(models.Model):
         help_text="ID de la transacción en MercadoPago"
     )
     
+    # external_reference de la preferencia (la misma de StockReservation):
+    # las notificaciones de pago llegan con este valor
+    external_reference = models.CharField(
+        max_length=64,
+        blank=True,
+        null=True,
+        db_index=True,
+        verbose_name="Referencia externa"
+    )
+    
     # Metadata
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -235,6 +402,75 @@ class OrderItem(models.Model):
         return self.quantity * self.price
 
 
+class DailySalesSummary(models.Model):
+    """
+    Órdenes y montos por día y estado, para el dashboard (ver ``sales.py``).
+    Se actualiza al crear o cambiar órdenes; ``rebuild_sales_summary`` la
+    recalcula desde ``Order``.
+    """
+
+    date = models.DateField(verbose_name="Fecha")
+    status = models.CharField(max_length=20, choices=Order.STATUS_CHOICES, verbose_name="Estado")
+    order_count = models.IntegerField(default=0, verbose_name="Órdenes")
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name="Monto")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Resumen diario de ventas"
+        verbose_name_plural = "Resúmenes diarios de ventas"
+        constraints = [
+            # También es el índice de las consultas por rango de fechas
+            models.UniqueConstraint(fields=['date', 'status'], name='daily_sales_date_status'),
+        ]
+
+    def __str__(self):
+        return f"{self.date} {self.status}: {self.order_count} (${self.revenue})"
+
+
+class PaymentNotification(models.Model):
+    """
+    Bandeja de entrada de notificaciones de MercadoPago (ver ``webhooks.py``).
+    El webhook solo inserta; ``process_payment_notifications`` la procesa.
+    """
+
+    STATUS_CHOICES = [
+        ('pending', 'Pendiente'),
+        ('processed', 'Procesada'),
+        ('ignored', 'Ignorada'),
+        ('failed', 'Fallida'),
+    ]
+
+    # Los reintentos de MercadoPago repiten el id: la restricción única
+    # descarta los duplicados en el INSERT
+    notification_id = models.CharField(max_length=64, unique=True, verbose_name="ID de notificación")
+    topic = models.CharField(max_length=32, verbose_name="Tipo")
+    resource_id = models.CharField(max_length=64, blank=True, verbose_name="ID del recurso")
+    payload = models.JSONField(default=dict, verbose_name="Contenido")
+
+    status = models.CharField(
+        max_length=10,
+        choices=STATUS_CHOICES,
+        default='pending',
+        verbose_name="Estado"
+    )
+    attempts = models.PositiveSmallIntegerField(default=0, verbose_name="Intentos")
+    error = models.CharField(max_length=255, blank=True, verbose_name="Error")
+
+    received_at = models.DateTimeField(auto_now_add=True, verbose_name="Recibida")
+    processed_at = models.DateTimeField(null=True, blank=True, verbose_name="Procesada")
+
+    class Meta:
+        verbose_name = "Notificación de pago"
+        verbose_name_plural = "Notificaciones de pago"
+        indexes = [
+            # El worker lee las pendientes en orden de llegada
+            models.Index(fields=['status', 'id'], name='notification_inbox_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.topic} {self.resource_id} ({self.notification_id})"
+
+
 class ShippingOption(models.Model):
     """
     Modelo para opciones de envío
@@ -272,6 +508,9 @@ class ShippingOption(models.Model):
         help_text="¿Esta opción de envío está disponible?"
     )
     
+    # Huella del índice de envíos (ver shipping.py)
+    updated_at = models.DateTimeField(auto_now=True)
+    
     class Meta:
         verbose_name = "Opción de Envío"
         verbose_name_plural = "Opciones de Envío"
@@ -312,6 +551,8 @@ class ShippingZone(models.Model):
         verbose_name="Opción de Envío"
     )
     
+    updated_at = models.DateTimeField(auto_now=True)
+    
     class Meta:
         verbose_name = "Zona de Envío"
         verbose_name_plural = "Zonas de Envío"
@@ -319,4 +560,20 @@ class ShippingZone(models.Model):
     
     def __str__(self):
         """Representación legible de la zona de envío"""
-        return f"{self.name} ({self.postal_code_start}-{self.postal_code_end})"
\ No newline at end of file
+        return f"{self.name} ({self.postal_code_start}-{self.postal_code_end})"
+    
+    def clean(self):
+        """Los extremos se comparan como números (1425 o C1425ABC)"""
+        from .shipping import normalize_postal_code
+        
+        start = normalize_postal_code(self.postal_code_start)
+        end = normalize_postal_code(self.postal_code_end)
+        errors = {}
+        if start is None:
+            errors['postal_code_start'] = 'Código postal no válido'
+        if end is None:
+            errors['postal_code_end'] = 'Código postal no válido'
+        if not errors and start > end:
+            errors['postal_code_end'] = 'El fin del rango es menor que el inicio'
+        if errors:
+            raise ValidationError(errors)
\ No newline at end of file
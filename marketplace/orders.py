@@ -0,0 +1,109 @@
+# === orders.py - Creación de órdenes a partir del carrito ===
+"""
+Dos pasos, para armar la preferencia de MercadoPago y la orden con los
+mismos precios::
+
+    lines, subtotal = price_cart(cart)
+    ... crear la preferencia con ``lines`` ...
+    order = place_order(lines, customer, mercadopago_id=preference['id'], reference=reference)
+
+``price_cart`` toma los precios actuales de los productos (no los guardados
+en el carrito al agregar) con la misma consulta ``.only()`` que usa el
+carrito, compartida en el request. ``place_order`` hace un INSERT de la
+orden y un ``bulk_create`` de los ítems dentro de una transacción: la
+cantidad de consultas no depende de la cantidad de líneas.
+
+Los cambios de estado en lote pasan por ``update_status``, que mantiene el
+resumen diario de ventas (``sales.py``).
+"""
+
+from collections import namedtuple
+from decimal import Decimal
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Order, OrderItem
+from .sales import SalesDeltas
+
+OrderLine = namedtuple('OrderLine', ['product', 'quantity', 'price', 'total_price'])
+
+CUSTOMER_FIELDS = ('first_name', 'last_name', 'email', 'address', 'city', 'phone')
+
+
+class EmptyCart(Exception):
+    """El carrito no tiene líneas con productos existentes"""
+
+
+def price_cart(cart):
+    """Líneas del carrito con el precio actual. Devuelve ``(lines, subtotal)``"""
+    products = cart.load_products()
+    lines = []
+    for product_id, item in cart.cart.items():
+        product = products.get(product_id)
+        if product is None:  # borrado después de agregarlo
+            continue
+        lines.append(OrderLine(product, item['quantity'], product.price, product.price * item['quantity']))
+    if not lines:
+        raise EmptyCart()
+    return lines, sum((line.total_price for line in lines), Decimal('0'))
+
+
+def customer_from_user(user):
+    """Datos del cliente a partir del usuario (los que falten quedan vacíos)"""
+    if not user or not user.is_authenticated:
+        return {}
+    return {
+        'first_name': user.first_name,
+        'last_name': user.last_name,
+        'email': user.email,
+        'phone': getattr(user, 'phone_number', '') or '',
+    }
+
+
+def place_order(lines, customer, user=None, shipping_price=0, mercadopago_id=None,
+                reference=None, using='default'):
+    """
+    Crea la ``Order`` pendiente y sus ``OrderItem`` en una transacción.
+    ``total`` incluye el envío. ``reference`` es el ``external_reference`` de
+    la preferencia, con el que llegan las notificaciones de pago.
+    """
+    if not lines:
+        raise EmptyCart()
+    subtotal = sum((line.total_price for line in lines), Decimal('0'))
+    order = Order(
+        user=user if user is not None and user.is_authenticated else None,
+        total=subtotal + Decimal(str(shipping_price or 0)),
+        mercadopago_id=mercadopago_id,
+        external_reference=reference,
+        **{field: customer.get(field) or '' for field in CUSTOMER_FIELDS},
+    )
+    with transaction.atomic(using=using):
+        order.save(using=using)
+        OrderItem.objects.using(using).bulk_create([
+            OrderItem(order=order, product=line.product, quantity=line.quantity, price=line.price)
+            for line in lines
+        ])
+    return order
+
+
+def update_status(queryset, status, using='default'):
+    """
+    ``queryset.update(status=...)`` que también actualiza el resumen diario
+    de ventas (``update()`` no dispara señales). Devuelve cuántas cambiaron.
+    """
+    with transaction.atomic(using=using):
+        rows = list(
+            queryset.using(using).exclude(status=status).select_for_update()
+            .values_list('id', 'created_at', 'status', 'total')
+        )
+        if not rows:
+            return 0
+        Order.objects.using(using).filter(id__in=[row[0] for row in rows]).update(
+            status=status, updated_at=timezone.now()
+        )
+        deltas = SalesDeltas()
+        for _, created_at, old_status, total in rows:
+            deltas.move(created_at, (old_status, total), (status, total))
+        deltas.apply(using)
+    return len(rows)
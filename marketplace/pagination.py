@@ -0,0 +1,124 @@
+# === pagination.py - Paginación por cursor (keyset) para listados ===
+"""
+Paginación keyset: en lugar de OFFSET, cada página pide las filas que vienen
+*después* de la última fila vista según el orden activo, con ``id`` como
+desempate estable. El costo por página es constante sin importar qué tan
+profundo se navegue, y usa los índices compuestos ``(available, <orden>, id)``
+de ``Product``.
+
+El cursor es un JSON en base64 con la clave de orden y los valores de la
+última fila; si no se puede decodificar se vuelve a la primera página.
+"""
+
+import base64
+import binascii
+import datetime
+import json
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+
+PAGE_SIZE = getattr(settings, 'PRODUCTS_PER_PAGE', 24)
+
+# Orden de cada opción de ``sort`` (siempre termina en id)
+SORT_ORDERINGS = {
+    'name': ('name', 'id'),
+    'price_low': ('price', 'id'),
+    'price_high': ('-price', '-id'),
+    'newest': ('-created_at', '-id'),
+    'relevance': ('-search_rank', 'id'),
+}
+
+
+class KeysetPage:
+    """Una página de resultados y el cursor para pedir la siguiente"""
+
+    def __init__(self, items, next_cursor):
+        self.items = items
+        self.next_cursor = next_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+# =============================================================================
+# CURSORES
+# =============================================================================
+
+def _serialize(value):
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    return value
+
+
+def encode_cursor(sort_by, ordering, obj):
+    """Cursor que apunta a la fila siguiente a ``obj``"""
+    values = [_serialize(getattr(obj, field.lstrip('-'))) for field in ordering]
+    payload = json.dumps({'s': sort_by, 'v': values}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, sort_by, ordering, model):
+    """Valores de la última fila vista, o None si el cursor no es válido"""
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if payload['s'] != sort_by or len(payload['v']) != len(ordering):
+            return None
+        values = []
+        for field_name, value in zip(ordering, payload['v']):
+            name = field_name.lstrip('-')
+            if name == 'search_rank':
+                values.append(float(value))
+            else:
+                values.append(model._meta.get_field(name).to_python(value))
+        return values
+    except (ValueError, TypeError, KeyError, binascii.Error, ValidationError, FieldDoesNotExist):
+        return None
+
+
+# =============================================================================
+# FILTRO KEYSET
+# =============================================================================
+
+def _keyset_q(ordering, values):
+    """(a, b) > (va, vb) respetando la dirección de cada campo"""
+    condition = Q()
+    for i, field_name in enumerate(ordering):
+        name = field_name.lstrip('-')
+        lookup = 'lt' if field_name.startswith('-') else 'gt'
+        term = Q(**{f'{name}__{lookup}': values[i]})
+        for previous, value in zip(ordering[:i], values[:i]):
+            term &= Q(**{previous.lstrip('-'): value})
+        condition |= term
+    return condition
+
+
+def paginate(queryset, sort_by, cursor=None, page_size=PAGE_SIZE):
+    """Devuelve la página de ``queryset`` que sigue a ``cursor``"""
+    ordering = SORT_ORDERINGS.get(sort_by) or SORT_ORDERINGS['name']
+    queryset = queryset.order_by(*ordering)
+
+    values = decode_cursor(cursor, sort_by, ordering, queryset.model)
+    if values is not None:
+        queryset = queryset.filter(_keyset_q(ordering, values))
+
+    items = list(queryset[:page_size + 1])
+    next_cursor = None
+    if len(items) > page_size:
+        items = items[:page_size]
+        next_cursor = encode_cursor(sort_by, ordering, items[-1])
+    return KeysetPage(items, next_cursor)
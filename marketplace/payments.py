@@ -0,0 +1,224 @@
+# === payments.py - Cliente de MercadoPago compartido ===
+"""
+Un solo ``mercadopago.SDK`` por proceso, con conexiones keep-alive y
+timeouts explícitos::
+
+    from marketplace import payments
+
+    preference = payments.create_preference(data, idempotency_key=key)
+
+El SDK por defecto abre un ``requests.Session`` nuevo en cada llamada (un
+handshake TLS por pago) y usa 60 s de timeout. ``PooledHttpClient`` guarda
+una sesión por hilo y respeta ``MERCADOPAGO_TIMEOUT``.
+
+También hay una caché corta de preferencias (``recent_preference`` /
+``remember_preference``): si el mismo carrito con el mismo envío se envía
+otra vez (doble clic, reintento) se devuelve la preferencia ya creada.
+``preference_lock`` serializa los envíos simultáneos de la misma clave: el
+primero marca la clave como pendiente y crea la preferencia fuera del lock.
+
+``MERCADOPAGO_API_BASE_URL`` permite apuntar a un servidor falso local
+(``manage.py fake_mercadopago``) para medir sin red.
+"""
+
+import hashlib
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+import mercadopago
+import requests
+from django.conf import settings
+from django.core.cache import cache
+from mercadopago.config import RequestOptions
+from mercadopago.http import HttpClient
+from requests.adapters import HTTPAdapter
+from urllib3.util import Retry
+
+logger = logging.getLogger(__name__)
+
+MERCADOPAGO_API_URL = 'https://api.mercadopago.com'
+PREFERENCE_KEY_PREFIX = 'mp:preference:'
+LOCK_POLL_INTERVAL = 0.05
+
+# Valor de la caché de preferencias mientras se está creando
+PENDING_PREFERENCE = {'pending': True}
+
+
+class PaymentError(Exception):
+    """MercadoPago no respondió o rechazó la operación"""
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+# =============================================================================
+# CLIENTE HTTP
+# =============================================================================
+
+class PooledHttpClient(HttpClient):
+    """
+    ``HttpClient`` del SDK con una ``requests.Session`` por hilo (keep-alive)
+    y los timeouts de ``MERCADOPAGO_TIMEOUT`` en lugar de los del SDK.
+    """
+
+    def __init__(self, base_url=None, timeout=None, max_retries=None, pool_size=10):
+        self.base_url = (base_url or _setting('MERCADOPAGO_API_BASE_URL', MERCADOPAGO_API_URL)).rstrip('/')
+        self.timeout = timeout or _setting('MERCADOPAGO_TIMEOUT', (3.05, 10))
+        self.max_retries = _setting('MERCADOPAGO_MAX_RETRIES', 2) if max_retries is None else max_retries
+        self.pool_size = pool_size
+        self._local = threading.local()
+
+    @property
+    def session(self):
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = requests.Session()
+            # POST no se reintenta en errores de lectura (urllib3 por defecto):
+            # solo fallas de conexión y 429/5xx en GET
+            retry = Retry(
+                total=self.max_retries, backoff_factor=0.2,
+                status_forcelist=[429, 500, 502, 503, 504],
+            )
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, max_retries=retry)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            self._local.session = session
+        return session
+
+    def request(self, method, url, maxretries=None, **kwargs):
+        if url.startswith(MERCADOPAGO_API_URL):
+            url = self.base_url + url[len(MERCADOPAGO_API_URL):]
+        kwargs['timeout'] = self.timeout
+        response = self.session.request(method, url, **kwargs)
+        result = {'status': response.status_code, 'response': None}
+        if response.status_code != 204 and response.content:
+            try:
+                result['response'] = response.json()
+            except ValueError:
+                logger.warning('Respuesta no JSON de MercadoPago (%s %s)', method, url)
+        return result
+
+    def get(self, url, headers, params=None, timeout=None, maxretries=None):
+        return self.request('GET', url, headers=headers, params=params)
+
+    def post(self, url, headers, data=None, params=None, timeout=None, maxretries=None):
+        return self.request('POST', url, headers=headers, data=data, params=params)
+
+    def put(self, url, headers, data=None, params=None, timeout=None, maxretries=None):
+        return self.request('PUT', url, headers=headers, data=data, params=params)
+
+    def delete(self, url, headers, params=None, timeout=None, maxretries=None):
+        return self.request('DELETE', url, headers=headers, params=params)
+
+
+_sdk = None
+_sdk_token = None
+_sdk_lock = threading.Lock()
+
+
+def get_sdk():
+    """SDK compartido por el proceso (se recrea si cambia el token)"""
+    global _sdk, _sdk_token
+
+    token = _setting('MERCADOPAGO_ACCESS_TOKEN', None)
+    if not token:
+        raise PaymentError('MERCADOPAGO_ACCESS_TOKEN no está configurado')
+    base_url = _setting('MERCADOPAGO_API_BASE_URL', MERCADOPAGO_API_URL)
+    if _sdk is None or _sdk_token != (token, base_url):
+        with _sdk_lock:
+            if _sdk is None or _sdk_token != (token, base_url):
+                _sdk = mercadopago.SDK(token, http_client=PooledHttpClient(base_url=base_url))
+                _sdk_token = (token, base_url)
+    return _sdk
+
+
+def create_preference(data, idempotency_key=None):
+    """Crea la preferencia y devuelve la respuesta de MercadoPago"""
+    options = None
+    if idempotency_key:
+        # MercadoPago descarta un segundo POST con la misma clave
+        options = RequestOptions(custom_headers={'x-idempotency-key': idempotency_key})
+    try:
+        result = get_sdk().preference().create(data, options)
+    except requests.RequestException as exc:
+        raise PaymentError(f'No se pudo contactar a MercadoPago: {exc}') from exc
+    if result['status'] not in (200, 201) or not result['response']:
+        raise PaymentError(f"MercadoPago respondió {result['status']}")
+    return result['response']
+
+
+def get_payment(payment_id):
+    """Detalle del pago, o None si MercadoPago no lo conoce"""
+    try:
+        result = get_sdk().payment().get(payment_id)
+    except requests.RequestException as exc:
+        raise PaymentError(f'No se pudo contactar a MercadoPago: {exc}') from exc
+    if result['status'] == 404:
+        return None
+    if result['status'] != 200 or not result['response']:
+        raise PaymentError(f"MercadoPago respondió {result['status']}")
+    return result['response']
+
+
+# =============================================================================
+# DEDUPLICACIÓN DE PREFERENCIAS
+# =============================================================================
+
+def preference_key(owner, items):
+    """Clave del carrito: comprador + ítems (precio y cantidad) + envío"""
+    payload = json.dumps([owner, items], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()[:32]
+
+
+def recent_preference(key):
+    """Preferencia creada hace poco para la misma clave, o None"""
+    return cache.get(PREFERENCE_KEY_PREFIX + key)
+
+
+def remember_preference(key, data):
+    cache.set(PREFERENCE_KEY_PREFIX + key, data, _setting('MERCADOPAGO_PREFERENCE_DEDUP_TTL', 120))
+
+
+def forget_preference(key):
+    if key:
+        cache.delete(PREFERENCE_KEY_PREFIX + key)
+
+
+def is_pending(preference):
+    return bool(preference and preference.get('pending'))
+
+
+def mark_preference_pending(key):
+    """
+    Marca la clave mientras otro request crea la preferencia (la llamada a
+    MercadoPago se hace fuera del lock). Vence cuando ya no puede seguir en
+    curso: timeouts de conexión y lectura por cada intento.
+    """
+    connect, read = _setting('MERCADOPAGO_TIMEOUT', (3.05, 10))
+    timeout = (connect + read) * (_setting('MERCADOPAGO_MAX_RETRIES', 2) + 1)
+    cache.set(PREFERENCE_KEY_PREFIX + key, PENDING_PREFERENCE, timeout)
+
+
+@contextmanager
+def preference_lock(key, timeout=None):
+    """
+    Serializa la consulta de ``recent_preference`` y la marca de pendiente
+    de la misma clave. Devuelve si se obtuvo el lock: si no, otro request
+    lo tiene y hay que usar (o esperar) su preferencia.
+    """
+    timeout = timeout or sum(_setting('MERCADOPAGO_TIMEOUT', (3.05, 10)))
+    lock_key = f'{PREFERENCE_KEY_PREFIX}lock:{key}'
+    deadline = time.monotonic() + timeout
+    acquired = cache.add(lock_key, 1, timeout)
+    while not acquired and time.monotonic() < deadline:
+        time.sleep(LOCK_POLL_INTERVAL)
+        acquired = cache.add(lock_key, 1, timeout)
+    try:
+        yield acquired
+    finally:
+        if acquired:
+            cache.delete(lock_key)
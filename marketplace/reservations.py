@@ -0,0 +1,183 @@
+# === reservations.py - Reservas de stock durante el pago ===
+"""
+Al iniciar el pago el stock del carrito se descuenta de ``Product.stock`` y
+queda retenido en ``StockReservation`` por ``STOCK_RESERVATION_TTL``
+segundos:
+
+- ``reserve``: descuenta cada línea con un ``UPDATE ... SET stock = stock - n
+  WHERE stock >= n``. El control y el descuento son una sola sentencia, así
+  dos compras simultáneas no pueden vender la misma unidad y no hace falta
+  un lock global. Todo o nada: si una línea no alcanza se revierte el resto.
+- ``commit``: el pago se aprobó, la reserva queda confirmada.
+- ``release``: el pago falló o se reintenta, el stock vuelve.
+- ``release_expired``: barrido periódico de reservas vencidas
+  (``manage.py release_expired_reservations``).
+
+Como ``Product.stock`` ya descuenta lo retenido, las validaciones del
+carrito siguen usando ese campo sin cambios. Los ``UPDATE`` no disparan
+señales: cada cambio de stock sube la versión del catálogo al confirmarse
+la transacción (grillas, facetas, validadores y snapshot).
+"""
+
+import logging
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .catalog import bump_catalog_version
+from .models import Product, StockReservation
+from .snapshot import catalog_snapshot
+
+logger = logging.getLogger(__name__)
+
+SWEEP_BATCH = 500
+
+
+class InsufficientStock(Exception):
+    """No hay stock para una de las líneas"""
+
+    def __init__(self, product_id, quantity):
+        self.product_id = product_id
+        self.quantity = quantity
+        super().__init__(f'Stock insuficiente para el producto {product_id} ({quantity} u.)')
+
+
+def reservation_ttl():
+    return timedelta(seconds=getattr(settings, 'STOCK_RESERVATION_TTL', 15 * 60))
+
+
+def _stock_changed(using):
+    """Invalida lo derivado del catálogo cuando la transacción se confirma"""
+    transaction.on_commit(lambda: bump_catalog_version(using), using=using)
+    transaction.on_commit(catalog_snapshot.mark_stale, using=using)
+
+
+def _decrement(product_id, quantity, now, using):
+    """Descuenta si alcanza; devuelve False si no"""
+    # update() no dispara señales: updated_at invalida tarjeta y detalle cacheados
+    return Product.objects.using(using).filter(pk=product_id, stock__gte=quantity).update(
+        stock=F('stock') - quantity, updated_at=now
+    ) == 1
+
+
+def _restore(rows, using):
+    """Devuelve al stock las filas ``(product_id, quantity)``"""
+    now = timezone.now()
+    totals = Counter()
+    for product_id, quantity in rows:
+        totals[product_id] += quantity
+    for product_id in sorted(totals):
+        Product.objects.using(using).filter(pk=product_id).update(
+            stock=F('stock') + totals[product_id], updated_at=now
+        )
+
+
+def reserve(reference, lines, ttl=None, using='default'):
+    """
+    Retiene ``lines`` (pares ``(product_id, quantity)``) bajo ``reference``.
+    Lanza ``InsufficientStock`` sin retener nada si alguna línea no alcanza.
+    """
+    totals = Counter()
+    for product_id, quantity in lines:
+        totals[int(product_id)] += quantity
+
+    now = timezone.now()
+    expires_at = now + (ttl or reservation_ttl())
+    with transaction.atomic(using=using):
+        # Siempre en el mismo orden: dos checkouts no se bloquean en cruz (Postgres)
+        for product_id in sorted(totals):
+            if not _decrement(product_id, totals[product_id], now, using):
+                raise InsufficientStock(product_id, totals[product_id])
+        _stock_changed(using)
+        return StockReservation.objects.using(using).bulk_create([
+            StockReservation(
+                reference=reference, product_id=product_id,
+                quantity=quantity, expires_at=expires_at,
+            )
+            for product_id, quantity in sorted(totals.items())
+        ])
+
+
+def _release_rows(queryset, using, limit=None):
+    """Libera las reservas retenidas de ``queryset``. Devuelve cuántas"""
+    with transaction.atomic(using=using):
+        # En Postgres otro barrido salta las filas bloqueadas; SQLite ya
+        # serializa las escrituras
+        rows = queryset.select_for_update(skip_locked=True).values_list('id', 'product_id', 'quantity')
+        rows = list(rows[:limit] if limit else rows)
+        # Fila por fila y solo si sigue retenida: en SQLite skip_locked no hace
+        # nada y un commit u otro barrido pudo ganar entre la lectura y acá
+        held = StockReservation.objects.using(using).filter(status='held')
+        released = [
+            (product_id, quantity)
+            for reservation_id, product_id, quantity in rows
+            if held.filter(id=reservation_id).update(status='released')
+        ]
+        if released:
+            _restore(released, using)
+            _stock_changed(using)
+    return len(released)
+
+
+def release(reference, using='default'):
+    """Devuelve el stock retenido bajo ``reference``"""
+    return release_many([reference] if reference else [], using)
+
+
+def release_many(references, using='default'):
+    """``release`` para varias referencias en una transacción"""
+    if not references:
+        return 0
+    return _release_rows(
+        StockReservation.objects.using(using).filter(reference__in=references, status='held'), using
+    )
+
+
+def release_expired(now=None, batch_size=SWEEP_BATCH, using='default'):
+    """Libera en lotes todas las reservas vencidas. Devuelve cuántas"""
+    now = now or timezone.now()
+    released = 0
+    expired = StockReservation.objects.using(using).filter(
+        status='held', expires_at__lte=now
+    ).order_by('id')
+    while True:
+        count = _release_rows(expired, using, limit=batch_size)
+        released += count
+        if count < batch_size:
+            return released
+
+
+def commit(reference, using='default'):
+    """
+    Confirma las reservas de un pago aprobado. Devuelve cuántas líneas.
+
+    Si alguna venció y el barrido ya devolvió el stock, se vuelve a
+    descontar; si ya no alcanza queda registrado como sobreventa.
+    """
+    return commit_many([reference] if reference else [], using)
+
+
+def commit_many(references, using='default'):
+    """``commit`` para varias referencias en una transacción"""
+    if not references:
+        return 0
+    now = timezone.now()
+    reservations = StockReservation.objects.using(using).filter(reference__in=references)
+    with transaction.atomic(using=using):
+        committed = reservations.filter(status='held').update(status='committed')
+        expired = list(reservations.filter(status='released').select_for_update())
+        for reservation in expired:
+            if not _decrement(reservation.product_id, reservation.quantity, now, using):
+                logger.error(
+                    'Sobreventa: %s pagó %s u. del producto %s sin stock',
+                    reservation.reference, reservation.quantity, reservation.product_id,
+                )
+        if expired:
+            # Las confirmadas ya estaban descontadas; solo cambia el stock al volver a descontar
+            _stock_changed(using)
+            reservations.filter(id__in=[r.id for r in expired]).update(status='committed')
+    return committed + len(expired)
@@ -0,0 +1,177 @@
+# === sales.py - Resumen diario de ventas para el dashboard ===
+"""
+``DailySalesSummary`` guarda una fila por día y estado con la cantidad de
+órdenes y el monto. El dashboard lee cualquier rango con una sola consulta
+sobre el índice único ``(date, status)``, sin importar cuántas órdenes haya.
+
+Se mantiene con deltas en la misma transacción que cambia la orden:
+
+- ``save()`` / ``delete()`` de una ``Order``: señales en ``signals.py``
+  (antes de guardar se lee el estado anterior para saber qué restar).
+- ``orders.update_status``: para los cambios en lote con ``update()``, que
+  no disparan señales (webhooks, vuelta del pago).
+
+Si algo quedó desfasado (cargas con SQL, ``update()`` sueltos),
+``manage.py rebuild_sales_summary`` lo recalcula desde ``Order``.
+El día es la fecha local (``TIME_ZONE``) de ``created_at``.
+"""
+
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import DailySalesSummary, Order
+
+# Estados que cuentan como venta (pendientes y canceladas no suman ingresos)
+REVENUE_STATUSES = ('paid', 'processing', 'shipped', 'delivered')
+
+STATUS_LABELS = dict(Order.STATUS_CHOICES)
+
+
+# =============================================================================
+# DELTAS
+# =============================================================================
+
+class SalesDeltas:
+    """Cambios pendientes por ``(día, estado)``: ``[órdenes, monto]``"""
+
+    def __init__(self):
+        self.rows = defaultdict(lambda: [0, Decimal('0')])
+
+    def add(self, created_at, status, total, sign=1):
+        row = self.rows[(timezone.localdate(created_at), status)]
+        row[0] += sign
+        row[1] += sign * Decimal(str(total or 0))
+
+    def move(self, created_at, old, new):
+        """Una orden que pasa de ``old`` a ``new`` (``(status, total)``)"""
+        if old != new:
+            self.add(created_at, *old, sign=-1)
+            self.add(created_at, *new)
+
+    def apply(self, using='default'):
+        now = timezone.now()
+        summaries = DailySalesSummary.objects.using(using)
+        # Siempre en el mismo orden: dos transacciones no se bloquean en cruz
+        for (day, status), (count, revenue) in sorted(self.rows.items()):
+            if not count and not revenue:
+                continue
+            changes = {
+                'order_count': F('order_count') + count,
+                'revenue': F('revenue') + revenue,
+                'updated_at': now,
+            }
+            if summaries.filter(date=day, status=status).update(**changes):
+                continue
+            try:
+                with transaction.atomic(using=using):
+                    summaries.create(date=day, status=status, order_count=count, revenue=revenue)
+            except IntegrityError:
+                # Otra transacción creó la fila del día entre el UPDATE y el INSERT
+                summaries.filter(date=day, status=status).update(**changes)
+        self.rows.clear()
+
+
+# =============================================================================
+# SEÑALES DE Order
+# =============================================================================
+
+def order_saving(order, using='default'):
+    """
+    Estado guardado antes de un ``save()`` de una orden existente. Se lee de
+    la base y no de la instancia, que puede venir de ``refresh_from_db`` o de
+    un formulario con datos viejos.
+    """
+    order._sales_previous = None
+    if not order._state.adding and order.pk:
+        order._sales_previous = Order.objects.using(using).filter(pk=order.pk).values_list(
+            'status', 'total'
+        ).first()
+
+
+def order_saved(order, created, using='default'):
+    deltas = SalesDeltas()
+    previous = getattr(order, '_sales_previous', None)
+    if created:
+        deltas.add(order.created_at, order.status, order.total)
+    elif previous:
+        deltas.move(order.created_at, previous, (order.status, order.total))
+    deltas.apply(using)
+
+
+def order_deleted(order, using='default'):
+    deltas = SalesDeltas()
+    deltas.add(order.created_at, order.status, order.total, sign=-1)
+    deltas.apply(using)
+
+
+# =============================================================================
+# RECONSTRUCCIÓN Y LECTURA
+# =============================================================================
+
+def rebuild(start=None, end=None, using='default'):
+    """
+    Recalcula el resumen desde ``Order`` (todo, o los días entre ``start`` y
+    ``end`` inclusive) con un solo GROUP BY. Devuelve cuántas filas quedaron.
+    """
+    orders = Order.objects.using(using)
+    summaries = DailySalesSummary.objects.using(using)
+    if start:
+        orders = orders.filter(created_at__date__gte=start)
+        summaries = summaries.filter(date__gte=start)
+    if end:
+        orders = orders.filter(created_at__date__lte=end)
+        summaries = summaries.filter(date__lte=end)
+
+    rows = (
+        orders.annotate(day=TruncDate('created_at'))
+        .values('day', 'status')
+        .annotate(order_count=Count('id'), revenue=Sum('total'))
+        .order_by()
+    )
+    with transaction.atomic(using=using):
+        summaries.delete()
+        created = DailySalesSummary.objects.using(using).bulk_create([
+            DailySalesSummary(
+                date=row['day'], status=row['status'],
+                order_count=row['order_count'], revenue=row['revenue'] or 0,
+            )
+            for row in rows
+        ], batch_size=1000)
+    return len(created)
+
+
+def sales_summary(start, end, using='default'):
+    """
+    Totales, serie diaria y órdenes por estado entre ``start`` y ``end``
+    (fechas, inclusive) con una sola consulta.
+    """
+    days = {
+        start + timedelta(days=i): {'count': 0, 'total': Decimal('0')}
+        for i in range((end - start).days + 1)
+    }
+    by_status = {}
+    rows = DailySalesSummary.objects.using(using).filter(date__range=(start, end)).values_list(
+        'date', 'status', 'order_count', 'revenue'
+    )
+    for day, status, count, revenue in rows:
+        entry = by_status.setdefault(status, {'status': status, 'label': STATUS_LABELS.get(status, status),
+                                              'count': 0, 'revenue': Decimal('0')})
+        entry['count'] += count
+        entry['revenue'] += revenue
+        days[day]['count'] += count
+        if status in REVENUE_STATUSES:
+            days[day]['total'] += revenue
+
+    return {
+        'order_count': sum(entry['count'] for entry in by_status.values()),
+        'revenue': sum((entry['revenue'] for status, entry in by_status.items() if status in REVENUE_STATUSES),
+                       Decimal('0')),
+        'days': [{'date': day, **values} for day, values in days.items()],
+        'by_status': sorted(by_status.values(), key=lambda entry: -entry['count']),
+    }
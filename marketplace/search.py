@@ -0,0 +1,209 @@
+# === search.py - Búsqueda full-text de productos ===
+"""
+Backend de búsqueda full-text para ``Product``.
+
+- PostgreSQL: columna ``search_vector`` (tsvector) con índice GIN y la
+  configuración ``spanish_unaccent`` (stemming español sin acentos).
+- SQLite: tabla sombra FTS5 ``marketplace_product_fts`` con el texto ya
+  normalizado y reducido a raíces en Python, rankeada con ``bm25()`` y
+  unida a ``Product`` por el modelo no administrado ``ProductSearchEntry``.
+
+Cualquier otro motor cae al filtro ``icontains`` original.
+"""
+
+import re
+import unicodedata
+
+from django.db import connections
+from django.db.models import BooleanField, F, FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+
+# Configuración de texto creada por la migración 0006 (PostgreSQL)
+PG_SEARCH_CONFIG = 'spanish_unaccent'
+
+# Tabla sombra FTS5 (SQLite)
+FTS_TABLE = 'marketplace_product_fts'
+
+# Peso relativo del nombre frente a la descripción
+NAME_WEIGHT = 10.0
+DESCRIPTION_WEIGHT = 1.0
+
+_TOKEN_RE = re.compile(r'[a-z0-9]+')
+
+# Sufijos españoles frecuentes, del más largo al más corto
+_SUFFIXES = (
+    'amientos', 'imientos', 'amiento', 'imiento', 'aciones', 'uciones',
+    'adoras', 'adores', 'ancias', 'acion', 'ucion', 'adora', 'mente',
+    'ancia', 'ables', 'ibles', 'istas', 'ador', 'able', 'ible', 'ista',
+)
+
+
+# =============================================================================
+# ANÁLISIS DE TEXTO
+# =============================================================================
+
+def normalize(text):
+    """Minúsculas y sin acentos ("Teclado Mecánico" -> "teclado mecanico")"""
+    text = unicodedata.normalize('NFKD', text or '')
+    return ''.join(c for c in text if not unicodedata.combining(c)).lower()
+
+
+def stem(word):
+    """Stemmer liviano para español: quita sufijos, plurales y vocal final"""
+    if len(word) <= 3 or word.isdigit():
+        return word
+
+    for suffix in _SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            return word[:-len(suffix)]
+
+    if word.endswith('ces') and len(word) > 4:
+        word = word[:-3] + 'z'
+    elif word.endswith('es') and len(word) > 4:
+        word = word[:-2]
+    elif word.endswith('s') and len(word) > 3:
+        word = word[:-1]
+
+    if word[-1] in 'aeo' and len(word) > 4:
+        word = word[:-1]
+    return word
+
+
+def tokenize(text):
+    """Tokens normalizados de un texto, sin reducir a raíces"""
+    return _TOKEN_RE.findall(normalize(text))
+
+
+def analyze(text):
+    """Convierte un texto en la lista de raíces que se indexan"""
+    return [stem(token) for token in tokenize(text)]
+
+
+def build_fts_query(query):
+    """Arma una consulta MATCH de FTS5 (todas las raíces, por prefijo)"""
+    terms = analyze(query)
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+# =============================================================================
+# CONSULTAS
+# =============================================================================
+
+def search_products(queryset, query):
+    """
+    Filtra ``queryset`` por ``query`` y anota ``search_rank`` (mayor = mejor).
+    """
+    query = (query or '').strip()
+    if not query:
+        return queryset
+
+    vendor = connections[queryset.db].vendor
+
+    if vendor == 'postgresql':
+        from django.contrib.postgres.search import SearchQuery, SearchRank
+
+        search_query = SearchQuery(query, config=PG_SEARCH_CONFIG, search_type='websearch')
+        return queryset.filter(search_vector=search_query).annotate(
+            search_rank=SearchRank(F('search_vector'), search_query)
+        )
+
+    if vendor == 'sqlite':
+        match = build_fts_query(query)
+        if not match:
+            # Sin términos (solo signos): vacío, pero ordenable por relevancia
+            return queryset.annotate(search_rank=Value(0.0, output_field=FloatField())).none()
+        # Un solo JOIN con la tabla FTS5; bm25() es negativo (más chico = mejor)
+        return queryset.filter(
+            RawSQL(f'{FTS_TABLE} MATCH %s', [match], output_field=BooleanField()),
+            search_entry__isnull=False,
+        ).annotate(search_rank=RawSQL(
+            f'-bm25({FTS_TABLE}, {NAME_WEIGHT}, {DESCRIPTION_WEIGHT})', [], output_field=FloatField(),
+        ))
+
+    return queryset.filter(
+        Q(name__icontains=query) | Q(description__icontains=query)
+    ).annotate(search_rank=Value(0.0, output_field=FloatField()))
+
+
+# =============================================================================
+# MANTENIMIENTO DEL ÍNDICE
+# =============================================================================
+
+def _pg_search_vector():
+    from django.contrib.postgres.search import SearchVector
+
+    return (
+        SearchVector('name', weight='A', config=PG_SEARCH_CONFIG)
+        + SearchVector('description', weight='B', config=PG_SEARCH_CONFIG)
+    )
+
+
+def _fts_rows(rows):
+    for product_id, name, description in rows:
+        yield product_id, ' '.join(analyze(name)), ' '.join(analyze(description))
+
+
+def create_fts_table(connection):
+    """Crea la tabla sombra FTS5 (solo SQLite)"""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} '
+            f'USING fts5(name, description, tokenize="unicode61 remove_diacritics 2")'
+        )
+
+
+def index_rows(connection, rows):
+    """Indexa filas ``(id, name, description)`` en la tabla FTS5"""
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f'INSERT OR REPLACE INTO {FTS_TABLE} (rowid, name, description) VALUES (%s, %s, %s)',
+            list(_fts_rows(rows)),
+        )
+
+
+def index_product(product, using='default'):
+    """Actualiza la entrada del índice para un producto guardado"""
+    from .models import Product
+
+    connection = connections[using]
+    if connection.vendor == 'postgresql':
+        Product.objects.using(using).filter(pk=product.pk).update(search_vector=_pg_search_vector())
+    elif connection.vendor == 'sqlite':
+        index_rows(connection, [(product.pk, product.name, product.description)])
+
+
+def unindex_product(product_id, using='default'):
+    """Elimina un producto del índice FTS5 (en PostgreSQL se borra con la fila)"""
+    connection = connections[using]
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [product_id])
+
+
+def rebuild_search_index(using='default', batch_size=5000):
+    """Reconstruye el índice completo (después de cargas masivas con bulk_create)"""
+    from .models import Product
+
+    connection = connections[using]
+    products = Product.objects.using(using)
+
+    if connection.vendor == 'postgresql':
+        return products.update(search_vector=_pg_search_vector())
+
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+        rows = products.order_by('id').values_list('id', 'name', 'description')
+        batch, total = [], 0
+        for row in rows.iterator(chunk_size=batch_size):
+            batch.append(row)
+            if len(batch) >= batch_size:
+                index_rows(connection, batch)
+                total += len(batch)
+                batch = []
+        if batch:
+            index_rows(connection, batch)
+            total += len(batch)
+        return total
+
+    return 0
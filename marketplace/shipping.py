@@ -0,0 +1,198 @@
+# === shipping.py - Cotización de envíos por código postal ===
+"""
+Las ``ShippingZone`` activas se cargan en un índice en memoria, uno por
+worker::
+
+    from marketplace.shipping import shipping_index
+
+    quote = shipping_index.quote('C1425ABC')   # ShippingQuote o None
+    quotes = shipping_index.quote_many(['1425', '1600', '5000'])
+
+Los rangos pueden superponerse (p. ej. una zona especial dentro de GBA):
+gana la zona más angosta y, a igual ancho, la opción más barata. Al cargar
+se recorren los límites una vez y se arma una lista ordenada de tramos
+disjuntos, cada uno con su zona ganadora; cada consulta es un ``bisect``
+sobre esa lista, O(log n) con miles de zonas.
+
+Los códigos se comparan como números: ``'999' < '1000'`` es falso como
+texto. Se acepta el formato viejo (``1425``) y el CPA (``C1425ABC``).
+
+El índice se recarga cuando cambian zonas u opciones: las señales lo marcan
+vencido en el worker que guardó, y los demás lo notan al revisar (como mucho
+cada ``SHIPPING_INDEX_CHECK_INTERVAL`` segundos) la huella de las tablas.
+"""
+
+import heapq
+import logging
+import re
+import threading
+import time
+from bisect import bisect_right
+from collections import namedtuple
+
+from django.conf import settings
+from django.db.models import Count, Max
+
+from .models import ShippingOption, ShippingZone
+
+logger = logging.getLogger(__name__)
+
+CHECK_INTERVAL = getattr(settings, 'SHIPPING_INDEX_CHECK_INTERVAL', 1.0)
+
+POSTAL_CODE_RE = re.compile(r'^[A-Z]?(\d{4})[A-Z]{0,3}$')
+
+ShippingQuote = namedtuple('ShippingQuote', [
+    'postal_code', 'zone_id', 'zone', 'option_id', 'option', 'price', 'estimated_days',
+])
+
+
+def normalize_postal_code(value):
+    """Número de 4 dígitos del código postal, o None si no es válido"""
+    match = POSTAL_CODE_RE.match(str(value or '').strip().upper().replace(' ', ''))
+    return int(match.group(1)) if match else None
+
+
+# =============================================================================
+# ÍNDICE
+# =============================================================================
+
+class ShippingIndex:
+    """Tramos disjuntos ordenados ``(inicio, fin, zona)`` para ``bisect``"""
+
+    def __init__(self, version, zones):
+        """``zones``: tuplas ``(id, nombre, inicio, fin, opción_id, opción, precio, días)``"""
+        self.version = version
+        self.zones = sorted(zones, key=lambda zone: (zone[2], zone[3], zone[0]))
+        self.starts, self.ends, self.winners = [], [], []
+
+        # Barrido de límites con un heap de zonas abiertas (la mejor arriba)
+        bounds = sorted({zone[2] for zone in self.zones} | {zone[3] + 1 for zone in self.zones})
+        opened, active = 0, []
+        for i, start in enumerate(bounds[:-1]):
+            while opened < len(self.zones) and self.zones[opened][2] <= start:
+                zone = self.zones[opened]
+                heapq.heappush(active, (zone[3] - zone[2], zone[6], zone[0], zone))
+                opened += 1
+            while active and active[0][3][3] < start:
+                heapq.heappop(active)
+            if not active:
+                continue
+            end = bounds[i + 1] - 1
+            winner = active[0][3]
+            if self.winners and self.winners[-1] is winner and self.ends[-1] == start - 1:
+                self.ends[-1] = end
+            else:
+                self.starts.append(start)
+                self.ends.append(end)
+                self.winners.append(winner)
+
+    def __len__(self):
+        return len(self.zones)
+
+    def lookup(self, code):
+        """Zona ganadora para el código ya normalizado, o None"""
+        i = bisect_right(self.starts, code) - 1
+        if i >= 0 and code <= self.ends[i]:
+            return self.winners[i]
+        return None
+
+    def quote(self, postal_code):
+        code = normalize_postal_code(postal_code)
+        zone = self.lookup(code) if code is not None else None
+        if zone is None:
+            return None
+        return ShippingQuote(postal_code, *zone[:2], *zone[4:])
+
+    def options(self):
+        """Opciones activas con sus rangos, de la más barata a la más cara"""
+        grouped = {}
+        for zone_id, name, start, end, option_id, option, price, days in self.zones:
+            entry = grouped.setdefault(option_id, {
+                'option_id': option_id, 'name': option, 'price': price,
+                'estimated_days': days, 'ranges': [],
+            })
+            entry['ranges'].append((start, end))
+        return sorted(grouped.values(), key=lambda entry: (entry['price'], entry['name']))
+
+
+def load_zones():
+    """Zonas de opciones activas como tuplas para ``ShippingIndex``"""
+    rows = ShippingZone.objects.filter(shipping_option__is_active=True).values_list(
+        'id', 'name', 'postal_code_start', 'postal_code_end',
+        'shipping_option_id', 'shipping_option__name', 'shipping_option__price',
+        'shipping_option__estimated_days',
+    )
+    zones = []
+    for zone_id, name, start, end, *option in rows:
+        start, end = normalize_postal_code(start), normalize_postal_code(end)
+        if start is None or end is None or start > end:
+            logger.warning('Zona de envío %s con rango no válido: se ignora', zone_id)
+            continue
+        zones.append((zone_id, name, start, end, *option))
+    return zones
+
+
+def tables_version():
+    """Huella de zonas y opciones: cambia al crear, editar o borrar"""
+    zones = ShippingZone.objects.aggregate(count=Count('id'), updated=Max('updated_at'))
+    options = ShippingOption.objects.aggregate(count=Count('id'), updated=Max('updated_at'))
+    return (zones['count'], zones['updated'], options['count'], options['updated'])
+
+
+class ShippingIndexHolder:
+    """Mantiene el índice vigente y lo reemplaza cuando cambian las tablas"""
+
+    def __init__(self, check_interval=CHECK_INTERVAL):
+        self.check_interval = check_interval
+        self._index = None
+        self._lock = threading.Lock()
+        self._checked_at = 0.0
+        self.load_ms = None
+
+    def mark_stale(self):
+        """Fuerza a revisar la huella en el próximo ``get()``"""
+        self._checked_at = 0.0
+
+    def get(self):
+        index = self._index
+        if index is not None and time.monotonic() - self._checked_at < self.check_interval:
+            return index
+        # Si otro hilo ya está recargando, se sigue usando el índice anterior
+        if not self._lock.acquire(blocking=index is None):
+            return index
+        try:
+            return self._refresh()
+        finally:
+            self._lock.release()
+
+    def _refresh(self):
+        current = self._index
+        version = tables_version()
+        self._checked_at = time.monotonic()
+        if current is not None and current.version == version:
+            return current
+
+        start = time.perf_counter()
+        self._index = ShippingIndex(version, load_zones())
+        self.load_ms = (time.perf_counter() - start) * 1000
+        logger.info(
+            'Índice de envíos: %s zonas, %s tramos, %.1f ms',
+            len(self._index), len(self._index.starts), self.load_ms,
+        )
+        return self._index
+
+    def quote(self, postal_code):
+        """``ShippingQuote`` para el código postal, o None si no hay envío"""
+        return self.get().quote(postal_code)
+
+    def quote_many(self, postal_codes):
+        """``{código: ShippingQuote | None}`` con un solo índice para todos"""
+        index = self.get()
+        return {code: index.quote(code) for code in postal_codes}
+
+    def options(self):
+        return self.get().options()
+
+
+# Instancia por proceso
+shipping_index = ShippingIndexHolder()
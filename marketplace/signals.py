@@ -0,0 +1,67 @@
+# === signals.py - Sincronización de índices y cachés del catálogo ===
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save, pre_save
+from django.dispatch import receiver
+
+from . import images, sales, search
+from .autocomplete import autocomplete_index
+from .catalog import bump_catalog_version
+from .fragment_cache import record_invalidation
+from .models import Order, Product, ShippingOption, ShippingZone
+from .shipping import shipping_index
+from .snapshot import catalog_snapshot
+
+
+@receiver(post_init, sender=Product)
+def product_loaded(sender, instance, **kwargs):
+    """Recuerda la imagen cargada para detectar si se reemplazó al guardar"""
+    # Valor crudo: no dispara una consulta si el campo está diferido
+    image = instance.__dict__.get('image')
+    instance._loaded_image_name = getattr(image, 'name', image)
+
+
+@receiver(post_save, sender=Product)
+def product_saved(sender, instance, using, **kwargs):
+    """Mantiene los índices de búsqueda al crear o editar un producto"""
+    images.process_product_image(instance, using=using)
+    search.index_product(instance, using=using)
+    autocomplete_index.update(instance)
+    bump_catalog_version(using)
+    record_invalidation()
+    transaction.on_commit(catalog_snapshot.mark_stale, using=using)
+
+
+@receiver(post_delete, sender=Product)
+def product_deleted(sender, instance, using, **kwargs):
+    """Quita el producto eliminado de los índices de búsqueda"""
+    search.unindex_product(instance.pk, using=using)
+    autocomplete_index.remove(instance.pk)
+    bump_catalog_version(using)
+    record_invalidation()
+    transaction.on_commit(catalog_snapshot.mark_stale, using=using)
+
+
+@receiver(post_save, sender=ShippingZone)
+@receiver(post_delete, sender=ShippingZone)
+@receiver(post_save, sender=ShippingOption)
+@receiver(post_delete, sender=ShippingOption)
+def shipping_changed(sender, using, **kwargs):
+    """Recarga el índice de envíos de este worker (los demás revisan la huella)"""
+    transaction.on_commit(shipping_index.mark_stale, using=using)
+
+
+@receiver(pre_save, sender=Order)
+def order_saving(sender, instance, using, **kwargs):
+    """Lee estado y total anteriores para moverlos en el resumen de ventas"""
+    sales.order_saving(instance, using)
+
+
+@receiver(post_save, sender=Order)
+def order_saved(sender, instance, created, using, **kwargs):
+    sales.order_saved(instance, created, using)
+
+
+@receiver(post_delete, sender=Order)
+def order_deleted(sender, instance, using, **kwargs):
+    sales.order_deleted(instance, using)
@@ -0,0 +1,367 @@
+# === snapshot.py - Snapshot del catálogo en memoria (modelo de lectura) ===
+"""
+Copia inmutable del catálogo disponible, una por worker, para las vistas de
+solo lectura (``index``, ``ofertas``, ``product_list`` sin búsqueda y el
+índice de autocompletado).
+
+- Registros compactos con ``__slots__`` y sin ``description``.
+- Órdenes precalculados (``array`` de posiciones) para cada ``sort`` de
+  ``product_list``, global y por categoría. El orden por nombre es el que
+  devuelve la base (su collation), no el de los strings de Python.
+- Conteos de facetas y paginación keyset resueltos en memoria, con el mismo
+  formato de cursor que ``pagination.py``.
+
+El snapshot se recarga completo y se reemplaza de una sola vez cuando cambia
+``CatalogVersion`` en la base (se consulta como mucho cada
+``CATALOG_SNAPSHOT_CHECK_INTERVAL`` segundos). Si la carga falla o el catálogo
+supera ``CATALOG_SNAPSHOT_MAX_PRODUCTS``, ``get()`` devuelve None y las vistas
+usan el ORM como antes.
+"""
+
+import logging
+import sys
+import threading
+import time
+from array import array
+from bisect import bisect_right
+from collections import Counter
+from datetime import datetime
+from operator import attrgetter
+
+from django.conf import settings
+from django.db.models.fields.files import ImageFieldFile
+
+from .catalog import get_db_catalog_version
+from .facets import FACET_PARAMS, price_band
+from .models import Product
+from .pagination import PAGE_SIZE, SORT_ORDERINGS, KeysetPage, decode_cursor, encode_cursor
+
+logger = logging.getLogger(__name__)
+
+ENABLED = getattr(settings, 'CATALOG_SNAPSHOT_ENABLED', True)
+MAX_PRODUCTS = getattr(settings, 'CATALOG_SNAPSHOT_MAX_PRODUCTS', 50_000)
+CHECK_INTERVAL = getattr(settings, 'CATALOG_SNAPSHOT_CHECK_INTERVAL', 1.0)
+RETRY_AFTER = 30
+
+# "relevance" necesita la búsqueda full-text: se resuelve con el ORM
+SNAPSHOT_SORTS = ('name', 'price_low', 'price_high', 'newest')
+
+RECORD_FIELDS = (
+    'id', 'name', 'category', 'price', 'stock', 'image_name', 'image_derivatives', 'created_at', 'updated_at',
+)
+
+CATEGORY_LABELS = dict(Product.CATEGORY_CHOICES)
+_IMAGE_FIELD = Product._meta.get_field('image')
+
+
+# =============================================================================
+# REGISTROS
+# =============================================================================
+
+class ProductRecord:
+    """Producto de solo lectura con lo que usan tarjetas y listados"""
+
+    __slots__ = RECORD_FIELDS + ('facets',)
+
+    # En el snapshot solo hay productos disponibles
+    available = True
+
+    def __init__(self, id, name, category, price, stock, image_name, image_derivatives, created_at, updated_at):
+        set_field = object.__setattr__
+        set_field(self, 'id', id)
+        set_field(self, 'name', name)
+        set_field(self, 'category', sys.intern(category))
+        set_field(self, 'price', price)
+        set_field(self, 'stock', stock)
+        set_field(self, 'image_name', sys.intern(image_name) if image_name else '')
+        set_field(self, 'image_derivatives', image_derivatives)
+        set_field(self, 'created_at', created_at)
+        set_field(self, 'updated_at', updated_at)
+        # Mismo orden que FACET_PARAMS: category, price, stock
+        set_field(self, 'facets', (self.category, price_band(price), self.get_stock_status()))
+
+    def __setattr__(self, name, value):
+        raise AttributeError('ProductRecord es de solo lectura')
+
+    def __repr__(self):
+        return f'<ProductRecord {self.id}: {self.name}>'
+
+    @property
+    def pk(self):
+        return self.id
+
+    @property
+    def image(self):
+        return ImageFieldFile(None, _IMAGE_FIELD, self.image_name)
+
+    def get_category_display(self):
+        return CATEGORY_LABELS.get(self.category, self.category)
+
+    # Mismos helpers que el modelo (solo usan price, stock e imagen)
+    get_price_in_pesos = Product.get_price_in_pesos
+    get_stock_status = Product.get_stock_status
+    get_image_url = Product.get_image_url
+    get_image_srcset = Product.get_image_srcset
+
+
+def _key_value(value, descending):
+    if not descending:
+        return value
+    if isinstance(value, datetime):
+        return -value.timestamp()
+    return -value
+
+
+def _sort_key(ordering, values):
+    return tuple(_key_value(value, field.startswith('-')) for field, value in zip(ordering, values))
+
+
+def _record_key(ordering):
+    names = [field.lstrip('-') for field in ordering]
+    return lambda record: _sort_key(ordering, [getattr(record, name) for name in names])
+
+
+# =============================================================================
+# SNAPSHOT
+# =============================================================================
+
+class CatalogSnapshot:
+    """Catálogo disponible con órdenes precalculados"""
+
+    def __init__(self, version, records):
+        self.version = version
+        self.records = tuple(records)
+        self.by_id = {record.id: record for record in self.records}
+        # Posición de cada registro, que es su lugar en el orden por nombre
+        self.position = {record.id: i for i, record in enumerate(self.records)}
+        self._record_keys = {sort: _record_key(SORT_ORDERINGS[sort]) for sort in SNAPSHOT_SORTS if sort != 'name'}
+        self._facet_counts = {}
+        # Productos por combinación (categoría, rango de precio, stock): pocas decenas
+        self._facet_combos = Counter(map(attrgetter('facets'), self.records))
+
+        # (sort, categoría o None) -> posiciones en self.records, ya ordenadas.
+        # Cada orden es todo ascendente o todo descendente (ver SORT_ORDERINGS)
+        self.orders = {}
+        categories = [record.category for record in self.records]
+        for sort in SNAPSHOT_SORTS:
+            ordering = SORT_ORDERINGS[sort]
+            if sort == 'name':
+                # Los registros ya vienen ordenados por la base (ver load_snapshot)
+                positions = range(len(self.records))
+            else:
+                keys = list(map(attrgetter(*(field.lstrip('-') for field in ordering)), self.records))
+                positions = sorted(range(len(keys)), key=keys.__getitem__, reverse=ordering[0].startswith('-'))
+            self.orders[(sort, None)] = array('I', positions)
+            buckets = {value: array('I') for value, _ in Product.CATEGORY_CHOICES}
+            for i in positions:
+                bucket = buckets.get(categories[i])
+                if bucket is not None:
+                    bucket.append(i)
+            for category, bucket in buckets.items():
+                self.orders[(sort, category)] = bucket
+
+        self.memory_bytes = _deep_sizeof(self)
+
+    def __len__(self):
+        return len(self.records)
+
+    def ordered(self, sort_by='newest', category=None):
+        """Registros en el orden de ``sort_by`` (opcionalmente de una categoría)"""
+        records = self.records
+        return (records[i] for i in self.orders[(sort_by, category)])
+
+    def newest(self, limit):
+        positions = self.orders[('newest', None)][:limit]
+        return [self.records[i] for i in positions]
+
+    def facet_counts(self, selection):
+        """Mismo resultado que ``facets.compute_facets`` sin búsqueda"""
+        key = tuple(sorted(selection.items()))
+        counts = self._facet_counts.get(key)
+        if counts is not None:
+            return counts
+
+        wanted = [selection.get(facet) for facet in FACET_PARAMS]
+        counts = {facet: {} for facet in FACET_PARAMS}
+        for values, count in self._facet_combos.items():
+            mismatches = [i for i, value in enumerate(wanted) if value is not None and values[i] != value]
+            if len(mismatches) > 1:
+                continue
+            for i, facet in enumerate(FACET_PARAMS):
+                # Cada faceta ignora su propia selección
+                if mismatches and mismatches[0] != i:
+                    continue
+                counts[facet][values[i]] = counts[facet].get(values[i], 0) + count
+
+        if len(self._facet_counts) > 512:
+            self._facet_counts.clear()
+        self._facet_counts[key] = counts
+        return counts
+
+    def paginate(self, selection, sort_by, cursor=None, page_size=PAGE_SIZE):
+        """
+        Como ``pagination.paginate`` sobre el snapshot. Devuelve None si el
+        cursor por nombre apunta a un producto que ya no está en el snapshot:
+        ubicarlo requiere la collation de la base, así que decide el ORM.
+        """
+        if sort_by not in SNAPSHOT_SORTS:
+            sort_by = 'name'
+        ordering = SORT_ORDERINGS[sort_by]
+        positions = self.orders[(sort_by, selection.get('category'))]
+        records = self.records
+
+        start = 0
+        values = decode_cursor(cursor, sort_by, ordering, Product)
+        if values is not None and sort_by == 'name':
+            name, pk = values
+            record = self.by_id.get(pk)
+            if record is None or record.name != name:
+                return None
+            start = bisect_right(positions, self.position[pk])
+        elif values is not None:
+            record_key = self._record_keys[sort_by]
+            start = bisect_right(
+                positions, _sort_key(ordering, values), key=lambda i: record_key(records[i])
+            )
+
+        price, stock = selection.get('price'), selection.get('stock')
+        items = []
+        for i in range(start, len(positions)):
+            record = records[positions[i]]
+            if price and record.facets[1] != price:
+                continue
+            if stock and record.facets[2] != stock:
+                continue
+            items.append(record)
+            if len(items) > page_size:
+                break
+
+        next_cursor = None
+        if len(items) > page_size:
+            items = items[:page_size]
+            next_cursor = encode_cursor(sort_by, ordering, items[-1])
+        return KeysetPage(items, next_cursor)
+
+    def info(self):
+        return {
+            'version': self.version,
+            'products': len(self.records),
+            'memory_bytes': self.memory_bytes,
+        }
+
+
+def _deep_sizeof(snapshot):
+    """Bytes ocupados por el snapshot (registros, valores y órdenes)"""
+    records = snapshot.records
+    total = sum(map(sys.getsizeof, (snapshot, records, snapshot.by_id, snapshot.position, snapshot.orders)))
+    total += sum(map(sys.getsizeof, records)) + sum(map(sys.getsizeof, map(attrgetter('facets'), records)))
+    for name in RECORD_FIELDS:
+        values = map(attrgetter(name), records)
+        if name in ('category', 'image_name'):
+            # Strings internados: se cuentan una sola vez
+            values = {id(value): value for value in values}.values()
+        total += sum(map(sys.getsizeof, values))
+    total += sum(map(sys.getsizeof, snapshot.orders.values()))
+    return total
+
+
+def load_snapshot(version, max_products=MAX_PRODUCTS):
+    """
+    Lee el catálogo disponible (una consulta) o None si es demasiado grande.
+    Las filas vienen ordenadas por nombre con la collation de la base, igual
+    que las páginas del ORM.
+    """
+    rows = list(
+        Product.objects.filter(available=True)
+        .order_by(*SORT_ORDERINGS['name'])
+        .values_list(*RECORD_FIELDS[:5], 'image', *RECORD_FIELDS[6:])[:max_products + 1]
+    )
+    if len(rows) > max_products:
+        return None
+    return CatalogSnapshot(version, (ProductRecord(*row) for row in rows))
+
+
+# =============================================================================
+# SNAPSHOT POR WORKER
+# =============================================================================
+
+class SnapshotHolder:
+    """Mantiene el snapshot vigente y lo reemplaza cuando cambia la versión"""
+
+    def __init__(self, enabled=ENABLED, max_products=MAX_PRODUCTS, check_interval=CHECK_INTERVAL):
+        self.enabled = enabled
+        self.max_products = max_products
+        self.check_interval = check_interval
+        self._snapshot = None
+        self._lock = threading.Lock()
+        self._checked_at = 0.0
+        self._failed_at = None
+        self.load_ms = None
+
+    def mark_stale(self):
+        """Fuerza a revisar la versión en el próximo ``get()``"""
+        self._checked_at = 0.0
+
+    def get(self):
+        """Snapshot vigente, o None si hay que usar el ORM"""
+        if not self.enabled:
+            return None
+
+        snapshot = self._snapshot
+        now = time.monotonic()
+        if snapshot is not None and now - self._checked_at < self.check_interval:
+            return snapshot
+        if snapshot is None and self._failed_at is not None and now - self._failed_at < RETRY_AFTER:
+            return None
+
+        # Si otro hilo ya está recargando, se sigue sirviendo el snapshot anterior
+        if not self._lock.acquire(blocking=snapshot is None):
+            return snapshot
+        try:
+            return self._refresh()
+        finally:
+            self._lock.release()
+
+    def _refresh(self):
+        current = self._snapshot
+        try:
+            # La versión se lee antes que las filas: si algo cambia en el medio,
+            # la próxima revisión vuelve a cargar
+            version = get_db_catalog_version()
+            self._checked_at = time.monotonic()
+            if current is not None and current.version == version:
+                return current
+
+            start = time.perf_counter()
+            snapshot = load_snapshot(version, self.max_products)
+            if snapshot is None:
+                logger.warning(
+                    'Catálogo con más de %s productos: se usa el ORM en lugar del snapshot',
+                    self.max_products,
+                )
+                self._snapshot, self._failed_at = None, time.monotonic()
+                return None
+        except Exception:
+            logger.exception('No se pudo cargar el snapshot del catálogo; se usa el ORM')
+            self._snapshot, self._failed_at = None, time.monotonic()
+            return None
+
+        self.load_ms = (time.perf_counter() - start) * 1000
+        self._snapshot, self._failed_at = snapshot, None
+        logger.info(
+            'Snapshot del catálogo v%s: %s productos, %.1f KiB, %.0f ms',
+            version, len(snapshot), snapshot.memory_bytes / 1024, self.load_ms,
+        )
+        return snapshot
+
+    def info(self):
+        """Estado para el endpoint de staff y los benchmarks"""
+        snapshot = self._snapshot
+        data = {'enabled': self.enabled, 'loaded': snapshot is not None, 'load_ms': self.load_ms}
+        if snapshot is not None:
+            data.update(snapshot.info())
+        return data
+
+
+# Instancia por proceso
+catalog_snapshot = SnapshotHolder()
@@ -0,0 +1,78 @@
+# === catalog_cache.py - Tags de caché de fragmentos del catálogo ===
+"""
+Uso::
+
+    {% load catalog_cache %}
+
+    {% productcache "product_card" product %}
+        ... tarjeta ...
+    {% endproductcache %}
+
+    {% catalogcache "index_grid" %}
+        ... grilla completa ...
+    {% endcatalogcache %}
+
+Se pueden agregar variables extra para variar la clave, como en ``{% cache %}``.
+"""
+
+from django import template
+
+from ..fragment_cache import catalog_fragment_key, get_or_render, product_fragment_key
+
+register = template.Library()
+
+
+class FragmentCacheNode(template.Node):
+    def __init__(self, nodelist, fragment_name, product, vary_on):
+        self.nodelist = nodelist
+        self.fragment_name = fragment_name
+        self.product = product
+        self.vary_on = vary_on
+
+    def render(self, context):
+        vary_on = [var.resolve(context) for var in self.vary_on]
+        if self.product is not None:
+            product = self.product.resolve(context)
+            key = product_fragment_key(self.fragment_name, product, *vary_on)
+        else:
+            key = catalog_fragment_key(self.fragment_name, *vary_on)
+        return get_or_render(key, lambda: self.nodelist.render(context))
+
+
+def _fragment_name(bits):
+    name = bits[1]
+    if name[0] not in '"\'' or name[-1] != name[0]:
+        raise template.TemplateSyntaxError(f"'{bits[0]}' necesita un nombre de fragmento entre comillas")
+    return name[1:-1]
+
+
+@register.tag
+def productcache(parser, token):
+    """Cachea la tarjeta de un producto hasta que el producto cambie"""
+    bits = token.split_contents()
+    if len(bits) < 3:
+        raise template.TemplateSyntaxError(f"'{bits[0]}' necesita un nombre y un producto")
+    nodelist = parser.parse(('endproductcache',))
+    parser.delete_first_token()
+    return FragmentCacheNode(
+        nodelist,
+        _fragment_name(bits),
+        parser.compile_filter(bits[2]),
+        [parser.compile_filter(bit) for bit in bits[3:]],
+    )
+
+
+@register.tag
+def catalogcache(parser, token):
+    """Cachea un fragmento hasta el próximo cambio en el catálogo"""
+    bits = token.split_contents()
+    if len(bits) < 2:
+        raise template.TemplateSyntaxError(f"'{bits[0]}' necesita un nombre de fragmento")
+    nodelist = parser.parse(('endcatalogcache',))
+    parser.delete_first_token()
+    return FragmentCacheNode(
+        nodelist,
+        _fragment_name(bits),
+        None,
+        [parser.compile_filter(bit) for bit in bits[2:]],
+    )
@@ -0,0 +1,52 @@
+# === product_images.py - <picture> con los derivados de la imagen ===
+"""
+Uso::
+
+    {% load product_images %}
+    {% product_picture product "card" class="product-img" loading="lazy" %}
+
+Genera un ``<picture>`` con ``srcset`` en WebP y JPEG; si el producto todavía
+no tiene derivados, un ``<img>`` simple con la imagen original.
+"""
+
+from django import template
+from django.forms.utils import flatatt
+from django.utils.html import format_html
+
+register = template.Library()
+
+# Ancho aproximado con el que se muestra cada tamaño
+DEFAULT_SIZES = {
+    'thumb': '80px',
+    'card': '(max-width: 576px) 50vw, (max-width: 992px) 33vw, 280px',
+    'detail': '(max-width: 992px) 100vw, 600px',
+}
+
+
+@register.simple_tag
+def product_picture(product, size='card', sizes=None, **attrs):
+    """Imagen responsive del producto"""
+    src = product.get_image_url(size, 'jpeg')
+    if not src:
+        return ''
+
+    attrs.setdefault('alt', product.name)
+    srcset_jpeg = product.get_image_srcset('jpeg')
+    if not srcset_jpeg:
+        return format_html('<img src="{}"{}>', src, flatatt(attrs))
+
+    sizes = sizes or DEFAULT_SIZES.get(size, '100vw')
+    return format_html(
+        '<picture class="product-picture">'
+        '<source type="image/webp" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}"{}>'
+        '</picture>',
+        product.get_image_srcset('webp'), sizes,
+        src, srcset_jpeg, sizes, flatatt(attrs),
+    )
+
+
+@register.filter
+def image_url(product, size='thumb'):
+    """``{{ product|image_url:"thumb" }}``: URL JPEG del tamaño pedido"""
+    return product.get_image_url(size, 'jpeg') or ''
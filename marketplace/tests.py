@@ -1,3 +1,1411 @@
-from django.test import TestCase
+import csv
+import io
+import json
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
+from functools import partial
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.http import QueryDict
+from django.template import Context, Template
+from django.test import RequestFactory, TestCase
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from django.utils import timezone
+import pandas as pd
+from PIL import Image
+
+from . import (
+    analytics, cart_storage, context_processors, exports, images, orders, payments, reservations, sales, search, webhooks
+)
+from .autocomplete import AutocompleteIndex
+from .cart import Cart
+from .catalog import bump_db_catalog_version, get_db_catalog_version
+from .facets import FACET_PARAMS, apply_facets, build_facets, compute_facets, parse_selection, price_band, result_count
+from .fake_mercadopago import FakeMercadoPago
+from .fragment_cache import catalog_fragment_key, fragment_cache_stats, fragment_stats
+from .models import (
+    CartLine, DailySalesSummary, Order, PaymentNotification, Product, ShippingOption, ShippingZone, StockReservation
+)
+from .pagination import SORT_ORDERINGS, decode_cursor, encode_cursor, paginate
+from .shipping import shipping_index
+from .snapshot import CatalogSnapshot, ProductRecord, SnapshotHolder, catalog_snapshot, load_snapshot
+
+
+class CartQueryCountTests(TestCase):
+    """El carrito carga sus productos con una sola consulta por request"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.products = Product.objects.bulk_create([
+            Product(
+                name=f'Producto {i}',
+                description='Descripción',
+                price=Decimal(1000 + i),
+                category='mouses',
+                image='products/default_product.jpg',
+                stock=10,
+            )
+            for i in range(20)
+        ])
+
+    def fill_cart(self, lines):
+        session = self.client.session
+        session[settings.CART_SESSION_ID] = {
+            str(product.id): {'quantity': 2, 'price': str(product.price)}
+            for product in self.products[:lines]
+        }
+        session.save()
+
+    def count_cart_detail_queries(self, lines):
+        self.fill_cart(lines)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('cart_detail'))
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_cart_detail_query_count_is_constant(self):
+        # Sesión + productos del carrito
+        for lines in (1, 5, 20):
+            with self.subTest(lines=lines):
+                self.assertEqual(self.count_cart_detail_queries(lines), 2)
+
+    def test_iteration_does_not_mutate_session(self):
+        self.fill_cart(3)
+        self.client.get(reverse('cart_detail'))
+        cart = self.client.session[settings.CART_SESSION_ID]
+        for item in cart.values():
+            self.assertEqual(set(item), {'quantity', 'price'})
+
+
+class CartStorageTests(TestCase):
+    """Backends de ``CART_STORAGE``: sesión, caché y tabla CartLine"""
+
+    BACKENDS = ('SessionCartStorage', 'CacheCartStorage', 'DatabaseCartStorage')
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.mouse, cls.keyboard = Product.objects.bulk_create([
+            Product(name='Mouse', description='Descripción', price=Decimal('1000'),
+                    category='mouses', image='products/default_product.jpg', stock=10),
+            Product(name='Teclado', description='Descripción', price=Decimal('2000.50'),
+                    category='teclados', image='products/default_product.jpg', stock=10),
+        ])
+
+    def setUp(self):
+        cache.clear()
+        self.session = self.client.session
+
+    def storage(self, backend):
+        """Backend de un request nuevo sobre la misma sesión"""
+        request = RequestFactory().get('/')
+        request.session = self.session
+        return getattr(cart_storage, backend)(request)
+
+    def test_round_trip(self):
+        for backend in self.BACKENDS:
+            with self.subTest(backend=backend):
+                self.setUp()
+                storage = self.storage(backend)
+                self.assertEqual(storage.lines, {})
+                storage.lines[str(self.mouse.id)] = {'quantity': 2, 'price': '1000.00'}
+                storage.lines[str(self.keyboard.id)] = {'quantity': 1, 'price': '2000.50'}
+                storage.write(changed=[str(self.mouse.id), str(self.keyboard.id)])
+                self.assertEqual(self.storage(backend).lines, {
+                    str(self.mouse.id): {'quantity': 2, 'price': '1000.00'},
+                    str(self.keyboard.id): {'quantity': 1, 'price': '2000.50'},
+                })
+
+                storage = self.storage(backend)
+                del storage.lines[str(self.mouse.id)]
+                storage.write(removed=[str(self.mouse.id)])
+                self.assertEqual(list(self.storage(backend).lines), [str(self.keyboard.id)])
+
+                self.storage(backend).clear()
+                self.assertEqual(self.storage(backend).lines, {})
+
+    def test_database_writes_only_changed_lines(self):
+        storage = self.storage('DatabaseCartStorage')
+        storage.lines[str(self.mouse.id)] = {'quantity': 1, 'price': '1000.00'}
+        storage.lines[str(self.keyboard.id)] = {'quantity': 1, 'price': '2000.50'}
+        storage.write(changed=list(storage.lines))
+        owner = self.session[cart_storage.OWNER_SESSION_KEY]
+        keyboard_line = CartLine.objects.get(owner=owner, product=self.keyboard)
+
+        storage = self.storage('DatabaseCartStorage')
+        storage.lines[str(self.mouse.id)]['quantity'] = 4
+        with CaptureQueriesContext(connection) as queries:
+            storage.write(changed=[str(self.mouse.id)])
+        # Un upsert de la fila que cambió (más el SAVEPOINT de atomic)
+        writes = [q['sql'] for q in queries if 'marketplace_cartline' in q['sql']]
+        self.assertEqual(len(writes), 1)
+        self.assertIn('ON CONFLICT', writes[0])
+        self.assertEqual(CartLine.objects.get(owner=owner, product=self.mouse).quantity, 4)
+        self.assertEqual(CartLine.objects.get(owner=owner, product=self.keyboard).updated_at,
+                         keyboard_line.updated_at)
+
+        storage.write(removed=[str(self.keyboard.id)])
+        self.assertEqual(list(CartLine.objects.filter(owner=owner).values_list('product_id', flat=True)),
+                         [self.mouse.id])
+
+    def test_reading_does_not_write(self):
+        for backend in self.BACKENDS:
+            with self.subTest(backend=backend):
+                self.setUp()
+                storage = self.storage(backend)
+                storage.lines[str(self.mouse.id)] = {'quantity': 2, 'price': '1000.00'}
+                storage.write(changed=[str(self.mouse.id)])
+                self.session.save()
+                self.session.modified = False
+
+                request = RequestFactory().get('/')
+                request.session = self.session
+                request.user = AnonymousUser()
+                with override_settings(CART_STORAGE=f'marketplace.cart_storage.{backend}'), \
+                        mock.patch.object(cache, 'set') as cache_set, \
+                        CaptureQueriesContext(connection) as queries:
+                    cart = Cart(request)
+                    self.assertEqual((len(cart), cart.get_total_price()), (2, Decimal('2000')))
+                    self.assertEqual([item['product'] for item in cart], [self.mouse])
+                self.assertFalse(self.session.modified)
+                cache_set.assert_not_called()
+                self.assertFalse([q for q in queries if not q['sql'].startswith('SELECT')])
+
+
+class CartBatchApiTests(TestCase):
+    """Operaciones del panel lateral en un solo POST"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.mouse, cls.keyboard, cls.headset = Product.objects.bulk_create([
+            Product(name=name, description='Descripción', price=Decimal(price), category='mouses',
+                    image='products/default_product.jpg', stock=stock)
+            for name, price, stock in [('Mouse', '1000', 10), ('Teclado', '2000', 3), ('Auriculares', '3000', 5)]
+        ])
+
+    def make_cart(self, lines):
+        request = RequestFactory().post('/carrito/api/lote/')
+        request.session = self.client.session
+        request.session[settings.CART_SESSION_ID] = {
+            str(product.id): {'quantity': quantity, 'price': str(product.price)} for product, quantity in lines
+        }
+        request.user = AnonymousUser()
+        return Cart(request)
+
+    def post(self, payload):
+        body = payload if isinstance(payload, str) else json.dumps(payload)
+        return self.client.post(reverse('cart_batch_api'), body, content_type='application/json')
+
+    def test_single_write_and_single_product_query(self):
+        cart = self.make_cart([(self.mouse, 1), (self.keyboard, 1)])
+        with mock.patch.object(cart.storage, 'write', wraps=cart.storage.write) as write, \
+                self.assertNumQueries(1):
+            changed, removed, errors = cart.apply([
+                ('set', self.mouse.id, 2), ('add', self.mouse.id, 1),
+                ('remove', self.keyboard.id, 0), ('add', self.headset.id, 2),
+            ])
+        write.assert_called_once_with(changed=sorted([str(self.mouse.id), str(self.headset.id)]),
+                                      removed=[str(self.keyboard.id)])
+        self.assertEqual(errors, [])
+        self.assertEqual({pid: line['quantity'] for pid, line in cart.cart.items()},
+                         {str(self.mouse.id): 3, str(self.headset.id): 2})
+
+    def test_quantities_clamped_to_stock(self):
+        self.post({'operations': [{'op': 'add', 'product_id': self.keyboard.id, 'quantity': 1}]})
+        response = self.post({'operations': [
+            {'op': 'set', 'product_id': self.keyboard.id, 'quantity': 7},
+            {'op': 'add', 'product_id': 999999, 'quantity': 1},
+        ]})
+        data = response.json()
+        self.assertFalse(data['success'])
+        self.assertEqual(data['lines'][str(self.keyboard.id)]['quantity'], 3)
+        self.assertEqual(data['cart_total_items'], 3)
+        self.assertEqual([error['product_id'] for error in data['errors']], [str(self.keyboard.id), '999999'])
+
+    def test_invalid_payloads(self):
+        self.post({'operations': [{'op': 'add', 'product_id': self.mouse.id, 'quantity': 2}]})
+        for payload in ['{no es json', {'operations': []}, {'operations': [{'op': 'add'}]},
+                        {'operations': [{'op': 'vaciar', 'product_id': self.mouse.id}]},
+                        {'operations': [{'op': 'add', 'product_id': self.mouse.id, 'quantity': -5}]}]:
+            with self.subTest(payload=payload):
+                response = self.post(payload)
+                self.assertEqual(response.status_code, 400)
+                self.assertFalse(response.json()['success'])
+        # Ninguno tocó el carrito
+        self.assertEqual(self.client.session[settings.CART_SESSION_ID][str(self.mouse.id)]['quantity'], 2)
+
+
+class StockReservationTests(TestCase):
+    """Reservas de stock del checkout"""
+
+    def make_product(self, stock):
+        # bulk_create: sin señales (no hace falta generar derivados de imagen)
+        return Product.objects.bulk_create([Product(
+            name='Teclado', description='Descripción', price=Decimal('1000'),
+            category='teclados', image='products/default_product.jpg', stock=stock,
+        )])[0]
+
+    def setUp(self):
+        self.product = self.make_product(stock=5)
+
+    def stock(self):
+        self.product.refresh_from_db(fields=['stock'])
+        return self.product.stock
+
+    def test_reserve_is_all_or_nothing(self):
+        other = self.make_product(stock=1)
+        with self.assertRaises(reservations.InsufficientStock):
+            reservations.reserve('ref', [(self.product.id, 2), (other.id, 2)])
+        self.assertEqual(self.stock(), 5)
+        self.assertFalse(StockReservation.objects.exists())
+
+    def test_release_and_commit(self):
+        reservations.reserve('a', [(self.product.id, 3)])
+        self.assertEqual(self.stock(), 2)
+        with self.assertRaises(reservations.InsufficientStock):
+            reservations.reserve('b', [(self.product.id, 3)])
+
+        self.assertEqual(reservations.release('a'), 1)
+        self.assertEqual(self.stock(), 5)
+
+        reservations.reserve('c', [(self.product.id, 4)])
+        self.assertEqual(reservations.commit('c'), 1)
+        self.assertEqual(reservations.release('c'), 0)
+        self.assertEqual(self.stock(), 1)
+
+    def test_stock_changes_invalidate_catalog(self):
+        before = get_db_catalog_version()
+        with self.captureOnCommitCallbacks(execute=True) as callbacks, \
+                mock.patch.object(catalog_snapshot, 'mark_stale') as mark_stale:
+            reservations.reserve('a', [(self.product.id, 5)])
+        self.assertTrue(callbacks)
+        self.assertEqual(get_db_catalog_version(), before + 1)
+        self.assertEqual(mark_stale.call_count, 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            reservations.release('a')
+        self.assertEqual(get_db_catalog_version(), before + 2)
+        # Sin cambio de stock (nada para liberar) no se invalida nada
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            reservations.release('a')
+        self.assertEqual(callbacks, [])
+
+    def test_release_restores_only_rows_still_held(self):
+        reservations.reserve('a', [(self.product.id, 3)])
+        # Lectura vieja: la reserva se confirmó después de seleccionarla
+        stale = StockReservation.objects.filter(reference='a')
+        reservations.commit('a')
+        self.assertEqual(reservations._release_rows(stale, 'default'), 0)
+        self.assertEqual(self.stock(), 2)
+
+    def test_sweep_releases_only_expired(self):
+        reservations.reserve('old', [(self.product.id, 2)], ttl=timedelta(seconds=-1))
+        reservations.reserve('new', [(self.product.id, 1)])
+        self.assertEqual(reservations.release_expired(), 1)
+        self.assertEqual(self.stock(), 4)
+        self.assertEqual(
+            StockReservation.objects.get(reference='new').status, 'held'
+        )
+
+
+class PlaceOrderTests(TestCase):
+    """Órdenes creadas desde el carrito"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.products = Product.objects.bulk_create([
+            Product(
+                name=f'Producto {i}', description='Descripción', price=Decimal(100 + i),
+                category='monitores', image='products/default_product.jpg', stock=10,
+            )
+            for i in range(20)
+        ])
+
+    def cart_with(self, lines):
+        request = RequestFactory().post('/payment/create/')
+        request.session = self.client.session
+        request.session[settings.CART_SESSION_ID] = {
+            # Precio viejo en el carrito: la orden usa el actual
+            str(product.id): {'quantity': 3, 'price': '1'}
+            for product in self.products[:lines]
+        }
+        request.user = AnonymousUser()
+        return Cart(request)
+
+    def test_query_count_does_not_grow_with_lines(self):
+        # La primera orden del día crea la fila del resumen de ventas
+        order_lines, _ = orders.price_cart(self.cart_with(1))
+        orders.place_order(order_lines, {'email': 'a@example.com'})
+        counts = []
+        for lines in (1, 20):
+            cart = self.cart_with(lines)
+            with CaptureQueriesContext(connection) as queries:
+                order_lines, _ = orders.price_cart(cart)
+                orders.place_order(order_lines, {'email': 'a@example.com'}, mercadopago_id='pref-1')
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
+
+    def test_totals_and_items(self):
+        order_lines, subtotal = orders.price_cart(self.cart_with(2))
+        order = orders.place_order(order_lines, {'email': 'a@example.com'}, shipping_price=1500)
+        self.assertEqual(subtotal, Decimal('603'))
+        self.assertEqual(order.total, Decimal('2103'))
+        self.assertEqual(
+            sorted(order.items.values_list('price', 'quantity')),
+            [(Decimal('100'), 3), (Decimal('101'), 3)],
+        )
+
+    def test_empty_cart(self):
+        with self.assertRaises(orders.EmptyCart):
+            orders.price_cart(self.cart_with(0))
+
+
+class MercadoPagoCheckoutTests(TestCase):
+    """Checkout contra el servidor falso de MercadoPago"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.product = Product.objects.bulk_create([Product(
+            name='Auriculares', description='Descripción', price=Decimal('5000'),
+            category='auriculares', image='products/default_product.jpg', stock=10,
+        )])[0]
+
+    def setUp(self):
+        self.fake = FakeMercadoPago().start()
+        self.addCleanup(self.fake.stop)
+        overrides = override_settings(
+            MERCADOPAGO_ACCESS_TOKEN='TEST-token', MERCADOPAGO_API_BASE_URL=self.fake.url,
+        )
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        self.addCleanup(cache.clear)
+
+    def set_quantity(self, quantity):
+        session = self.client.session
+        session[settings.CART_SESSION_ID] = {
+            str(self.product.id): {'quantity': quantity, 'price': '5000'},
+        }
+        session.save()
+
+    def pay(self):
+        response = self.client.post(reverse('create_payment'), '{}', content_type='application/json')
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def test_resubmitting_same_cart_reuses_preference(self):
+        self.set_quantity(2)
+        first, second = self.pay(), self.pay()
+        self.assertEqual(first['id'], second['id'])
+        self.assertEqual(self.fake.stats['preferences'], 1)
+        self.assertEqual(Order.objects.get().mercadopago_id, first['id'])
+        self.product.refresh_from_db(fields=['stock'])
+        self.assertEqual(self.product.stock, 8)
+
+    def test_changed_cart_creates_new_preference(self):
+        self.set_quantity(2)
+        first = self.pay()
+        self.set_quantity(3)
+        second = self.pay()
+        self.assertNotEqual(first['id'], second['id'])
+        self.assertEqual(self.fake.stats['preferences'], 2)
+        self.assertEqual(Order.objects.get(pk=first['order_id']).status, 'cancelled')
+        self.product.refresh_from_db(fields=['stock'])
+        self.assertEqual(self.product.stock, 7)
+
+    def post_payment(self):
+        return self.client.post(reverse('create_payment'), '{}', content_type='application/json')
+
+    def test_concurrent_checkout_does_not_create_a_second_preference(self):
+        self.set_quantity(2)
+
+        @contextmanager
+        def lock_taken(key, timeout=None):
+            yield False
+
+        # Otro request tiene el lock y se venció la espera
+        with mock.patch.object(payments, 'preference_lock', lock_taken):
+            response = self.post_payment()
+        self.assertEqual((response.status_code, response.json()['pending']), (409, True))
+
+        preference_lock, create_preference, held = payments.preference_lock, payments.create_preference, []
+
+        @contextmanager
+        def tracked_lock(key, timeout=None):
+            with preference_lock(key, timeout) as acquired:
+                held.append(key)
+                try:
+                    yield acquired
+                finally:
+                    held.remove(key)
+
+        def create_while_other_request_arrives(*args, **kwargs):
+            # MercadoPago se llama sin el lock; otro envío ve la clave pendiente
+            self.assertEqual(held, [])
+            self.assertEqual(self.post_payment().status_code, 409)
+            return create_preference(*args, **kwargs)
+
+        with mock.patch.object(payments, 'preference_lock', tracked_lock), \
+                mock.patch.object(payments, 'create_preference', create_while_other_request_arrives):
+            self.pay()
+        self.assertEqual(self.fake.stats['preferences'], 1)
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_order_failure_releases_reservation(self):
+        self.set_quantity(2)
+        with mock.patch.object(orders, 'place_order', side_effect=RuntimeError('base caída')), \
+                self.assertRaises(RuntimeError):
+            self.post_payment()
+        self.product.refresh_from_db(fields=['stock'])
+        self.assertEqual(self.product.stock, 10)
+        self.assertEqual(StockReservation.objects.get().status, 'released')
+        # El próximo intento crea la preferencia sin esperar a la clave pendiente
+        self.pay()
+        self.assertEqual(self.fake.stats['preferences'], 2)
+
+
+class PaymentWebhookTests(TestCase):
+    """Bandeja de notificaciones de pago y su procesamiento"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.product = Product.objects.bulk_create([Product(
+            name='Mouse', description='Descripción', price=Decimal('2000'),
+            category='mouses', image='products/default_product.jpg', stock=10,
+        )])[0]
+
+    def checkout(self, reference):
+        reservations.reserve(reference, [(self.product.id, 2)])
+        line = orders.OrderLine(self.product, 2, self.product.price, self.product.price * 2)
+        return orders.place_order([line], {'email': 'a@example.com'}, reference=reference)
+
+    def notify(self, notification_id, payment_id):
+        body = {'id': notification_id, 'type': 'payment', 'action': 'payment.updated', 'data': {'id': payment_id}}
+        return self.client.post(reverse('payment_webhook'), body, content_type='application/json')
+
+    def test_retries_are_stored_once(self):
+        for _ in range(3):
+            self.assertEqual(self.notify(1, '900').status_code, 200)
+        self.notify(2, '900')
+        self.assertEqual(PaymentNotification.objects.count(), 2)
+        response = self.client.post(reverse('payment_webhook'), 'no json', content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_process_inbox_applies_payment_status(self):
+        paid, rejected = self.checkout('ref-paid'), self.checkout('ref-rejected')
+        self.notify(1, '900')
+        self.notify(2, '900')
+        self.notify(3, '901')
+        found = {
+            '900': {'status': 'approved', 'external_reference': 'ref-paid'},
+            '901': {'status': 'rejected', 'external_reference': 'ref-rejected'},
+        }
+        fetched = []
+
+        def fetch(payment_id):
+            fetched.append(payment_id)
+            return found[payment_id]
+
+        stats = webhooks.process_inbox(fetch=fetch)
+        self.assertEqual(sorted(fetched), ['900', '901'])
+        self.assertEqual((stats['processed'], stats['orders']), (3, 2))
+        self.assertEqual(Order.objects.get(pk=paid.pk).status, 'paid')
+        self.assertEqual(Order.objects.get(pk=rejected.pk).status, 'cancelled')
+        self.assertEqual(
+            dict(StockReservation.objects.values_list('reference', 'status')),
+            {'ref-paid': 'committed', 'ref-rejected': 'released'},
+        )
+        self.product.refresh_from_db(fields=['stock'])
+        self.assertEqual(self.product.stock, 8)
+
+    def test_success_redirect_does_not_confirm_payment(self):
+        order = self.checkout('ref-redirect')
+        session = self.client.session
+        session[settings.CART_SESSION_ID] = {str(self.product.id): {'quantity': 2, 'price': '2000'}}
+        session['checkout_order_id'] = order.pk
+        session.save()
+
+        url = reverse('payment_success') + '?status=approved&external_reference=ref-redirect'
+        self.assertEqual(self.client.get(url).status_code, 200)
+        self.assertNotIn(settings.CART_SESSION_ID, self.client.session)
+        self.assertEqual(Order.objects.get(pk=order.pk).status, 'pending')
+        self.assertEqual(StockReservation.objects.get(reference='ref-redirect').status, 'held')
+
+        # Solo la confirmación de MercadoPago lo convierte en venta
+        self.notify(1, '900')
+        webhooks.process_inbox(fetch=lambda payment_id: {'status': 'approved', 'external_reference': 'ref-redirect'})
+        self.assertEqual(Order.objects.get(pk=order.pk).status, 'paid')
+        self.assertEqual(StockReservation.objects.get(reference='ref-redirect').status, 'committed')
+
+    def test_fetch_errors_are_retried(self):
+        self.notify(1, '900')
+
+        def fetch(payment_id):
+            raise payments.PaymentError('timeout')
+
+        stats = webhooks.process_inbox(fetch=fetch)
+        self.assertEqual(stats['retry'], 1)
+        notification = PaymentNotification.objects.get()
+        self.assertEqual((notification.status, notification.attempts), ('pending', 1))
+
+
+class ShippingIndexTests(TestCase):
+    """Cotización de envíos con las zonas de la migración inicial"""
+
+    @classmethod
+    def setUpTestData(cls):
+        express = ShippingOption.objects.create(name='Express Quilmes', price=Decimal('1800'), estimated_days='24 horas')
+        ShippingZone.objects.create(
+            name='Quilmes', postal_code_start='B1876', postal_code_end='1880', shipping_option=express
+        )
+        inactive = ShippingOption.objects.create(name='Moto', price=Decimal('100'), estimated_days='2 horas', is_active=False)
+        ShippingZone.objects.create(
+            name='Centro', postal_code_start='1000', postal_code_end='1010', shipping_option=inactive
+        )
+
+    def setUp(self):
+        shipping_index.mark_stale()
+
+    def zone(self, postal_code):
+        quote = shipping_index.quote(postal_code)
+        return quote and quote.zone
+
+    def test_lookup_by_numeric_range(self):
+        self.assertEqual(self.zone('1425'), 'CABA')
+        self.assertEqual(self.zone('C1001ABC'), 'CABA')  # la opción inactiva no cuenta
+        self.assertEqual(self.zone('1700'), 'GBA')
+        self.assertEqual(self.zone('1878'), 'Quilmes')  # la zona más angosta gana
+        self.assertEqual(self.zone('1881'), 'GBA')
+        self.assertEqual(self.zone('9400'), 'Interior')
+        self.assertIsNone(self.zone('999'))
+        self.assertIsNone(self.zone('abc'))
+
+    def test_index_reloads_when_option_changes(self):
+        option = ShippingOption.objects.get(name='GBA')
+        self.assertEqual(shipping_index.quote('1700').price, Decimal('2000'))
+        with self.captureOnCommitCallbacks(execute=True):
+            option.price = Decimal('2500')
+            option.save()
+        self.assertEqual(shipping_index.quote('1700').price, Decimal('2500'))
+
+    def test_calculate_shipping_and_bulk_api(self):
+        self.client.post(reverse('calculate_shipping'), {'postal_code': '1754'})
+        self.assertEqual(self.client.session['shipping_price'], 2000.0)
+
+        response = self.client.get(reverse('shipping_quote_api'), {'cp': ['1425', 'B1878', '0001']})
+        quotes = response.json()['quotes']
+        self.assertEqual(quotes['1425']['price'], '1500.00')
+        self.assertEqual(quotes['B1878']['zone'], 'Quilmes')
+        self.assertIsNone(quotes['0001'])
+
+
+class SalesSummaryTests(TestCase):
+    """Resumen diario de ventas del dashboard"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.product = Product.objects.bulk_create([Product(
+            name='Monitor', description='Descripción', price=Decimal('100000'),
+            category='monitores', image='products/default_product.jpg', stock=50,
+        )])[0]
+
+    def place(self, quantity):
+        line = orders.OrderLine(self.product, quantity, self.product.price, self.product.price * quantity)
+        return orders.place_order([line], {'email': 'a@example.com'})
+
+    def summary(self):
+        return sorted(DailySalesSummary.objects.filter(order_count__gt=0).values_list(
+            'date', 'status', 'order_count', 'revenue'
+        ))
+
+    def test_incremental_updates_match_rebuild(self):
+        first, second, third = self.place(1), self.place(2), self.place(3)
+        orders.update_status(Order.objects.filter(pk__in=[first.pk, second.pk]), 'paid')
+        second.refresh_from_db()
+        second.status = 'shipped'
+        second.save()
+        third.delete()
+
+        today = timezone.localdate()
+        self.assertEqual(self.summary(), [
+            (today, 'paid', 1, Decimal('100000')),
+            (today, 'shipped', 1, Decimal('200000')),
+        ])
+        incremental = self.summary()
+        sales.rebuild()
+        self.assertEqual(self.summary(), incremental)
+
+    def test_dashboard_reads_summary(self):
+        orders.update_status(Order.objects.filter(pk=self.place(2).pk), 'paid')
+        self.place(1)
+        admin_user = get_user_model().objects.create_superuser('admin', 'admin@example.com', 'x')
+        self.client.force_login(admin_user)
+
+        response = self.client.get(reverse('admin_dashboard'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['total_orders'], 2)
+        self.assertEqual(response.context['total_revenue'], Decimal('200000'))
+        self.assertEqual(len(response.context['sales_data']), 30)
+        self.assertEqual(response.context['top_products'][0]['revenue'], Decimal('200000.00'))
+
+
+class ExportTests(TestCase):
+    """Exportación en streaming desde el admin"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.product = Product.objects.bulk_create([Product(
+            name='Teclado, "TKL"', description='Descripción', price=Decimal('45999.90'),
+            category='teclados', image='products/default_product.jpg', stock=50,
+        )])[0]
+        line = orders.OrderLine(cls.product, 2, cls.product.price, cls.product.price * 2)
+        cls.order = orders.place_order([line], {'email': 'a@example.com'})
+        cls.admin_user = get_user_model().objects.create_superuser('admin', 'admin@example.com', 'x')
+
+    def export(self, action):
+        self.client.force_login(self.admin_user)
+        response = self.client.post(reverse('admin:marketplace_order_changelist'), {
+            'action': action, '_selected_action': [self.order.pk],
+        })
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode('utf-8')
+
+    def test_items_csv(self):
+        content = self.export('export_items_csv')
+        self.assertTrue(content.startswith('\ufeff'))
+        rows = list(csv.DictReader(io.StringIO(content.lstrip('\ufeff'))))
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['product_name'], 'Teclado, "TKL"')
+        self.assertEqual(rows[0]['price'], '45999.90')
+        self.assertEqual(rows[0]['order_created_at'], timezone.localtime(self.order.created_at).isoformat())
+
+    def test_orders_jsonl(self):
+        rows = [json.loads(line) for line in self.export('export_orders_jsonl').splitlines()]
+        self.assertEqual([(row['id'], row['total']) for row in rows], [(self.order.pk, '91999.80')])
+
+    def test_parquet_disabled_without_pyarrow(self):
+        with mock.patch.object(exports, 'PARQUET_AVAILABLE', False), tempfile.TemporaryDirectory() as directory:
+            self.assertEqual(exports.file_formats(), ['csv', 'jsonl'])
+            path = os.path.join(directory, 'orders.parquet')
+            with self.assertRaisesMessage(CommandError, 'pyarrow'):
+                call_command('export_data', 'orders', '--format', 'parquet', '-o', path)
+            self.assertFalse(os.path.exists(path))
+        if not exports.PARQUET_AVAILABLE:
+            with self.assertRaisesMessage(ImportError, 'pyarrow'):
+                exports.write_parquet('orders', '/dev/null')
+
+    def test_parquet_schema_from_model_fields(self):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            self.skipTest('pyarrow no instalado')
+        # Primer grupo: solo la orden de invitado, con user_id None
+        line = orders.OrderLine(self.product, 1, self.product.price, self.product.price)
+        orders.place_order([line], {'email': 'b@example.com'}, user=self.admin_user)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'orders.parquet')
+            self.assertEqual(exports.write_parquet('orders', path, row_group=1), 2)
+            table = pq.read_table(path)
+        self.assertEqual(table.schema.field('user_id').type, pa.int64())
+        self.assertEqual(table.column('user_id').to_pylist(), [None, self.admin_user.pk])
+
+
+class AnalyticsTests(TestCase):
+    """Métricas vectorizadas del dashboard"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.mouse, cls.monitor = Product.objects.bulk_create([
+            Product(name='Mouse', description='Descripción', price=Decimal('1000'),
+                    category='mouses', image='products/default_product.jpg', stock=50),
+            Product(name='Monitor', description='Descripción', price=Decimal('50000'),
+                    category='monitores', image='products/default_product.jpg', stock=50),
+        ])
+
+    def place(self, email, *lines):
+        order = orders.place_order(
+            [orders.OrderLine(product, quantity, product.price, product.price * quantity) for product, quantity in lines],
+            {'email': email},
+        )
+        orders.update_status(Order.objects.filter(pk=order.pk), 'paid')
+        return order
+
+    def test_metrics(self):
+        self.place('a@example.com', (self.mouse, 3), (self.monitor, 1))
+        self.place('A@example.com', (self.mouse, 1))
+        self.place('b@example.com', (self.monitor, 2))
+        orders.place_order([orders.OrderLine(self.mouse, 9, self.mouse.price, self.mouse.price * 9)],
+                           {'email': 'c@example.com'})
+
+        today = timezone.localdate()
+        metrics = analytics.compute(today, today)
+
+        # Ingresos = cantidad x precio; la orden pendiente no cuenta
+        self.assertEqual(
+            [(row['name'], row['total_sold'], row['revenue']) for row in metrics['top_products']],
+            [('Mouse', 4, Decimal('4000.00')), ('Monitor', 3, Decimal('150000.00'))],
+        )
+        basket = metrics['basket']
+        self.assertEqual([row['count'] for row in basket['bins'][:4]], [1, 1, 0, 1])
+        self.assertEqual(basket['avg_ticket'], Decimal('51333.33'))
+        self.assertEqual(metrics['category_mix']['weeks'][0]['revenue'], {'monitores': 150000.0, 'mouses': 4000.0})
+
+        cohorts = metrics['cohorts']
+        self.assertEqual((cohorts['customers'], cohorts['repeat_customers']), (2, 1))
+        self.assertEqual(cohorts['table'][0]['customers'], 2)
+
+    def test_customer_keys_with_guests(self):
+        with_guests = analytics.customer_keys(pd.Series([12, None], dtype='float64'), ['a@x.com', 'b@x.com'])
+        logged_in = analytics.customer_keys(pd.Series([12], dtype='int64'), ['a@x.com'])
+        self.assertEqual(list(with_guests), ['u:12', 'e:b@x.com'])
+        self.assertEqual(list(logged_in), ['u:12'])
+
+    def test_cohorts_mix_guests_and_users(self):
+        user = get_user_model().objects.create_user('ana', 'ana@example.com', 'x')
+        guest = self.place('invitado@example.com', (self.mouse, 1))
+        Order.objects.filter(pk=guest.pk).update(created_at=timezone.now() - timedelta(days=60))
+        order = self.place('ana@example.com', (self.mouse, 1))
+        Order.objects.filter(pk=order.pk).update(user=user)
+
+        # Primeras compras con invitados; en la ventana solo la orden del usuario
+        today = timezone.localdate()
+        cohorts = analytics.compute(today, today)['cohorts']
+        self.assertEqual(cohorts['table'][0]['customers'], 1)
+
+    def test_cached_per_window(self):
+        cache.clear()
+        today = timezone.localdate()
+        self.place('a@example.com', (self.mouse, 1))
+        self.assertEqual(analytics.window_metrics(today, today)['basket']['orders'], 1)
+        with self.assertNumQueries(1):
+            analytics.window_metrics(today, today)
+        # Una orden nueva del período cambia la huella y se recalcula
+        self.place('b@example.com', (self.mouse, 1))
+        self.assertEqual(analytics.window_metrics(today, today)['basket']['orders'], 2)
+
+
+class ConditionalGetTests(TestCase):
+    """ETag y 304 de las páginas del catálogo"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.product = Product.objects.bulk_create([Product(
+            name='Mouse gamer', description='Descripción', price=Decimal('2000'),
+            category='mouses', image='products/default_product.jpg', stock=10,
+        )])[0]
+
+    def setUp(self):
+        cache.clear()
+
+    def revalidate(self, url):
+        """(primera respuesta, revalidación con su ETag)"""
+        first = self.client.get(url)
+        return first, self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+
+    def test_cart_change_invalidates_etag_with_any_storage(self):
+        url = reverse('product_list')
+        for backend in ('SessionCartStorage', 'CacheCartStorage', 'DatabaseCartStorage'):
+            with self.subTest(backend=backend), \
+                    override_settings(CART_STORAGE=f'marketplace.cart_storage.{backend}'):
+                self.client = self.client_class()
+                self.client.get(url)  # cookie CSRF
+                first, second = self.revalidate(url)
+                self.assertEqual(second.status_code, 304)
+                # Por AJAX: sin mensaje pendiente, que desactivaría los validadores
+                self.client.post(reverse('add_to_cart', args=[self.product.id]), {'quantity': 1},
+                                 HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+                self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag']).status_code, 200)
+
+    def test_catalog_stamp_is_one_primary_key_lookup(self):
+        url = reverse('product_list')
+        self.client.get(url)
+        first, second = self.revalidate(url)
+        self.assertEqual(second.status_code, 304)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual([q['sql'] for q in queries if 'marketplace_product' in q['sql']], [])
+
+        # Un cambio de stock de una reserva también cambia el validador
+        with self.captureOnCommitCallbacks(execute=True):
+            reservations.reserve('ref', [(self.product.id, 10)])
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag']).status_code, 200)
+
+    def test_product_detail_follows_updated_at(self):
+        url = reverse('product_detail', args=[self.product.id])
+        self.client.get(url)
+        first, second = self.revalidate(url)
+        self.assertEqual(second.status_code, 304)
+        self.assertIn('no-cache', first['Cache-Control'])
+        Product.objects.filter(pk=self.product.pk).update(updated_at=timezone.now() + timedelta(seconds=1))
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag']).status_code, 200)
+        # No disponible: sin validadores, 404 de la vista
+        Product.objects.filter(pk=self.product.pk).update(available=False)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag']).status_code, 404)
+
+    def test_last_modified_only_for_anonymous_visitors(self):
+        url = reverse('product_list')
+        self.client.get(url)
+        anonymous = self.client.get(url)
+        self.assertIn('Last-Modified', anonymous)
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=anonymous['Last-Modified']).status_code, 304)
+
+        user = get_user_model().objects.create_user('ana', 'ana@example.com', 'x')
+        self.client.force_login(user)
+        self.client.get(url)
+        logged_in = self.client.get(url)
+        self.assertNotIn('Last-Modified', logged_in)
+        self.assertNotEqual(logged_in['ETag'], anonymous['ETag'])
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=anonymous['ETag']).status_code, 200)
+
+    def test_pending_messages_and_first_visit_disable_validators(self):
+        url = reverse('product_list')
+        # Primera visita: todavía no hay cookie CSRF
+        self.assertNotIn('ETag', self.client.get(url))
+        self.client.post(reverse('add_to_cart', args=[self.product.id]), {'quantity': 1})
+        self.assertNotIn('ETag', self.client.get(url))
+        self.assertIn('ETag', self.client.get(url))
+
+    def test_autocomplete_is_not_personalized(self):
+        url = reverse('search_autocomplete') + '?q=mouse'
+        first, second = self.revalidate(url)
+        self.assertEqual(second.status_code, 304)
+        bump_db_catalog_version()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag']).status_code, 200)
+
+
+class FragmentCacheTests(TestCase):
+    """Caché de tarjetas y grillas del catálogo"""
+
+    def setUp(self):
+        cache.clear()
+
+    def test_grid_key_follows_shared_db_version(self):
+        key = catalog_fragment_key('grid', 'mouses')
+        # Otro worker (caché local vacía) arma la misma clave
+        cache.clear()
+        self.assertEqual(catalog_fragment_key('grid', 'mouses'), key)
+        # Un cambio registrado por cualquier worker la cambia en todos
+        bump_db_catalog_version()
+        self.assertNotEqual(catalog_fragment_key('grid', 'mouses'), key)
+        self.assertNotEqual(catalog_fragment_key('grid', 'teclados'), catalog_fragment_key('grid', 'mouses'))
+
+    def render(self, source, **context):
+        return Template('{% load catalog_cache %}' + source).render(Context(context))
+
+    def test_card_invalidated_by_its_own_edit(self):
+        mouse, keyboard = Product.objects.bulk_create([
+            Product(name='Mouse', description='Descripción', price=Decimal('1000'),
+                    category='mouses', image='products/default_product.jpg', stock=5),
+            Product(name='Teclado', description='Descripción', price=Decimal('2000'),
+                    category='teclados', image='products/default_product.jpg', stock=5),
+        ])
+        card = '{% productcache "card" product %}{{ product.name }}{% endproductcache %}'
+        self.assertEqual(self.render(card, product=mouse), 'Mouse')
+        self.assertEqual(self.render(card, product=keyboard), 'Teclado')
+
+        # Sin cambiar updated_at se sigue sirviendo la tarjeta cacheada
+        mouse.name = keyboard.name = 'Editado'
+        self.assertEqual(self.render(card, product=mouse), 'Mouse')
+        mouse.updated_at += timedelta(seconds=1)
+        self.assertEqual(self.render(card, product=mouse), 'Editado')
+        self.assertEqual(self.render(card, product=keyboard), 'Teclado')
+
+    def test_grid_invalidated_by_catalog_change_and_stats(self):
+        fragment_stats.reset()
+        grid = '{% catalogcache "grid" category %}{{ label }}{% endcatalogcache %}'
+        self.assertEqual(self.render(grid, category='mouses', label='antes'), 'antes')
+        self.assertEqual(self.render(grid, category='mouses', label='después'), 'antes')
+        self.assertEqual(self.render(grid, category='teclados', label='otra'), 'otra')
+        bump_db_catalog_version()
+        self.assertEqual(self.render(grid, category='mouses', label='después'), 'después')
+        self.assertEqual(fragment_cache_stats(), {'hits': 1, 'misses': 3, 'invalidations': 0, 'hit_rate': 0.25})
+
+
+class ImageDerivativeTests(TestCase):
+    """Derivados WebP/JPEG de las imágenes de productos"""
+
+    def setUp(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root, True)
+        self.storage = FileSystemStorage(location=root)
+
+    def save_image(self, name, color, fmt):
+        buffer = io.BytesIO()
+        Image.new('RGB', (800, 600), color).save(buffer, fmt)
+        return self.storage.save(name, ContentFile(buffer.getvalue()))
+
+    def test_same_stem_different_extension(self):
+        self.assertEqual(images.derivative_name('products/foo.PNG', 'thumb', 'webp'), 'products/foo_png.thumb.webp')
+        png = self.save_image('products/foo.png', (255, 0, 0), 'PNG')
+        jpg = self.save_image('products/foo.jpg', (0, 0, 255), 'JPEG')
+        saved_png = images.generate_derivatives(png, self.storage)
+        saved_jpg = images.generate_derivatives(jpg, self.storage)
+        self.assertEqual(len(saved_png), 6)
+        self.assertEqual(len(saved_jpg), 6)
+        self.assertFalse(set(saved_png) & set(saved_jpg))
+
+        with self.storage.open(images.derivative_name(png, 'thumb', 'jpeg')) as fh:
+            thumb = Image.open(fh)
+            self.assertEqual(thumb.size, (160, 120))
+            red, _, blue = thumb.convert('RGB').getpixel((80, 60))
+        self.assertGreater(red, blue)
+
+    def test_save_defers_derivatives_until_commit(self):
+        name = self.save_image('products/foo.png', (255, 0, 0), 'PNG')
+        with override_settings(MEDIA_ROOT=self.storage.location), \
+                mock.patch.object(images, 'run_in_background') as run_in_background:
+            with self.captureOnCommitCallbacks(execute=True):
+                product = Product.objects.create(name='Mouse', description='Descripción', price=Decimal('1000'),
+                                                 category='mouses', image=name, stock=5)
+                # Dentro del guardado no se genera ni se agenda nada
+                run_in_background.assert_not_called()
+            self.assertEqual(self.storage.listdir('products')[1], ['foo.png'])
+            func, *args = run_in_background.call_args.args
+            before = get_db_catalog_version()
+            self.assertTrue(func(*args))
+
+        product.refresh_from_db()
+        self.assertEqual(product.image_derivatives, images.DERIVATIVES_VERSION)
+        self.assertTrue(self.storage.exists(images.derivative_name(name, 'card', 'webp')))
+        self.assertEqual(get_db_catalog_version(), before + 1)
+
+    def test_replaced_image_serves_original_until_regenerated(self):
+        old = self.save_image('products/old.png', (255, 0, 0), 'PNG')
+        new = self.save_image('products/new.png', (0, 0, 255), 'PNG')
+        product = Product.objects.create(name='Mouse', description='Descripción', price=Decimal('1000'),
+                                         category='mouses', image=old, stock=5,
+                                         image_derivatives=images.DERIVATIVES_VERSION)
+        product = Product.objects.get(pk=product.pk)
+        with mock.patch.object(images, 'run_in_background') as run_in_background, \
+                self.captureOnCommitCallbacks(execute=True):
+            product.image = new
+            product.save()
+        self.assertEqual(Product.objects.get(pk=product.pk).image_derivatives, 0)
+        # La generación de la imagen anterior terminó tarde: no marca la nueva
+        self.assertFalse(images.build_product_image(product.pk, old, storage=self.storage))
+        self.assertEqual(Product.objects.get(pk=product.pk).image_derivatives, 0)
+        func, *args = run_in_background.call_args.args
+        self.assertEqual(args[:3], [product.pk, new, True])
+
+
+class SearchTests(TestCase):
+    """Búsqueda full-text sobre la tabla sombra FTS5"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.keyboard, cls.mouse, cls.mousepad = Product.objects.bulk_create([
+            Product(name='Teclado Mecánico RGB', description='Switches rojos para gaming',
+                    price=Decimal('45000'), category='teclados', image='products/default_product.jpg', stock=5),
+            Product(name='Mouse inalámbrico', description='Sensor óptico, incluye teclado numérico de regalo',
+                    price=Decimal('15000'), category='mouses', image='products/default_product.jpg', stock=5),
+            Product(name='Mousepad XL', description='Base de goma',
+                    price=Decimal('8000'), category='mouses', image='products/default_product.jpg', stock=5),
+        ])
+        search.rebuild_search_index()
+
+    def found(self, query):
+        return list(search.search_products(Product.objects.all(), query)
+                    .order_by('-search_rank').values_list('name', flat=True))
+
+    def test_stemming_and_accents(self):
+        self.assertEqual(search.analyze('Teclados Mecánicos'), search.analyze('teclado mecanico'))
+        self.assertEqual(self.found('mecanicos'), ['Teclado Mecánico RGB'])
+
+    def test_name_ranks_above_description(self):
+        self.assertEqual(self.found('teclado'), ['Teclado Mecánico RGB', 'Mouse inalámbrico'])
+
+    def test_all_terms_by_prefix(self):
+        self.assertEqual(sorted(self.found('mous')), ['Mouse inalámbrico', 'Mousepad XL'])
+        self.assertEqual(self.found('mouse sensor'), ['Mouse inalámbrico'])
+        self.assertFalse(search.search_products(Product.objects.all(), '¿?').exists())
+
+    def test_index_and_unindex_product(self):
+        # Solo se reindexa: la fila guardada conserva su nombre
+        self.mousepad.name = 'Alfombrilla XL'
+        search.index_product(self.mousepad)
+        self.assertEqual(self.found('alfombrilla'), ['Mousepad XL'])
+        self.assertEqual(self.found('mousepad'), [])
+        search.unindex_product(self.mousepad.pk)
+        self.assertEqual(self.found('alfombrilla'), [])
+
+    def test_product_list_orders_by_relevance(self):
+        response = self.client.get(reverse('product_list'), {'q': 'teclado'})
+        self.assertEqual([p.name for p in response.context['products']],
+                         ['Teclado Mecánico RGB', 'Mouse inalámbrico'])
+        self.assertEqual(response.context['sort_by'], 'relevance')
+
+
+class AutocompleteIndexTests(TestCase):
+    """Índice de prefijos en memoria del autocompletado"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.keyboard, cls.mouse, cls.headset = Product.objects.bulk_create([
+            Product(name='Teclado Redragon Kumara', description='Descripción', price=Decimal('45000'),
+                    category='teclados', image='products/default_product.jpg', stock=5),
+            Product(name='Mouse Redragon Griffin', description='Descripción', price=Decimal('15000.5'),
+                    category='mouses', image='products/default_product.jpg', stock=5),
+            Product(name='Auriculares HyperX', description='Descripción', price=Decimal('60000'),
+                    category='auriculares', image='products/default_product.jpg', stock=5),
+        ])
+
+    def setUp(self):
+        # Desde el ORM: el snapshot del proceso puede ser de otro test
+        patcher = mock.patch.object(catalog_snapshot, 'enabled', False)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.index = AutocompleteIndex(max_age=0)
+
+    def names(self, query):
+        return sorted(record[0] for record in self.index.search(query))
+
+    def test_prefix_and_all_terms(self):
+        self.assertEqual(self.names('redr'), ['Mouse Redragon Griffin', 'Teclado Redragon Kumara'])
+        self.assertEqual(self.names('REDRAGON mou'), ['Mouse Redragon Griffin'])
+        self.assertEqual(self.names('téclad'), ['Teclado Redragon Kumara'])
+        self.assertEqual(self.names('logitech'), [])
+        record = self.index.search('griffin')[0]
+        self.assertEqual(record[2], '15000.50')
+        self.assertEqual(record[3], reverse('product_detail', args=[self.mouse.pk]))
+
+    def test_update_and_remove(self):
+        self.index.ensure_built()
+        self.mouse.name = 'Mouse Logitech G502'
+        self.index.update(self.mouse)
+        self.assertEqual(self.names('logi'), ['Mouse Logitech G502'])
+        self.assertEqual(self.names('griffin'), [])
+        self.assertEqual(self.names('mouse'), ['Mouse Logitech G502'])
+
+        self.keyboard.available = False
+        self.index.update(self.keyboard)
+        self.assertEqual(self.names('redragon'), [])
+
+        self.index.remove(self.headset.pk)
+        self.assertEqual(self.names('hyperx'), [])
+        self.assertEqual(self.index._keys, sorted(self.index._keys))
+
+    def test_rebuilt_when_another_worker_changes_the_catalog(self):
+        self.index.max_age = None
+        self.index.ensure_built()
+        # Otro worker: la base cambia sin señales en este proceso
+        Product.objects.filter(pk=self.mouse.pk).update(name='Mouse Logitech')
+        bump_db_catalog_version()
+        self.assertEqual(self.names('griffin'), ['Mouse Redragon Griffin'])
+        self.index.ensure_built(get_db_catalog_version())
+        self.assertEqual(self.names('logitech'), ['Mouse Logitech'])
+
+        with mock.patch('marketplace.views.autocomplete_index', self.index), \
+                mock.patch('marketplace.conditional.autocomplete_index', self.index):
+            url = reverse('search_autocomplete') + '?q=kuma'
+            first = self.client.get(url)
+            Product.objects.filter(pk=self.keyboard.pk).update(name='Teclado Redragon Fizz')
+            bump_db_catalog_version()
+            second = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second.json(), {'results': []})
+
+    def test_max_products_marks_truncated(self):
+        index = AutocompleteIndex(max_products=2, max_age=0)
+        index.ensure_built()
+        self.assertTrue(index.truncated)
+        self.assertEqual(len(index._records), 2)
+
+    def test_view_uses_index(self):
+        with mock.patch('marketplace.views.autocomplete_index', self.index):
+            response = self.client.get(reverse('search_autocomplete'), {'q': 'kuma'})
+        self.assertEqual([result['name'] for result in response.json()['results']], ['Teclado Redragon Kumara'])
+        self.assertEqual(self.client.get(reverse('search_autocomplete'), {'q': 'k'}).json(), {'results': []})
+
+
+class KeysetPaginationTests(TestCase):
+    """Paginación por cursor con empates en la clave de orden"""
+
+    @classmethod
+    def setUpTestData(cls):
+        # Precios repetidos: el id desempata
+        cls.products = Product.objects.bulk_create([
+            Product(name=f'Teclado {i % 3}', description='Teclado mecánico', price=Decimal(1000 * (i % 4)),
+                    category='teclados', image='products/default_product.jpg', stock=5)
+            for i in range(11)
+        ])
+        search.rebuild_search_index()
+
+    def walk(self, queryset, sort_by, page_size=3):
+        ids, cursor = [], None
+        while True:
+            page = paginate(queryset, sort_by, cursor, page_size=page_size)
+            ids += [product.pk for product in page]
+            if not page.has_next:
+                return ids
+            cursor = page.next_cursor
+
+    def test_pages_cover_the_ordering_once(self):
+        for sort_by, ordering in SORT_ORDERINGS.items():
+            if sort_by == 'relevance':
+                continue
+            with self.subTest(sort_by=sort_by):
+                expected = list(Product.objects.order_by(*ordering).values_list('pk', flat=True))
+                self.assertEqual(self.walk(Product.objects.all(), sort_by), expected)
+
+    def test_relevance_cursor_over_search_rank(self):
+        results = search.search_products(Product.objects.all(), 'teclado')
+        expected = [product.pk for product in results.order_by(*SORT_ORDERINGS['relevance'])]
+        self.assertEqual(len(expected), 11)
+        self.assertEqual(self.walk(results, 'relevance'), expected)
+
+    def test_cursor_round_trip_and_invalid_cursors(self):
+        ordering = SORT_ORDERINGS['price_high']
+        product = self.products[5]
+        cursor = encode_cursor('price_high', ordering, product)
+        self.assertEqual(decode_cursor(cursor, 'price_high', ordering, Product), [product.price, product.pk])
+        # Otro orden, basura o base64 sin JSON: primera página
+        self.assertIsNone(decode_cursor(cursor, 'price_low', SORT_ORDERINGS['price_low'], Product))
+        self.assertIsNone(decode_cursor('no-es-un-cursor', 'price_high', ordering, Product))
+        self.assertIsNone(decode_cursor('e30', 'price_high', ordering, Product))
+
+    def test_product_list_follows_cursor(self):
+        url = reverse('product_list')
+        with mock.patch.object(catalog_snapshot, 'enabled', False), \
+                mock.patch('marketplace.views.paginate', partial(paginate, page_size=4)):
+            first = self.client.get(url, {'sort': 'price_low'})
+            second = self.client.get(url, {'sort': 'price_low', 'cursor': first.context['next_cursor']})
+            broken = self.client.get(url, {'sort': 'price_low', 'cursor': 'roto'})
+        expected = list(Product.objects.order_by('price', 'id').values_list('pk', flat=True))
+        self.assertEqual([product.pk for product in first.context['products']], expected[:4])
+        self.assertEqual([product.pk for product in second.context['products']], expected[4:8])
+        self.assertEqual([product.pk for product in broken.context['products']], expected[:4])
+
+    def test_snapshot_pages_match_orm(self):
+        snapshot = load_snapshot(version=0)
+        for sort_by in ('name', 'price_low', 'price_high', 'newest'):
+            with self.subTest(sort_by=sort_by):
+                ids, cursor = [], None
+                while True:
+                    page = snapshot.paginate({}, sort_by, cursor, page_size=3)
+                    ids += [record.pk for record in page]
+                    if not page.has_next:
+                        break
+                    cursor = page.next_cursor
+                self.assertEqual(ids, self.walk(Product.objects.all(), sort_by))
+
+
+class FacetTests(TestCase):
+    """Conteos de facetas en una sola consulta"""
+
+    SELECTIONS = [
+        {},
+        {'category': 'mouses'},
+        {'price': '25000-50000'},
+        {'category': 'teclados', 'stock': 'poco_stock'},
+        {'category': 'monitores', 'price': 'desde-200000', 'stock': 'agotado'},
+    ]
+
+    @classmethod
+    def setUpTestData(cls):
+        categories = ['teclados', 'mouses', 'auriculares', 'monitores']
+        prices = [Decimal('9999'), Decimal('25000'), Decimal('49999.99'), Decimal('120000'), Decimal('250000')]
+        Product.objects.bulk_create([
+            Product(name=f'Producto {i}', description='Descripción', price=prices[i % 5],
+                    category=categories[i % 4], image='products/default_product.jpg', stock=[0, 3, 10][i % 3])
+            for i in range(30)
+        ])
+
+    def setUp(self):
+        cache.clear()
+
+    def expected(self, selection):
+        """Conteo en Python: cada faceta aplica las selecciones de las otras"""
+        products = list(Product.objects.filter(available=True))
+        counts = {facet: {} for facet in FACET_PARAMS}
+        for product in products:
+            values = {'category': product.category, 'price': price_band(product.price),
+                      'stock': product.get_stock_status()}
+            for facet in FACET_PARAMS:
+                if all(values[other] == value for other, value in selection.items() if other != facet):
+                    counts[facet][values[facet]] = counts[facet].get(values[facet], 0) + 1
+        return counts
+
+    def nonzero(self, counts):
+        return {facet: {value: count for value, count in options.items() if count} for facet, options in counts.items()}
+
+    def test_counts_in_one_aggregate(self):
+        queryset = Product.objects.filter(available=True)
+        for selection in self.SELECTIONS:
+            with self.subTest(selection=selection):
+                # La versión del catálogo (clave primaria) y un solo aggregate
+                with self.assertNumQueries(2):
+                    counts = compute_facets(queryset, selection)
+                self.assertEqual(self.nonzero(counts), self.expected(selection))
+                self.assertEqual(result_count(counts, selection), apply_facets(queryset, selection).count())
+                with self.assertNumQueries(1):
+                    self.assertEqual(compute_facets(queryset, selection), counts)
+
+    def test_snapshot_counts_match_orm(self):
+        snapshot = load_snapshot(version=0)
+        queryset = Product.objects.filter(available=True)
+        for selection in self.SELECTIONS:
+            with self.subTest(selection=selection):
+                self.assertEqual(self.nonzero(snapshot.facet_counts(selection)),
+                                 self.nonzero(compute_facets(queryset, selection)))
+
+    def test_search_without_terms(self):
+        # "!!!" no deja términos: la búsqueda es queryset.none()
+        queryset = search.search_products(Product.objects.filter(available=True), '!!!')
+        with self.assertNumQueries(0):
+            counts = compute_facets(queryset, {}, '!!!')
+        self.assertEqual(result_count(counts, {}), 0)
+        response = self.client.get(reverse('product_list'), {'q': '!!!'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['products_count'], 0)
+
+    def test_counts_shared_by_all_workers(self):
+        queryset = Product.objects.filter(available=True)
+        counts = compute_facets(queryset, {}, 'Teclado ')
+        self.assertEqual(compute_facets(queryset, {}, 'teclado'), counts)
+        # Otro worker cambió el catálogo: su caché local no se enteró, la base sí
+        Product.objects.filter(category='mouses').update(available=False)
+        bump_db_catalog_version()
+        self.assertEqual(compute_facets(queryset, {}, 'teclado')['category']['mouses'], 0)
+
+    def test_parse_selection_and_urls(self):
+        params = QueryDict('category=mouses&price=barato&stock=agotado&cursor=abc&q=rgb')
+        selection = parse_selection(params)
+        self.assertEqual(selection, {'category': 'mouses', 'stock': 'agotado'})
+        facets = build_facets(compute_facets(Product.objects.all(), selection), selection, params)
+        mouses = next(entry for entry in facets['category'] if entry['value'] == 'mouses')
+        teclados = next(entry for entry in facets['category'] if entry['value'] == 'teclados')
+        # Elegida: el enlace la quita; el cursor nunca se arrastra
+        self.assertTrue(mouses['selected'])
+        self.assertEqual(QueryDict(mouses['url'][1:]).dict(), {'price': 'barato', 'stock': 'agotado', 'q': 'rgb'})
+        self.assertEqual(QueryDict(teclados['url'][1:])['category'], 'teclados')
+        self.assertNotIn('cursor', teclados['url'])
+
+
+class CatalogSnapshotTests(TestCase):
+    """Snapshot del catálogo en memoria y su recarga por versión"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.mouse, cls.keyboard = Product.objects.bulk_create([
+            Product(name='Mouse', description='Descripción', price=Decimal('1000'),
+                    category='mouses', image='products/default_product.jpg', stock=5),
+            Product(name='Teclado', description='Descripción', price=Decimal('2000'),
+                    category='teclados', image='products/default_product.jpg', stock=5),
+        ])
+
+    def test_reloads_only_when_db_version_changes(self):
+        holder = SnapshotHolder(enabled=True, check_interval=60)
+        snapshot = holder.get()
+        self.assertEqual(sorted(record.name for record in snapshot.records), ['Mouse', 'Teclado'])
+        with self.assertNumQueries(0):
+            self.assertIs(holder.get(), snapshot)
+
+        # Misma versión: una consulta y el mismo snapshot
+        holder.mark_stale()
+        with self.assertNumQueries(1):
+            self.assertIs(holder.get(), snapshot)
+
+        Product.objects.filter(pk=self.keyboard.pk).update(available=False)
+        self.assertIs(holder.get(), snapshot)
+        bump_db_catalog_version()
+        holder.mark_stale()
+        fresh = holder.get()
+        self.assertEqual([record.name for record in fresh.records], ['Mouse'])
+        self.assertEqual(fresh.version, get_db_catalog_version())
+
+    def test_name_order_comes_from_database(self):
+        # Una collation sin mayúsculas ni acentos (como la de PostgreSQL) no
+        # ordena igual que los strings de Python: manda el orden de la base
+        now = timezone.now()
+        names = ['ábaco', 'beta', 'Zeta']
+        snapshot = CatalogSnapshot(0, [
+            ProductRecord(i, name, 'mouses', Decimal('1000'), 5, '', 0, now, now)
+            for i, name in enumerate(names, start=1)
+        ])
+        ids, cursor = [], None
+        while True:
+            page = snapshot.paginate({}, 'name', cursor, page_size=1)
+            ids += [record.pk for record in page]
+            if not page.has_next:
+                break
+            cursor = page.next_cursor
+        self.assertEqual(ids, [1, 2, 3])
+
+    def test_cursor_for_missing_product_uses_orm(self):
+        holder = SnapshotHolder(enabled=True, check_interval=60)
+        gone = Product(pk=10**6, name='Nada')
+        cursor = encode_cursor('name', SORT_ORDERINGS['name'], gone)
+        self.assertIsNone(holder.get().paginate({}, 'name', cursor))
+        with mock.patch('marketplace.views.catalog_snapshot', holder):
+            response = self.client.get(reverse('product_list'), {'sort': 'name', 'cursor': cursor})
+        self.assertEqual([product.name for product in response.context['products']], ['Teclado'])
+        self.assertEqual(response.context['products_count'], 2)
+
+    def test_records_are_read_only(self):
+        record = load_snapshot(version=0).by_id[self.mouse.pk]
+        self.assertEqual(record.get_category_display(), 'Mouses Gaming')
+        with self.assertRaises(AttributeError):
+            record.price = Decimal('1')
+
+    def test_too_many_products_falls_back_to_orm(self):
+        holder = SnapshotHolder(enabled=True, max_products=1)
+        with self.assertLogs('marketplace.snapshot', 'WARNING'):
+            self.assertIsNone(holder.get())
+        # No reintenta en cada request
+        with self.assertNumQueries(0):
+            self.assertIsNone(holder.get())
+        with mock.patch('marketplace.views.catalog_snapshot', holder):
+            response = self.client.get(reverse('product_list'))
+        self.assertEqual(sorted(product.name for product in response.context['products']), ['Mouse', 'Teclado'])
+
+    def test_load_error_returns_none(self):
+        holder = SnapshotHolder(enabled=True)
+        with mock.patch('marketplace.snapshot.load_snapshot', side_effect=RuntimeError('base caída')), \
+                self.assertLogs('marketplace.snapshot', 'ERROR'):
+            self.assertIsNone(holder.get())
+        self.assertFalse(holder.info()['loaded'])
+
+
+class CartContextProcessorTests(TestCase):
+    """Carrito perezoso en el contexto de los templates"""
+
+    def make_request(self):
+        request = RequestFactory().get('/')
+        request.session = self.client.session
+        request.session[settings.CART_SESSION_ID] = {
+            '1': {'quantity': 2, 'price': '1500.50'},
+            '2': {'quantity': 1, 'price': '999'},
+        }
+        request.user = AnonymousUser()
+        return request
+
+    def test_cart_built_once_and_only_when_read(self):
+        request = self.make_request()
+        with mock.patch.object(context_processors, 'Cart', wraps=Cart) as cart_class:
+            context = context_processors.cart_context(request)
+            self.assertIs(context_processors.cart_context(request), context)
+            cart_class.assert_not_called()
+
+            self.assertEqual(context['cart_total_items'], 3)
+            self.assertEqual(context['cart_total_price'], Decimal('4000.00'))
+            self.assertEqual(len(context['cart']), 3)
+        cart_class.assert_called_once_with(request)
+
+    def test_json_endpoint_does_not_touch_the_cart(self):
+        with mock.patch.object(context_processors, 'Cart', wraps=Cart) as cart_class:
+            self.client.get(reverse('search_autocomplete'), {'q': 'mouse'})
+            cart_class.assert_not_called()
+            self.client.get(reverse('product_list'))
+        cart_class.assert_called_once()
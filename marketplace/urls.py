@@ -10,6 +10,7 @@ urlpatterns = [
     path('ofertas/', views.ofertas, name='ofertas'),
     path('contacto/', views.contacto, name='contacto'),
     path('envios/', views.envios_info, name='envios_info'),
+    path('envios/api/cotizar/', views.shipping_quote_api, name='shipping_quote_api'),
     
     # Carrito
     path('carrito/', views.cart_detail, name='cart_detail'),
@@ -19,6 +20,7 @@ urlpatterns = [
     path('carrito/vaciar/', views.clear_cart, name='clear_cart'),
     path('carrito/calcular-envio/', views.calculate_shipping, name='calculate_shipping'),
     path('carrito/api/panel/', cart_panel_api, name='cart_panel_api'),
+    path('carrito/api/lote/', views.cart_batch_api, name='cart_batch_api'),
 
     # Mercado Pago
     path('payment/create/', views.create_mercadopago_payment, name='create_payment'),
@@ -30,4 +32,6 @@ urlpatterns = [
     # API y Utilidades
     path('buscar/autocomplete/', views.search_autocomplete, name='search_autocomplete'),
     path('mis-pedidos/', views.order_history, name='order_history'),
+    path('api/cache/fragmentos/', views.fragment_cache_stats_api, name='fragment_cache_stats'),
+    path('api/catalogo/snapshot/', views.catalog_snapshot_api, name='catalog_snapshot'),
 ]
\ No newline at end of file
@@ -1,29 +1,49 @@
 # === marketplace/views.py - VERSIÓN CORREGIDA Y OPTIMIZADA ===
 
 from django.shortcuts import render, get_object_or_404, redirect
+from django.template.loader import render_to_string
 from django.contrib import messages
 from django.http import JsonResponse
+from django.urls import reverse
 from django.db.models import Q
 from django.contrib.auth.decorators import login_required
+from django.contrib.admin.views.decorators import staff_member_required
 from django.views.decorators.http import require_http_methods
 from django.views.decorators.csrf import csrf_exempt
 from django.utils import timezone
 from decimal import Decimal
-import mercadopago
 import json
+import logging
+import uuid
 from django.conf import settings
 
 from .models import Product, Order, OrderItem
 from .forms import OrderForm, ContactForm
 from .cart import Cart
+from .search import search_products
+from .pagination import paginate, SORT_ORDERINGS
+from .facets import apply_facets, build_facets, compute_facets, parse_selection, result_count
+from .autocomplete import autocomplete_index, RESULT_FIELDS as AUTOCOMPLETE_FIELDS
+from .fragment_cache import fragment_cache_stats
+from .conditional import autocomplete_stamp, catalog_condition, product_stamp
+from .snapshot import catalog_snapshot
+from .shipping import shipping_index
+from . import orders, payments, reservations, webhooks
+
+logger = logging.getLogger(__name__)
 
 # =============================================================================
 # VISTAS PRINCIPALES
 # =============================================================================
 
+@catalog_condition()
 def index(request):
     """Vista principal de la página de inicio"""
-    featured_products = Product.objects.filter(available=True).order_by('-created_at')[:8]
+    snapshot = catalog_snapshot.get()
+    if snapshot is not None:
+        featured_products = snapshot.newest(8)
+    else:
+        featured_products = Product.objects.filter(available=True).order_by('-created_at')[:8]
     
     context = {
         'products': featured_products,
@@ -33,39 +53,58 @@ def index(request):
     
     return render(request, 'marketplace/index.html', context)
 
+@catalog_condition()
 def product_list(request):
-    """Vista para listar productos con filtros"""
-    category = request.GET.get('category', '')
-    search_query = request.GET.get('q', '')
+    """Vista para listar productos con filtros y facetas"""
+    selection = parse_selection(request.GET)
+    category = selection.get('category', '')
+    search_query = request.GET.get('q', '').strip()
     sort_by = request.GET.get('sort', 'name')
-    
-    products = Product.objects.filter(available=True)
-    
-    # Filtros
-    if category:
-        products = products.filter(category=category)
-    
-    if search_query:
-        products = products.filter(
-            Q(name__icontains=search_query) | 
-            Q(description__icontains=search_query)
-        )
-    
-    # Ordenamiento
-    sorting_options = {
-        'name': 'name',
-        'price_low': 'price',
-        'price_high': '-price', 
-        'newest': '-created_at'
-    }
-    
-    order_field = sorting_options.get(sort_by, 'name')
-    products = products.order_by(order_field)
+    fragment = request.GET.get('fragment')
+    cursor = request.GET.get('cursor')
+    
+    # Con búsqueda, por defecto se ordena por relevancia
+    if search_query and 'sort' not in request.GET:
+        sort_by = 'relevance'
+    if sort_by not in SORT_ORDERINGS or (sort_by == 'relevance' and not search_query):
+        sort_by = 'name'
+    
+    # Sin búsqueda se sirve desde el snapshot en memoria (si está cargado)
+    snapshot = None if search_query else catalog_snapshot.get()
+    
+    page = None
+    if snapshot is not None:
+        if not fragment:
+            facet_counts = snapshot.facet_counts(selection)
+        # None si el cursor apunta a un producto que ya no está en el snapshot
+        page = snapshot.paginate(selection, sort_by, cursor)
+    if page is None:
+        products = Product.objects.filter(available=True)
+        if search_query:
+            products = search_products(products, search_query)
+        
+        # Facetas: conteos sobre la búsqueda, antes de aplicar los filtros
+        if not fragment and snapshot is None:
+            facet_counts = compute_facets(products, selection, search_query)
+        products = apply_facets(products, selection)
+        
+        # Paginación por cursor sobre el orden elegido
+        page = paginate(products, sort_by, cursor)
+    
+    # Scroll infinito: solo las tarjetas de la página siguiente
+    if fragment:
+        html = render_to_string('marketplace/product_grid_items.html', {'products': page.items}, request=request)
+        return JsonResponse({'html': html, 'next_cursor': page.next_cursor})
     
     context = {
-        'products': products,
+        'products': page.items,
+        'products_count': result_count(facet_counts, selection),
+        'next_cursor': page.next_cursor,
+        'facets': build_facets(facet_counts, selection, request.GET),
         'categories': Product.CATEGORY_CHOICES,
         'selected_category': category,
+        'selected_price': selection.get('price', ''),
+        'selected_stock': selection.get('stock', ''),
         'search_query': search_query,
         'sort_by': sort_by,
         'page_title': 'Productos - Masivo Tech'
@@ -73,6 +112,7 @@ def product_list(request):
     
     return render(request, 'marketplace/product_list.html', context)
 
+@catalog_condition(product_stamp)
 def product_detail(request, product_id):
     """Vista para detalle de producto"""
     product = get_object_or_404(Product, id=product_id, available=True)
@@ -113,7 +153,11 @@ def handle_add_to_cart(request, product):
 
 def ofertas(request):
     """Vista para ofertas especiales"""
-    productos_oferta = Product.objects.filter(available=True).order_by('-created_at')[:8]
+    snapshot = catalog_snapshot.get()
+    if snapshot is not None:
+        productos_oferta = snapshot.newest(8)
+    else:
+        productos_oferta = Product.objects.filter(available=True).order_by('-created_at')[:8]
     
     context = {
         'productos_oferta': productos_oferta,
@@ -139,13 +183,15 @@ def contacto(request):
     
     return render(request, 'marketplace/contacto.html', context)
 
+# Íconos de las tarjetas de envios_info, de la zona más barata a la más cara
+SHIPPING_CARD_ICONS = [('fa-building', 'fa-bolt'), ('fa-home', 'fa-clock'), ('fa-globe-americas', 'fa-truck')]
+
 def envios_info(request):
     """Vista para información de envíos"""
-    shipping_zones = [
-        {'zona': 'CABA', 'precio': '$1.500', 'tiempo': '24-48 horas'},
-        {'zona': 'GBA', 'precio': '$2.000', 'tiempo': '48-72 horas'},
-        {'zona': 'Interior', 'precio': '$3.500', 'tiempo': '5-7 días'},
-    ]
+    shipping_zones = shipping_index.options()
+    for i, zone in enumerate(shipping_zones):
+        zone['icon'], zone['time_icon'] = SHIPPING_CARD_ICONS[min(i, len(SHIPPING_CARD_ICONS) - 1)]
+        zone['ranges'] = [f'{start:04d}-{end:04d}' for start, end in zone['ranges']]
     
     context = {
         'shipping_zones': shipping_zones,
@@ -169,8 +215,7 @@ def cart_detail(request):
             cart_has_exceeded_stock = True
             break
     
-    shipping_price = request.session.get('shipping_price', 0)
-    postal_code = request.session.get('postal_code', '')
+    postal_code, shipping_price = session_shipping(request)
     total_with_shipping = cart.get_total_price() + Decimal(str(shipping_price))
     
     context = {
@@ -196,6 +241,58 @@ def cart_panel_api(request):
     
     return render(request, 'marketplace/cart_panel_content.html', context)
 
+CART_BATCH_OPERATIONS = ('set', 'add', 'remove')
+CART_BATCH_MAX = 50
+
+@require_http_methods(["POST"])
+def cart_batch_api(request):
+    """
+    Varias operaciones del panel lateral en un solo POST::
+
+        {"operations": [{"op": "set", "product_id": 3, "quantity": 2},
+                        {"op": "remove", "product_id": 7}]}
+
+    Responde solo las líneas que cambiaron y los totales.
+    """
+    try:
+        payload = json.loads(request.body)
+        operations = [
+            (op['op'], int(op['product_id']), int(op.get('quantity', 0)))
+            for op in payload['operations']
+        ]
+    except (ValueError, TypeError, KeyError):
+        return JsonResponse({'success': False, 'message': 'Operaciones no válidas'}, status=400)
+    if not operations or len(operations) > CART_BATCH_MAX:
+        return JsonResponse({'success': False, 'message': 'Cantidad de operaciones no válida'}, status=400)
+    if any(op not in CART_BATCH_OPERATIONS for op, _, _ in operations):
+        return JsonResponse({'success': False, 'message': 'Operación desconocida'}, status=400)
+    # Un "add" negativo borraría la línea sin avisar: para quitar está "remove"
+    if any(quantity < 0 for _, _, quantity in operations):
+        return JsonResponse({'success': False, 'message': 'Cantidad no válida'}, status=400)
+
+    cart = Cart(request)
+    changed, removed, errors = cart.apply(operations)
+
+    lines = {}
+    for product_id in changed:
+        item = cart.cart[product_id]
+        price = Decimal(item['price'])
+        lines[product_id] = {
+            'quantity': item['quantity'],
+            'price': str(price),
+            'total_price': str(price * item['quantity']),
+            'stock': cart.products[product_id].stock,
+        }
+
+    return JsonResponse({
+        'success': not errors,
+        'lines': lines,
+        'removed': removed,
+        'errors': errors,
+        'cart_total_items': len(cart),
+        'cart_total_price': str(cart.get_total_price()),
+    })
+
 def add_to_cart(request, product_id):
     """Agregar producto al carrito"""
     cart = Cart(request)
@@ -301,181 +398,199 @@ def clear_cart(request):
 def calculate_shipping(request):
     """Calcular costo de envío"""
     if request.method == 'POST':
-        postal_code = request.POST.get('postal_code', '')
-        
-        shipping_price = 0
-        if postal_code:
-            if postal_code.startswith(('1', '2')):  # CABA
-                shipping_price = 1500
-            elif postal_code.startswith(('16', '17')):  # GBA
-                shipping_price = 2000
-            else:  # Interior
-                shipping_price = 3500
+        postal_code = request.POST.get('postal_code', '').strip()
+        quote = shipping_index.quote(postal_code) if postal_code else None
         
-        request.session['shipping_price'] = float(shipping_price)
-        request.session['postal_code'] = postal_code
+        if quote is None:
+            clear_shipping_session(request)
+            if postal_code:
+                messages.error(request, f'No hacemos envíos al código postal {postal_code}.')
+        else:
+            request.session['shipping_price'] = float(quote.price)
+            request.session['postal_code'] = postal_code
     
     return redirect('cart_detail')
 
+SHIPPING_QUOTE_MAX = 500
+
+@csrf_exempt
+@require_http_methods(["GET", "POST"])
+def shipping_quote_api(request):
+    """
+    Cotiza varios códigos postales de una vez::
+
+        GET  /envios/api/cotizar/?cp=1425&cp=B1600
+        POST /envios/api/cotizar/  {"postal_codes": ["1425", "B1600"]}
+
+    Solo lectura: no cambia el envío guardado en la sesión.
+    """
+    if request.method == 'POST':
+        try:
+            postal_codes = [str(code) for code in json.loads(request.body)['postal_codes']]
+        except (ValueError, TypeError, KeyError):
+            return JsonResponse({'success': False, 'message': 'Códigos postales no válidos'}, status=400)
+    else:
+        postal_codes = request.GET.getlist('cp')
+    if not postal_codes or len(postal_codes) > SHIPPING_QUOTE_MAX:
+        return JsonResponse({'success': False, 'message': 'Cantidad de códigos postales no válida'}, status=400)
+    
+    quotes = {}
+    for code, quote in shipping_index.quote_many(postal_codes).items():
+        quotes[code] = quote and {
+            'zone': quote.zone,
+            'option': quote.option,
+            'price': str(quote.price),
+            'estimated_days': quote.estimated_days,
+        }
+    return JsonResponse({'success': True, 'quotes': quotes})
+
 # =============================================================================
 # MERCADO PAGO
 # =============================================================================
+
+# Referencia de la reserva de stock y orden del último intento de pago
+RESERVATION_SESSION_KEY = 'reservation_reference'
+ORDER_SESSION_KEY = 'checkout_order_id'
+PREFERENCE_SESSION_KEY = 'checkout_preference_key'
+
 @require_http_methods(["POST"])
 @csrf_exempt
 def create_mercadopago_payment(request):
-    """Crear preferencia de pago en MercadoPago - VERSIÓN CON DEBUG COMPLETO"""
+    """Crear preferencia de pago en MercadoPago"""
+    # 1. Datos del cliente (opcionales) y carrito
     try:
-        print("=" * 50)
-        print("🔄 INICIANDO CREACIÓN DE PAGO MERCADOPAGO")
-        print("=" * 50)
-        
-        # 1. Verificar SDK
-        try:
-            import mercadopago
-            print("✅ Paquete mercadopago disponible")
-        except ImportError as e:
-            error_msg = f"❌ mercadopago no instalado: {e}"
-            print(error_msg)
-            return JsonResponse({'error': error_msg}, status=500)
-        
-        # 2. Verificar credenciales
-        if not hasattr(settings, 'MERCADOPAGO_ACCESS_TOKEN'):
-            error_msg = "❌ MERCADOPAGO_ACCESS_TOKEN no existe en settings"
-            print(error_msg)
-            return JsonResponse({'error': error_msg}, status=500)
-        
-        if not settings.MERCADOPAGO_ACCESS_TOKEN:
-            error_msg = "❌ MERCADOPAGO_ACCESS_TOKEN está vacío"
-            print(error_msg)
-            return JsonResponse({'error': error_msg}, status=500)
-        
-        print(f"✅ Credenciales configuradas: {settings.MERCADOPAGO_ACCESS_TOKEN[:20]}...")
-        
-        # 3. Inicializar SDK
+        checkout_data = json.loads(request.body or b'{}')
+    except ValueError:
+        checkout_data = {}
+    if not isinstance(checkout_data, dict):
+        checkout_data = {}
+    
+    cart = Cart(request)
+    try:
+        order_lines, total_carrito = orders.price_cart(cart)
+    except orders.EmptyCart:
+        return JsonResponse({'error': 'El carrito está vacío'}, status=400)
+    
+    # 2. Items con los precios actuales (los mismos de la orden) y envío
+    items = [
+        {
+            "id": str(line.product.id),
+            "title": line.product.name[:250],
+            "unit_price": float(line.price),
+            "quantity": line.quantity,
+            "currency_id": "ARS",
+        }
+        for line in order_lines
+    ]
+    postal_code, shipping_price = session_shipping(request)
+    if shipping_price > 0:
+        items.append({
+            "title": f"Envío a {postal_code}"[:250],
+            "unit_price": float(shipping_price),
+            "quantity": 1,
+            "currency_id": "ARS",
+        })
+    
+    # 3. Doble clic o reintento con el mismo carrito: la misma preferencia
+    if not request.session.session_key:
+        request.session.save()
+    dedup_key = payments.preference_key(request.session.session_key, items)
+    # El lock solo cubre la consulta y la marca; MercadoPago se llama afuera
+    with payments.preference_lock(dedup_key) as acquired:
+        existing = payments.recent_preference(dedup_key)
+        if existing is None and acquired:
+            payments.mark_preference_pending(dedup_key)
+    if payments.is_pending(existing) or (existing is None and not acquired):
+        return JsonResponse(
+            {'error': 'El pago ya se está creando. Intenta nuevamente en unos segundos.', 'pending': True},
+            status=409,
+        )
+    if existing:
+        request.session[RESERVATION_SESSION_KEY] = existing['reference']
+        request.session[ORDER_SESSION_KEY] = existing['order_id']
+        request.session[PREFERENCE_SESSION_KEY] = dedup_key
+        logger.info('Preferencia %s reutilizada (orden #%s)', existing['id'], existing['order_id'])
+        return JsonResponse({**existing, 'message': 'Pago creado exitosamente'})
+    
+    result = None
+    try:
+        # 4. Retener el stock mientras se paga (si se reintenta, se libera la anterior)
+        reference = f"masivotech_{int(timezone.now().timestamp())}_{uuid.uuid4().hex[:8]}"
+        release_checkout_reservation(request)
         try:
-            sdk = mercadopago.SDK(settings.MERCADOPAGO_ACCESS_TOKEN)
-            print("✅ SDK de MercadoPago inicializado")
-        except Exception as e:
-            error_msg = f"❌ Error inicializando SDK: {e}"
-            print(error_msg)
-            return JsonResponse({'error': error_msg}, status=500)
-        
-        # 4. Verificar carrito
-        cart = Cart(request)
-        print(f"🛒 Carrito tiene {len(cart)} items")
-        
-        if len(cart) == 0:
-            error_msg = "❌ El carrito está vacío"
-            print(error_msg)
-            return JsonResponse({'error': error_msg}, status=400)
-        
-        # 5. Construir items con validación
-        items = []
-        total_carrito = 0
-        
-        print("📦 Construyendo items del carrito:")
-        for i, item in enumerate(cart, 1):
-            try:
-                product_name = item['product'].name[:250]  # Limitar longitud
-                unit_price = float(item['price'])
-                quantity = item['quantity']
-                item_total = unit_price * quantity
-                total_carrito += item_total
-                
-                item_data = {
-                    "title": product_name,
-                    "unit_price": unit_price,
-                    "quantity": quantity,
-                    "currency_id": "ARS"
-                }
-                items.append(item_data)
-                
-                print(f"   {i}. {product_name} - ${unit_price} x {quantity} = ${item_total}")
-                
-            except Exception as e:
-                error_msg = f"❌ Error procesando item {i}: {e}"
-                print(error_msg)
-                return JsonResponse({'error': error_msg}, status=500)
-        
-        print(f"💰 Total carrito: ${total_carrito}")
-        
-        # 6. Agregar envío si existe
-        shipping_price = request.session.get('shipping_price', 0)
-        postal_code = request.session.get('postal_code', '')
+            reservations.reserve(reference, [(line.product.id, line.quantity) for line in order_lines])
+        except reservations.InsufficientStock as e:
+            return JsonResponse({'error': 'Sin stock suficiente', 'product_id': e.product_id}, status=409)
+        request.session[RESERVATION_SESSION_KEY] = reference
         
-        if shipping_price > 0:
-            try:
-                shipping_item = {
-                    "title": f"Envío a {postal_code}"[:250],
-                    "unit_price": float(shipping_price),
-                    "quantity": 1,
-                    "currency_id": "ARS"
-                }
-                items.append(shipping_item)
-                print(f"🚚 Envío agregado: ${shipping_price} para {postal_code}")
-            except Exception as e:
-                error_msg = f"❌ Error agregando envío: {e}"
-                print(error_msg)
-                return JsonResponse({'error': error_msg}, status=500)
-        
-        # 7. Crear preferencia de pago
+        # 5. Crear preferencia de pago
         preference_data = {
             "items": items,
             "back_urls": {
-                "success": "http://127.0.0.1:8000/payment/success/",
-                "failure": "http://127.0.0.1:8000/payment/failure/", 
-                "pending": "http://127.0.0.1:8000/payment/pending/"
+                "success": request.build_absolute_uri(reverse('payment_success')),
+                "failure": request.build_absolute_uri(reverse('payment_failure')),
+                "pending": request.build_absolute_uri(reverse('payment_pending')),
             },
-            # "auto_return": "approved",  # ← REMOVER ESTA LÍNEA
-            "external_reference": f"masivotech_{int(timezone.now().timestamp())}",
+            "external_reference": reference,
         }
-        
-        print("📤 Enviando datos a MercadoPago...")
-        print(f"📊 Datos enviados: {preference_data}")
-        
         try:
-            preference_response = sdk.preference().create(preference_data)
-            print(f"📥 Respuesta de MP recibida: {preference_response}")
-        except Exception as e:
-            error_msg = f"❌ Error en la petición a MercadoPago: {e}"
-            print(error_msg)
-            return JsonResponse({'error': error_msg}, status=500)
-        
-        # 8. Procesar respuesta
-        if preference_response["status"] in [200, 201]:
-            preference = preference_response["response"]
-            init_point = preference.get('init_point') or preference.get('sandbox_init_point')
-            
-            if not init_point:
-                error_msg = "❌ MercadoPago no devolvió URL de pago válida"
-                print(error_msg)
-                print(f"📋 Respuesta completa: {preference}")
-                return JsonResponse({'error': error_msg}, status=500)
-            
-            print(f"✅ Pago creado exitosamente - ID: {preference['id']}")
-            print(f"🔗 URL de pago: {init_point}")
-            
-            return JsonResponse({
-                'id': preference['id'],
-                'init_point': init_point,
-                'message': 'Pago creado exitosamente'
-            })
-        else:
-            error_msg = f"❌ Error de MercadoPago - Status: {preference_response['status']}"
-            print(error_msg)
-            print(f"📋 Respuesta completa: {preference_response}")
-            return JsonResponse({'error': error_msg}, status=500)
-            
-    except Exception as e:
-        error_msg = f"💥 ERROR NO MANEJADO: {str(e)}"
-        print(error_msg)
-        import traceback
-        print(f"📝 Traceback completo: {traceback.format_exc()}")
-        return JsonResponse({'error': error_msg}, status=500)
+            preference = payments.create_preference(
+                preference_data, idempotency_key=f'{dedup_key}-{reference}'
+            )
+        except payments.PaymentError as e:
+            logger.error('No se pudo crear la preferencia %s: %s', reference, e)
+            release_checkout_reservation(request)
+            return JsonResponse({'error': 'No se pudo iniciar el pago. Intenta nuevamente.'}, status=502)
+        
+        init_point = preference.get('init_point') or preference.get('sandbox_init_point')
+        if not init_point:
+            logger.error('MercadoPago no devolvió URL de pago para %s', reference)
+            release_checkout_reservation(request)
+            return JsonResponse({'error': 'MercadoPago no devolvió URL de pago válida'}, status=502)
+        
+        # 6. Orden pendiente con los mismos precios de la preferencia
+        customer = orders.customer_from_user(request.user)
+        form = OrderForm(checkout_data)
+        if form.is_valid():
+            customer.update(form.cleaned_data)
+        try:
+            order = orders.place_order(
+                order_lines, customer, user=request.user,
+                shipping_price=shipping_price, mercadopago_id=preference['id'], reference=reference,
+            )
+        except Exception:
+            # Sin orden no hay pago que confirme la reserva: se devuelve el stock
+            release_checkout_reservation(request)
+            raise
+        request.session[ORDER_SESSION_KEY] = order.id
+        request.session[PREFERENCE_SESSION_KEY] = dedup_key
+        
+        result = {
+            'id': preference['id'],
+            'order_id': order.id,
+            'init_point': init_point,
+            'reference': reference,
+        }
+        payments.remember_preference(dedup_key, result)
+    finally:
+        # Si no se llegó a crear, el próximo intento no tiene que esperar
+        if result is None:
+            payments.forget_preference(dedup_key)
+    
+    logger.info('Preferencia %s creada: orden #%s, $%s', preference['id'], order.id, total_carrito)
+    return JsonResponse({**result, 'message': 'Pago creado exitosamente'})
 
 
 def payment_success(request):
-    """Pago exitoso"""
+    """Pago exitoso: vacía el carrito. El pago lo confirma el webhook"""
+    # La redirección no está verificada (cualquiera puede pedir esta URL): la
+    # reserva sigue retenida y la orden 'pending' hasta que MercadoPago
+    # confirme el pago por el webhook (webhooks.apply_payments). Se olvidan
+    # para que un checkout nuevo no libere ni cancele este pago
+    request.session.pop(RESERVATION_SESSION_KEY, None)
+    request.session.pop(ORDER_SESSION_KEY, None)
+    payments.forget_preference(request.session.pop(PREFERENCE_SESSION_KEY, None))
+    
     cart = Cart(request)
     cart.clear()
     clear_shipping_session(request)
@@ -490,6 +605,8 @@ def payment_success(request):
 
 def payment_failure(request):
     """Pago fallido"""
+    release_checkout_reservation(request)
+    
     context = {
         'payment_id': request.GET.get('payment_id'),
         'status': request.GET.get('status'),
@@ -512,14 +629,13 @@ def payment_pending(request):
 
 @csrf_exempt
 def payment_webhook(request):
-    """Webhook para notificaciones de MercadoPago"""
+    """Webhook para notificaciones de MercadoPago (se procesan en segundo plano)"""
     if request.method == 'POST':
         try:
-            data = json.loads(request.body)
-            print(f"📦 Webhook recibido: {data}")
-            return JsonResponse({'status': 'ok'})
-        except Exception as e:
-            return JsonResponse({'error': str(e)}, status=500)
+            webhooks.ingest(request.body, request.GET)
+        except webhooks.InvalidNotification as e:
+            return JsonResponse({'error': str(e)}, status=400)
+        return JsonResponse({'status': 'ok'})
     
     return JsonResponse({'error': 'Método no permitido'}, status=405)
 
@@ -533,37 +649,71 @@ def get_base_url(request):
         return settings.BASE_URL.rstrip('/')
     return 'http://127.0.0.1:8000'
 
+def release_checkout_reservation(request):
+    """Devuelve el stock retenido por el último intento de pago"""
+    reservations.release(request.session.pop(RESERVATION_SESSION_KEY, None))
+    payments.forget_preference(request.session.pop(PREFERENCE_SESSION_KEY, None))
+    order_id = request.session.pop(ORDER_SESSION_KEY, None)
+    if order_id:
+        orders.update_status(Order.objects.filter(pk=order_id, status='pending'), 'cancelled')
+
+def session_shipping(request):
+    """
+    ``(código postal, precio)`` del envío elegido, cotizado otra vez con el
+    índice vigente: si la tarifa cambió se cobra la nueva.
+    """
+    postal_code = request.session.get('postal_code', '')
+    quote = shipping_index.quote(postal_code) if postal_code else None
+    if quote is None:
+        return postal_code, 0
+    shipping_price = float(quote.price)
+    if request.session.get('shipping_price') != shipping_price:
+        request.session['shipping_price'] = shipping_price
+    return postal_code, shipping_price
+
 def clear_shipping_session(request):
     """Limpiar datos de envío de la sesión"""
     for key in ['shipping_price', 'postal_code']:
         if key in request.session:
             del request.session[key]
 
+@catalog_condition(autocomplete_stamp, personalized=False)
 def search_autocomplete(request):
-    """Autocompletado de búsqueda"""
+    """Autocompletado de búsqueda (índice de prefijos en memoria)"""
     query = request.GET.get('q', '')
     
     if len(query) < 2:
         return JsonResponse({'results': []})
     
-    products = Product.objects.filter(
-        Q(name__icontains=query) | 
-        Q(category__icontains=query),
-        available=True
-    )[:5]
-    
-    results = []
-    for product in products:
-        results.append({
-            'name': product.name,
-            'category': product.get_category_display(),
-            'price': str(product.price),
-            'url': f"/producto/{product.id}/",
-            'image': product.image.url if product.image else None
-        })
-    
+    records = autocomplete_index.search(query, limit=5)
+    
+    # Catálogo más grande que el tope del índice: completar desde la base
+    if not records and autocomplete_index.truncated:
+        products = Product.objects.filter(
+            Q(name__icontains=query) | 
+            Q(category__icontains=query),
+            available=True
+        )[:5]
+        records = [
+            (p.name, p.get_category_display(), str(p.price), f"/producto/{p.id}/",
+             p.get_image_url('thumb', 'webp'))
+            for p in products
+        ]
+    
+    results = [dict(zip(AUTOCOMPLETE_FIELDS, record)) for record in records]
     return JsonResponse({'results': results})
 
+@staff_member_required
+def fragment_cache_stats_api(request):
+    """Contadores de la caché de tarjetas y grillas (solo staff)"""
+    return JsonResponse(fragment_cache_stats())
+
+@staff_member_required
+def catalog_snapshot_api(request):
+    """Estado y memoria del snapshot del catálogo de este worker (solo staff)"""
+    catalog_snapshot.get()
+    return JsonResponse(catalog_snapshot.info())
+
 @login_required
 def order_history(request):
     """Historial de pedidos del usuario"""
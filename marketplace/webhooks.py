@@ -0,0 +1,198 @@
+# === webhooks.py - Notificaciones de pago de MercadoPago ===
+"""
+El webhook responde enseguida y el trabajo pesado queda para un worker::
+
+    POST /payment/webhook/  ->  ingest()  ->  PaymentNotification (pendiente)
+    manage.py process_payment_notifications --every 5  ->  process_inbox()
+
+- ``ingest``: un solo ``INSERT`` que ignora duplicados. MercadoPago reintenta
+  hasta recibir 200 y repite el id de la notificación; la restricción única
+  de ``notification_id`` los descarta sin consultar antes.
+- ``process_inbox``: lee las pendientes en lotes, consulta cada pago una sola
+  vez aunque tenga varias notificaciones (en paralelo, con el cliente
+  compartido de ``payments``) y aplica los cambios de estado con
+  ``orders.update_status``, un ``UPDATE`` por estado destino y no uno por
+  orden.
+
+Se usa el estado actual del pago, no el de la notificación: si llegan
+desordenadas gana el último estado. Las transiciones son condicionales
+(``WHERE status IN ...``), así reprocesar o correr dos workers no rompe nada.
+"""
+
+import hashlib
+import json
+import logging
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+
+from . import orders, payments, reservations
+from .models import Order, PaymentNotification
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 200
+MAX_ATTEMPTS = 5
+
+# Estado del pago -> (estado de la orden, estados desde los que se pasa)
+TRANSITIONS = {
+    'approved': ('paid', ('pending', 'cancelled')),
+    'rejected': ('cancelled', ('pending',)),
+    'cancelled': ('cancelled', ('pending',)),
+    'refunded': ('cancelled', ('pending', 'paid')),
+    'charged_back': ('cancelled', ('pending', 'paid')),
+}
+
+
+class InvalidNotification(Exception):
+    """El request no parece una notificación de MercadoPago"""
+
+
+# =============================================================================
+# RECEPCIÓN
+# =============================================================================
+
+def parse_notification(body, query):
+    """
+    Campos de ``PaymentNotification`` a partir del request. Acepta los dos
+    formatos de MercadoPago: webhooks (``{"id", "type", "data": {"id"}}``) e
+    IPN (``?topic=payment&id=...``).
+    """
+    try:
+        payload = json.loads(body) if body else {}
+    except ValueError:
+        raise InvalidNotification('JSON inválido')
+    if not isinstance(payload, dict):
+        raise InvalidNotification('Se esperaba un objeto JSON')
+
+    data = payload.get('data') if isinstance(payload.get('data'), dict) else {}
+    topic = payload.get('type') or payload.get('topic') or query.get('type') or query.get('topic') or ''
+    resource_id = (
+        data.get('id') or query.get('data.id') or query.get('id')
+        or str(payload.get('resource') or '').rstrip('/').rsplit('/', 1)[-1]
+    )
+    if not topic or not resource_id:
+        raise InvalidNotification('Notificación sin tipo o recurso')
+
+    if data and payload.get('id'):
+        notification_id = str(payload['id'])
+    else:
+        # IPN no trae id propio: un reintento repite exactamente lo mismo
+        raw = json.dumps([topic, str(resource_id), payload, sorted(query.items())], sort_keys=True, default=str)
+        notification_id = 'h:' + hashlib.sha256(raw.encode()).hexdigest()[:40]
+
+    return {
+        'notification_id': notification_id[:64],
+        'topic': str(topic)[:32],
+        'resource_id': str(resource_id)[:64],
+        'payload': payload,
+    }
+
+
+def ingest(body, query):
+    """Guarda la notificación (los duplicados se ignoran en el mismo INSERT)"""
+    notification = PaymentNotification(**parse_notification(body, query))
+    PaymentNotification.objects.bulk_create([notification], ignore_conflicts=True)
+
+
+# =============================================================================
+# PROCESAMIENTO
+# =============================================================================
+
+def _fetch_all(payment_ids, fetch, pool):
+    """``{payment_id: pago | None | PaymentError}``"""
+    def safe_fetch(payment_id):
+        try:
+            return fetch(payment_id)
+        except payments.PaymentError as exc:
+            return exc
+
+    return dict(zip(payment_ids, pool.map(safe_fetch, payment_ids)))
+
+
+def apply_payments(found):
+    """
+    Aplica los pagos ``{payment_id: pago}`` a las órdenes y reservas.
+    Devuelve cuántas órdenes cambiaron de estado.
+    """
+    targets = defaultdict(set)
+    for payment in found.values():
+        reference = payment.get('external_reference')
+        transition = TRANSITIONS.get(payment.get('status'))
+        if reference and transition:
+            targets[transition].add(reference)
+
+    changed = 0
+    for (status, from_statuses), references in targets.items():
+        changed += orders.update_status(
+            Order.objects.filter(external_reference__in=references, status__in=from_statuses), status
+        )
+
+    approved = targets.get(TRANSITIONS['approved'], set())
+    rejected = targets.get(TRANSITIONS['rejected'], set())
+    # Pagado: el stock queda vendido. Rechazado: vuelve. Devuelto: la
+    # mercadería pudo haber salido, el stock se ajusta a mano
+    reservations.commit_many(sorted(approved))
+    reservations.release_many(sorted(rejected))
+    return changed
+
+
+def process_batch(rows, fetch, pool, now=None):
+    """Procesa ``rows`` (``(id, topic, resource_id)``). Devuelve un Counter"""
+    now = now or timezone.now()
+    stats = Counter()
+
+    by_payment = defaultdict(list)
+    ignored = []
+    for notification_id, topic, resource_id in rows:
+        if topic == 'payment':
+            by_payment[resource_id].append(notification_id)
+        else:
+            ignored.append(notification_id)
+
+    results = _fetch_all(list(by_payment), fetch, pool)
+    found = {pid: r for pid, r in results.items() if isinstance(r, dict)}
+    errors = {pid: r for pid, r in results.items() if isinstance(r, Exception)}
+    # 404: pagos de prueba o de otra cuenta
+    ignored += [nid for pid, r in results.items() if r is None for nid in by_payment[pid]]
+
+    stats['orders'] += apply_payments(found)
+
+    done = [nid for pid in found for nid in by_payment[pid]]
+    stats['processed'] += PaymentNotification.objects.filter(id__in=done).update(
+        status='processed', processed_at=now, error=''
+    )
+    stats['ignored'] += PaymentNotification.objects.filter(id__in=ignored).update(
+        status='ignored', processed_at=now
+    )
+    for payment_id, exc in errors.items():
+        logger.warning('No se pudo consultar el pago %s: %s', payment_id, exc)
+        failed = PaymentNotification.objects.filter(id__in=by_payment[payment_id])
+        failed.update(attempts=F('attempts') + 1, error=str(exc)[:255])
+        given_up = failed.filter(attempts__gte=MAX_ATTEMPTS).update(status='failed')
+        stats['failed'] += given_up
+        stats['retry'] += len(by_payment[payment_id]) - given_up
+    return stats
+
+
+def process_inbox(batch_size=BATCH_SIZE, fetch=None, workers=None):
+    """
+    Procesa las notificaciones pendientes en lotes. Cada llamada recorre la
+    cola una vez: las que fallaron se reintentan en la próxima.
+    """
+    fetch = fetch or payments.get_payment
+    workers = workers or getattr(settings, 'WEBHOOK_FETCH_WORKERS', 8)
+    stats = Counter()
+    last_id = 0
+    pending = PaymentNotification.objects.filter(status='pending').order_by('id')
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        while True:
+            rows = list(pending.filter(id__gt=last_id).values_list('id', 'topic', 'resource_id')[:batch_size])
+            if not rows:
+                return stats
+            stats += process_batch(rows, fetch, pool)
+            stats['batches'] += 1
+            last_id = rows[-1][0]
@@ -197,6 +197,23 @@ TEMPLATES = [
     },
 ]
 
+# =============================================================================
+# CONFIGURACIÓN DE CACHÉ
+# =============================================================================
+
+# Por defecto caché local por worker; CACHE_BACKEND/CACHE_LOCATION permiten
+# compartirla entre workers (p. ej. DatabaseCache o Memcached)
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', 'masivotech'),
+        'TIMEOUT': 300,
+    }
+}
+
+# Tarjetas y grillas de productos (se invalidan por updated_at / versión del catálogo)
+FRAGMENT_CACHE_TIMEOUT = 3600
+
 # =============================================================================
 # CONFIGURACIÓN DE CRISPY FORMS
 # =============================================================================
@@ -210,18 +227,74 @@ CRISPY_TEMPLATE_PACK = "bootstrap5"
 
 CART_SESSION_ID = 'cart'
 
+# Dónde se guardan las líneas: SessionCartStorage, CacheCartStorage o
+# DatabaseCartStorage (ver marketplace/cart_storage.py)
+CART_STORAGE = os.getenv('CART_STORAGE', 'marketplace.cart_storage.SessionCartStorage')
+
+# Segundos que el stock queda retenido mientras se paga (ver marketplace/reservations.py)
+STOCK_RESERVATION_TTL = 15 * 60
+
+# =============================================================================
+# CONFIGURACIÓN DE BÚSQUEDA
+# =============================================================================
+
+# Productos por página en los listados (paginación por cursor)
+PRODUCTS_PER_PAGE = 24
+
+# Índice de autocompletado en memoria (por worker)
+AUTOCOMPLETE_MAX_PRODUCTS = int(os.getenv('AUTOCOMPLETE_MAX_PRODUCTS', 50000))
+AUTOCOMPLETE_MAX_AGE = 300  # segundos antes de reconstruir
+
+# Snapshot del catálogo en memoria (por worker); con más productos se usa el ORM
+CATALOG_SNAPSHOT_ENABLED = os.getenv('CATALOG_SNAPSHOT_ENABLED', 'True') == 'True'
+CATALOG_SNAPSHOT_MAX_PRODUCTS = int(os.getenv('CATALOG_SNAPSHOT_MAX_PRODUCTS', 50000))
+CATALOG_SNAPSHOT_CHECK_INTERVAL = 1.0  # segundos entre consultas a CatalogVersion
+
 # =============================================================================
 # CONFIGURACIÓN DE APIs EXTERNAS
 # =============================================================================
 
 # Google Gemini AI
 GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
+# Modelos en orden de preferencia; el que anda se recuerda por proceso
+# (chat/gemini.py): GEMINI_HEALTH_TTL segundos, o GEMINI_RETRY_TTL si ninguno respondió
+GEMINI_MODELS = [
+    'models/gemini-2.0-flash-001',
+    'models/gemini-2.5-flash',
+    'models/gemini-flash-latest',
+    'models/gemini-pro-latest',
+]
+GEMINI_HEALTH_TTL = 600
+GEMINI_RETRY_TTL = 60
+GEMINI_PROBE_TIMEOUT = 10
+# Caché de respuestas del chat por mensaje normalizado (chat/answers.py)
+CHAT_CACHE_TTL = 3600
+CHAT_CACHE_LOCAL_SIZE = 512     # LRU en memoria de cada worker
+CHAT_CACHE_MAX_CHARS = 200      # los mensajes más largos no se guardan
+CHAT_CACHE_WAIT_TIMEOUT = 20    # espera máxima por la misma pregunta en curso
+# Llamadas a Gemini desde chat_api_async (chat/limiter.py), por proceso
+CHAT_UPSTREAM_CONCURRENCY = 8       # llamadas a la vez
+CHAT_UPSTREAM_QUEUE = 32            # mensajes esperando turno; el resto recibe la respuesta predefinida
+CHAT_UPSTREAM_QUEUE_TIMEOUT = 5     # segundos máximos en la cola
+CHAT_UPSTREAM_DEADLINE = 15         # segundos por llamada
+# Respuestas predefinidas del chat sin Gemini (chat/intents.py)
+CHAT_INTENTS_FILE = BASE_DIR / 'chat' / 'data' / 'intents.json'
 # Mercado Pago - CONFIGURACIÓN BÁSICA
 
 
 MERCADOPAGO_ACCESS_TOKEN = os.getenv('MERCADOPAGO_ACCESS_TOKEN')
 MERCADOPAGO_PUBLIC_KEY = os.getenv('MERCADOPAGO_PUBLIC_KEY')
 
+# Cliente compartido (marketplace/payments.py); la URL se puede apuntar al
+# servidor falso de `manage.py fake_mercadopago`
+MERCADOPAGO_API_BASE_URL = os.getenv('MERCADOPAGO_API_BASE_URL', 'https://api.mercadopago.com')
+MERCADOPAGO_TIMEOUT = (3.05, 10)  # conexión, lectura (segundos)
+MERCADOPAGO_MAX_RETRIES = 2
+# Segundos en que un reenvío del mismo carrito devuelve la misma preferencia
+MERCADOPAGO_PREFERENCE_DEDUP_TTL = 120
+# Consultas de pagos en paralelo al procesar notificaciones (marketplace/webhooks.py)
+WEBHOOK_FETCH_WORKERS = 8
+
 # Google OAuth
 SOCIALACCOUNT_PROVIDERS = {
     'google': {
@@ -269,6 +342,9 @@ BASE_URL = 'http://127.0.0.1:8000'
 
 # Configuración del admin dashboard
 ADMIN_DASHBOARD = True
+# Segundos que se guardan las métricas por período (marketplace/analytics.py);
+# se recalculan antes si cambia alguna orden del período
+ANALYTICS_CACHE_TIMEOUT = 3600
 
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
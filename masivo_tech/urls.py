@@ -3,7 +3,15 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 
-urlpatterns = [
+from marketplace.admin_dashboard import admin_dashboard
+
+urlpatterns = []
+
+if getattr(settings, 'ADMIN_DASHBOARD', False):
+    # Antes de admin.site.urls, que tomaría "dashboard/" como una app
+    urlpatterns.append(path('admin/dashboard/', admin.site.admin_view(admin_dashboard), name='admin_dashboard'))
+
+urlpatterns += [
     path('admin/', admin.site.urls),
     path('', include('marketplace.urls')),
     path('soporte/', include('chat.urls')),
@@ -7,6 +7,7 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'masivo_tech.settings')
 django.setup()
 
 from marketplace.models import Product
+from marketplace.images import detect_image_extension
 
 def get_argentina_products():
     """Productos con precios reales de Argentina"""
@@ -78,12 +79,15 @@ def create_argentina_products():
             
             # Descargar imagen
             try:
-                response = requests.get(product_info['image_url'])
-                if response.status_code == 200:
-                    file_name = f"{product_info['name'].replace(' ', '_').lower()}.jpg"
+                response = requests.get(product_info['image_url'], timeout=15)
+                extension = detect_image_extension(response.content) if response.status_code == 200 else None
+                if extension:
+                    file_name = f"{product_info['name'].replace(' ', '_').lower()}.{extension}"
                     image_file = ContentFile(response.content, name=file_name)
-                    product.image.save(file_name, image_file)
-            except:
+                    product.image.save(file_name, image_file, save=False)
+                else:
+                    product.image = 'products/default_product.jpg'
+            except requests.RequestException:
                 product.image = 'products/default_product.jpg'
             
             product.save()
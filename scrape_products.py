@@ -9,6 +9,7 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'masivo_tech.settings')
 django.setup()
 
 from marketplace.models import Product
+from marketplace.images import detect_image_extension
 
 def get_products_from_api():
     """Obtiene productos reales de APIs de periféricos"""
@@ -83,13 +84,15 @@ def get_products_from_api():
     return predefined_peripherals
 
 def download_product_image(image_url, product_name):
-    """Descarga la imagen del producto"""
+    """Descarga la imagen del producto (con la extensión de su formato real)"""
     try:
-        response = requests.get(image_url)
+        response = requests.get(image_url, timeout=15)
         if response.status_code == 200:
-            file_name = f"{product_name.replace(' ', '_').lower()}.jpg"
-            return ContentFile(response.content, name=file_name)
-    except:
+            extension = detect_image_extension(response.content)
+            if extension:
+                file_name = f"{product_name.replace(' ', '_').lower()}.{extension}"
+                return ContentFile(response.content, name=file_name)
+    except requests.RequestException:
         pass
     return None
 
@@ -116,7 +119,8 @@ def create_real_products():
             # Descargar y asignar imagen
             image_file = download_product_image(product_info['image_url'], product_info['name'])
             if image_file:
-                product.image.save(f"{product_info['name'].replace(' ', '_')}.jpg", image_file)
+                # save=False: el save() de abajo dispara una sola vez la generación de derivados
+                product.image.save(image_file.name, image_file, save=False)
             else:
                 # Imagen por defecto si no se puede descargar
                 product.image = 'products/default_product.jpg'
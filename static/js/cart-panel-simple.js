@@ -3,6 +3,12 @@
 class CartPanelSimple {
     constructor() {
         this.initialized = false;
+        // Operaciones pendientes por producto y espera antes de enviarlas (ms)
+        this.pendingOperations = new Map();
+        this.flushDelay = 400;
+        this.flushTimer = null;
+        // Lote enviado y todavía sin respuesta (promesa) o null
+        this.flushPromise = null;
         this.init();
     }
 
@@ -58,6 +64,11 @@ class CartPanelSimple {
             this.reloadCartPanel();
         });
 
+        // No perder cambios pendientes al salir de la página
+        window.addEventListener('pagehide', () => {
+            this.flushOperations({ keepalive: true });
+        });
+
         // Recargar cuando se abre el panel
         document.addEventListener('click', (e) => {
             if (e.target.closest('.cart-toggle')) {
@@ -68,7 +79,7 @@ class CartPanelSimple {
         });
     }
 
-    async handleQuantityChange(button, change) {
+    handleQuantityChange(button, change) {
         const productId = button.dataset.productId;
         const quantityElement = document.getElementById(`quantity${productId}`);
         
@@ -82,6 +93,7 @@ class CartPanelSimple {
 
         // Validar límites
         if (newQuantity < 1) newQuantity = 1;
+        if (newQuantity === currentQuantity) return;
 
         console.log(`🔄 Actualizando cantidad: ${currentQuantity} → ${newQuantity} para producto ${productId}`);
         
@@ -97,8 +109,8 @@ class CartPanelSimple {
         // Actualizar total del item (estimado)
         this.updateItemTotal(productId, newQuantity);
 
-        // Enviar actualización al servidor
-        await this.updateCartItem(productId, newQuantity);
+        // Los clics seguidos se juntan en un solo envío
+        this.queueOperation(productId, { op: 'set', quantity: newQuantity });
     }
 
     updateItemTotal(productId, quantity) {
@@ -116,101 +128,114 @@ class CartPanelSimple {
         }
     }
 
-    async handleRemoveItem(button) {
+    handleRemoveItem(button) {
         const productId = button.dataset.productId;
         
         if (!confirm('¿Estás seguro de que quieres eliminar este producto del carrito?')) {
             return;
         }
 
-        await this.removeCartItem(productId);
+        // Ocultar ya; el servidor confirma en el próximo lote
+        const itemElement = document.getElementById(`cartItem${productId}`);
+        if (itemElement) itemElement.style.display = 'none';
+
+        this.queueOperation(productId, { op: 'remove' });
     }
 
-        async updateCartItem(productId, quantity) {
-        try {
-            console.log(`📤 Enviando actualización: Producto ${productId}, Cantidad ${quantity}`);
-            
-            const formData = new URLSearchParams();
-            formData.append('quantity', quantity);
-            formData.append('csrfmiddlewaretoken', this.getCSRFToken());
+    // =========================================================================
+    // LOTES DE OPERACIONES
+    // =========================================================================
 
-            const response = await fetch(`/carrito/actualizar/${productId}/`, {
-                method: 'POST',
-                headers: {
-                    'X-Requested-With': 'XMLHttpRequest',
-                    'X-CSRFToken': this.getCSRFToken(),
-                },
-                body: formData
-            });
+    queueOperation(productId, operation) {
+        // Por producto solo importa la última operación (set 2, set 3 → set 3)
+        this.pendingOperations.set(productId, { product_id: productId, ...operation });
 
-            if (response.ok) {
-                const data = await response.json();
-                console.log('✅ Respuesta del servidor:', data);
-                
-                if (data.success) {
-                    this.updateCartDisplay(data);
-                    MasivoTechUtils.showToast(data.message || 'Carrito actualizado', 'success');
-                    
-                    // Si el carrito quedó vacío después de actualizar, recargar panel
-                    if (data.cart_total_items === 0) {
-                        setTimeout(() => {
-                            this.reloadCartPanel();
-                        }, 1000);
-                    }
-                } else {
-                    throw new Error(data.message || 'Error del servidor');
-                }
-            } else {
-                throw new Error(`Error HTTP: ${response.status}`);
-            }
-        } catch (error) {
-            console.error('❌ Error actualizando item:', error);
-            MasivoTechUtils.showToast(error.message || 'Error al actualizar el carrito', 'error');
-            this.reloadCartPanel(); // Recargar todo el panel en caso de error
+        clearTimeout(this.flushTimer);
+        this.flushTimer = setTimeout(() => this.flushOperations(), this.flushDelay);
+    }
+
+    async flushOperations({ keepalive = false } = {}) {
+        clearTimeout(this.flushTimer);
+
+        // Un lote a la vez: lo que llegue mientras tanto va en el siguiente.
+        // Al salir de la página no se espera (keepalive lo envía igual)
+        while (this.flushPromise && !keepalive) {
+            await this.flushPromise;
+        }
+        if (this.pendingOperations.size === 0) return;
+
+        const operations = Array.from(this.pendingOperations.values());
+        this.pendingOperations.clear();
+
+        const promise = this.flushPromise = this.sendOperations(operations, keepalive);
+        try {
+            await promise;
+        } finally {
+            if (this.flushPromise === promise) this.flushPromise = null;
         }
     }
 
-    async removeCartItem(productId) {
+    async sendOperations(operations, keepalive) {
         try {
-            console.log(`📤 Enviando eliminación: Producto ${productId}`);
-            
-            const formData = new URLSearchParams();
-            formData.append('csrfmiddlewaretoken', this.getCSRFToken());
+            console.log(`📤 Enviando lote de ${operations.length} operaciones`, operations);
 
-            const response = await fetch(`/carrito/remover/${productId}/`, {
+            const response = await fetch('/carrito/api/lote/', {
                 method: 'POST',
+                keepalive,
                 headers: {
+                    'Content-Type': 'application/json',
                     'X-Requested-With': 'XMLHttpRequest',
                     'X-CSRFToken': this.getCSRFToken(),
                 },
-                body: formData
+                body: JSON.stringify({ operations })
             });
 
-            if (response.ok) {
-                const data = await response.json();
-                console.log('✅ Respuesta del servidor:', data);
-                
-                if (data.success) {
-                    this.updateCartDisplay(data);
-                    MasivoTechUtils.showToast(data.message || 'Producto eliminado del carrito', 'success');
-                    
-                    // Recargar panel completo después de eliminar
-                    setTimeout(() => {
-                        this.reloadCartPanel();
-                    }, 500);
-                } else {
-                    throw new Error(data.message || 'Error del servidor');
-                }
-            } else {
+            if (!response.ok) {
                 throw new Error(`Error HTTP: ${response.status}`);
             }
+
+            const data = await response.json();
+            console.log('✅ Respuesta del servidor:', data);
+
+            this.applyCartDiff(data);
+            this.updateCartDisplay(data);
+
+            if (data.errors.length) {
+                data.errors.forEach(error => MasivoTechUtils.showToast(error.message, 'warning'));
+            } else {
+                MasivoTechUtils.showToast('Carrito actualizado', 'success');
+            }
+
+            if (data.cart_total_items === 0) {
+                this.reloadCartPanel();
+            }
         } catch (error) {
-            console.error('❌ Error eliminando item:', error);
-            MasivoTechUtils.showToast(error.message || 'Error al eliminar el producto', 'error');
+            console.error('❌ Error enviando el lote:', error);
+            MasivoTechUtils.showToast(error.message || 'Error al actualizar el carrito', 'error');
             this.reloadCartPanel(); // Recargar todo el panel en caso de error
         }
     }
 
+    applyCartDiff(data) {
+        // Líneas que cambiaron: cantidad y total confirmados por el servidor
+        Object.entries(data.lines).forEach(([productId, line]) => {
+            // Si el usuario volvió a tocar la línea, manda lo que está en pantalla
+            if (this.pendingOperations.has(productId)) return;
+
+            const quantityElement = document.getElementById(`quantity${productId}`);
+            const totalElement = document.getElementById(`total${productId}`);
+            const minusBtn = document.querySelector(`.cart-minus[data-product-id="${productId}"]`);
+
+            if (quantityElement) quantityElement.textContent = line.quantity;
+            if (totalElement) totalElement.textContent = `$${line.total_price}`;
+            if (minusBtn) minusBtn.disabled = line.quantity <= 1;
+        });
+
+        data.removed.forEach(productId => {
+            document.getElementById(`cartItem${productId}`)?.remove();
+        });
+    }
+
         updateCartDisplay(data) {
         console.log('📊 Actualizando display del carrito:', data);
         
@@ -258,6 +283,9 @@ class CartPanelSimple {
             return;
         }
 
+        // Esperar el lote en curso y enviar lo pendiente para no mostrar datos viejos
+        await this.flushOperations();
+
         try {
             console.log('🔄 CartPanelSimple: Recargando panel del carrito...');
             
@@ -313,6 +341,8 @@ class CartPanelSimple {
 
     // Método para cerrar el panel manualmente
     closePanel() {
+        this.flushOperations();
+
         const cartPanel = document.getElementById('cartPanel');
         const overlay = document.querySelector('.panel-overlay');
         
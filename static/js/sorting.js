@@ -47,6 +47,8 @@ class SortingManager {
         } else {
             currentUrl.searchParams.delete('sort');
         }
+        // El cursor pertenece al orden anterior
+        currentUrl.searchParams.delete('cursor');
         
         // Mostrar estado de loading
         this.showLoadingState();
@@ -91,7 +93,100 @@ class SortingManager {
     }
 }
 
+// === Scroll infinito con paginación por cursor ===
+
+class InfiniteScroll {
+    constructor() {
+        this.selectors = {
+            productsGrid: '#productsGrid',
+            sentinel: '#productsSentinel'
+        };
+        
+        this.loading = false;
+        this.init();
+    }
+
+    init() {
+        this.grid = document.querySelector(this.selectors.productsGrid);
+        this.sentinel = document.querySelector(this.selectors.sentinel);
+        
+        if (!this.grid || !this.sentinel) return;
+        
+        // El link "Ver más" sigue funcionando sin JavaScript
+        this.sentinel.querySelector('a')?.addEventListener('click', (e) => {
+            e.preventDefault();
+            this.loadNextPage();
+        });
+        
+        if ('IntersectionObserver' in window) {
+            this.observer = new IntersectionObserver((entries) => {
+                if (entries.some(entry => entry.isIntersecting)) {
+                    this.loadNextPage();
+                }
+            }, { rootMargin: '400px 0px' });
+            this.observer.observe(this.sentinel);
+        }
+    }
+
+    /**
+     * Pide la página siguiente como fragmento HTML y la agrega al grid
+     */
+    async loadNextPage() {
+        const cursor = this.sentinel.dataset.nextCursor;
+        if (this.loading || !cursor) return;
+        
+        this.loading = true;
+        const url = new URL(window.location.href);
+        url.searchParams.set('cursor', cursor);
+        url.searchParams.set('fragment', '1');
+        
+        try {
+            const response = await fetch(url.toString(), {
+                headers: { 'X-Requested-With': 'XMLHttpRequest' }
+            });
+            const data = await response.json();
+            
+            const template = document.createElement('template');
+            template.innerHTML = data.html;
+            this.bindCards(template.content);
+            this.grid.appendChild(template.content);
+            
+            if (data.next_cursor) {
+                this.sentinel.dataset.nextCursor = data.next_cursor;
+            } else {
+                this.finish();
+            }
+        } catch (error) {
+            console.error('❌ Error cargando más productos:', error);
+            MasivoTechUtils.showToast('No se pudieron cargar más productos', 'error');
+        } finally {
+            this.loading = false;
+        }
+    }
+
+    /**
+     * Los botones de agregar al carrito se vinculan uno por uno en cart.js
+     */
+    bindCards(root) {
+        if (!window.cartManager) return;
+        
+        root.querySelectorAll('.add-to-cart-btn').forEach(button => {
+            button.addEventListener('click', (e) => {
+                e.preventDefault();
+                e.stopPropagation();
+                window.cartManager.handleAddToCart(button);
+            });
+        });
+    }
+
+    finish() {
+        this.observer?.disconnect();
+        this.sentinel.remove();
+    }
+}
+
 // Inicializar cuando el DOM esté listo
 document.addEventListener('DOMContentLoaded', () => {
     window.sortingManager = new SortingManager();
+    window.infiniteScroll = new InfiniteScroll();
 });
\ No newline at end of file